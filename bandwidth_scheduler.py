@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Time-of-day bandwidth schedule
+
+A schedule is a list of weekly time slots. Each slot overrides some of the
+session's rate limits and active-torrent caps while it is in effect;
+outside every slot the base settings (the limits set by hand and the
+performance profile's caps) apply. Where slots overlap, the first one
+listed wins, and a slot whose end is before its start runs past midnight.
+
+Slots are stored in settings.json as dicts:
+
+    {"days": ["mon", "tue", "wed", "thu", "fri"], "start": "09:00", "end": "17:00",
+     "download_rate": 500000, "upload_rate": 100000, "active_downloads": 2}
+
+and edited as one line per slot:
+
+    mon-fri 09:00-17:00 down=500 up=100 downloads=2
+
+Rates are bytes/sec in the dicts and KB/s in the text form, 0 = unlimited.
+
+BandwidthScheduler re-evaluates the schedule at every minute boundary on
+a background thread and calls apply_settings() only when the effective
+values change.
+"""
+
+import re
+import threading
+from datetime import datetime
+
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Slot keys and the libtorrent settings they override
+SLOT_SETTINGS = {
+    'download_rate': 'download_rate_limit',
+    'upload_rate': 'upload_rate_limit',
+    'active_downloads': 'active_downloads',
+    'active_seeds': 'active_seeds',
+    'active_limit': 'active_limit',
+}
+
+# Names used in the text form, and whether the value is a rate in KB/s
+TEXT_KEYS = {
+    'down': ('download_rate', True),
+    'up': ('upload_rate', True),
+    'downloads': ('active_downloads', False),
+    'seeds': ('active_seeds', False),
+    'active': ('active_limit', False),
+}
+
+TIME_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+
+def parse_time(text):
+    """
+    Parse "HH:MM" into minutes since midnight
+
+    Raises:
+        ValueError: If the time is malformed or out of range
+    """
+    match = TIME_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid time {text!r} (expected HH:MM)")
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError(f"Invalid time {text!r}")
+    return hours * 60 + minutes
+
+
+def parse_days(text):
+    """
+    Parse "mon-fri", "sat,sun", "daily" or "*" into day indexes (Monday = 0)
+
+    Raises:
+        ValueError: If a day name is unknown
+    """
+    text = text.strip().lower()
+    if text in ('daily', '*'):
+        return list(range(7))
+
+    days = []
+    for part in text.split(','):
+        first, dash, last = part.partition('-')
+        if first not in DAYS or (dash and last not in DAYS):
+            raise ValueError(f"Invalid days {part!r} (use mon..sun, ranges like mon-fri, or daily)")
+        start = DAYS.index(first)
+        end = DAYS.index(last) if dash else start
+        # A range like fri-mon wraps around the week
+        index = start
+        while True:
+            if index not in days:
+                days.append(index)
+            if index == end:
+                break
+            index = (index + 1) % 7
+    return days
+
+
+class ScheduleSlot:
+    """One weekly time slot and the settings it overrides"""
+
+    def __init__(self, days, start, end, limits):
+        """
+        Args:
+            days: Day indexes the slot starts on (Monday = 0)
+            start: Start in minutes since midnight
+            end: End in minutes since midnight; before start means the next day
+            limits: Dict of SLOT_SETTINGS keys to values
+
+        Raises:
+            ValueError: If the slot is empty or a value is invalid
+        """
+        if not days:
+            raise ValueError("A slot needs at least one day")
+        if start == end:
+            raise ValueError("A slot can't start and end at the same time")
+        for key, value in limits.items():
+            if key not in SLOT_SETTINGS:
+                raise ValueError(f"Unknown slot setting {key!r}")
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"{key} must be a non-negative integer, got {value!r}")
+        if not limits:
+            raise ValueError("A slot needs at least one limit")
+
+        self.days = sorted(set(days))
+        self.start = start
+        self.end = end
+        self.limits = dict(limits)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a slot from its settings.json form
+
+        Raises:
+            ValueError: If the slot is malformed
+        """
+        try:
+            days = [DAYS.index(day) for day in data['days']]
+            start = parse_time(data['start'])
+            end = parse_time(data['end'])
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid slot {data!r}: {e}")
+        except ValueError as e:
+            raise ValueError(f"Invalid slot {data!r}: {e}")
+        limits = {key: data[key] for key in SLOT_SETTINGS if key in data}
+        return cls(days, start, end, limits)
+
+    def to_dict(self):
+        """Return the settings.json form"""
+        data = {
+            'days': [DAYS[day] for day in self.days],
+            'start': f"{self.start // 60:02d}:{self.start % 60:02d}",
+            'end': f"{self.end // 60:02d}:{self.end % 60:02d}",
+        }
+        data.update(self.limits)
+        return data
+
+    @classmethod
+    def parse(cls, line):
+        """
+        Build a slot from its text form, e.g. "mon-fri 09:00-17:00 down=500 up=100"
+
+        Raises:
+            ValueError: If the line is malformed
+        """
+        fields = line.split()
+        if len(fields) < 3:
+            raise ValueError("Expected: <days> <HH:MM>-<HH:MM> <setting>=<value> ...")
+
+        days = parse_days(fields[0])
+        start_text, dash, end_text = fields[1].partition('-')
+        if not dash:
+            raise ValueError(f"Invalid time range {fields[1]!r} (expected HH:MM-HH:MM)")
+        start, end = parse_time(start_text), parse_time(end_text)
+
+        limits = {}
+        for field in fields[2:]:
+            name, equals, value = field.partition('=')
+            if not equals or name not in TEXT_KEYS:
+                raise ValueError(f"Invalid setting {field!r} (use {', '.join(TEXT_KEYS)})")
+            key, is_rate = TEXT_KEYS[name]
+            try:
+                number = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be a number, got {value!r}")
+            limits[key] = number * 1000 if is_rate else number
+        return cls(days, start, end, limits)
+
+    def format(self):
+        """Return the text form"""
+        if self.days == list(range(7)):
+            days = 'daily'
+        elif self.days == list(range(self.days[0], self.days[-1] + 1)) and len(self.days) > 2:
+            days = f"{DAYS[self.days[0]]}-{DAYS[self.days[-1]]}"
+        else:
+            days = ','.join(DAYS[day] for day in self.days)
+
+        fields = [days, f"{self.start // 60:02d}:{self.start % 60:02d}-"
+                        f"{self.end // 60:02d}:{self.end % 60:02d}"]
+        for name, (key, is_rate) in TEXT_KEYS.items():
+            if key in self.limits:
+                value = self.limits[key] // 1000 if is_rate else self.limits[key]
+                fields.append(f"{name}={value}")
+        return ' '.join(fields)
+
+    def contains(self, when):
+        """Return True if the slot is in effect at a datetime"""
+        day = when.weekday()
+        minute = when.hour * 60 + when.minute
+        if self.start < self.end:
+            return day in self.days and self.start <= minute < self.end
+        # Runs past midnight: the evening of a listed day or the morning after
+        return ((day in self.days and minute >= self.start)
+                or ((day - 1) % 7 in self.days and minute < self.end))
+
+    def settings(self):
+        """Return the libtorrent settings this slot overrides"""
+        return {SLOT_SETTINGS[key]: value for key, value in self.limits.items()}
+
+
+class BandwidthSchedule:
+    """An ordered list of slots; the first slot in effect wins"""
+
+    def __init__(self, slots=()):
+        self.slots = list(slots)
+
+    @classmethod
+    def from_settings(cls, data):
+        """
+        Build a schedule from the 'bandwidth_schedule' entry of settings.json
+
+        Args:
+            data: {'enabled': bool, 'slots': [slot dicts]}, or None
+
+        Returns:
+            BandwidthSchedule, or None if the schedule is off
+
+        Raises:
+            ValueError: If a slot is malformed
+        """
+        if not data or not data.get('enabled'):
+            return None
+        return cls(ScheduleSlot.from_dict(slot) for slot in data.get('slots', []))
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Build a schedule from one slot per line; blank lines and # comments are skipped
+
+        Raises:
+            ValueError: Naming the first line that is malformed
+        """
+        slots = []
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                slots.append(ScheduleSlot.parse(line))
+            except ValueError as e:
+                raise ValueError(f"Line {number}: {e}")
+        return cls(slots)
+
+    def format(self):
+        """Return one slot per line"""
+        return '\n'.join(slot.format() for slot in self.slots)
+
+    def to_list(self):
+        """Return the slots in their settings.json form"""
+        return [slot.to_dict() for slot in self.slots]
+
+    def slot_at(self, when):
+        """Return the slot in effect at a datetime, or None"""
+        for slot in self.slots:
+            if slot.contains(when):
+                return slot
+        return None
+
+
+class BandwidthScheduler:
+    """Apply a bandwidth schedule to a session from a background thread"""
+
+    def __init__(self, ses, base, schedule=None, on_change=None, clock=datetime.now):
+        """
+        Args:
+            ses: libtorrent session
+            base: Settings outside every slot; only the keys of
+                SLOT_SETTINGS' values are used
+            schedule: BandwidthSchedule, or None to just keep the base
+            on_change: Called as on_change(settings, slot) on the scheduler
+                thread after new settings were applied; slot is None
+                outside every slot
+            clock: Returns the current local datetime
+        """
+        self.ses = ses
+        self.base = {}
+        self.schedule = schedule
+        self.on_change = on_change
+        self.clock = clock
+
+        self.current = {}     # Settings last applied
+        self.slot = None      # Slot in effect, or None
+        self.reapply = True   # The session's values may differ from current
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.set_base(base, apply=False)
+
+    def start(self):
+        """Apply the schedule now and keep it applied until stop()"""
+        self.check()
+        self.thread = threading.Thread(target=self._run, name='bandwidth-scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self.stopped.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            # Slots start and end on whole minutes
+            now = self.clock()
+            self.wake.wait(60 - now.second - now.microsecond / 1e6 + 0.05)
+            self.wake.clear()
+            if self.stopped.is_set():
+                return
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Bandwidth schedule error: {e}")
+
+    def set_base(self, base, apply=True):
+        """
+        Change the settings used outside every slot
+
+        Callers usually apply the new settings to the session themselves
+        first, so everything the schedule controls is applied again; a slot
+        in effect keeps its values.
+
+        Args:
+            base: Settings dict, e.g. the session settings after Apply Limits
+            apply: Re-evaluate the schedule right away
+        """
+        with self.lock:
+            self.base = {name: base[name] for name in SLOT_SETTINGS.values() if name in base}
+            self.reapply = True
+        if apply:
+            self.check()
+
+    def set_schedule(self, schedule):
+        """Replace the schedule (None turns it off) and apply it right away"""
+        with self.lock:
+            self.schedule = schedule
+        self.check()
+
+    def settings_at(self, when):
+        """
+        Return the effective settings at a datetime
+
+        Returns:
+            tuple: (settings dict, slot in effect or None)
+        """
+        with self.lock:
+            settings = dict(self.base)
+            slot = self.schedule.slot_at(when) if self.schedule is not None else None
+        if slot is not None:
+            settings.update(slot.settings())
+        return settings, slot
+
+    def check(self, when=None):
+        """
+        Apply the settings for a moment, if they differ from the last ones
+
+        Args:
+            when: datetime to evaluate (default: now)
+
+        Returns:
+            bool: True if settings were applied
+        """
+        settings, slot = self.settings_at(when or self.clock())
+        with self.lock:
+            new = settings != self.current or slot is not self.slot
+            if not new and not self.reapply:
+                return False
+            if self.reapply:
+                changed = settings
+            else:
+                changed = {name: value for name, value in settings.items()
+                           if self.current.get(name) != value}
+            self.current = settings
+            self.slot = slot
+            self.reapply = False
+
+        if changed:
+            self.ses.apply_settings(changed)
+        if new and self.on_change:
+            self.on_change(settings, slot)
+        return True
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Bulk import of .torrent files and magnet lists
+
+Sources are directories of .torrent files, .torrent files, text files with
+one magnet link per line, or '-' for stdin. Items are validated and parsed
+on a worker pool, deduplicated by info hash, and added with
+async_add_torrent(); nothing is reported per item except through one
+ImportReport at the end.
+
+Usage:
+  python3 bulk_import.py <directory|file.torrent|magnets.txt|-> [...]
+
+The items are handed to the running GUI in one request, or to the
+torrent daemon if no GUI is running.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import libtorrent as lt
+
+import control_api
+from ipc_protocol import IpcClient, ProtocolError
+from torrent_utils import is_magnet_link, validate_magnet_link
+
+
+# Same limit as adding a single .torrent file in the GUI
+MAX_TORRENT_FILE_SIZE = 10 * 1024 * 1024
+
+
+def read_magnet_lines(lines, origin):
+    """
+    Collect magnet items from lines of text
+
+    Blank lines and lines starting with '#' are skipped.
+
+    Returns:
+        tuple: (items, errors) where errors are (origin, message) pairs
+    """
+    items = []
+    errors = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if is_magnet_link(line):
+            items.append({'magnet': line})
+        else:
+            errors.append((f"{origin}:{number}", "Not a magnet link"))
+    return items, errors
+
+
+def collect_items(sources, stdin=None):
+    """
+    Expand import sources into add items
+
+    Args:
+        sources: Directory, .torrent file, magnet list file or '-' paths
+        stdin: Stream read for '-' (default: sys.stdin)
+
+    Returns:
+        tuple: (items, errors); items are {'magnet': uri} or
+            {'torrent': absolute path} dicts, errors (source, message) pairs
+    """
+    items = []
+    errors = []
+
+    for source in sources:
+        if source == '-':
+            found, bad = read_magnet_lines(stdin or sys.stdin, '<stdin>')
+        elif is_magnet_link(source):
+            found, bad = [{'magnet': source.strip()}], []
+        elif os.path.isdir(source):
+            found, bad = [], []
+            with os.scandir(source) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.torrent') and entry.is_file():
+                        found.append({'torrent': os.path.abspath(entry.path)})
+            found.sort(key=lambda item: item['torrent'])
+        elif source.endswith('.torrent'):
+            found, bad = [{'torrent': os.path.abspath(source)}], []
+        else:
+            try:
+                with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                    found, bad = read_magnet_lines(f, source)
+            except OSError as e:
+                found, bad = [], [(source, str(e))]
+
+        items.extend(found)
+        errors.extend(bad)
+
+    return items, errors
+
+
+def parse_item(item):
+    """
+    Turn an add item into add_torrent_params
+
+    Args:
+        item: {'magnet': uri} or {'torrent': path}
+
+    Returns:
+        tuple: (info_hash, add_torrent_params)
+
+    Raises:
+        ValueError: If the item is not a valid torrent
+    """
+    if 'magnet' in item:
+        check = validate_magnet_link(item['magnet'])
+        if not check['valid']:
+            raise ValueError(check['error'])
+        try:
+            params = lt.parse_magnet_uri(item['magnet'])
+        except RuntimeError as e:
+            raise ValueError(f"Failed to parse magnet link: {e}")
+        if params.info_hash.is_all_zeros():
+            raise ValueError("Info hash is all zeros")
+        return str(params.info_hash), params
+
+    path = item['torrent']
+    try:
+        size = os.path.getsize(path)
+    except OSError as e:
+        raise ValueError(f"Cannot read file: {e}")
+    if size == 0:
+        raise ValueError("Torrent file is empty")
+    if size > MAX_TORRENT_FILE_SIZE:
+        raise ValueError(f"Torrent file too large ({size} bytes)")
+
+    try:
+        ti = lt.torrent_info(path)
+    except RuntimeError as e:
+        raise ValueError(f"Invalid torrent file: {e}")
+    if not ti.name():
+        raise ValueError("Torrent file is missing required name field")
+
+    params = lt.add_torrent_params()
+    params.ti = ti
+    return str(ti.info_hash()), params
+
+
+def describe_item(item):
+    """Return the magnet link or path an item came from"""
+    if not isinstance(item, dict):
+        return repr(item)
+    return item.get('magnet') or item.get('torrent') or repr(item)
+
+
+def short_source(source):
+    """Shorten a source for the summary: file name, or the start of a magnet link"""
+    if is_magnet_link(source):
+        return source[:60]
+    return os.path.basename(source)
+
+
+class ImportReport:
+    """Outcome of a bulk import"""
+
+    def __init__(self):
+        self.total = 0
+        self.added = 0
+        self.duplicates = 0
+        self.invalid = []    # (source, reason) for items that could not be parsed
+        self.failed = []     # (source, reason) for items libtorrent refused
+
+    def summary(self, max_errors=10):
+        """
+        Describe the import in a few lines
+
+        Args:
+            max_errors: Number of individual problems listed
+
+        Returns:
+            str: Human-readable summary
+        """
+        lines = [f"Imported {self.added} of {self.total} torrent(s)"]
+        if self.duplicates:
+            lines.append(f"  {self.duplicates} already added")
+        if self.invalid:
+            lines.append(f"  {len(self.invalid)} invalid")
+        if self.failed:
+            lines.append(f"  {len(self.failed)} failed")
+
+        problems = self.invalid + self.failed
+        for source, reason in problems[:max_errors]:
+            lines.append(f"  • {short_source(source)}: {reason}")
+        if len(problems) > max_errors:
+            lines.append(f"  ... and {len(problems) - max_errors} more")
+
+        return "\n".join(lines)
+
+
+class BulkImporter:
+    """Parse many items in parallel and add the new ones asynchronously"""
+
+    def __init__(self, ses, save_path, existing=(), on_added=None, max_workers=8,
+                 restorer=None):
+        """
+        Args:
+            ses: libtorrent session to add the torrents to
+            save_path: Directory to download to
+            existing: Info hashes already in the session, skipped as duplicates
+            on_added: Called as on_added(handle, entry) on the alert thread
+                for each added torrent; entry has 'info_hash', 'name',
+                'size', 'has_metadata' and 'recheck' like a restored one,
+                plus 'imported'
+            max_workers: Threads parsing items
+            restorer: Optional SessionRestorer; saved torrents it has yet to
+                add are skipped as duplicates too
+        """
+        self.ses = ses
+        self.save_path = save_path
+        self.existing = set(existing)
+        self.on_added = on_added
+        self.max_workers = max_workers
+        self.restorer = restorer
+
+        self.report = ImportReport()
+        self.pending = {}      # info_hash -> (source, entry), added but not yet answered
+        self.lock = threading.Lock()
+        self.submitted = False
+        self.done = threading.Event()
+
+    def _parse(self, item):
+        try:
+            info_hash, params = parse_item(item)
+            return item, info_hash, params, None
+        except (ValueError, KeyError, TypeError) as e:
+            return item, None, None, str(e) or type(e).__name__
+
+    def _in_session(self, info_hash):
+        """Return True if the session already has a torrent with this info hash"""
+        return self.ses.find_torrent(lt.sha1_hash(bytes.fromhex(info_hash))).is_valid()
+
+    def prepare(self, items):
+        """
+        Parse items on the worker pool and drop invalid ones and duplicates
+
+        Args:
+            items: List of {'magnet': uri} or {'torrent': path} dicts
+
+        Returns:
+            list: (info_hash, params, source) for every torrent to add
+        """
+        self.report.total += len(items)
+        prepared = []
+        seen = set(self.existing)
+        # Taken before asking the session, so a restore finishing in
+        # between is found in one or the other
+        if self.restorer is not None:
+            seen |= self.restorer.unanswered_hashes()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='bulk-import') as pool:
+            # map() keeps the input order, so the first copy of a duplicate wins
+            for item, info_hash, params, error in pool.map(self._parse, items, chunksize=64):
+                if error:
+                    self.report.invalid.append((describe_item(item), error))
+                elif info_hash in seen or self._in_session(info_hash):
+                    self.report.duplicates += 1
+                else:
+                    seen.add(info_hash)
+                    prepared.append((info_hash, params, describe_item(item)))
+
+        return prepared
+
+    def submit(self, prepared):
+        """Add prepared torrents with async_add_torrent(); answers arrive as alerts"""
+        for info_hash, params, source in prepared:
+            ti = params.ti
+            params.save_path = self.save_path
+            params.storage_mode = lt.storage_mode_t.storage_mode_sparse
+            entry = {
+                'info_hash': info_hash,
+                'name': ti.name() if ti is not None else (params.name or 'Fetching metadata...'),
+                'size': ti.total_size() if ti is not None else None,
+                'has_metadata': ti is not None,
+                'recheck': False,
+                'imported': True,    # Not in the resume store yet
+            }
+
+            # Recorded before adding, so the alert can't arrive first
+            with self.lock:
+                self.pending[info_hash] = (source, entry)
+            try:
+                self.ses.async_add_torrent(params)
+            except Exception as e:
+                with self.lock:
+                    self.pending.pop(info_hash, None)
+                    self.report.failed.append((source, str(e)))
+
+        with self.lock:
+            self.submitted = True
+            self._check_done()
+
+    def on_add_torrent(self, alert):
+        """Count an add_torrent_alert for one of the imported torrents"""
+        info_hash = str(alert.params.info_hash)
+        if alert.params.ti is not None:
+            info_hash = str(alert.params.ti.info_hash())
+
+        with self.lock:
+            pending = self.pending.pop(info_hash, None)
+            if pending is None:
+                return  # Added by something other than this import
+            source, entry = pending
+
+            if alert.error.value():
+                self.report.failed.append((source, alert.error.message()))
+                self._check_done()
+                return
+            self.report.added += 1
+            self._check_done()
+
+        if self.on_added:
+            self.on_added(alert.handle, entry)
+
+    def _check_done(self):
+        """Signal completion once everything submitted has been answered (lock held)"""
+        if self.submitted and not self.pending:
+            self.done.set()
+
+    def run(self, items, timeout=120):
+        """
+        Import items and wait until every add has been answered
+
+        Someone must be dispatching add_torrent_alerts to on_add_torrent()
+        meanwhile (e.g. an ImportRouter the importer was added to).
+
+        Args:
+            items: List of {'magnet': uri} or {'torrent': path} dicts
+            timeout: Seconds to wait for the answers
+
+        Returns:
+            ImportReport
+        """
+        self.submit(self.prepare(items))
+        if not self.done.wait(timeout):
+            with self.lock:
+                for source, _ in self.pending.values():
+                    self.report.failed.append((source, "No answer from the session"))
+                self.pending.clear()
+        return self.report
+
+
+class ImportRouter:
+    """
+    Pass add_torrent_alerts on to the imports in progress
+
+    Subscribe on_add_torrent() once, while the session is set up, so an
+    import starting or finishing never changes the alert handlers while
+    the alert thread is dispatching.
+    """
+
+    def __init__(self):
+        self.importers = []
+        self.lock = threading.Lock()
+
+    def add(self, importer):
+        """Start passing alerts to a BulkImporter"""
+        with self.lock:
+            self.importers = self.importers + [importer]
+
+    def remove(self, importer):
+        """Stop passing alerts to a BulkImporter"""
+        with self.lock:
+            self.importers = [i for i in self.importers if i is not importer]
+
+    def on_add_torrent(self, alert):
+        """Hand an add_torrent_alert to every import (alert thread)"""
+        for importer in self.importers:
+            importer.on_add_torrent(alert)
+
+
+def main():
+    """Hand import sources to the running GUI or daemon"""
+    parser = argparse.ArgumentParser(description='Import many torrents at once')
+    parser.add_argument('sources', nargs='+',
+                        help="Directories of .torrent files, .torrent files, magnet list files, "
+                             "or '-' to read magnet links from stdin")
+    args = parser.parse_args()
+
+    items, errors = collect_items(args.sources)
+    for source, message in errors:
+        print(f"Skipped {source}: {message}")
+    if not items:
+        print("Nothing to import")
+        sys.exit(1)
+
+    socket_path = os.path.join(tempfile.gettempdir(), "torrent-downloader-gui.sock")
+    try:
+        with IpcClient(socket_path, timeout=60) as client:
+            results = client.add(items)
+        rejected = [r for r in results if r['status'] != 'queued']
+        print(f"Sent {len(items) - len(rejected)} torrent(s) to the running GUI "
+              f"({len(rejected)} rejected)")
+        sys.exit(1 if rejected else 0)
+    except (OSError, ProtocolError):
+        pass  # No GUI running
+
+    client = control_api.connect(os.path.expanduser("~/.config/torrent-downloader/daemon.json"))
+    if client is None:
+        print("Start the GUI or torrent-daemon.py first")
+        sys.exit(1)
+
+    try:
+        results = client.add_many(items)
+    except control_api.ControlError as e:
+        print(f"Failed to send torrents to the torrent daemon: {e}")
+        sys.exit(1)
+
+    failed = 0
+    for item, result in zip(items, results):
+        if 'error' in result:
+            print(f"Failed to add {describe_item(item)}: {result['error']}")
+            failed += 1
+    print(f"Sent {len(items) - failed} torrent(s) to the torrent daemon ({failed} failed)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
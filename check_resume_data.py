@@ -7,6 +7,8 @@ Checks what torrents are saved and can be resumed
 import os
 import sys
 
+from resume_store import find_resume_store, SQLiteResumeStore
+
 def check_resume_data():
     """Check resume data directory"""
     resume_dir = os.path.expanduser("~/.config/torrent-downloader/resume")
@@ -16,20 +18,25 @@ def check_resume_data():
     print("=" * 70)
     print()
 
-    # Check if directory exists
-    if not os.path.exists(resume_dir):
+    # Check if a resume store exists (resume.db or the resume directory)
+    store = find_resume_store(resume_dir)
+    if store is None:
         print(f"❌ Resume directory does not exist: {resume_dir}")
         print()
         print("This is normal if you haven't downloaded anything yet.")
         return
 
-    print(f"✓ Resume directory exists: {resume_dir}")
+    if isinstance(store, SQLiteResumeStore):
+        print(f"✓ Resume database exists: {store.db_path}")
+    else:
+        print(f"✓ Resume directory exists: {resume_dir}")
     print()
 
-    # List all files
-    files = sorted(os.listdir(resume_dir))
+    # Read all records
+    records = store.load_all()
+    store.close()
 
-    if not files:
+    if not records:
         print("No resume files found.")
         print()
         print("This means:")
@@ -38,24 +45,15 @@ def check_resume_data():
         print("  - OR resume files were deleted")
         return
 
-    # Group files by info hash
+    # Which parts are stored for each info hash
     torrents = {}
-    for file in files:
-        if file.endswith('.fastresume'):
-            info_hash = file.replace('.fastresume', '')
-            if info_hash not in torrents:
-                torrents[info_hash] = {'resume': False, 'torrent': False, 'magnet': False}
-            torrents[info_hash]['resume'] = True
-        elif file.endswith('.torrent'):
-            info_hash = file.replace('.torrent', '')
-            if info_hash not in torrents:
-                torrents[info_hash] = {'resume': False, 'torrent': False, 'magnet': False}
-            torrents[info_hash]['torrent'] = True
-        elif file.endswith('.magnet'):
-            info_hash = file.replace('.magnet', '')
-            if info_hash not in torrents:
-                torrents[info_hash] = {'resume': False, 'torrent': False, 'magnet': False}
-            torrents[info_hash]['magnet'] = True
+    for info_hash in sorted(records):
+        record = records[info_hash]
+        torrents[info_hash] = {
+            'resume': bool(record['resume']),
+            'torrent': bool(record['torrent']),
+            'magnet': bool(record['magnet']),
+        }
 
     # Display results
     print(f"Found {len(torrents)} torrent(s) with resume data:")
@@ -87,8 +85,7 @@ def check_resume_data():
         if data['torrent']:
             try:
                 import libtorrent as lt
-                torrent_file = os.path.join(resume_dir, f"{info_hash}.torrent")
-                ti = lt.torrent_info(torrent_file)
+                ti = lt.torrent_info(records[info_hash]['torrent'])
                 name = ti.name()
                 size = ti.total_size()
 
@@ -98,9 +95,7 @@ def check_resume_data():
                 print(f"  Name: Unable to read ({e})")
         elif data['magnet']:
             try:
-                magnet_file = os.path.join(resume_dir, f"{info_hash}.magnet")
-                with open(magnet_file, 'r') as f:
-                    magnet = f.read().strip()
+                magnet = records[info_hash]['magnet']
 
                 import libtorrent as lt
                 params = lt.parse_magnet_uri(magnet)
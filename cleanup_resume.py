@@ -6,6 +6,8 @@ Cleanup Resume Data - Remove corrupted or empty resume files
 import os
 import sys
 
+from resume_store import find_resume_store, EXTENSIONS
+
 def cleanup_resume_data():
     """Clean up corrupted resume files"""
     resume_dir = os.path.expanduser("~/.config/torrent-downloader/resume")
@@ -15,31 +17,30 @@ def cleanup_resume_data():
     print("=" * 70)
     print()
 
-    if not os.path.exists(resume_dir):
+    store = find_resume_store(resume_dir)
+    if store is None:
         print(f"✓ No resume directory found - nothing to clean")
         return
 
-    print(f"Checking: {resume_dir}")
+    print(f"Checking: {getattr(store, 'db_path', resume_dir)}")
     print()
 
-    # Find corrupted files
+    # Find corrupted entries; each is reported as the file it would be stored in
     corrupted_files = []
     valid_files = []
+    records = store.load_all()
 
-    for filename in sorted(os.listdir(resume_dir)):
-        filepath = os.path.join(resume_dir, filename)
-        size = os.path.getsize(filepath)
+    for info_hash in sorted(records):
+        record = records[info_hash]
 
-        if filename.endswith('.fastresume'):
-            # Resume files should be at least 100 bytes for real data
-            if size < 10:
-                corrupted_files.append((filename, size, "too small"))
-            else:
-                valid_files.append((filename, size))
+        for field, min_size in (('resume', 10), ('torrent', 100)):
+            if record[field] is None:
+                continue
+            filename = f"{info_hash}{EXTENSIONS[field]}"
+            size = len(record[field])
 
-        elif filename.endswith('.torrent'):
-            # Torrent files should be at least 100 bytes
-            if size < 100:
+            # Resume data and torrent metadata below these sizes can't be valid
+            if size < min_size:
                 corrupted_files.append((filename, size, "too small"))
             else:
                 valid_files.append((filename, size))
@@ -58,10 +59,11 @@ def cleanup_resume_data():
 
         if response in ['y', 'yes']:
             deleted = 0
+            by_extension = {ext: field for field, ext in EXTENSIONS.items()}
             for filename, size, reason in corrupted_files:
-                filepath = os.path.join(resume_dir, filename)
+                info_hash, ext = os.path.splitext(filename)
                 try:
-                    os.remove(filepath)
+                    store.delete(info_hash, fields=(by_extension[ext],))
                     print(f"  ✓ Deleted: {filename}")
                     deleted += 1
                 except Exception as e:
@@ -80,6 +82,8 @@ def cleanup_resume_data():
         for filename, size in valid_files:
             print(f"  ✓ {filename} ({size} bytes)")
 
+    store.close()
+
     print()
     print("=" * 70)
 
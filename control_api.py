@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Local HTTP control API for the torrent daemon
+
+The server listens on 127.0.0.1 only and answers JSON. Every request must
+carry the daemon's token (X-Auth-Token header). The token and port are
+written to a control file only the owning user can read, so other local
+users can't drive the daemon.
+
+Endpoints:
+    GET    /session                       Rates, totals, limits
+    GET    /stats[?all=1]                 libtorrent session counters (summary or all)
+    GET    /torrents                      Status of every torrent
+    POST   /torrents                      {"magnet": uri} or {"torrent": base64}
+                                          or {"items": [either, ...]} -> {"results": [...]}
+    GET    /torrents/<hash>               Status of one torrent
+    DELETE /torrents/<hash>[?delete_files=1]
+    POST   /torrents/<hash>/pause
+    POST   /torrents/<hash>/resume
+    POST   /torrents/<hash>/stream        {"file": index} (optional) -> {"url": ...}
+    GET    /torrents/<hash>/files         Files with size, priority and bytes done
+    POST   /torrents/<hash>/files         {"include": [globs], "exclude": [globs]}
+    GET    /limits                        {"download": B/s, "upload": B/s}
+    POST   /limits                        Same body; omitted keys are kept
+    GET    /profile                       {"profile": name}
+    POST   /profile                       Same body; switches the running session
+"""
+
+import os
+import json
+import base64
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import http_client
+
+
+DEFAULT_PORT = 58846
+TOKEN_HEADER = 'X-Auth-Token'
+
+# Largest request body accepted (a .torrent file in base64 plus JSON)
+MAX_BODY = 16 * 1024 * 1024
+
+
+def write_control_file(path, port):
+    """
+    Generate a new API token and record it with the port, readable by the owner only
+
+    Args:
+        path: Control file path
+        port: Port the server listens on
+
+    Returns:
+        str: The token
+    """
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)   # The file may predate us with looser permissions
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'port': port, 'token': token, 'pid': os.getpid()}, f)
+    return token
+
+
+def connect(path, timeout=10):
+    """
+    Return a client for the daemon that wrote a control file
+
+    Args:
+        path: Control file path
+        timeout: Seconds to wait for each request
+
+    Returns:
+        ControlClient, or None if no daemon has written the file
+    """
+    try:
+        with open(path, 'r') as f:
+            info = json.load(f)
+        return ControlClient(info['token'], port=info['port'], timeout=timeout)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """Route control requests to the engine"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = parse_qs(url.query)
+
+        token = self.headers.get(TOKEN_HEADER, '').encode('utf-8', 'replace')
+        if not secrets.compare_digest(token, self.server.token.encode('utf-8')):
+            self._reply(401, {'error': 'Missing or wrong token'})
+            return
+
+        try:
+            body = self._read_body() if method == 'POST' else {}
+            status, result = self._route(method, parts, query, body)
+        except KeyError as e:
+            status, result = 404, {'error': f"Unknown torrent: {e.args[0]}"}
+        except ValueError as e:
+            status, result = 400, {'error': str(e)}
+        except Exception as e:
+            print(f"Control API error: {type(e).__name__}: {e}")
+            status, result = 500, {'error': str(e)}
+
+        self._reply(status, result)
+
+    def _route(self, method, parts, query, body):
+        """Return (status, result) for a request"""
+        engine = self.server.engine
+
+        if parts == ['session'] and method == 'GET':
+            return 200, engine.session_status()
+
+        if parts == ['stats'] and method == 'GET':
+            all_metrics = query.get('all', ['0'])[0] in ('1', 'true')
+            return 200, engine.session_stats(all_metrics=all_metrics)
+
+        if parts == ['limits']:
+            if method == 'POST':
+                engine.set_limits(download=body.get('download'), upload=body.get('upload'))
+            if method in ('GET', 'POST'):
+                return 200, engine.get_limits()
+
+        if parts == ['profile']:
+            if method == 'POST':
+                engine.set_profile(body.get('profile'))
+            if method in ('GET', 'POST'):
+                return 200, {'profile': engine.get_profile()}
+
+        if parts == ['torrents']:
+            if method == 'GET':
+                return 200, engine.list_torrents()
+            if method == 'POST':
+                if 'items' in body:
+                    return 200, {'results': self._add_items(body['items'])}
+                return 201, {'info_hash': self._add_item(body)}
+
+        if len(parts) == 2 and parts[0] == 'torrents':
+            info_hash = parts[1]
+            if method == 'GET':
+                return 200, engine.torrent_status(info_hash)
+            if method == 'DELETE':
+                delete_files = query.get('delete_files', ['0'])[0] in ('1', 'true')
+                engine.remove(info_hash, delete_files=delete_files)
+                return 200, {'removed': info_hash}
+
+        if len(parts) == 3 and parts[0] == 'torrents' and parts[2] == 'files':
+            info_hash = parts[1]
+            if method == 'POST':
+                filters = {}
+                for key in ('include', 'exclude'):
+                    patterns = body.get(key, [])
+                    if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+                        raise ValueError(f"'{key}' must be a list of glob patterns")
+                    filters[key] = patterns
+                engine.select_files(info_hash, **filters)
+            if method in ('GET', 'POST'):
+                return 200, engine.files(info_hash)
+
+        if len(parts) == 3 and parts[0] == 'torrents' and method == 'POST':
+            info_hash, action = parts[1], parts[2]
+            if action == 'pause':
+                engine.pause(info_hash)
+                return 200, {'paused': info_hash}
+            if action == 'resume':
+                engine.resume(info_hash)
+                return 200, {'resumed': info_hash}
+            if action == 'stream':
+                file_index = body.get('file')
+                if file_index is not None and (isinstance(file_index, bool)
+                                               or not isinstance(file_index, int)):
+                    raise ValueError("'file' must be a file index")
+                return 200, {'url': engine.stream(info_hash, file_index)}
+
+        return 404, {'error': f"No such endpoint: {method} {self.path}"}
+
+    def _add_item(self, item):
+        """Add one {"magnet": uri} or {"torrent": base64} item; returns its info hash"""
+        engine = self.server.engine
+        if not isinstance(item, dict):
+            raise ValueError("Each item must be a JSON object")
+        if 'magnet' in item:
+            return engine.add_magnet(item['magnet'])
+        if 'torrent' in item:
+            try:
+                data = base64.b64decode(item['torrent'], validate=True)
+            except Exception:
+                raise ValueError("'torrent' must be base64-encoded .torrent data")
+            return engine.add_torrent_data(data)
+        raise ValueError("Body needs a 'magnet' or 'torrent' field")
+
+    def _add_items(self, items):
+        """
+        Add a batch of items, one failing without stopping the rest
+
+        Returns:
+            list: {'info_hash': ...} or {'error': message} per item, in order
+        """
+        if not isinstance(items, list):
+            raise ValueError("'items' must be a list")
+        results = []
+        for item in items:
+            try:
+                results.append({'info_hash': self._add_item(item)})
+            except Exception as e:
+                results.append({'error': str(e) or type(e).__name__})
+        return results
+
+    def _read_body(self):
+        """Parse the JSON request body"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise ValueError("Request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ValueError("Request body must be JSON")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def _reply(self, status, result):
+        data = json.dumps(result).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Clients poll; don't log every request
+
+
+class ControlServer(ThreadingHTTPServer):
+    """Serve the control API for an engine on a loopback port"""
+
+    daemon_threads = True
+
+    def __init__(self, engine, token, port=DEFAULT_PORT):
+        """
+        Args:
+            engine: TorrentEngine to control
+            token: Secret clients must send in the X-Auth-Token header
+            port: Loopback port to listen on (0 picks a free one)
+        """
+        super().__init__(('127.0.0.1', port), ControlHandler)
+        self.engine = engine
+        self.token = token
+
+    def start(self):
+        """Serve requests on a background thread"""
+        threading.Thread(target=self.serve_forever, name='control-api', daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ControlError(Exception):
+    """The daemon rejected a request or could not be reached"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ControlClient:
+    """Talk to a running daemon through its control API"""
+
+    def __init__(self, token, port=DEFAULT_PORT, timeout=10):
+        self.base = f"http://127.0.0.1:{port}"
+        self.headers = {TOKEN_HEADER: token}
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None, params=None):
+        session = http_client.get_session()
+        try:
+            response = session.request(method, self.base + path, json=body, params=params,
+                                        headers=self.headers, timeout=self.timeout)
+        except Exception as e:
+            raise ControlError(f"Daemon not reachable: {e}")
+
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+        if response.status_code >= 400:
+            raise ControlError(result.get('error', f"HTTP {response.status_code}"),
+                               status=response.status_code)
+        return result
+
+    def session_status(self):
+        return self._request('GET', '/session')
+
+    def session_stats(self, all_metrics=False):
+        """Return the latest libtorrent counters: {'timestamp', 'values'}"""
+        return self._request('GET', '/stats', params={'all': '1'} if all_metrics else None)
+
+    def list_torrents(self):
+        return self._request('GET', '/torrents')
+
+    def torrent_status(self, info_hash):
+        return self._request('GET', f"/torrents/{info_hash}")
+
+    def add_magnet(self, magnet):
+        """Add a magnet link; returns its info hash"""
+        return self._request('POST', '/torrents', {'magnet': magnet})['info_hash']
+
+    def add_torrent_file(self, path):
+        """Add a .torrent file by sending its contents; returns its info hash"""
+        with open(path, 'rb') as f:
+            data = base64.b64encode(f.read()).decode('ascii')
+        return self._request('POST', '/torrents', {'torrent': data})['info_hash']
+
+    def add_many(self, items):
+        """
+        Add several torrents in one request
+
+        Args:
+            items: {'magnet': uri} or {'torrent': path} dicts
+
+        Returns:
+            list: {'info_hash': ...} or {'error': message} per item, in order
+        """
+        results = [None] * len(items)
+        batch = []
+        sent = []
+        for index, item in enumerate(items):
+            if 'magnet' in item:
+                batch.append({'magnet': item['magnet']})
+            else:
+                try:
+                    with open(item['torrent'], 'rb') as f:
+                        data = base64.b64encode(f.read()).decode('ascii')
+                except OSError as e:
+                    results[index] = {'error': str(e)}
+                    continue
+                batch.append({'torrent': data})
+            sent.append(index)
+
+        if batch:
+            answers = self._request('POST', '/torrents', {'items': batch})['results']
+            for index, answer in zip(sent, answers):
+                results[index] = answer
+        return results
+
+    def remove(self, info_hash, delete_files=False):
+        self._request('DELETE', f"/torrents/{info_hash}",
+                      params={'delete_files': '1'} if delete_files else None)
+
+    def pause(self, info_hash):
+        self._request('POST', f"/torrents/{info_hash}/pause")
+
+    def resume(self, info_hash):
+        self._request('POST', f"/torrents/{info_hash}/resume")
+
+    def stream(self, info_hash, file_index=None):
+        """Put a torrent in streaming mode; returns the local URL of the file"""
+        body = {'file': file_index} if file_index is not None else {}
+        return self._request('POST', f"/torrents/{info_hash}/stream", body)['url']
+
+    def files(self, info_hash):
+        return self._request('GET', f"/torrents/{info_hash}/files")
+
+    def select_files(self, info_hash, include=(), exclude=()):
+        """Download only the files passing glob filters; returns the new file list"""
+        return self._request('POST', f"/torrents/{info_hash}/files",
+                             {'include': list(include), 'exclude': list(exclude)})
+
+    def get_limits(self):
+        return self._request('GET', '/limits')
+
+    def set_limits(self, download=None, upload=None):
+        """Set rate limits in bytes/sec; None keeps the current value"""
+        body = {key: value for key, value in (('download', download), ('upload', upload))
+                if value is not None}
+        return self._request('POST', '/limits', body)
+
+    def get_profile(self):
+        return self._request('GET', '/profile')['profile']
+
+    def set_profile(self, name):
+        """Switch the daemon's session to another performance profile"""
+        return self._request('POST', '/profile', {'profile': name})['profile']
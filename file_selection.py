@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Choose which files of a torrent to download
+
+Selections are libtorrent file priorities, one per file: 0 skips a file,
+higher values fetch it sooner. They are set with
+add_torrent_params.file_priorities before a torrent is added, so skipped
+files are never allocated, or with prioritize_files() afterwards.
+libtorrent saves them in the resume data ('file_priority'), so a
+selection survives restarts without any extra bookkeeping.
+
+Glob filters match the file's path inside the torrent, with or without
+its top folder ("Season 1/*"), or just its name ("*.mkv"),
+case-insensitively.
+"""
+
+import fnmatch
+
+import libtorrent as lt
+
+
+# Priority names shown to the user and the libtorrent values behind them
+PRIORITIES = {
+    'skip': 0,
+    'low': 1,
+    'normal': 4,
+    'high': 7,
+}
+
+DEFAULT_PRIORITY = PRIORITIES['normal']
+
+
+def priority_name(value):
+    """Return the name for a libtorrent file priority (nearest lower name)"""
+    name = 'skip'
+    for candidate, threshold in PRIORITIES.items():
+        if value >= threshold:
+            name = candidate
+    return name
+
+
+def list_files(ti):
+    """
+    Return the real files of a torrent, without padding files
+
+    Args:
+        ti: torrent_info
+
+    Returns:
+        list: (index, path, size) tuples; paths use '/' separators
+    """
+    files = ti.files()
+    return [(i, files.file_path(i).replace('\\', '/'), files.file_size(i))
+            for i in range(files.num_files())
+            if not files.file_flags(i) & lt.file_storage.flag_pad_file]
+
+
+def matches(path, patterns):
+    """
+    Return True if a torrent path matches any glob
+
+    A glob may match the full path, the path below the torrent's top
+    folder or just the file name.
+    """
+    path = path.lower()
+    candidates = {path, path.split('/', 1)[-1], path.rsplit('/', 1)[-1]}
+    return any(fnmatch.fnmatchcase(candidate, pattern.lower())
+               for pattern in patterns for candidate in candidates)
+
+
+def select_files(ti, include=(), exclude=(), priorities=None):
+    """
+    Compute file priorities from glob filters
+
+    With include patterns, only matching files are downloaded; exclude
+    patterns then skip files among those.
+
+    Args:
+        ti: torrent_info
+        include: Globs of files to download (empty = all)
+        exclude: Globs of files to skip
+        priorities: Current priorities; files that pass the filters keep
+            theirs (default: normal for every file)
+
+    Returns:
+        list: One priority per file, for file_priorities or prioritize_files()
+
+    Raises:
+        ValueError: If the filters leave nothing to download
+    """
+    num_files = ti.num_files()
+    if priorities is None:
+        priorities = [DEFAULT_PRIORITY] * num_files
+    result = list(priorities)
+
+    files = list_files(ti)
+    for index, path, _ in files:
+        if (include and not matches(path, include)) or matches(path, exclude):
+            result[index] = 0
+        elif include and result[index] == 0:
+            # Files an include pattern names are wanted even if skipped before
+            result[index] = DEFAULT_PRIORITY
+
+    if not any(result[index] for index, _, _ in files):
+        raise ValueError("No files match the filters")
+    return result
+
+
+def selection_summary(ti, priorities):
+    """
+    Describe what a selection downloads
+
+    Returns:
+        tuple: (files selected, total files, bytes selected, total bytes)
+    """
+    files = list_files(ti)
+    selected = [size for index, _, size in files if priorities[index]]
+    return len(selected), len(files), sum(selected), sum(size for _, _, size in files)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for all outbound requests
+
+One requests.Session is shared by every module, so connections to the
+same host are kept alive and reused instead of paying for a new TCP and
+TLS handshake on each call. Idempotent requests are retried with
+exponential backoff on connection errors and on 429/5xx responses.
+A Retry-After header is honored for a few seconds at most, so a server
+asking for an hour can't stall a search worker past its deadline.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+USER_AGENT = "torrent-downloader/1.0"
+DEFAULT_TIMEOUT = 10
+
+# Connection pools kept (one per host) and connections kept per pool
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 8
+
+# Longest Retry-After wait honored, in seconds
+MAX_RETRY_AFTER = 2
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class CappedRetry(Retry):
+    """Retry policy that sleeps at most MAX_RETRY_AFTER seconds for a Retry-After header"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+def make_retry(total=2, backoff_factor=0.3):
+    """
+    Build the retry policy for idempotent requests
+
+    Args:
+        total: Maximum number of retries
+        backoff_factor: Sleep between retries is backoff_factor * 2 ** (retry - 1)
+
+    Returns:
+        Retry: urllib3 retry configuration
+    """
+    return CappedRetry(
+        total=total,
+        read=1,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back instead of raising
+    )
+
+
+def make_session(retry=None):
+    """
+    Create a session with pooled keep-alive connections, retries and gzip
+
+    Args:
+        retry: Retry policy (default: make_retry())
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                          pool_maxsize=POOL_MAXSIZE,
+                          max_retries=retry or make_retry())
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': 'gzip, deflate',
+    })
+    return session
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def get(url, params=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    GET a URL through the shared session
+
+    Safe to call from any thread: the connection pools are thread-safe and
+    the session carries no per-request state. Raises the usual requests
+    exceptions (Timeout, ConnectionError, ...).
+
+    Args:
+        url: URL to fetch
+        params: Query parameters
+        timeout: Seconds to wait for the connection and for each read
+
+    Returns:
+        requests.Response
+    """
+    return get_session().get(url, params=params, timeout=timeout, **kwargs)
+
+
+def close():
+    """Close pooled connections (e.g. on shutdown)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
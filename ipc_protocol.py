@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Framed JSON messages over the single-instance Unix socket
+
+Each message is a 4-byte big-endian length followed by that many bytes of
+UTF-8 JSON, so messages of any size arrive whole and a connection can
+carry any number of requests. Requests name a type and carry an id that
+the response echoes:
+
+    {"id": 1, "type": "add", "items": [{"magnet": "magnet:?..."},
+                                       {"torrent": "/path/to/file.torrent"}]}
+    {"id": 1, "type": "result", "results": [{"status": "queued"},
+                                            {"status": "rejected", "error": "..."}]}
+
+    {"id": 2, "type": "ping"}  ->  {"id": 2, "type": "pong"}
+
+A request the server can't handle gets {"id": ..., "type": "error", "error": "..."}.
+"""
+
+import os
+import json
+import socket
+import struct
+import itertools
+import threading
+
+from torrent_utils import is_magnet_link, validate_magnet_link
+
+
+# Largest message accepted; hundreds of magnets fit in a small fraction of it
+MAX_MESSAGE = 16 * 1024 * 1024
+
+_HEADER = struct.Struct('>I')
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid framed message"""
+
+
+def send_message(sock, message):
+    """
+    Send one framed JSON message
+
+    Args:
+        sock: Connected socket
+        message: JSON-serializable dict
+    """
+    data = json.dumps(message).encode('utf-8')
+    if len(data) > MAX_MESSAGE:
+        raise ProtocolError(f"Message too large ({len(data)} bytes)")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    """Read exactly size bytes, or return None if the peer closed first"""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """
+    Receive one framed JSON message
+
+    Args:
+        sock: Connected socket
+
+    Returns:
+        dict, or None if the peer closed the connection between messages
+
+    Raises:
+        ProtocolError: If the frame is oversized, truncated or not a JSON object
+    """
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ProtocolError(f"Message too large ({length} bytes)")
+
+    data = _recv_exactly(sock, length)
+    if data is None:
+        raise ProtocolError("Connection closed in the middle of a message")
+
+    try:
+        message = json.loads(data.decode('utf-8'))
+    except ValueError as e:
+        raise ProtocolError(f"Invalid JSON: {e}")
+    if not isinstance(message, dict):
+        raise ProtocolError("Message must be a JSON object")
+    return message
+
+
+def make_add_item(arg):
+    """
+    Build an add item from a command-line argument
+
+    Paths are made absolute, since the receiving instance has its own
+    working directory.
+    """
+    if is_magnet_link(arg):
+        return {'magnet': arg.strip()}
+    return {'torrent': os.path.abspath(arg)}
+
+
+def validate_add_item(item):
+    """
+    Check an add item before it is queued
+
+    Args:
+        item: {'magnet': uri} or {'torrent': path}
+
+    Returns:
+        str: Why the item is rejected, or None if it is acceptable
+    """
+    if not isinstance(item, dict):
+        return "Item must be an object"
+
+    if 'magnet' in item:
+        if not isinstance(item['magnet'], str):
+            return "Magnet link must be a string"
+        check = validate_magnet_link(item['magnet'])
+        return None if check['valid'] else check['error']
+
+    if 'torrent' in item:
+        path = item['torrent']
+        if not isinstance(path, str) or not os.path.isabs(path):
+            return "Torrent path must be absolute"
+        if not os.path.isfile(path):
+            return f"Torrent file not found: {path}"
+        return None
+
+    return "Item needs a 'magnet' or 'torrent' field"
+
+
+class IpcServer:
+    """Accept framed requests on a Unix socket and answer them with a handler"""
+
+    def __init__(self, socket_path, handlers):
+        """
+        Args:
+            socket_path: Path of the Unix socket to listen on
+            handlers: {request type: callable(request) -> response dict};
+                the id and type of the response are filled in here
+        """
+        self.socket_path = socket_path
+        self.handlers = dict(handlers)
+        self.handlers.setdefault('ping', lambda request: {'type': 'pong'})
+        self.sock = None
+        self.running = False
+
+    def start(self):
+        """Bind the socket and accept connections on a background thread"""
+        # Remove stale socket file if exists
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Created owner-only, so other users can't connect before listen();
+        # the umask is process-wide, but only for the length of the bind
+        old_umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen(16)
+
+        self.running = True
+        threading.Thread(target=self._accept_loop, args=(self.sock,), name='ipc-accept',
+                         daemon=True).start()
+
+    def _accept_loop(self, sock):
+        """Block in accept() until stop() closes the socket"""
+        while self.running:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                break  # Socket closed by stop()
+            threading.Thread(target=self._serve, args=(conn,), name='ipc-conn',
+                             daemon=True).start()
+
+    def _serve(self, conn):
+        """Answer every request on one connection until the client hangs up"""
+        with conn:
+            while True:
+                try:
+                    request = recv_message(conn)
+                except ProtocolError as e:
+                    # The stream can't be resynchronized; report and hang up
+                    try:
+                        send_message(conn, {'id': None, 'type': 'error', 'error': str(e)})
+                    except OSError:
+                        pass
+                    return
+                except OSError:
+                    return
+                if request is None:
+                    return
+
+                try:
+                    send_message(conn, self._answer(request))
+                except OSError:
+                    return
+
+    def _answer(self, request):
+        handler = self.handlers.get(request.get('type'))
+        if handler is None:
+            response = {'type': 'error', 'error': f"Unknown request type: {request.get('type')!r}"}
+        else:
+            try:
+                response = handler(request)
+            except Exception as e:
+                print(f"IPC handler error: {type(e).__name__}: {e}")
+                response = {'type': 'error', 'error': str(e)}
+
+        response['id'] = request.get('id')
+        response.setdefault('type', 'result')
+        return response
+
+    def stop(self):
+        """Stop accepting connections and remove the socket file"""
+        self.running = False
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        if os.path.exists(self.socket_path):
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+
+class IpcClient:
+    """Send requests to a running instance over one connection"""
+
+    def __init__(self, socket_path, timeout=5):
+        """
+        Raises:
+            OSError: If no instance is listening on the socket
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.ids = itertools.count(1)
+
+    def request(self, request_type, **fields):
+        """
+        Send a request and wait for its response
+
+        Returns:
+            dict: The response
+
+        Raises:
+            ProtocolError: If the server answered with an error or out of turn
+            OSError: If the connection failed
+        """
+        request_id = next(self.ids)
+        send_message(self.sock, dict(fields, id=request_id, type=request_type))
+
+        response = recv_message(self.sock)
+        if response is None:
+            raise ProtocolError("Connection closed before a response arrived")
+        if response.get('id') != request_id:
+            raise ProtocolError(f"Response for request {response.get('id')}, expected {request_id}")
+        if response.get('type') == 'error':
+            raise ProtocolError(response.get('error', 'Unknown error'))
+        return response
+
+    def add(self, items):
+        """
+        Queue torrents in one round trip
+
+        Args:
+            items: List of {'magnet': uri} or {'torrent': path} dicts
+
+        Returns:
+            list: One result per item, {'status': 'queued'} or
+                {'status': 'rejected', 'error': ...}
+        """
+        return self.request('add', items=items)['results']
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -5,11 +5,12 @@ Helps protect your privacy and ensure safe torrenting
 """
 
 import subprocess
-import requests
 import socket
 import os
 import json
 
+import http_client
+
 
 class PrivacySecurityChecker:
     """Check privacy and security status"""
@@ -58,7 +59,7 @@ class PrivacySecurityChecker:
             ip = None
             for service in services:
                 try:
-                    response = requests.get(service, timeout=5)
+                    response = http_client.get(service, timeout=5)
                     if 'json' in service:
                         ip = response.json().get('ip')
                     else:
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Resume data persistence for libtorrent sessions
+
+Resume data arrives asynchronously as save_resume_data_alert. The writer
+serializes each alert on the alert thread and hands the file I/O to a
+worker pool; the flusher requests resume data for many torrents at once
+and waits until every request has been answered or has failed; the
+checkpointer periodically saves only the torrents that changed.
+
+Each resume record also carries the size and mtime of every file, so on
+startup the files can be compared against it instead of re-hashing them.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import libtorrent as lt
+
+from resume_store import FileResumeStore, write_file_atomic
+from status_engine import alert_waiter
+
+
+def encode_resume_data(params):
+    """
+    Serialize the add_torrent_params carried by a save_resume_data_alert
+
+    Args:
+        params: alert.params from a save_resume_data_alert
+
+    Returns:
+        bytes: Bencoded resume data, readable by lt.read_resume_data()
+    """
+    if hasattr(lt, 'write_resume_data_buf'):
+        return lt.write_resume_data_buf(params)
+    # libtorrent 1.1 hands out the resume data as an entry already
+    return lt.bencode(params)
+
+
+# Extra key stored in the bencoded resume data; libtorrent ignores unknown keys
+FILE_STATS_KEY = b'torrent-dl-file-stats'
+
+
+def file_stats(ti, save_path):
+    """
+    Collect [size, mtime] for every file of a torrent
+
+    Args:
+        ti: torrent_info of the torrent
+        save_path: Directory the torrent is saved to
+
+    Returns:
+        list: One [size, mtime] pair per file, [-1, 0] for missing files
+    """
+    stats = []
+    files = ti.files()
+    for index in range(files.num_files()):
+        if files.file_flags(index) & lt.file_storage.flag_pad_file:
+            continue
+        try:
+            st = os.stat(os.path.join(save_path, files.file_path(index)))
+            stats.append([st.st_size, int(st.st_mtime)])
+        except OSError:
+            stats.append([-1, 0])
+    return stats
+
+
+def attach_file_stats(resume_data, ti, save_path):
+    """Return resume data with the current file stats recorded in it"""
+    entry = lt.bdecode(resume_data)
+    entry[FILE_STATS_KEY] = file_stats(ti, save_path)
+    return lt.bencode(entry)
+
+
+def verify_resume_files(resume_data, ti, save_path):
+    """
+    Check files on disk against the sizes and mtimes recorded with the resume data
+
+    Only stats the files, so it is cheap enough to run for every torrent
+    on startup. Torrents that fail the check need a full hash check.
+
+    Args:
+        resume_data: Bencoded resume data as written by ResumeDataWriter
+        ti: torrent_info of the torrent
+        save_path: Directory the torrent is saved to
+
+    Returns:
+        bool: True if every file matches the resume record
+    """
+    if not resume_data or ti is None:
+        return False
+
+    try:
+        entry = lt.bdecode(resume_data)
+    except Exception:
+        return False
+
+    if not isinstance(entry, dict) or FILE_STATS_KEY not in entry:
+        return False  # Written before file stats were recorded
+
+    return entry[FILE_STATS_KEY] == file_stats(ti, save_path)
+
+
+# Extra key for settings libtorrent doesn't keep itself (priority, the
+# user's own rate limits, queue position)
+TORRENT_SETTINGS_KEY = b'torrent-dl-torrent-settings'
+
+
+def attach_torrent_settings(resume_data, settings):
+    """Return resume data with per-torrent settings recorded in it"""
+    entry = lt.bdecode(resume_data)
+    entry[TORRENT_SETTINGS_KEY] = {key.encode(): value for key, value in settings.items()}
+    return lt.bencode(entry)
+
+
+def read_torrent_settings(resume_data):
+    """
+    Read the per-torrent settings recorded with resume data
+
+    Args:
+        resume_data: Bencoded resume data, or None
+
+    Returns:
+        dict: Settings with str keys, or None if none were recorded
+    """
+    if not resume_data:
+        return None
+    try:
+        entry = lt.bdecode(resume_data)
+    except Exception:
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get(TORRENT_SETTINGS_KEY), dict):
+        return None
+
+    settings = {}
+    for key, value in entry[TORRENT_SETTINGS_KEY].items():
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', 'replace')
+        settings[key.decode('utf-8', 'replace')] = value
+    return settings
+
+
+class ResumeDataWriter:
+    """
+    Write save_resume_data_alert results to a resume store
+
+    Records are prepared (file stats, metadata) on a worker pool, then a
+    single committer thread writes whatever has accumulated in one
+    put_many() call, so a burst of answers becomes one transaction.
+    """
+
+    def __init__(self, store, max_workers=4, torrent_settings=None):
+        """
+        Args:
+            store: Resume store, or a directory path for the per-hash file layout
+            max_workers: Threads preparing records
+            torrent_settings: Optional callable(info_hash, handle) returning a
+                dict of settings to record with the resume data, or None
+        """
+        if isinstance(store, str):
+            store = FileResumeStore(store)
+        self.store = store
+        self.torrent_settings = torrent_settings
+        self.pool = ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix='resume-writer')
+        self.commits = queue.Queue()
+        self.committer = threading.Thread(target=self._commit_loop,
+                                          name='resume-committer', daemon=True)
+        self.committer.start()
+
+    def submit(self, alert):
+        """
+        Queue the resume data from an alert for writing
+
+        Alerts are only valid until the next pop_alerts(), so everything
+        needed is copied out here, on the alert thread.
+
+        Args:
+            alert: save_resume_data_alert
+
+        Returns:
+            Future: Resolves to the info hash once the record is stored
+        """
+        handle = alert.handle
+        info_hash = str(handle.info_hash())
+        resume_data = encode_resume_data(alert.params)
+        save_path = alert.params.save_path
+
+        future = Future()
+        self.pool.submit(self._prepare, future, handle, info_hash, resume_data, save_path)
+        return future
+
+    def _prepare(self, future, handle, info_hash, resume_data, save_path):
+        """Build the record for a torrent and hand it to the committer"""
+        try:
+            record = {'resume': resume_data}
+            ti = handle.torrent_file() if handle.is_valid() else None
+            if ti is not None:
+                record['resume'] = attach_file_stats(resume_data, ti, save_path)
+
+                # Metadata never changes, so only save it the first time it is available
+                if not self.store.has_metadata(info_hash):
+                    try:
+                        # Create torrent from torrent_info and generate bencode
+                        record['torrent'] = lt.bencode(lt.create_torrent(ti).generate())
+                    except Exception as e:
+                        print(f"Could not save .torrent file: {e}")
+
+                    # Also save magnet link as backup
+                    try:
+                        record['magnet'] = lt.make_magnet_uri(ti)
+                    except Exception as e:
+                        print(f"Could not save .magnet file: {e}")
+
+            if self.torrent_settings is not None:
+                settings = self.torrent_settings(info_hash, handle)
+                if settings:
+                    record['resume'] = attach_torrent_settings(record['resume'], settings)
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        self.commits.put((info_hash, record, future))
+
+    def _commit_loop(self):
+        """Store queued records, batching everything that arrived since the last write"""
+        while True:
+            batch = [self.commits.get()]
+            while True:
+                try:
+                    batch.append(self.commits.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                try:
+                    self.store.put_many((info_hash, record) for info_hash, record, _ in batch)
+                except Exception as e:
+                    for _, _, future in batch:
+                        future.set_exception(e)
+                else:
+                    for info_hash, _, future in batch:
+                        future.set_result(info_hash)
+            if stop:
+                return
+
+    def shutdown(self):
+        """Wait for queued writes and stop the worker threads"""
+        self.pool.shutdown(wait=True)
+        if self.committer.is_alive():
+            self.commits.put(None)
+            self.committer.join()
+
+
+class ResumeFlusher:
+    """Request resume data for many torrents and wait until all of it is written"""
+
+    def __init__(self, ses, writer):
+        self.ses = ses
+        self.writer = writer
+
+    def flush(self, handles, timeout=30.0, flags=None):
+        """
+        Save resume data for every handle, pumping alerts until all are answered
+
+        Must not run while another thread is calling pop_alerts() on the
+        same session, or answers would be lost to that thread.
+
+        Args:
+            handles: torrent_handles to save
+            timeout: Overall deadline in seconds, including the file writes
+            flags: save_resume_data() flags (default: flush the disk cache)
+
+        Returns:
+            dict: {'saved': int, 'failed': int, 'timed_out': int}
+        """
+        if flags is None:
+            flags = lt.save_resume_flags_t.flush_disk_cache
+
+        deadline = time.monotonic() + timeout
+        # Keyed by handle: answers for removed torrents report an all-zero info hash
+        outstanding = set()
+        for handle in handles:
+            try:
+                if handle.is_valid():
+                    handle.save_resume_data(flags)
+                    outstanding.add(handle)
+            except Exception as e:
+                print(f"Could not request resume data: {e}")
+
+        futures = []
+        failed = 0
+
+        while outstanding:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not alert_waiter(self.ses).wait(remaining):
+                continue
+
+            for alert in self.ses.pop_alerts():
+                if isinstance(alert, lt.save_resume_data_alert):
+                    try:
+                        futures.append(self.writer.submit(alert))
+                    except Exception as e:
+                        print(f"Failed to save torrent resume data: {e}")
+                        failed += 1
+                    outstanding.discard(alert.handle)
+                elif isinstance(alert, lt.save_resume_data_failed_alert):
+                    print(f"Resume data request failed: {alert.message()}")
+                    outstanding.discard(alert.handle)
+                    failed += 1
+
+        done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+        saved = 0
+        for future in done:
+            if future.exception() is None:
+                saved += 1
+            else:
+                print(f"Failed to write resume data: {future.exception()}")
+                failed += 1
+
+        return {
+            'saved': saved,
+            'failed': failed,
+            'timed_out': len(outstanding) + len(not_done)
+        }
+
+
+class ResumeCheckpointer:
+    """Periodically save resume data for torrents that changed since their last save"""
+
+    def __init__(self, writer, interval=60.0, max_requests_per_tick=20):
+        """
+        Args:
+            writer: ResumeDataWriter that receives the answers
+            interval: Seconds between checkpoints
+            max_requests_per_tick: Requests issued per tick, so a large
+                checkpoint is spread out instead of hitting the disk at once
+        """
+        self.writer = writer
+        self.interval = interval
+        self.max_requests_per_tick = max_requests_per_tick
+
+        self.dirty = {}          # info_hash -> handle, seen with need_save_resume
+        self.queue = deque()     # (info_hash, handle) waiting to be requested
+        self.in_flight = set()   # info hashes queued or awaiting an answer
+        self.forgotten = {}      # info_hash -> handle of a removed torrent (None = any)
+        self.lock = threading.Lock()   # forget() is called from other threads
+        self.next_checkpoint = time.monotonic() + interval
+
+    def note_status(self, status):
+        """Remember a torrent whose changed status says it needs saving"""
+        if status.need_save_resume:
+            info_hash = str(status.info_hash)
+            with self.lock:
+                if not self._is_forgotten(info_hash, status.handle):
+                    self.dirty[info_hash] = status.handle
+
+    def forget(self, info_hash, handle=None):
+        """
+        Stop checkpointing a removed torrent
+
+        Pending requests are dropped and answers still on their way are
+        ignored, so a late write can't put the torrent back in the store.
+
+        Args:
+            info_hash: Torrent being removed
+            handle: Its handle; if given, the same torrent added again later
+                gets a new handle and is checkpointed as usual
+        """
+        with self.lock:
+            self.dirty.pop(info_hash, None)
+            self.queue = deque(item for item in self.queue if item[0] != info_hash)
+            self.in_flight.discard(info_hash)
+            self.forgotten[info_hash] = handle
+
+    def _is_forgotten(self, info_hash, handle):
+        """Return True for a removed torrent (call with the lock held)"""
+        if info_hash not in self.forgotten:
+            return False
+        removed = self.forgotten[info_hash]
+        if removed is None or removed == handle:
+            return True
+        del self.forgotten[info_hash]   # Added again since
+        return False
+
+    def tick(self):
+        """
+        Queue dirty torrents when a checkpoint is due and issue the next few requests
+
+        Called once per update loop tick, on the alert thread.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_checkpoint:
+                self.next_checkpoint = now + self.interval
+                for info_hash, handle in self.dirty.items():
+                    if info_hash not in self.in_flight:
+                        self.queue.append((info_hash, handle))
+                        self.in_flight.add(info_hash)
+                self.dirty.clear()
+
+            batch = [self.queue.popleft()
+                     for _ in range(min(self.max_requests_per_tick, len(self.queue)))]
+
+        for info_hash, handle in batch:
+            try:
+                if handle.is_valid() and self._request(handle):
+                    continue
+            except Exception as e:
+                print(f"Could not request resume data: {e}")
+            with self.lock:
+                self.in_flight.discard(info_hash)
+
+    def _request(self, handle):
+        """Ask for resume data if it changed; returns True if an answer will follow"""
+        flags = lt.save_resume_flags_t
+        if hasattr(flags, 'only_if_modified'):
+            handle.save_resume_data(flags.only_if_modified)
+            return True
+        if handle.need_save_resume_data():
+            handle.save_resume_data()
+            return True
+        return False
+
+    def on_resume_data(self, alert):
+        """Write an answer to a checkpoint request (save_resume_data_alert)"""
+        handle = alert.handle
+        # A removed torrent's handle is invalid and reports an all-zero hash
+        if not handle.is_valid():
+            return
+        info_hash = str(handle.info_hash())
+        with self.lock:
+            self.in_flight.discard(info_hash)
+            if self._is_forgotten(info_hash, handle):
+                return
+        self.writer.submit(alert)
+
+    def on_resume_failed(self, alert):
+        """Forget a request that libtorrent could not answer (save_resume_data_failed_alert)"""
+        with self.lock:
+            self.in_flight.discard(str(alert.handle.info_hash()))
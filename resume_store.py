@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Resume data storage backends
+
+A resume record holds what's needed to restore one torrent:
+    'resume'  - bencoded resume data (bytes)
+    'torrent' - bencoded .torrent metadata (bytes)
+    'magnet'  - magnet link (str), kept as a fallback for the metadata
+
+FileResumeStore keeps the original <hash>.fastresume/.torrent/.magnet
+layout. SQLiteResumeStore keeps every record in one WAL-mode database,
+so a startup is a single query and a batch of writes is one transaction.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+FIELDS = ('resume', 'torrent', 'magnet')
+
+# File extension used for each field by FileResumeStore
+EXTENSIONS = {
+    'resume': '.fastresume',
+    'torrent': '.torrent',
+    'magnet': '.magnet',
+}
+
+
+def write_file_atomic(path, data):
+    """
+    Write a file so readers see either the old or the new contents, never a partial one
+
+    Args:
+        path: Destination path
+        data: bytes or str to write
+    """
+    tmp_path = f"{path}.tmp"
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    with open(tmp_path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def empty_record():
+    """Return a record with no fields set"""
+    return {field: None for field in FIELDS}
+
+
+class FileResumeStore:
+    """Resume records as <hash>.fastresume, <hash>.torrent and <hash>.magnet files"""
+
+    def __init__(self, resume_dir):
+        self.resume_dir = resume_dir
+        os.makedirs(resume_dir, exist_ok=True)
+
+    def path(self, info_hash, field):
+        return os.path.join(self.resume_dir, f"{info_hash}{EXTENSIONS[field]}")
+
+    def load_all(self):
+        """
+        Read every record with one directory scan
+
+        Returns:
+            dict: info_hash -> record
+        """
+        records = {}
+        by_extension = {ext: field for field, ext in EXTENSIONS.items()}
+
+        with os.scandir(self.resume_dir) as entries:
+            for entry in entries:
+                info_hash, dot, ext = entry.name.rpartition('.')
+                field = by_extension.get(dot + ext)
+                if not info_hash or field is None or not entry.is_file():
+                    continue
+                try:
+                    value = self._read(entry.path, field)
+                except OSError as e:
+                    print(f"Could not read {entry.name}: {e}")
+                    continue
+                records.setdefault(info_hash, empty_record())[field] = value
+
+        return records
+
+    def _read(self, path, field):
+        if field == 'magnet':
+            with open(path, 'r') as f:
+                return f.read().strip()
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def get(self, info_hash):
+        """Return the record for a torrent, or None if nothing is stored"""
+        record = empty_record()
+        found = False
+        for field in FIELDS:
+            try:
+                record[field] = self._read(self.path(info_hash, field), field)
+                found = True
+            except OSError:
+                pass
+        return record if found else None
+
+    def has_metadata(self, info_hash):
+        """Return True if a .torrent is stored for the torrent"""
+        return os.path.exists(self.path(info_hash, 'torrent'))
+
+    def put(self, info_hash, resume=None, torrent=None, magnet=None):
+        """Store the given fields of a record; fields left as None are kept"""
+        self.put_many([(info_hash, {'resume': resume, 'torrent': torrent, 'magnet': magnet})])
+
+    def put_many(self, records):
+        """
+        Store several records
+
+        Args:
+            records: Iterable of (info_hash, record) pairs
+        """
+        for info_hash, record in records:
+            for field in FIELDS:
+                if record.get(field) is not None:
+                    write_file_atomic(self.path(info_hash, field), record[field])
+
+    def delete(self, info_hash, fields=FIELDS):
+        """Delete a record, or only some of its fields"""
+        for field in fields:
+            try:
+                os.remove(self.path(info_hash, field))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        pass
+
+
+class SQLiteResumeStore:
+    """Resume records in a single SQLite database in WAL mode"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        # Shared by the GUI thread and the resume writer; access is serialized by self.lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS resume (
+                info_hash TEXT PRIMARY KEY,
+                resume BLOB,
+                torrent BLOB,
+                magnet TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def load_all(self):
+        """
+        Read every record with one query
+
+        Returns:
+            dict: info_hash -> record
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT info_hash, resume, torrent, magnet FROM resume").fetchall()
+        return {row[0]: self._record(row[1:]) for row in rows}
+
+    def _record(self, values):
+        resume, torrent, magnet = values
+        return {
+            'resume': bytes(resume) if resume is not None else None,
+            'torrent': bytes(torrent) if torrent is not None else None,
+            'magnet': magnet,
+        }
+
+    def get(self, info_hash):
+        """Return the record for a torrent, or None if nothing is stored"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT resume, torrent, magnet FROM resume WHERE info_hash = ?",
+                (info_hash,)).fetchone()
+        return self._record(row) if row else None
+
+    def has_metadata(self, info_hash):
+        """Return True if .torrent metadata is stored for the torrent"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM resume WHERE info_hash = ? AND torrent IS NOT NULL",
+                (info_hash,)).fetchone()
+        return row is not None
+
+    def put(self, info_hash, resume=None, torrent=None, magnet=None):
+        """Store the given fields of a record; fields left as None are kept"""
+        self.put_many([(info_hash, {'resume': resume, 'torrent': torrent, 'magnet': magnet})])
+
+    def put_many(self, records):
+        """
+        Store several records in one transaction
+
+        Args:
+            records: Iterable of (info_hash, record) pairs
+        """
+        rows = [(info_hash, record.get('resume'), record.get('torrent'), record.get('magnet'))
+                for info_hash, record in records]
+        if not rows:
+            return
+
+        with self.lock, self.conn:
+            self.conn.executemany("""
+                INSERT INTO resume (info_hash, resume, torrent, magnet) VALUES (?, ?, ?, ?)
+                ON CONFLICT(info_hash) DO UPDATE SET
+                    resume = COALESCE(excluded.resume, resume),
+                    torrent = COALESCE(excluded.torrent, torrent),
+                    magnet = COALESCE(excluded.magnet, magnet)
+            """, rows)
+
+    def delete(self, info_hash, fields=FIELDS):
+        """Delete a record, or only some of its fields"""
+        with self.lock, self.conn:
+            if set(fields) >= set(FIELDS):
+                self.conn.execute("DELETE FROM resume WHERE info_hash = ?", (info_hash,))
+                return
+
+            assignments = ", ".join(f"{field} = NULL" for field in fields if field in FIELDS)
+            if assignments:
+                self.conn.execute(f"UPDATE resume SET {assignments} WHERE info_hash = ?",
+                                  (info_hash,))
+            self.conn.execute("""
+                DELETE FROM resume WHERE info_hash = ?
+                AND resume IS NULL AND torrent IS NULL AND magnet IS NULL
+            """, (info_hash,))
+
+    def close(self):
+        """Close the database"""
+        with self.lock:
+            self.conn.close()
+
+
+def migrate_file_store(resume_dir, store):
+    """
+    Copy records from the per-hash file layout into another store
+
+    The records are written in one batch, then the old files are moved to
+    a 'migrated' subdirectory so they are not picked up again.
+
+    Args:
+        resume_dir: Directory with .fastresume/.torrent/.magnet files
+        store: Store to copy the records into
+
+    Returns:
+        int: Number of torrents migrated
+    """
+    if not os.path.isdir(resume_dir):
+        return 0
+
+    records = FileResumeStore(resume_dir).load_all()
+    if not records:
+        return 0
+
+    store.put_many(records.items())
+
+    migrated_dir = os.path.join(resume_dir, "migrated")
+    os.makedirs(migrated_dir, exist_ok=True)
+    for info_hash, record in records.items():
+        for field in FIELDS:
+            if record[field] is not None:
+                name = f"{info_hash}{EXTENSIONS[field]}"
+                os.replace(os.path.join(resume_dir, name), os.path.join(migrated_dir, name))
+
+    return len(records)
+
+
+def open_resume_store(resume_dir, backend='sqlite'):
+    """
+    Open the resume store for a resume directory
+
+    The SQLite database lives next to the directory (resume/ -> resume.db).
+    Records still in the directory are migrated into it on open.
+
+    Args:
+        resume_dir: Resume directory of the per-hash file layout
+        backend: 'sqlite' or 'files'
+
+    Returns:
+        FileResumeStore or SQLiteResumeStore
+    """
+    if backend == 'files':
+        return FileResumeStore(resume_dir)
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown resume backend: {backend}")
+
+    store = SQLiteResumeStore(resume_dir.rstrip(os.sep) + ".db")
+    try:
+        migrated = migrate_file_store(resume_dir, store)
+        if migrated:
+            print(f"Migrated resume data for {migrated} torrent(s) to {store.db_path}")
+    except Exception as e:
+        print(f"Failed to migrate resume files: {e}")
+    return store
+
+
+def find_resume_store(resume_dir):
+    """
+    Open whichever store exists for a resume directory, without migrating
+
+    Used by the diagnostic tools, which must not change anything on open.
+
+    Returns:
+        FileResumeStore, SQLiteResumeStore, or None if neither exists
+    """
+    db_path = resume_dir.rstrip(os.sep) + ".db"
+    if os.path.exists(db_path):
+        return SQLiteResumeStore(db_path)
+    if os.path.isdir(resume_dir):
+        return FileResumeStore(resume_dir)
+    return None
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+libtorrent session counters for monitoring and tuning
+
+Every few seconds the engine's update loop calls SessionMetrics.tick(),
+which asks the session for a session_stats_alert with
+post_session_stats(). The alert carries every counter and gauge in
+lt.session_stats_metrics() (disk queue and job times, piece picker
+loops, peer errors and disconnect reasons, DHT, uTP...). The latest
+sample is kept for:
+
+- MetricsServer: a loopback HTTP endpoint in the Prometheus text format
+  (GET /metrics), off by default
+- an optional JSONL log, one line per sample, for offline analysis
+- summary(): the handful of values worth a first look when tuning the
+  settings in session_profiles.py
+
+libtorrent 2.0 reads and writes through memory-mapped files and has no
+block cache of its own, so there are no cache hit counters; the disk
+job queue, disk.request_latency and disk.num_read_back show disk
+pressure instead.
+"""
+
+import re
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import libtorrent as lt
+
+
+DEFAULT_METRICS_PORT = 58847     # Next to the control API's 58846
+DEFAULT_INTERVAL = 5.0           # Seconds between samples
+PREFIX = 'libtorrent_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Shown by summary() and `torrent-ctl.py stats`
+SUMMARY = (
+    'disk.queued_disk_jobs',
+    'disk.num_running_disk_jobs',
+    'disk.blocked_disk_jobs',
+    'disk.queued_write_bytes',
+    'disk.request_latency',
+    'disk.num_read_back',
+    'disk.disk_read_time',
+    'disk.disk_write_time',
+    'disk.disk_hash_time',
+    'peer.num_peers_connected',
+    'peer.num_peers_half_open',
+    'peer.num_peers_end_game',
+    'peer.error_peers',
+    'peer.connect_timeouts',
+    'peer.piece_rejects',
+    'picker.piece_picker_busy_loops',
+    'picker.end_game_piece_picks',
+    'picker.hash_fail_piece_picks',
+    'net.limiter_down_queue',
+    'net.limiter_up_queue',
+    'ses.num_downloading_torrents',
+    'ses.num_seeding_torrents',
+    'ses.num_queued_download_torrents',
+    'dht.dht_nodes',
+)
+
+
+def metric_types():
+    """Return {metric name: 'counter' or 'gauge'} for every session metric"""
+    return {m.name: 'counter' if m.type == lt.metric_type_t.counter else 'gauge'
+            for m in lt.session_stats_metrics()}
+
+
+def prometheus_name(name, kind):
+    """Turn 'disk.num_read_ops' into 'libtorrent_disk_num_read_ops_total' for a counter"""
+    name = PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+    return name + '_total' if kind == 'counter' else name
+
+
+def format_prometheus(values, types):
+    """
+    Render metric values in the Prometheus text exposition format
+
+    Args:
+        values: metric name -> value
+        types: metric name -> 'counter' or 'gauge'
+
+    Returns:
+        str: One HELP/TYPE header and sample line per metric, sorted by name
+    """
+    lines = []
+    for name in sorted(values):
+        kind = types.get(name, 'gauge')
+        metric = prometheus_name(name, kind)
+        lines.append(f"# HELP {metric} libtorrent session {kind} {name}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {values[name]}")
+    return '\n'.join(lines) + '\n'
+
+
+class SessionMetrics:
+    """Sample session counters periodically and keep the latest values"""
+
+    def __init__(self, ses, interval=DEFAULT_INTERVAL, log_path=None, clock=time.monotonic):
+        """
+        Args:
+            ses: libtorrent session
+            interval: Seconds between samples
+            log_path: JSONL file every sample is appended to, or None
+            clock: Monotonic clock deciding when the next sample is due
+        """
+        self.ses = ses
+        self.interval = interval
+        self.clock = clock
+        self.types = metric_types()
+        self.lock = threading.Lock()
+        self.values = {}
+        self.timestamp = None     # Unix time of the latest sample
+        self.due = 0.0
+        self.log = open(log_path, 'a', encoding='utf-8') if log_path else None
+
+    def tick(self):
+        """Request a sample if the interval has passed (call from the update loop)"""
+        now = self.clock()
+        if now < self.due:
+            return
+        self.due = now + self.interval
+        self.ses.post_session_stats()
+
+    def on_session_stats(self, alert):
+        """Store a session_stats_alert (subscribe on the alert thread)"""
+        values = dict(alert.values)
+        timestamp = time.time()
+        with self.lock:
+            self.values = values
+            self.timestamp = timestamp
+            if self.log is not None:
+                # Zeroes are left out to keep lines short; a missing metric is 0
+                record = {'timestamp': round(timestamp, 3),
+                          'values': {name: value for name, value in values.items() if value}}
+                try:
+                    self.log.write(json.dumps(record, sort_keys=True) + '\n')
+                    self.log.flush()
+                except OSError as e:
+                    print(f"Metrics log write failed, logging stopped: {e}")
+                    self.log.close()
+                    self.log = None
+
+    def latest(self):
+        """
+        Return the latest sample
+
+        Returns:
+            tuple: (Unix timestamp or None before the first sample, {name: value})
+        """
+        with self.lock:
+            return self.timestamp, dict(self.values)
+
+    def summary(self):
+        """Return the SUMMARY metrics of the latest sample, in SUMMARY order"""
+        _, values = self.latest()
+        return {name: values[name] for name in SUMMARY if name in values}
+
+    def render(self):
+        """Return the latest sample in the Prometheus text format"""
+        timestamp, values = self.latest()
+        text = format_prometheus(values, self.types)
+        if timestamp is not None:
+            text += ("# HELP libtorrent_stats_timestamp_seconds Time of the latest sample\n"
+                     "# TYPE libtorrent_stats_timestamp_seconds gauge\n"
+                     f"libtorrent_stats_timestamp_seconds {timestamp:.3f}\n")
+        return text
+
+    def close(self):
+        """Close the JSONL log"""
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        data = self.server.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Scraped every few seconds; don't log every request
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serve the latest session metrics to Prometheus on a loopback port"""
+
+    daemon_threads = True
+
+    def __init__(self, metrics, port=DEFAULT_METRICS_PORT):
+        """
+        Args:
+            metrics: SessionMetrics to serve
+            port: Loopback port to listen on (0 picks a free one)
+        """
+        super().__init__(('127.0.0.1', port), MetricsHandler)
+        self.metrics = metrics
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve requests on a background thread"""
+        threading.Thread(target=self.serve_forever, name='metrics', daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Named performance profiles for the libtorrent session
+
+Each profile is a complete set of the connection, queueing, choking, disk
+and buffer settings, so switching profiles at runtime with
+apply_settings() fully replaces the previous one instead of leaving some
+of its values behind. Profiles are stored by name in settings.json as
+'performance_profile', with optional 'profile_overrides' for individual
+settings.
+
+Usage:
+  python3 session_profiles.py                  # list profiles
+  python3 session_profiles.py --benchmark [profile ...] [--size MiB]
+
+The benchmark transfers a synthetic torrent from a seeder to a leecher
+session over loopback with each profile, so profiles can be compared on
+this machine without any network access.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import libtorrent as lt
+
+
+DEFAULT_PROFILE = 'balanced'
+
+# Every profile sets all of these. 'balanced' is the long-standing default:
+# the values the session was always created with, and libtorrent's own
+# defaults for everything else, so upgrading doesn't change a session.
+BALANCED = {
+    # Connections and peer lists
+    'connections_limit': 200,
+    'connection_speed': 30,
+    'max_peerlist_size': 1000,
+    'max_paused_peerlist_size': 1000,
+
+    # Queueing
+    'active_downloads': 3,
+    'active_seeds': 5,
+    'active_checking': 1,
+    'active_limit': 8,
+    'dont_count_slow_torrents': True,
+    'share_ratio_limit': 200,
+    'seeding_outgoing_connections': True,
+
+    # Choking
+    'unchoke_slots_limit': 8,
+    'seed_choking_algorithm': int(lt.seed_choking_algorithm_t.fastest_upload),
+    'choking_algorithm': int(lt.choking_algorithm_t.rate_based_choker),
+
+    # Disk threads, file handles and hashing
+    'aio_threads': 10,
+    'hashing_threads': 1,
+    'file_pool_size': 40,
+    'max_queued_disk_bytes': 1024 * 1024,
+    'checking_mem_usage': 256,
+
+    # Request queues and send buffers
+    'max_out_request_queue': 500,
+    'max_allowed_in_request_queue': 2000,
+    'send_buffer_watermark': 500 * 1024,
+    'send_buffer_low_watermark': 10 * 1024,
+    'send_buffer_watermark_factor': 50,
+    'suggest_mode': int(lt.suggest_mode_t.no_piece_suggestions),
+}
+
+PROFILES = {
+    'balanced': {},
+
+    # Many active torrents and peers, deep queues and big buffers for
+    # fast links and fast disks
+    'seedbox': {
+        'connections_limit': 800,
+        'connection_speed': 100,
+        'max_peerlist_size': 4000,
+        'max_paused_peerlist_size': 1000,
+        'active_downloads': 10,
+        'active_seeds': 50,
+        'active_checking': 2,
+        'active_limit': 100,
+        'unchoke_slots_limit': 40,
+        'aio_threads': 16,
+        'hashing_threads': 4,
+        'file_pool_size': 500,
+        'max_queued_disk_bytes': 8 * 1024 * 1024,
+        'checking_mem_usage': 2048,
+        'max_out_request_queue': 1500,
+        'max_allowed_in_request_queue': 4000,
+        'send_buffer_watermark': 3 * 1024 * 1024,
+        'send_buffer_low_watermark': 64 * 1024,
+        'send_buffer_watermark_factor': 150,
+        'suggest_mode': int(lt.suggest_mode_t.suggest_read_cache),
+    },
+
+    # Few peers, small queues and buffers for small machines
+    'low_memory': {
+        'connections_limit': 50,
+        'connection_speed': 10,
+        'max_peerlist_size': 300,
+        'max_paused_peerlist_size': 100,
+        'active_downloads': 2,
+        'active_seeds': 2,
+        'active_limit': 4,
+        'unchoke_slots_limit': 4,
+        'aio_threads': 2,
+        'file_pool_size': 10,
+        'max_queued_disk_bytes': 256 * 1024,
+        'checking_mem_usage': 32,
+        'max_out_request_queue': 100,
+        'max_allowed_in_request_queue': 250,
+        'send_buffer_watermark': 64 * 1024,
+        'send_buffer_low_watermark': 8 * 1024,
+        'send_buffer_watermark_factor': 20,
+    },
+
+    # Spend as little data as possible beyond the downloads themselves:
+    # one download at a time, little seeding, few connection attempts
+    'metered': {
+        'connections_limit': 60,
+        'connection_speed': 5,
+        'max_peerlist_size': 300,
+        'max_paused_peerlist_size': 100,
+        'active_downloads': 1,
+        'active_seeds': 1,
+        'active_limit': 2,
+        'dont_count_slow_torrents': False,
+        'share_ratio_limit': 100,
+        'seeding_outgoing_connections': False,
+        'unchoke_slots_limit': 4,
+    },
+}
+
+PROFILE_DESCRIPTIONS = {
+    'balanced': "Default: a few active torrents, moderate connections and buffers",
+    'seedbox': "High throughput: many active torrents and peers, deep disk and request queues",
+    'low_memory': "Small machines: few peers, small buffers and disk queues",
+    'metered': "Metered links: one download at a time, stop seeding at ratio 1.0",
+}
+
+
+def validate_settings(settings):
+    """
+    Drop settings this libtorrent doesn't know or with the wrong type
+
+    Args:
+        settings: Dict of libtorrent setting names to values
+
+    Returns:
+        tuple: (valid settings dict, list of rejected names with the reason)
+    """
+    defaults = lt.default_settings()
+    valid = {}
+    rejected = []
+    for name, value in settings.items():
+        if name not in defaults:
+            rejected.append(f"{name}: unknown setting")
+            continue
+        expected = type(defaults[name])
+        # bool is an int subclass; keep the two apart
+        if type(value) is not expected and not (expected is int and type(value) is bool):
+            rejected.append(f"{name}: expected {expected.__name__}, got {type(value).__name__}")
+            continue
+        valid[name] = value
+    return valid, rejected
+
+
+def profile_settings(name, overrides=None):
+    """
+    Return the complete settings of a profile
+
+    Args:
+        name: Profile name
+        overrides: Individual settings applied on top of the profile;
+            unknown or mistyped ones are skipped with a warning
+
+    Returns:
+        dict: Settings for lt.session() or apply_settings()
+
+    Raises:
+        ValueError: If the profile doesn't exist
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile {name!r} (choose from {', '.join(PROFILES)})")
+
+    settings = dict(BALANCED)
+    settings.update(PROFILES[name])
+    if overrides:
+        valid, rejected = validate_settings(overrides)
+        for reason in rejected:
+            print(f"Ignoring profile override {reason}")
+        settings.update(valid)
+    return settings
+
+
+def benchmark_profile(name, size_mb=64, timeout=120):
+    """
+    Time a loopback transfer between two sessions using a profile
+
+    Args:
+        name: Profile to benchmark
+        size_mb: Size of the synthetic torrent in MiB
+        timeout: Seconds before giving up
+
+    Returns:
+        dict: {'profile', 'size', 'seconds', 'rate'}; seconds is None on timeout
+    """
+    work_dir = tempfile.mkdtemp(prefix='profile-bench-')
+    try:
+        seed_dir = os.path.join(work_dir, 'seed')
+        leech_dir = os.path.join(work_dir, 'leech')
+        os.makedirs(seed_dir)
+        os.makedirs(leech_dir)
+
+        path = os.path.join(seed_dir, 'payload.bin')
+        chunk = os.urandom(1024 * 1024)
+        with open(path, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(chunk)
+
+        fs = lt.file_storage()
+        lt.add_files(fs, path)
+        t = lt.create_torrent(fs)
+        lt.set_piece_hashes(t, seed_dir)
+        ti = lt.torrent_info(lt.bencode(t.generate()))
+
+        settings = profile_settings(name)
+        settings.update({
+            'listen_interfaces': '127.0.0.1:0',
+            'enable_dht': False,
+            'enable_lsd': False,
+            'enable_upnp': False,
+            'enable_natpmp': False,
+        })
+        seeder = lt.session(settings)
+        leecher = lt.session(settings)
+
+        params = lt.add_torrent_params()
+        params.ti = ti
+        params.save_path = seed_dir
+        params.flags |= lt.torrent_flags.seed_mode
+        seeder.add_torrent(params)
+
+        params = lt.add_torrent_params()
+        params.ti = ti
+        params.save_path = leech_dir
+        handle = leecher.add_torrent(params)
+
+        start = time.monotonic()
+        handle.connect_peer(('127.0.0.1', seeder.listen_port()))
+        seconds = None
+        while time.monotonic() - start < timeout:
+            if handle.status().is_seeding:
+                seconds = time.monotonic() - start
+                break
+            time.sleep(0.02)
+
+        size = size_mb * 1024 * 1024
+        return {'profile': name, 'size': size, 'seconds': seconds,
+                'rate': size / seconds if seconds else None}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List or benchmark session performance profiles')
+    parser.add_argument('--benchmark', nargs='*', metavar='PROFILE',
+                        help='Benchmark these profiles (default: all)')
+    parser.add_argument('--size', type=int, default=64,
+                        help='Size of the benchmark torrent in MiB (default: 64)')
+    args = parser.parse_args()
+
+    if args.benchmark is None:
+        for name in PROFILES:
+            marker = '*' if name == DEFAULT_PROFILE else ' '
+            print(f"{marker} {name:12} {PROFILE_DESCRIPTIONS[name]}")
+        return
+
+    names = args.benchmark or list(PROFILES)
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        print(f"Unknown profile(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    print(f"Loopback transfer of {args.size} MiB, one seeder and one leecher")
+    for name in names:
+        result = benchmark_profile(name, size_mb=args.size)
+        if result['seconds'] is None:
+            print(f"  {name:12} timed out")
+        else:
+            print(f"  {name:12} {result['seconds']:6.2f} s  "
+                  f"{result['rate'] / (1024 * 1024):8.1f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
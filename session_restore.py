@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Background restore of saved torrents at startup
+
+Records are read from the resume store and turned into add_torrent_params
+on a worker pool (parsing .torrent metadata and resume data is the slow
+part), then handed to ses.async_add_torrent(). The caller learns about
+each torrent when its add_torrent_alert is dispatched, so rows can appear
+while the rest of the library is still loading.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import libtorrent as lt
+
+from resume_data import read_torrent_settings
+
+
+def apply_save_path(params, save_path):
+    """
+    Set the download directory unless resume data already recorded one
+
+    Resume data saved after a move records the directory the files were
+    moved to; replacing it would look for them in the old place.
+
+    Args:
+        params: add_torrent_params, possibly from lt.read_resume_data()
+        save_path: Directory to use when params has none
+
+    Returns:
+        str: The directory the torrent will be saved to
+    """
+    if not params.save_path:
+        params.save_path = save_path
+    return params.save_path
+
+
+def build_restore_params(info_hash, record, save_path):
+    """
+    Build add_torrent_params for a saved torrent
+
+    Args:
+        info_hash: Info hash the record is stored under
+        record: Resume store record ('resume', 'torrent', 'magnet')
+        save_path: Directory to download to, unless the resume data names one
+
+    Returns:
+        tuple: (add_torrent_params, resume_data bytes or None)
+    """
+    resume_data = record['resume']
+    params = None
+
+    # Load resume data if available and valid
+    if resume_data and len(resume_data) > 10:
+        try:
+            params = lt.read_resume_data(resume_data)
+        except Exception as e:
+            print(f"  Resume data invalid, starting fresh: {e}")
+    elif resume_data is not None:
+        print(f"  Resume data too small ({len(resume_data)} bytes), starting fresh")
+
+    if params is None:
+        resume_data = None
+        params = lt.add_torrent_params()
+    apply_save_path(params, save_path)
+
+    # Prefer full .torrent metadata, fall back to the magnet link
+    if record['torrent']:
+        params.ti = lt.torrent_info(record['torrent'])
+    elif record['magnet']:
+        magnet_params = lt.parse_magnet_uri(record['magnet'])
+        params.info_hash = magnet_params.info_hash
+        if magnet_params.name:
+            params.name = magnet_params.name
+        params.trackers = magnet_params.trackers
+    elif params.info_hash.is_all_zeros():
+        # No metadata available, just use info hash
+        params.info_hash = lt.sha1_hash(bytes.fromhex(info_hash))
+
+    return params, resume_data
+
+
+class SessionRestorer:
+    """Restore every torrent in a resume store without blocking the caller"""
+
+    def __init__(self, ses, store, save_path, on_added, needs_recheck=None, max_workers=4):
+        """
+        Args:
+            ses: libtorrent session to add the torrents to
+            store: Resume store to read records from
+            save_path: Directory to download to, for records whose resume
+                data doesn't name one
+            on_added: Called as on_added(handle, entry) on the alert thread
+                for each restored torrent; entry has 'info_hash', 'name',
+                'size', 'has_metadata', 'recheck' and 'torrent_settings'
+                (per-torrent settings saved with the resume data, or None)
+            needs_recheck: Optional callable(resume_data, ti, save_path)
+                deciding whether a torrent with metadata gets a hash check
+            max_workers: Threads parsing records
+        """
+        self.ses = ses
+        self.store = store
+        self.save_path = save_path
+        self.on_added = on_added
+        self.needs_recheck = needs_recheck
+        self.pool = ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix='session-restore')
+
+        self.pending = {}      # info_hash -> entry, added but not yet answered
+        self.unanswered = set()   # Info hashes of records not yet added or failed
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.total = None   # Number of records, once they are loaded
+        self.restored = 0
+        self.failed = 0
+
+    def start(self):
+        """Begin restoring on a background thread and return immediately"""
+        threading.Thread(target=self._run, name='session-restore', daemon=True).start()
+
+    def _run(self):
+        try:
+            records = self.store.load_all()
+        except Exception as e:
+            print(f"Failed to load session state: {e}")
+            self.loaded.set()
+            return
+
+        with self.lock:
+            self.unanswered.update(records)
+        self.total = len(records)
+        self.loaded.set()
+        for info_hash, record in records.items():
+            if self.stopped:
+                break
+            try:
+                self.pool.submit(self._restore, info_hash, record)
+            except RuntimeError:
+                break  # Shut down while submitting
+
+    def _restore(self, info_hash, record):
+        """Parse one record and add the torrent asynchronously"""
+        if self.stopped:
+            return
+        try:
+            params, resume_data = build_restore_params(info_hash, record, self.save_path)
+
+            # libtorrent saved the limits last applied, which may be a
+            # share of the session cap; start from the user's own ones
+            torrent_settings = read_torrent_settings(resume_data)
+            if torrent_settings:
+                params.download_limit = torrent_settings.get('download_limit', 0)
+                params.upload_limit = torrent_settings.get('upload_limit', 0)
+
+            ti = params.ti
+            recheck = ti is not None and self.needs_recheck is not None and \
+                self.needs_recheck(resume_data, ti, params.save_path)
+            entry = {
+                'info_hash': info_hash,
+                'name': ti.name() if ti is not None else (params.name or 'Loading...'),
+                'size': ti.total_size() if ti is not None else None,
+                'has_metadata': ti is not None,
+                'recheck': recheck,
+                'torrent_settings': torrent_settings,
+            }
+
+            # Recorded before adding, so the alert can't arrive first
+            with self.lock:
+                self.pending[info_hash] = entry
+            self.ses.async_add_torrent(params)
+        except Exception as e:
+            print(f"Failed to resume {info_hash}: {e}")
+            with self.lock:
+                self.pending.pop(info_hash, None)
+                self.unanswered.discard(info_hash)
+                self.failed += 1
+
+    def on_add_torrent(self, alert):
+        """Finish restoring a torrent when its add_torrent_alert arrives"""
+        info_hash = str(alert.params.info_hash)
+        if alert.params.ti is not None:
+            info_hash = str(alert.params.ti.info_hash())
+
+        with self.lock:
+            entry = self.pending.pop(info_hash, None)
+            if entry is None:
+                return  # Added by something other than the restore
+            self.unanswered.discard(info_hash)
+
+            if alert.error.value():
+                print(f"Failed to resume {info_hash}: {alert.error.message()}")
+                self.failed += 1
+                return
+            self.restored += 1
+
+        handle = alert.handle
+        if entry['recheck']:
+            handle.force_recheck()
+
+        self.on_added(handle, entry)
+
+    def unanswered_hashes(self, timeout=None):
+        """
+        Return the info hashes of saved torrents not in the session yet
+
+        Waits for the store to be read first, so a torrent about to be
+        restored is never missed.
+
+        Args:
+            timeout: Seconds to wait for the store (None waits as long as it takes)
+
+        Returns:
+            set: Info hashes queued for restore or waiting for their alert
+        """
+        self.loaded.wait(timeout)
+        with self.lock:
+            return set(self.unanswered)
+
+    def is_unanswered(self, info_hash, timeout=None):
+        """Return True if a saved torrent is still to be added by the restore (see unanswered_hashes)"""
+        self.loaded.wait(timeout)
+        with self.lock:
+            return info_hash in self.unanswered
+
+    def is_finished(self):
+        """Return True once every record has been restored or has failed"""
+        with self.lock:
+            return self.total is not None and self.restored + self.failed >= self.total
+
+    def shutdown(self):
+        """Stop restoring; torrents not yet added stay in the store untouched"""
+        self.stopped = True
+        self.pool.shutdown(wait=True, cancel_futures=True)
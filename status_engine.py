@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Alert-driven status engine for libtorrent sessions
+
+Instead of calling handle.status() on every torrent every tick, the engine
+asks the session for one state_update_alert per tick, which only contains
+the torrents whose status changed since the previous tick. All other alerts
+are dispatched to subscribers, so the engine is the single consumer of
+pop_alerts() while the session is running.
+"""
+
+import os
+import select
+import threading
+import time
+import weakref
+
+import libtorrent as lt
+
+
+class AlertWaiter:
+    """
+    Block until a session has alerts, without session.wait_for_alert()
+
+    wait_for_alert() hands Python a pointer into the alert queue, which the
+    network thread may reallocate while it fills up (e.g. during a bulk add),
+    crashing the interpreter. Instead the session writes to a pipe whenever
+    its queue becomes non-empty, and waiting is a select() on that pipe.
+    """
+
+    def __init__(self, ses):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+        ses.set_alert_fd(self.write_fd)
+
+    def wait(self, timeout):
+        """
+        Wait for alerts to pop
+
+        Args:
+            timeout: Seconds to wait at most
+
+        Returns:
+            bool: True if alerts may be waiting, False on timeout
+        """
+        ready, _, _ = select.select([self.read_fd], [], [], max(0, timeout))
+        if not ready:
+            return False
+        # Drain before popping: an alert posted after this wakes us again
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+
+_waiters = weakref.WeakKeyDictionary()
+_retired_fds = []    # Write ends of pipes whose session was being destroyed
+_waiters_lock = threading.Lock()
+
+
+def _retire(waiter):
+    """Release a waiter's pipe once its session is garbage collected"""
+    os.close(waiter.read_fd)
+    # Weak references die before the session shuts down, which may still
+    # notify; the write end is closed on the next alert_waiter() call
+    with _waiters_lock:
+        _retired_fds.append(waiter.write_fd)
+
+
+def alert_waiter(ses):
+    """
+    Return the AlertWaiter of a session, creating it on first use
+
+    A session has a single alert fd, so everything waiting on the same
+    session must share one waiter.
+    """
+    with _waiters_lock:
+        while _retired_fds:
+            os.close(_retired_fds.pop())
+
+        waiter = _waiters.get(ses)
+        if waiter is None:
+            waiter = _waiters[ses] = AlertWaiter(ses)
+            weakref.finalize(ses, _retire, waiter)
+        return waiter
+
+
+class StatusEngine:
+    """Cache torrent status from state_update_alert and dispatch other alerts"""
+
+    def __init__(self, ses):
+        self.ses = ses
+        self.waiter = alert_waiter(ses)
+        self.statuses = {}       # info_hash -> latest torrent_status
+        self.handlers = {}       # alert class -> list of callbacks
+        self.pending = []        # handles that need an initial status
+        self.forgotten = []      # info hashes removed since the last poll
+        self.pending_lock = threading.Lock()
+
+        # Session-wide aggregates, maintained incrementally from changed rows
+        self.download_rate = 0
+        self.upload_rate = 0
+        self.num_peers = 0
+        self.total_download = 0
+        self.total_upload = 0
+
+    def subscribe(self, alert_type, callback):
+        """
+        Register a callback for an alert type
+
+        Args:
+            alert_type: libtorrent alert class (e.g. lt.save_resume_data_alert)
+            callback: Called with the alert on the polling thread
+        """
+        # Replace rather than mutate, so a dispatch in progress is unaffected
+        self.handlers[alert_type] = self.handlers.get(alert_type, []) + [callback]
+
+    def unsubscribe(self, alert_type, callback):
+        """Remove a callback registered with subscribe()"""
+        callbacks = self.handlers.get(alert_type, [])
+        if callback in callbacks:
+            # Replace rather than mutate, so a dispatch in progress is unaffected
+            self.handlers[alert_type] = [c for c in callbacks if c != callback]
+
+    def track(self, handle):
+        """
+        Fetch the status of a newly added torrent on the next poll
+
+        Torrents only show up in state_update_alert once something changes,
+        so a torrent that is added paused would otherwise never be reported.
+        """
+        with self.pending_lock:
+            self.pending.append(handle)
+
+    def forget(self, info_hash):
+        """
+        Drop a removed torrent from the cache and the rate aggregates
+
+        Safe to call from any thread; the cache itself is only modified on
+        the polling thread, at the end of the next poll().
+        """
+        with self.pending_lock:
+            self.forgotten.append(info_hash)
+
+    def get(self, info_hash):
+        """Return the cached status for a torrent, or None"""
+        return self.statuses.get(info_hash)
+
+    def poll(self, interval=1.0):
+        """
+        Run one tick of the engine
+
+        Requests a state update, then handles alerts until the interval has
+        elapsed.
+
+        Args:
+            interval: Tick length in seconds
+
+        Returns:
+            list: torrent_status objects that changed during this tick
+        """
+        deadline = time.monotonic() + interval
+        changed = {}
+
+        with self.pending_lock:
+            pending, self.pending = self.pending, []
+        for handle in pending:
+            try:
+                if handle.is_valid():
+                    status = handle.status()
+                    changed[str(status.info_hash)] = status
+            except Exception as e:
+                print(f"Status engine: could not fetch initial status: {e}")
+
+        self.ses.post_torrent_updates()
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self.waiter.wait(remaining):
+                break
+
+            for alert in self.ses.pop_alerts():
+                if isinstance(alert, lt.state_update_alert):
+                    for status in alert.status:
+                        changed[str(status.info_hash)] = status
+                else:
+                    self.dispatch(alert)
+
+        with self.pending_lock:
+            forgotten, self.forgotten = self.forgotten, []
+        for info_hash in forgotten:
+            changed.pop(info_hash, None)
+            self._drop(info_hash)
+
+        for info_hash, status in changed.items():
+            self._store(info_hash, status)
+
+        return list(changed.values())
+
+    def dispatch(self, alert):
+        """Pass an alert to every callback subscribed to its type"""
+        for callback in self.handlers.get(type(alert), ()):
+            try:
+                callback(alert)
+            except Exception as e:
+                print(f"Status engine: {type(alert).__name__} handler failed: {e}")
+
+    def _drop(self, info_hash):
+        """Remove a cached status; session totals keep its transferred bytes"""
+        status = self.statuses.pop(info_hash, None)
+        if status is not None:
+            self.download_rate -= status.download_rate
+            self.upload_rate -= status.upload_rate
+            self.num_peers -= status.num_peers
+
+    def _store(self, info_hash, status):
+        """Replace a cached status and update the aggregates by the delta"""
+        old = self.statuses.get(info_hash)
+        if old is not None:
+            self.download_rate -= old.download_rate
+            self.upload_rate -= old.upload_rate
+            self.num_peers -= old.num_peers
+            self.total_download -= old.total_download
+            self.total_upload -= old.total_upload
+
+        self.statuses[info_hash] = status
+        self.download_rate += status.download_rate
+        self.upload_rate += status.upload_rate
+        self.num_peers += status.num_peers
+        self.total_download += status.total_download
+        self.total_upload += status.total_upload
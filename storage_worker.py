@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Background deletion and moving of downloaded files
+
+Files are deleted with remove_torrent(..., delete_files) and moved with
+move_storage(), so libtorrent does the filesystem work on its disk threads
+and only touches files that belong to the torrent. The caller returns
+immediately; completion arrives as alerts, which StorageWorker turns into
+progress updates of a StorageJob.
+
+The session's alert_mask must include storage notifications, or
+torrent_deleted_alert and storage_moved_alert are never posted.
+"""
+
+import errno
+import threading
+
+import libtorrent as lt
+
+
+class StorageJob:
+    """Progress of one batch of deletes or moves"""
+
+    def __init__(self, kind, total, destination=None):
+        """
+        Args:
+            kind: 'delete' or 'move'
+            total: Number of torrents in the batch
+            destination: Target directory of a move
+        """
+        self.kind = kind
+        self.total = total
+        self.destination = destination
+        self.done = 0
+        self.errors = []     # (torrent name, message)
+        self.finished = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait until every torrent in the batch has been answered"""
+        return self.finished.wait(timeout)
+
+    def summary(self, max_errors=10):
+        """
+        Describe the outcome in a few lines
+
+        Args:
+            max_errors: Number of individual failures listed
+
+        Returns:
+            str: Human-readable summary
+        """
+        verb = "Deleted files of" if self.kind == 'delete' else "Moved"
+        lines = [f"{verb} {self.done - len(self.errors)} of {self.total} torrent(s)"]
+        for name, message in self.errors[:max_errors]:
+            lines.append(f"  • {name}: {message}")
+        if len(self.errors) > max_errors:
+            lines.append(f"  ... and {len(self.errors) - max_errors} more")
+        return "\n".join(lines)
+
+
+class StorageWorker:
+    """Start deletes and moves on libtorrent's disk threads and track their alerts"""
+
+    def __init__(self, ses, on_progress=None):
+        """
+        Args:
+            ses: libtorrent session owning the torrents
+            on_progress: Called as on_progress(job) on the alert thread each
+                time a torrent of a job is answered
+        """
+        self.ses = ses
+        self.on_progress = on_progress
+        self.pending = {}    # info_hash -> (job, name)
+        self.lock = threading.Lock()
+
+    def delete(self, torrents):
+        """
+        Remove torrents from the session and delete their files
+
+        Args:
+            torrents: (handle, info_hash, name) tuples
+
+        Returns:
+            StorageJob
+        """
+        job = StorageJob('delete', len(torrents))
+        with self.lock:
+            for handle, info_hash, name in torrents:
+                self.pending[info_hash] = (job, name)
+
+        for handle, info_hash, name in torrents:
+            try:
+                self.ses.remove_torrent(handle, lt.session.delete_files)
+            except Exception as e:
+                self._answer(info_hash, str(e))
+        self._check_empty(job)
+        return job
+
+    def move(self, torrents, destination):
+        """
+        Move the files of torrents to another directory
+
+        Files already present at the destination are kept, so moving onto
+        a copy doesn't overwrite it.
+
+        Args:
+            torrents: (handle, info_hash, name) tuples
+            destination: Directory to move to
+
+        Returns:
+            StorageJob
+        """
+        job = StorageJob('move', len(torrents), destination)
+        with self.lock:
+            for handle, info_hash, name in torrents:
+                self.pending[info_hash] = (job, name)
+
+        for handle, info_hash, name in torrents:
+            try:
+                handle.move_storage(destination, lt.move_flags_t.dont_replace)
+            except Exception as e:
+                self._answer(info_hash, str(e))
+        self._check_empty(job)
+        return job
+
+    def on_deleted(self, alert):
+        """Handle a torrent_deleted_alert"""
+        self._answer(str(alert.info_hash), None)
+
+    def on_delete_failed(self, alert):
+        """Handle a torrent_delete_failed_alert"""
+        # No error means the torrent had no files yet (magnet without
+        # metadata); a non-empty directory means files that don't belong
+        # to the torrent were kept
+        code = alert.error.value()
+        if code in (0, errno.ENOTEMPTY):
+            self._answer(str(alert.info_hash), None)
+        else:
+            self._answer(str(alert.info_hash), alert.error.message())
+
+    def on_moved(self, alert):
+        """Handle a storage_moved_alert"""
+        self._answer(str(alert.handle.info_hash()), None)
+
+    def on_move_failed(self, alert):
+        """Handle a storage_moved_failed_alert"""
+        message = alert.error.message()
+        if alert.file_path:
+            message = f"{message} ({alert.file_path})"
+        self._answer(str(alert.handle.info_hash()), message)
+
+    def _answer(self, info_hash, error):
+        """Record the outcome for one torrent and report progress"""
+        with self.lock:
+            pending = self.pending.pop(info_hash, None)
+            if pending is None:
+                return  # Not started by this worker
+            job, name = pending
+            job.done += 1
+            if error:
+                job.errors.append((name, error))
+            if job.done >= job.total:
+                job.finished.set()
+
+        if self.on_progress:
+            self.on_progress(job)
+
+    def _check_empty(self, job):
+        """Finish a job with nothing in it right away"""
+        if job.total == 0:
+            job.finished.set()
+            if self.on_progress:
+                self.on_progress(job)
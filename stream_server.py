@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Streaming mode: play a file while its torrent is still downloading
+
+StreamServer serves torrent files over HTTP on 127.0.0.1 with Range
+support, so a media player can open the URL and start playing after a few
+pieces arrive. Streaming a file turns on sequential download for its
+torrent, and every read gives the pieces right after the read offset a
+deadline (set_piece_deadline), so libtorrent requests them first from the
+fastest peers. A request that starts somewhere else in the file (a seek)
+clears the old deadlines and prioritizes the pieces at the new offset
+instead of waiting for the download to get there.
+
+Each stream gets a random path, so other local users can't guess the URL
+of a file they aren't meant to read.
+"""
+
+import os
+import time
+import secrets
+import mimetypes
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+import libtorrent as lt
+
+
+# How far past the read offset pieces get a deadline
+DEFAULT_READAHEAD = 16 * 1024 * 1024
+MIN_READAHEAD_PIECES = 4
+
+# Deadline of the first piece after the offset, and how much later each
+# following piece is due
+FIRST_DEADLINE_MS = 0
+DEADLINE_STEP_MS = 150
+
+# Largest write to the socket at a time
+CHUNK_SIZE = 256 * 1024
+
+# Give up on a request if no needed piece arrives for this long
+STALL_TIMEOUT = 60.0
+PIECE_POLL_INTERVAL = 0.05
+
+
+def pick_file(ti):
+    """
+    Return the index of the file to stream by default: the largest one
+
+    Args:
+        ti: torrent_info
+
+    Returns:
+        int: File index
+    """
+    files = ti.files()
+    candidates = [i for i in range(files.num_files())
+                  if not files.file_flags(i) & lt.file_storage.flag_pad_file]
+    return max(candidates, key=files.file_size)
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header for a file of a given size
+
+    Only single byte ranges are honored; anything else is answered with
+    the whole file, as RFC 7233 allows.
+
+    Args:
+        header: Value of the Range header, or None
+        size: File size in bytes
+
+    Returns:
+        tuple: (first, last) byte offsets, inclusive, or None for the whole file
+
+    Raises:
+        ValueError: If the range can't be satisfied (416)
+    """
+    if not header:
+        return None
+    unit, _, spec = header.strip().partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+
+    first_text, dash, last_text = spec.strip().partition('-')
+    try:
+        first = int(first_text) if first_text else None
+        last = int(last_text) if last_text else None
+    except ValueError:
+        return None
+    if not dash or (first is None and last is None):
+        return None
+
+    if first is None:
+        # Suffix range: the last N bytes
+        if last == 0 or size == 0:
+            raise ValueError(f"Range not satisfiable for {size} bytes")
+        return max(0, size - last), size - 1
+
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise ValueError(f"Range not satisfiable for {size} bytes")
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+class Stream:
+    """One file of a torrent being streamed"""
+
+    def __init__(self, handle, file_index, readahead=DEFAULT_READAHEAD):
+        """
+        Args:
+            handle: torrent_handle with metadata
+            file_index: File to stream
+            readahead: Bytes past the read offset that get a deadline
+
+        Raises:
+            ValueError: If the torrent has no metadata yet or the index is invalid
+        """
+        ti = handle.torrent_file()
+        if ti is None:
+            raise ValueError("Torrent metadata not yet available")
+        files = ti.files()
+        if not 0 <= file_index < files.num_files():
+            raise ValueError(f"No file {file_index} in torrent ({files.num_files()} files)")
+
+        self.handle = handle
+        self.info_hash = str(handle.info_hash())
+        self.file_index = file_index
+        self.ti = ti
+        self.files = files
+        self.size = files.file_size(file_index)
+        self.name = os.path.basename(files.file_path(file_index))
+        self.content_type = mimetypes.guess_type(self.name)[0] or 'application/octet-stream'
+        self.window = max(MIN_READAHEAD_PIECES, readahead // ti.piece_length())
+        self.num_pieces = ti.num_pieces()
+
+        self.lock = threading.Lock()
+        self.deadlines = set()    # Pieces given a deadline since the last seek
+
+    def enable(self):
+        """Turn on sequential download, make sure the file is wanted and resume the torrent"""
+        self.handle.set_flags(lt.torrent_flags.sequential_download)
+        if self.handle.file_priority(self.file_index) == 0:
+            self.handle.file_priority(self.file_index, 4)
+        self.handle.resume()
+
+    def disable(self):
+        """Go back to rarest-first and drop the deadlines"""
+        if self.handle.is_valid():
+            self.handle.unset_flags(lt.torrent_flags.sequential_download)
+            self.handle.clear_piece_deadlines()
+
+    def path(self):
+        """Return where the file is on disk right now"""
+        return os.path.join(self.handle.status().save_path, self.files.file_path(self.file_index))
+
+    def piece_at(self, offset):
+        """Return the piece holding a byte of the file"""
+        return self.ti.map_file(self.file_index, offset, 1).piece
+
+    def seek(self, offset):
+        """
+        Start reading at an offset
+
+        An offset outside the pieces already prioritized is a seek: the old
+        deadlines are dropped so the peers' bandwidth goes to the new
+        position.
+        """
+        piece = self.piece_at(offset)
+        with self.lock:
+            if piece in self.deadlines or self.handle.have_piece(piece):
+                return
+            self.deadlines.clear()
+        self.handle.clear_piece_deadlines()
+
+    def prioritize(self, offset):
+        """Give the pieces from an offset to the end of the read-ahead window a deadline"""
+        first = self.piece_at(offset)
+        last = min(first + self.window, self.num_pieces) - 1
+        with self.lock:
+            due = [piece for piece in range(first, last + 1) if piece not in self.deadlines]
+            self.deadlines.update(due)
+        for piece in due:
+            if not self.handle.have_piece(piece):
+                deadline = FIRST_DEADLINE_MS + (piece - first) * DEADLINE_STEP_MS
+                self.handle.set_piece_deadline(piece, deadline)
+
+    def wait_for(self, first_piece, last_piece, timeout=STALL_TIMEOUT):
+        """
+        Wait until a run of pieces is downloaded and verified
+
+        The timeout restarts every time one of them arrives.
+
+        Returns:
+            bool: False if the torrent was removed or the download stalled
+        """
+        piece = first_piece
+        deadline = time.monotonic() + timeout
+        while piece <= last_piece:
+            if not self.handle.is_valid():
+                return False
+            if self.handle.have_piece(piece):
+                piece += 1
+                deadline = time.monotonic() + timeout
+                continue
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(PIECE_POLL_INTERVAL)
+        return True
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """Serve byte ranges of streamed files"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        parts = [p for p in urlsplit(self.path).path.split('/') if p]
+        stream = self.server.lookup(parts[0]) if parts else None
+        if stream is None:
+            self._error(404, "No such stream")
+            return
+
+        try:
+            byte_range = parse_range(self.headers.get('Range'), stream.size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{stream.size}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if byte_range is None:
+            first, last = 0, stream.size - 1
+            self.send_response(200)
+        else:
+            first, last = byte_range
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {first}-{last}/{stream.size}")
+        self.send_header('Content-Type', stream.content_type)
+        self.send_header('Content-Length', str(last - first + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        if not send_body or last < first:
+            return
+        try:
+            self._send_range(stream, first, last)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The player closed the connection, usually to seek
+        except Exception as e:
+            print(f"Stream error: {type(e).__name__}: {e}")
+            self.close_connection = True
+
+    def _send_range(self, stream, first, last):
+        """Write bytes first..last of a stream as their pieces arrive"""
+        stream.seek(first)
+        f = None
+        try:
+            offset = first
+            while offset <= last:
+                stream.prioritize(offset)
+                end = min(last, offset + CHUNK_SIZE - 1)
+                if not stream.wait_for(stream.piece_at(offset), stream.piece_at(end)):
+                    # Closing the connection tells the player the data isn't coming
+                    self.close_connection = True
+                    return
+                if f is None:
+                    f = open(stream.path(), 'rb')
+                f.seek(offset)
+                data = f.read(end - offset + 1)
+                if not data:
+                    self.close_connection = True
+                    return
+                self.wfile.write(data)
+                offset += len(data)
+        finally:
+            if f is not None:
+                f.close()
+
+    def _error(self, status, message):
+        data = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Players make many range requests; don't log every one
+
+
+class StreamServer(ThreadingHTTPServer):
+    """Serve streamed torrent files on a loopback port"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, readahead=DEFAULT_READAHEAD):
+        """
+        Args:
+            port: Loopback port to listen on (0 picks a free one)
+            readahead: Bytes past the read offset that get a deadline
+        """
+        super().__init__(('127.0.0.1', port), StreamHandler)
+        self.readahead = readahead
+        self.lock = threading.Lock()
+        self.streams = {}     # token -> Stream
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve requests on a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, name='stream-server', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving and turn streaming mode off for every torrent"""
+        with self.lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+        for stream in streams:
+            stream.disable()
+        if self.thread is not None:
+            self.shutdown()
+        self.server_close()
+
+    def lookup(self, token):
+        with self.lock:
+            return self.streams.get(token)
+
+    def add(self, handle, file_index=None):
+        """
+        Put a torrent in streaming mode and return the URL of one of its files
+
+        Streaming the same file again returns the same URL.
+
+        Args:
+            handle: torrent_handle with metadata
+            file_index: File to stream (default: the largest)
+
+        Returns:
+            str: http://127.0.0.1:<port>/... URL for a media player
+
+        Raises:
+            ValueError: If the torrent has no metadata yet or the index is invalid
+        """
+        ti = handle.torrent_file()
+        if ti is None:
+            raise ValueError("Torrent metadata not yet available")
+        if file_index is None:
+            file_index = pick_file(ti)
+
+        info_hash = str(handle.info_hash())
+        with self.lock:
+            for token, stream in self.streams.items():
+                if stream.info_hash == info_hash and stream.file_index == file_index:
+                    return self.url(token, stream)
+
+        stream = Stream(handle, file_index, self.readahead)
+        stream.enable()
+        token = secrets.token_urlsafe(16)
+        with self.lock:
+            self.streams[token] = stream
+        return self.url(token, stream)
+
+    def url(self, token, stream):
+        """Return the URL of a stream; the file name helps players guess the format"""
+        return f"http://127.0.0.1:{self.port}/{token}/{quote(stream.name)}"
+
+    def remove(self, info_hash):
+        """
+        Stop streaming the files of a torrent
+
+        Returns:
+            int: Number of streams removed
+        """
+        with self.lock:
+            tokens = [token for token, stream in self.streams.items()
+                      if stream.info_hash == info_hash]
+            streams = [self.streams.pop(token) for token in tokens]
+        for stream in streams:
+            stream.disable()
+        return len(streams)
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Reproducible loopback swarm benchmark for the session profiles
+
+Usage:
+  python3 swarm_benchmark.py [profile ...] [--size MiB] [--leechers N]
+                             [--repeat N] [--output FILE] [--baseline COMMIT]
+
+Each trial builds a synthetic torrent with lt.create_torrent from a
+seeded pseudo-random payload (the same bytes, and so the same info hash,
+on every run), starts a seeder session and N leecher sessions on
+127.0.0.1 and connects every leecher to the seeder and to each other.
+It measures:
+
+- complete_seconds: until the last leecher has every piece
+- cpu_per_mib: process CPU time per MiB received by all leechers
+- peak_rss / rss_growth: resident memory, sampled while transferring
+- resume_save_seconds: saving resume data for every leecher
+- restart_seconds: new leecher sessions, added from that resume data,
+  until all of them report finished again (no recheck)
+
+Every trial runs in a fresh process, so the memory of one profile isn't
+inflated by the one before. With --repeat the median of each metric is
+kept. With --output, each run is appended to a JSONL file together with
+the git commit, libtorrent version and machine, and compared with the
+previous run there that used the same parameters on the same machine,
+so a regression shows up as a percentage next to the commit that caused
+it. No network access or outside service is needed.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import concurrent.futures
+import multiprocessing
+from datetime import datetime
+
+import libtorrent as lt
+
+from session_profiles import PROFILES, profile_settings
+
+
+MIB = 1024 * 1024
+DEFAULT_SIZE_MB = 64
+DEFAULT_LEECHERS = 3
+DEFAULT_SEED = 1
+DEFAULT_TIMEOUT = 300
+POLL_INTERVAL = 0.02
+
+# Metrics shown by compare(); all of them are better when lower
+COMPARED = ('complete_seconds', 'cpu_per_mib', 'peak_rss', 'restart_seconds')
+
+
+def loopback_settings(profile):
+    """Profile settings for a session that only talks to 127.0.0.1"""
+    settings = profile_settings(profile)
+    settings.update({
+        'listen_interfaces': '127.0.0.1:0',
+        'enable_dht': False,
+        'enable_lsd': False,
+        'enable_upnp': False,
+        'enable_natpmp': False,
+        # Every peer is on 127.0.0.1: without this only one connection per IP is allowed
+        'allow_multiple_connections_per_ip': True,
+    })
+    return settings
+
+
+def write_payload(path, size_mb, seed=DEFAULT_SEED):
+    """Write size_mb MiB of pseudo-random bytes that are the same for the same seed"""
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(rng.randbytes(MIB))
+
+
+def make_torrent(directory, size_mb, seed=DEFAULT_SEED):
+    """
+    Write the payload to directory/payload.bin and return its torrent_info
+
+    The creation date is left out so the same payload always gives the
+    same info hash.
+    """
+    path = os.path.join(directory, 'payload.bin')
+    write_payload(path, size_mb, seed)
+
+    fs = lt.file_storage()
+    lt.add_files(fs, path)
+    t = lt.create_torrent(fs)
+    lt.set_piece_hashes(t, directory)
+    torrent = t.generate()
+    torrent.pop(b'creation date', None)
+    return lt.torrent_info(lt.bencode(torrent))
+
+
+def current_rss():
+    """Return the resident memory of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No /proc: the peak so far is the best available (bytes on macOS, KiB elsewhere)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def cpu_seconds():
+    """Return user + system CPU time of this process"""
+    times = os.times()
+    return times.user + times.system
+
+
+def wait_for_resume_data(sessions, expected, timeout):
+    """
+    Collect the resume data of one torrent per session
+
+    Returns:
+        dict: session index -> bencoded resume data
+    """
+    saved = {}
+    deadline = time.monotonic() + timeout
+    while len(saved) < expected and time.monotonic() < deadline:
+        for index, ses in enumerate(sessions):
+            for alert in ses.pop_alerts():
+                if isinstance(alert, lt.save_resume_data_alert):
+                    saved[index] = lt.write_resume_data_buf(alert.params)
+        time.sleep(POLL_INTERVAL)
+    return saved
+
+
+def run_trial(profile, size_mb=DEFAULT_SIZE_MB, leechers=DEFAULT_LEECHERS, seed=DEFAULT_SEED,
+              timeout=DEFAULT_TIMEOUT):
+    """
+    Transfer a synthetic torrent to N leechers with one profile and measure it
+
+    Args:
+        profile: Name of the session profile
+        size_mb: Size of the payload in MiB
+        leechers: Number of leecher sessions
+        seed: Seed of the pseudo-random payload
+        timeout: Seconds the transfer and the restart may take each
+
+    Returns:
+        dict: The metrics listed in the module docstring (seconds, bytes);
+            'timed_out' is True and the time metrics None if the swarm
+            didn't finish
+
+    Raises:
+        ValueError: If the profile doesn't exist
+    """
+    settings = loopback_settings(profile)
+    work_dir = tempfile.mkdtemp(prefix='swarm-bench-')
+    try:
+        seed_dir = os.path.join(work_dir, 'seed')
+        os.makedirs(seed_dir)
+        ti = make_torrent(seed_dir, size_mb, seed)
+        leech_dirs = [os.path.join(work_dir, f'leech{i}') for i in range(leechers)]
+
+        baseline_rss = current_rss()
+        seeder = lt.session(settings)
+        params = lt.add_torrent_params()
+        params.ti = lt.torrent_info(ti)
+        params.save_path = seed_dir
+        params.flags |= lt.torrent_flags.seed_mode
+        seeder.add_torrent(params)
+
+        sessions, handles = [], []
+        for leech_dir in leech_dirs:
+            ses = lt.session(settings)
+            params = lt.add_torrent_params()
+            params.ti = lt.torrent_info(ti)
+            params.save_path = leech_dir
+            sessions.append(ses)
+            handles.append(ses.add_torrent(params))
+
+        start = time.monotonic()
+        start_cpu = cpu_seconds()
+        for i, handle in enumerate(handles):
+            handle.connect_peer(('127.0.0.1', seeder.listen_port()))
+            for other in sessions[i + 1:]:
+                handle.connect_peer(('127.0.0.1', other.listen_port()))
+
+        finished = [None] * leechers
+        peak_rss = baseline_rss
+        while None in finished and time.monotonic() - start < timeout:
+            for i, handle in enumerate(handles):
+                if finished[i] is None and handle.status().is_finished:
+                    finished[i] = time.monotonic() - start
+            peak_rss = max(peak_rss, current_rss())
+            time.sleep(POLL_INTERVAL)
+        cpu = cpu_seconds() - start_cpu
+
+        result = {
+            'profile': profile,
+            'timed_out': None in finished,
+            'complete_seconds': None if None in finished else max(finished),
+            'mean_complete_seconds': None if None in finished else statistics.mean(finished),
+            'rate': None if None in finished else size_mb * MIB * leechers / max(finished),
+            'cpu_seconds': cpu,
+            'cpu_per_mib': cpu / (size_mb * leechers),
+            'peak_rss': peak_rss,
+            'rss_growth': peak_rss - baseline_rss,
+            'resume_save_seconds': None,
+            'restart_seconds': None,
+        }
+        if result['timed_out']:
+            return result
+
+        # Resume data as the GUI and daemon save it on shutdown
+        save_start = time.monotonic()
+        for handle in handles:
+            handle.save_resume_data(lt.save_resume_flags_t.flush_disk_cache
+                                    | lt.save_resume_flags_t.save_info_dict)
+        saved = wait_for_resume_data(sessions, leechers, timeout)
+        if len(saved) < leechers:
+            result['timed_out'] = True
+            return result
+        result['resume_save_seconds'] = time.monotonic() - save_start
+        del handles, sessions
+
+        restart_start = time.monotonic()
+        restarted = []
+        for i, leech_dir in enumerate(leech_dirs):
+            ses = lt.session(settings)
+            params = lt.read_resume_data(saved[i])
+            params.save_path = leech_dir
+            restarted.append((ses, ses.add_torrent(params)))
+        while time.monotonic() - restart_start < timeout:
+            if all(handle.status().is_finished for _, handle in restarted):
+                result['restart_seconds'] = time.monotonic() - restart_start
+                break
+            time.sleep(POLL_INTERVAL)
+        else:
+            result['timed_out'] = True
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_isolated(kwargs):
+    return run_trial(**kwargs)
+
+
+def run_isolated(profile, **kwargs):
+    """Run one trial in a fresh process, so its memory and CPU are its own"""
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_isolated, dict(kwargs, profile=profile)).result()
+
+
+def summarize(trials):
+    """
+    Combine repeated trials of one profile
+
+    Returns:
+        dict: Median of every numeric metric over the trials that finished;
+            'timed_out' if any trial didn't, 'trials' the number run
+    """
+    finished = [t for t in trials if not t['timed_out']] or trials
+    summary = {'profile': trials[0]['profile'], 'trials': len(trials),
+               'timed_out': any(t['timed_out'] for t in trials)}
+    for key, value in trials[0].items():
+        if key in summary or isinstance(value, bool):
+            continue
+        values = [t[key] for t in finished if t[key] is not None]
+        summary[key] = statistics.median(values) if values else None
+    return summary
+
+
+def git_revision():
+    """
+    Return (short commit, has uncommitted changes) of this checkout
+
+    Returns:
+        tuple: (None, False) outside a git checkout
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                 cwd=directory, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(changes.strip())
+
+
+def machine_description():
+    """Describe this machine; results are only compared with the same one"""
+    return f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs"
+
+
+def make_record(params, results):
+    """
+    Build the JSON record of one run
+
+    Args:
+        params: Parameters that must match for runs to be comparable
+        results: Profile name -> summarize() result
+    """
+    commit, dirty = git_revision()
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'libtorrent': lt.__version__,
+        'python': platform.python_version(),
+        'machine': machine_description(),
+        'params': params,
+        'results': results,
+    }
+
+
+def load_records(path):
+    """Return the records of a results file, oldest first (none if it doesn't exist)"""
+    records = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print(f"Skipping malformed line in {path}")
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def append_record(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def find_baseline(records, params, machine, commit=None):
+    """
+    Return the newest record comparable with a run, or None
+
+    Args:
+        records: Records from load_records()
+        params: Parameters of the new run; only records with equal ones match
+        machine: machine_description() of the new run, which must match too
+        commit: Only a record of this commit (prefix) matches
+    """
+    for record in reversed(records):
+        if record.get('params') != params or record.get('machine') != machine:
+            continue
+        if commit and not (record.get('commit') or '').startswith(commit):
+            continue
+        return record
+    return None
+
+
+def compare(baseline, results):
+    """
+    Compare a run with a baseline record
+
+    Returns:
+        list: (profile, metric, old, new, change in percent or None) for
+            every COMPARED metric both have
+    """
+    rows = []
+    for profile, new in results.items():
+        old = baseline['results'].get(profile)
+        if old is None:
+            continue
+        for metric in COMPARED:
+            if old.get(metric) is None or new.get(metric) is None:
+                continue
+            change = (new[metric] - old[metric]) * 100 / old[metric] if old[metric] else None
+            rows.append((profile, metric, old[metric], new[metric], change))
+    return rows
+
+
+def format_value(metric, value):
+    if metric == 'peak_rss' or metric == 'rss_growth':
+        return f"{value / MIB:.1f} MiB"
+    if metric == 'cpu_per_mib':
+        return f"{value * 1000:.1f} ms/MiB"
+    return f"{value:.2f} s"
+
+
+def print_result(result):
+    """Print one profile's summary on one line"""
+    if result['complete_seconds'] is None:
+        print(f"  {result['profile']:12} timed out")
+        return
+    restart = result['restart_seconds']
+    print(f"  {result['profile']:12} "
+          f"{result['complete_seconds']:7.2f} s {result['rate'] / MIB:8.1f} MiB/s  "
+          f"CPU {format_value('cpu_per_mib', result['cpu_per_mib']):>12}  "
+          f"RSS {format_value('peak_rss', result['peak_rss']):>10} "
+          f"(+{format_value('rss_growth', result['rss_growth'])})  "
+          f"resume save {result['resume_save_seconds']:.2f} s  "
+          f"restart {'timed out' if restart is None else f'{restart:.2f} s'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark session profiles with a loopback swarm')
+    parser.add_argument('profiles', nargs='*', metavar='PROFILE',
+                        help=f"Profiles to run (default: all of {', '.join(PROFILES)})")
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE_MB,
+                        help=f'Payload size in MiB (default: {DEFAULT_SIZE_MB})')
+    parser.add_argument('--leechers', type=int, default=DEFAULT_LEECHERS,
+                        help=f'Leecher sessions (default: {DEFAULT_LEECHERS})')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Trials per profile; the median is reported (default: 1)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f'Seed of the payload bytes (default: {DEFAULT_SEED})')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
+                        help=f'Seconds before a transfer or restart gives up (default: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--output', metavar='FILE',
+                        help='Append the results to this JSONL file and compare with the previous run')
+    parser.add_argument('--baseline', metavar='COMMIT',
+                        help='Compare with the run of this commit in the output file instead')
+    args = parser.parse_args()
+
+    names = args.profiles or list(PROFILES)
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        print(f"Unknown profile(s): {', '.join(unknown)}")
+        sys.exit(1)
+    if args.size < 1 or args.leechers < 1 or args.repeat < 1:
+        print("--size, --leechers and --repeat must be at least 1")
+        sys.exit(1)
+
+    params = {'size_mb': args.size, 'leechers': args.leechers, 'seed': args.seed,
+              'repeat': args.repeat}
+    print(f"Loopback swarm: {args.size} MiB, 1 seeder, {args.leechers} leecher(s), "
+          f"{args.repeat} trial(s) per profile")
+
+    results = {}
+    for name in names:
+        trials = [run_isolated(name, size_mb=args.size, leechers=args.leechers,
+                               seed=args.seed, timeout=args.timeout)
+                  for _ in range(args.repeat)]
+        results[name] = summarize(trials)
+        print_result(results[name])
+
+    if not args.output:
+        return
+
+    record = make_record(params, results)
+    baseline = find_baseline(load_records(args.output), params, record['machine'], args.baseline)
+    append_record(args.output, record)
+    print(f"Results appended to {args.output}")
+
+    if baseline is None:
+        print("No earlier run with the same parameters on this machine to compare with")
+        return
+    print(f"Compared with {baseline['commit'] or 'unknown commit'}"
+          f"{' (dirty)' if baseline.get('dirty') else ''} from {baseline['timestamp']}:")
+    for profile, metric, old, new, change in compare(baseline, results):
+        change = '' if change is None else f"{change:+6.1f}%"
+        print(f"  {profile:12} {metric:18} {format_value(metric, old):>14} -> "
+              f"{format_value(metric, new):>14}  {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Sessions and torrents shared by the tests
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from torrent_engine import build_session_settings
+
+
+# Keeps a test session off the network
+LOOPBACK = {
+    'listen_interfaces': '127.0.0.1:0',
+    'enable_dht': False,
+    'enable_lsd': False,
+    'enable_upnp': False,
+    'enable_natpmp': False,
+}
+
+
+def make_settings():
+    """Return the app's own session settings (profile, alert mask), loopback-only"""
+    settings = build_session_settings(listen_interfaces='127.0.0.1:0', dht=False)
+    settings.update(LOOPBACK)
+    return settings
+
+
+def make_session(settings=None, app_settings=False):
+    """
+    Create a loopback-only session that won't touch the network
+
+    Args:
+        settings: Extra settings applied last
+        app_settings: Start from make_settings() instead of libtorrent's defaults
+    """
+    base = make_settings() if app_settings else dict(LOOPBACK)
+    base.update(settings or {})
+    return lt.session(base)
+
+
+def make_torrent_data(directory, name="test.txt", size=64 * 1024):
+    """Create a file and return the bencoded .torrent describing it"""
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+
+    fs = lt.file_storage()
+    lt.add_files(fs, path)
+    t = lt.create_torrent(fs)
+    lt.set_piece_hashes(t, directory)
+    return lt.bencode(t.generate())
+
+
+def make_torrent(directory, name="test.txt", size=64 * 1024):
+    """Create a file and a torrent_info describing it"""
+    return lt.torrent_info(lt.bdecode(make_torrent_data(directory, name, size)))
+
+
+def make_folder_torrent(directory, name, files, piece_size=0):
+    """
+    Write files under directory/name and return the torrent_info for them
+
+    Args:
+        directory: Directory the torrent is saved to
+        name: Folder holding the files
+        files: Relative path -> contents (bytes) or size (random bytes)
+        piece_size: Piece size in bytes (0 lets libtorrent choose)
+    """
+    root = os.path.join(directory, name)
+    for path, contents in files.items():
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(os.urandom(contents) if isinstance(contents, int) else contents)
+
+    fs = lt.file_storage()
+    lt.add_files(fs, root)
+    t = lt.create_torrent(fs, piece_size=piece_size)
+    lt.set_piece_hashes(t, directory)
+    return lt.torrent_info(lt.bencode(t.generate()))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the time-of-day bandwidth scheduler
+"""
+
+import unittest
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bandwidth_scheduler import (BandwidthSchedule, BandwidthScheduler, ScheduleSlot,
+                                 parse_days, parse_time)
+from tests.helpers import make_session
+
+
+# 2026-03-02 is a Monday
+MONDAY_NOON = datetime(2026, 3, 2, 12, 0)
+MONDAY_NIGHT = datetime(2026, 3, 2, 23, 30)
+TUESDAY_EARLY = datetime(2026, 3, 3, 5, 59)
+SATURDAY_NOON = datetime(2026, 3, 7, 12, 0)
+
+BASE = {'download_rate_limit': 0, 'upload_rate_limit': 0, 'active_downloads': 3,
+        'active_seeds': 5, 'active_limit': 8, 'connections_limit': 200}
+
+
+class FakeSession:
+    """Record apply_settings() calls"""
+
+    def __init__(self):
+        self.applied = []
+
+    def apply_settings(self, settings):
+        self.applied.append(settings)
+
+
+class TestParsing(unittest.TestCase):
+    """Test the text and settings.json forms"""
+
+    def test_days_and_times(self):
+        """Test day lists, ranges, wrapping ranges and times"""
+        self.assertEqual(parse_days("mon-fri"), [0, 1, 2, 3, 4])
+        self.assertEqual(parse_days("sat,sun"), [5, 6])
+        self.assertEqual(parse_days("fri-mon"), [4, 5, 6, 0])
+        self.assertEqual(parse_days("daily"), list(range(7)))
+        self.assertEqual(parse_time("9:05"), 545)
+        self.assertEqual(parse_time("24:00"), 1440)
+
+        for bad in ("monday", "mon-xyz"):
+            with self.assertRaises(ValueError):
+                parse_days(bad)
+        for bad in ("25:00", "12:60", "noon"):
+            with self.assertRaises(ValueError):
+                parse_time(bad)
+
+    def test_text_round_trip(self):
+        """Test a slot line converts to settings and back"""
+        slot = ScheduleSlot.parse("mon-fri 09:00-17:00 down=500 up=100 downloads=2")
+
+        self.assertEqual(slot.settings(), {'download_rate_limit': 500000,
+                                           'upload_rate_limit': 100000,
+                                           'active_downloads': 2})
+        self.assertEqual(slot.format(), "mon-fri 09:00-17:00 down=500 up=100 downloads=2")
+        self.assertEqual(ScheduleSlot.from_dict(slot.to_dict()).format(), slot.format())
+
+    def test_invalid_lines(self):
+        """Test errors name the bad line"""
+        for text, message in (("mon 09:00 down=1", "Line 1"),
+                              ("# comment\nmon 09:00-10:00 speed=1", "Line 2"),
+                              ("mon 09:00-09:00 down=1", "same time"),
+                              ("mon 09:00-10:00", "Expected"),
+                              ("mon 09:00-10:00 down=-5", "non-negative")):
+            with self.assertRaises(ValueError) as cm:
+                BandwidthSchedule.parse(text)
+            self.assertIn(message, str(cm.exception))
+
+    def test_from_settings(self):
+        """Test a disabled or missing schedule is None"""
+        slots = [{'days': ['sat'], 'start': '00:00', 'end': '24:00', 'download_rate': 0}]
+        self.assertIsNone(BandwidthSchedule.from_settings(None))
+        self.assertIsNone(BandwidthSchedule.from_settings({'enabled': False, 'slots': slots}))
+        self.assertEqual(len(BandwidthSchedule.from_settings({'enabled': True, 'slots': slots}).slots), 1)
+
+        with self.assertRaises(ValueError):
+            BandwidthSchedule.from_settings({'enabled': True, 'slots': [{'days': ['sat']}]})
+
+
+class TestSchedule(unittest.TestCase):
+    """Test which slot is in effect when"""
+
+    def setUp(self):
+        self.schedule = BandwidthSchedule.parse(
+            "mon-fri 09:00-17:00 down=500 up=100\n"
+            "mon-fri 22:00-06:00 down=0 up=0 downloads=10\n"
+            "daily 00:00-24:00 down=2000\n")
+
+    def test_slots(self):
+        """Test business hours, the night slot across midnight, and the first match winning"""
+        self.assertIs(self.schedule.slot_at(MONDAY_NOON), self.schedule.slots[0])
+        self.assertIs(self.schedule.slot_at(MONDAY_NIGHT), self.schedule.slots[1])
+        self.assertIs(self.schedule.slot_at(TUESDAY_EARLY), self.schedule.slots[1])
+        self.assertIs(self.schedule.slot_at(SATURDAY_NOON), self.schedule.slots[2])
+
+    def test_night_slot_ends_after_last_day(self):
+        """Test a slot starting Friday night runs into Saturday but not Sunday night"""
+        slot = self.schedule.slots[1]
+        self.assertTrue(slot.contains(datetime(2026, 3, 7, 5, 0)))     # Saturday morning
+        self.assertFalse(slot.contains(datetime(2026, 3, 7, 23, 0)))   # Saturday night
+        self.assertFalse(slot.contains(datetime(2026, 3, 2, 5, 0)))    # Monday morning
+
+
+class TestBandwidthScheduler(unittest.TestCase):
+    """Test applying the schedule to a session"""
+
+    def setUp(self):
+        self.schedule = BandwidthSchedule.parse("mon-fri 09:00-17:00 down=500 up=100 downloads=1")
+        self.ses = FakeSession()
+        self.changes = []
+        self.scheduler = BandwidthScheduler(self.ses, BASE, self.schedule,
+                                            on_change=lambda s, slot: self.changes.append(slot))
+
+    def test_only_changes_applied(self):
+        """Test settings are applied when a slot starts and ends, and not in between"""
+        self.assertTrue(self.scheduler.check(MONDAY_NOON))
+        self.assertEqual(self.ses.applied[-1]['download_rate_limit'], 500000)
+        self.assertEqual(self.ses.applied[-1]['active_downloads'], 1)
+        self.assertNotIn('connections_limit', self.ses.applied[-1])
+
+        self.assertFalse(self.scheduler.check(datetime(2026, 3, 2, 13, 0)))
+
+        self.assertTrue(self.scheduler.check(MONDAY_NIGHT))
+        self.assertEqual(self.ses.applied[-1], {'download_rate_limit': 0,
+                                                'upload_rate_limit': 0,
+                                                'active_downloads': 3})
+        self.assertEqual(self.changes, [self.schedule.slots[0], None])
+
+    def test_base_changes_outside_and_inside_slots(self):
+        """Test new manual limits apply outside slots and wait during one"""
+        self.scheduler.check(MONDAY_NIGHT)
+        self.scheduler.clock = lambda: MONDAY_NIGHT
+        self.scheduler.set_base(dict(BASE, download_rate_limit=3000))
+        self.assertEqual(self.ses.applied[-1]['download_rate_limit'], 3000)
+
+        # The caller may have applied its new limits already; the slot's go back on
+        self.scheduler.clock = lambda: MONDAY_NOON
+        self.scheduler.set_base(dict(BASE, download_rate_limit=4000))
+        self.assertEqual(self.ses.applied[-1]['download_rate_limit'], 500000)
+        self.assertEqual(self.scheduler.current['download_rate_limit'], 500000)
+
+    def test_turn_off(self):
+        """Test removing the schedule restores the base settings"""
+        self.scheduler.check(MONDAY_NOON)
+        self.scheduler.clock = lambda: MONDAY_NOON
+        self.scheduler.set_schedule(None)
+
+        self.assertEqual(self.scheduler.current['download_rate_limit'], 0)
+        self.assertIsNone(self.scheduler.slot)
+
+    def test_live_session(self):
+        """Test the scheduled values reach a real session and the thread stops"""
+        ses = make_session()
+        scheduler = BandwidthScheduler(ses, BASE, self.schedule, clock=lambda: MONDAY_NOON)
+        scheduler.start()
+        try:
+            settings = ses.get_settings()
+            self.assertEqual(settings['download_rate_limit'], 500000)
+            self.assertEqual(settings['active_downloads'], 1)
+        finally:
+            scheduler.stop()
+        self.assertFalse(scheduler.thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
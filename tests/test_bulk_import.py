@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk import of torrent files and magnet lists
+"""
+
+import unittest
+import sys
+import os
+import io
+import tempfile
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from bulk_import import BulkImporter, ImportReport, ImportRouter, collect_items, parse_item
+from status_engine import StatusEngine
+from tests.helpers import make_session, make_torrent_data
+
+
+def make_torrent_file(directory, name):
+    """Create a data file and a .torrent for it; returns the .torrent path"""
+    data = make_torrent_data(directory, name + ".bin", size=16 * 1024)
+    torrent_path = os.path.join(directory, name + ".torrent")
+    with open(torrent_path, 'wb') as f:
+        f.write(data)
+    return torrent_path
+
+
+def magnet(i):
+    return f"magnet:?xt=urn:btih:{i:040x}&dn=item{i}"
+
+
+class TestCollectItems(unittest.TestCase):
+    """Test expanding directories, magnet lists and stdin into items"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_directory(self):
+        """Test a directory yields its .torrent files only"""
+        for name in ("b.torrent", "a.torrent", "notes.txt"):
+            open(os.path.join(self.test_dir, name), 'w').close()
+
+        items, errors = collect_items([self.test_dir])
+
+        self.assertEqual([os.path.basename(i['torrent']) for i in items], ["a.torrent", "b.torrent"])
+        self.assertEqual(errors, [])
+
+    def test_magnet_list(self):
+        """Test magnet list files skip blanks and comments and report junk lines"""
+        path = os.path.join(self.test_dir, "magnets.txt")
+        with open(path, 'w') as f:
+            f.write(f"# my list\n{magnet(1)}\n\n  {magnet(2)}  \nnot a magnet\n")
+
+        items, errors = collect_items([path])
+
+        self.assertEqual(items, [{'magnet': magnet(1)}, {'magnet': magnet(2)}])
+        self.assertEqual(errors, [(f"{path}:5", "Not a magnet link")])
+
+    def test_stdin_and_missing_file(self):
+        """Test '-' reads stdin and unreadable sources are reported"""
+        items, errors = collect_items(['-', os.path.join(self.test_dir, "missing.txt")],
+                                      stdin=io.StringIO(magnet(3) + "\n"))
+
+        self.assertEqual(items, [{'magnet': magnet(3)}])
+        self.assertEqual(len(errors), 1)
+
+
+class TestParseItem(unittest.TestCase):
+    """Test validating and parsing single items"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_valid_items(self):
+        """Test magnets and .torrent files parse to their info hash"""
+        info_hash, params = parse_item({'magnet': magnet(7)})
+        self.assertEqual(info_hash, f"{7:040x}")
+
+        path = make_torrent_file(self.test_dir, "t")
+        info_hash, params = parse_item({'torrent': path})
+        self.assertEqual(info_hash, str(lt.torrent_info(path).info_hash()))
+        self.assertIsNotNone(params.ti)
+
+    def test_invalid_items(self):
+        """Test bad input raises ValueError with a reason"""
+        empty = os.path.join(self.test_dir, "empty.torrent")
+        open(empty, 'w').close()
+        garbage = os.path.join(self.test_dir, "garbage.torrent")
+        with open(garbage, 'wb') as f:
+            f.write(b"not bencoded")
+
+        for item in ({'magnet': "magnet:?dn=nohash"}, {'torrent': empty}, {'torrent': garbage},
+                     {'torrent': os.path.join(self.test_dir, "missing.torrent")}):
+            with self.assertRaises(ValueError):
+                parse_item(item)
+
+
+class TestBulkImporter(unittest.TestCase):
+    """Test importing into a live session"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.ses = make_session()
+        self.engine = StatusEngine(self.ses)
+        self.router = ImportRouter()
+        self.engine.subscribe(lt.add_torrent_alert, self.router.on_add_torrent)
+        self.added = []
+
+        # Pump alerts the way the GUI's update loop does
+        self.running = True
+        self.pump = threading.Thread(target=self.pump_alerts, daemon=True)
+        self.pump.start()
+
+    def tearDown(self):
+        self.running = False
+        self.pump.join()
+        shutil.rmtree(self.test_dir)
+
+    def pump_alerts(self):
+        while self.running:
+            self.engine.poll(interval=0.05)
+
+    def run_import(self, items, existing=(), restorer=None):
+        importer = BulkImporter(self.ses, self.test_dir, existing=existing,
+                                on_added=lambda handle, entry: self.added.append(entry),
+                                restorer=restorer)
+        self.router.add(importer)
+        try:
+            return importer.run(items, timeout=30)
+        finally:
+            self.router.remove(importer)
+
+    def test_mixed_import(self):
+        """Test valid items are added and the rest are counted once"""
+        paths = [make_torrent_file(self.test_dir, f"t{i}") for i in range(3)]
+        items = [{'torrent': p} for p in paths] + [{'magnet': magnet(i)} for i in range(1, 6)]
+        items += [{'magnet': magnet(1)}, {'torrent': paths[0]}]       # Duplicates
+        items += [{'magnet': "magnet:?xt=urn:btih:zz"}]               # Invalid
+
+        report = self.run_import(items)
+
+        self.assertEqual(report.total, 11)
+        self.assertEqual(report.added, 8)
+        self.assertEqual(report.duplicates, 2)
+        self.assertEqual(len(report.invalid), 1)
+        self.assertEqual(report.failed, [])
+        self.assertEqual(len(self.ses.get_torrents()), 8)
+        self.assertTrue(all(entry['imported'] for entry in self.added))
+        self.assertEqual(sum(entry['has_metadata'] for entry in self.added), 3)
+
+    def test_existing_torrents_skipped(self):
+        """Test torrents already in the list are not added again"""
+        report = self.run_import([{'magnet': magnet(1)}, {'magnet': magnet(2)}],
+                                 existing={f"{1:040x}"})
+
+        self.assertEqual(report.added, 1)
+        self.assertEqual(report.duplicates, 1)
+
+    def test_pending_restores_skipped(self):
+        """Test saved torrents the restorer has yet to add are not imported"""
+        restorer = SimpleNamespace(unanswered_hashes=lambda: {f"{1:040x}"})
+        report = self.run_import([{'magnet': magnet(1)}, {'magnet': magnet(2)}],
+                                 restorer=restorer)
+
+        self.assertEqual(report.added, 1)
+        self.assertEqual(report.duplicates, 1)
+
+    def test_torrents_in_session_skipped(self):
+        """Test a torrent already in the session but not yet listed is skipped"""
+        params = lt.parse_magnet_uri(magnet(1))
+        params.save_path = self.test_dir
+        self.ses.add_torrent(params)
+
+        report = self.run_import([{'magnet': magnet(1)}])
+
+        self.assertEqual(report.added, 0)
+        self.assertEqual(report.duplicates, 1)
+        self.assertEqual(self.added, [])
+
+    def test_router_stops_after_remove(self):
+        """Test alerts only reach imports that are still registered"""
+        seen = []
+        importer = SimpleNamespace(on_add_torrent=seen.append)
+        self.router.add(importer)
+        self.router.on_add_torrent('alert')
+        self.router.remove(importer)
+        self.router.on_add_torrent('alert')
+
+        self.assertEqual(seen, ['alert'])
+
+    def test_many_magnets_fast(self):
+        """Test thousands of magnets import in seconds"""
+        items = [{'magnet': magnet(i)} for i in range(1, 2001)]
+
+        start = time.monotonic()
+        report = self.run_import(items)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(report.added, 2000)
+        self.assertEqual(len(self.added), 2000)
+        self.assertLess(elapsed, 10)
+
+
+class TestImportReport(unittest.TestCase):
+    """Test the summary text"""
+
+    def test_summary(self):
+        """Test counts and a capped list of problems are shown"""
+        report = ImportReport()
+        report.total = 30
+        report.added = 10
+        report.duplicates = 5
+        report.invalid = [(f"/x/{i}.torrent", "bad") for i in range(15)]
+
+        summary = report.summary(max_errors=3)
+
+        self.assertIn("Imported 10 of 30", summary)
+        self.assertIn("5 already added", summary)
+        self.assertIn("15 invalid", summary)
+        self.assertIn("0.torrent: bad", summary)
+        self.assertIn("and 12 more", summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Tests for the daemon control API
+"""
+
+import unittest
+import sys
+import os
+import stat
+import tempfile
+import shutil
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+from control_api import ControlServer, ControlClient, ControlError, connect, write_control_file
+
+
+MAGNET_HASH = "dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"
+
+
+class FakeEngine:
+    """Record calls the way TorrentEngine would answer them"""
+
+    def __init__(self):
+        self.torrents = {}
+        self.limits = {'download': 0, 'upload': 0}
+        self.profile = 'balanced'
+
+    def session_status(self):
+        return {'torrents': len(self.torrents)}
+
+    def session_stats(self, all_metrics=False):
+        values = {'disk.queued_disk_jobs': 2}
+        if all_metrics:
+            values['utp.num_utp_idle'] = 0
+        return {'timestamp': 1700000000.0, 'values': values}
+
+    def list_torrents(self):
+        return list(self.torrents.values())
+
+    def torrent_status(self, info_hash):
+        return self.torrents[info_hash]
+
+    def add_magnet(self, magnet):
+        if MAGNET_HASH not in magnet:
+            raise ValueError("Invalid magnet link")
+        self.torrents[MAGNET_HASH] = {'info_hash': MAGNET_HASH, 'paused': False}
+        return MAGNET_HASH
+
+    def add_torrent_data(self, data):
+        self.torrents['torrent'] = {'info_hash': 'torrent', 'data': data.decode()}
+        return 'torrent'
+
+    def remove(self, info_hash, delete_files=False):
+        del self.torrents[info_hash]
+        self.deleted_files = delete_files
+
+    def pause(self, info_hash):
+        self.torrents[info_hash]['paused'] = True
+
+    def resume(self, info_hash):
+        self.torrents[info_hash]['paused'] = False
+
+    def stream(self, info_hash, file_index=None):
+        self.torrents[info_hash]['streamed'] = file_index
+        return f"http://127.0.0.1:1/token/{info_hash}"
+
+    def files(self, info_hash):
+        return self.torrents[info_hash].get('files', [])
+
+    def select_files(self, info_hash, include=(), exclude=()):
+        self.torrents[info_hash]['files'] = [{'include': include, 'exclude': exclude}]
+
+    def get_limits(self):
+        return self.limits
+
+    def set_limits(self, download=None, upload=None):
+        if download is not None:
+            self.limits['download'] = download
+        if upload is not None:
+            self.limits['upload'] = upload
+
+    def get_profile(self):
+        return self.profile
+
+    def set_profile(self, name):
+        if name not in ('balanced', 'seedbox'):
+            raise ValueError(f"Unknown profile {name!r}")
+        self.profile = name
+
+
+class TestControlApi(unittest.TestCase):
+    """Test the server routes against a fake engine"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.control_path = os.path.join(self.test_dir, "daemon.json")
+        self.engine = FakeEngine()
+        self.server = ControlServer(self.engine, token='', port=0)
+        self.server.token = write_control_file(self.control_path, self.server.server_address[1])
+        self.server.start()
+        self.client = connect(self.control_path)
+
+    def tearDown(self):
+        self.server.stop()
+        http_client.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_control_file_private(self):
+        """Test the control file is readable by the owner only"""
+        mode = stat.S_IMODE(os.stat(self.control_path).st_mode)
+        self.assertEqual(mode, 0o600)
+        self.assertIsNone(connect(os.path.join(self.test_dir, "missing.json")))
+
+    def test_wrong_token_rejected(self):
+        """Test requests without the right token are refused"""
+        client = ControlClient("wrong", port=self.server.server_address[1])
+        with self.assertRaises(ControlError) as cm:
+            client.list_torrents()
+        self.assertEqual(cm.exception.status, 401)
+
+    def test_add_and_list(self):
+        """Test adding a magnet and a .torrent file"""
+        self.assertEqual(self.client.add_magnet(f"magnet:?xt=urn:btih:{MAGNET_HASH}"), MAGNET_HASH)
+
+        path = os.path.join(self.test_dir, "a.torrent")
+        with open(path, 'wb') as f:
+            f.write(b"d4:infoe")
+        self.assertEqual(self.client.add_torrent_file(path), 'torrent')
+
+        self.assertEqual(self.engine.torrents['torrent']['data'], "d4:infoe")
+        self.assertEqual(len(self.client.list_torrents()), 2)
+        self.assertEqual(self.client.session_status(), {'torrents': 2})
+
+    def test_add_many(self):
+        """Test a batch add answers every item in order in one request"""
+        path = os.path.join(self.test_dir, "a.torrent")
+        with open(path, 'wb') as f:
+            f.write(b"d4:infoe")
+
+        results = self.client.add_many([
+            {'magnet': f"magnet:?xt=urn:btih:{MAGNET_HASH}"},
+            {'magnet': "magnet:?xt=urn:btih:bad"},
+            {'torrent': os.path.join(self.test_dir, "missing.torrent")},
+            {'torrent': path},
+        ])
+
+        self.assertEqual(results[0], {'info_hash': MAGNET_HASH})
+        self.assertIn('error', results[1])
+        self.assertIn('error', results[2])
+        self.assertEqual(results[3], {'info_hash': 'torrent'})
+        self.assertEqual(len(self.engine.torrents), 2)
+
+    def test_add_many_rejects_bad_batch(self):
+        """Test malformed batches and items"""
+        with self.assertRaises(ControlError) as cm:
+            self.client._request('POST', '/torrents', {'items': "not a list"})
+        self.assertEqual(cm.exception.status, 400)
+
+        results = self.client._request('POST', '/torrents', {'items': [42, {}]})['results']
+        self.assertEqual([set(r) for r in results], [{'error'}, {'error'}])
+        self.assertEqual(self.client.add_many([]), [])
+
+    def test_pause_resume_remove(self):
+        """Test per-torrent actions"""
+        self.client.add_magnet(f"magnet:?xt=urn:btih:{MAGNET_HASH}")
+
+        self.client.pause(MAGNET_HASH)
+        self.assertTrue(self.client.torrent_status(MAGNET_HASH)['paused'])
+        self.client.resume(MAGNET_HASH)
+        self.assertFalse(self.client.torrent_status(MAGNET_HASH)['paused'])
+
+        self.client.remove(MAGNET_HASH, delete_files=True)
+        self.assertTrue(self.engine.deleted_files)
+        self.assertEqual(self.client.list_torrents(), [])
+
+    def test_errors(self):
+        """Test unknown torrents give 404 and invalid input 400"""
+        with self.assertRaises(ControlError) as cm:
+            self.client.pause(MAGNET_HASH)
+        self.assertEqual(cm.exception.status, 404)
+
+        with self.assertRaises(ControlError) as cm:
+            self.client.add_magnet("magnet:?xt=urn:btih:bad")
+        self.assertEqual(cm.exception.status, 400)
+
+    def test_stream(self):
+        """Test a stream URL is returned and the file index is checked"""
+        self.client.add_magnet(f"magnet:?xt=urn:btih:{MAGNET_HASH}")
+
+        self.assertEqual(self.client.stream(MAGNET_HASH, 2), f"http://127.0.0.1:1/token/{MAGNET_HASH}")
+        self.assertEqual(self.engine.torrents[MAGNET_HASH]['streamed'], 2)
+
+        with self.assertRaises(ControlError) as cm:
+            self.client.stream(MAGNET_HASH, "movie.mkv")
+        self.assertEqual(cm.exception.status, 400)
+
+    def test_files(self):
+        """Test files are listed, filters passed on, and bad filters refused"""
+        self.client.add_magnet(f"magnet:?xt=urn:btih:{MAGNET_HASH}")
+        self.assertEqual(self.client.files(MAGNET_HASH), [])
+
+        self.assertEqual(self.client.select_files(MAGNET_HASH, include=["*.mkv"]),
+                         [{'include': ["*.mkv"], 'exclude': []}])
+
+        with self.assertRaises(ControlError) as cm:
+            self.client._request('POST', f"/torrents/{MAGNET_HASH}/files", {'include': "*.mkv"})
+        self.assertEqual(cm.exception.status, 400)
+
+    def test_stats(self):
+        """Test the summary is the default and ?all=1 asks for every counter"""
+        self.assertEqual(self.client.session_stats()['values'], {'disk.queued_disk_jobs': 2})
+        self.assertEqual(len(self.client.session_stats(all_metrics=True)['values']), 2)
+
+    def test_limits(self):
+        """Test limits can be read and partially updated"""
+        self.client.set_limits(upload=1000)
+        self.assertEqual(self.client.get_limits(), {'download': 0, 'upload': 1000})
+
+    def test_profile(self):
+        """Test the profile can be read and switched, and unknown names are refused"""
+        self.assertEqual(self.client.get_profile(), 'balanced')
+        self.assertEqual(self.client.set_profile('seedbox'), 'seedbox')
+
+        with self.assertRaises(ControlError) as cm:
+            self.client.set_profile('turbo')
+        self.assertEqual(cm.exception.status, 400)
+        self.assertEqual(self.engine.profile, 'seedbox')
+
+
+if __name__ == '__main__':
+    unittest.main()
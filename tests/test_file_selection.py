@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for choosing which files of a torrent to download
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from file_selection import list_files, matches, priority_name, select_files, selection_summary
+from tests.helpers import make_folder_torrent, make_session
+
+
+FILES = {
+    "Season 1/Episode 1.mkv": 300 * 1024,
+    "Season 1/Episode 2.mkv": 200 * 1024,
+    "Season 1/sample.mkv": 20 * 1024,
+    "Season 2/Episode 1.MKV": 100 * 1024,
+    "info.nfo": 1024,
+}
+
+
+class TestFileSelection(unittest.TestCase):
+    """Test filters and priorities against a multi-file torrent"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.ti = make_folder_torrent(cls.test_dir, "show", FILES)
+        cls.index = {path: index for index, path, _ in list_files(cls.ti)}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def wanted(self, priorities):
+        return sorted(path for path, index in self.index.items() if priorities[index])
+
+    def test_list_files(self):
+        """Test paths use '/' and sizes match"""
+        files = {path: size for _, path, size in list_files(self.ti)}
+        self.assertEqual(files, {f"show/{path}": size for path, size in FILES.items()})
+
+    def test_matches(self):
+        """Test globs match the full path or just the name, ignoring case"""
+        self.assertTrue(matches("show/Season 2/Episode 1.MKV", ["*.mkv"]))
+        self.assertTrue(matches("show/Season 1/Episode 1.mkv", ["*/season 1/*"]))
+        self.assertTrue(matches("show/Season 1/Episode 1.mkv", ["Season 1/*"]))
+        self.assertFalse(matches("show/info.nfo", ["*.mkv", "Season*"]))
+
+    def test_include_and_exclude(self):
+        """Test only included files are wanted and excludes win"""
+        priorities = select_files(self.ti, include=["*.mkv"], exclude=["*sample*"])
+
+        self.assertEqual(self.wanted(priorities), [
+            "show/Season 1/Episode 1.mkv", "show/Season 1/Episode 2.mkv",
+            "show/Season 2/Episode 1.MKV"])
+        self.assertEqual(selection_summary(self.ti, priorities), (3, 5, 600 * 1024, 621 * 1024))
+
+    def test_keeps_existing_priorities(self):
+        """Test files passing the filters keep their priority and skipped ones come back if included"""
+        current = [4] * self.ti.num_files()
+        current[self.index["show/Season 1/Episode 1.mkv"]] = 7
+        current[self.index["show/Season 1/Episode 2.mkv"]] = 0
+
+        priorities = select_files(self.ti, exclude=["*.nfo"], priorities=current)
+        self.assertEqual(priorities[self.index["show/Season 1/Episode 1.mkv"]], 7)
+        self.assertEqual(priorities[self.index["show/Season 1/Episode 2.mkv"]], 0)
+        self.assertEqual(priorities[self.index["show/info.nfo"]], 0)
+
+        priorities = select_files(self.ti, include=["Episode 2.mkv"], priorities=current)
+        self.assertEqual(self.wanted(priorities), ["show/Season 1/Episode 2.mkv"])
+
+    def test_nothing_selected(self):
+        """Test filters that leave nothing raise ValueError"""
+        with self.assertRaises(ValueError):
+            select_files(self.ti, include=["*.iso"])
+        with self.assertRaises(ValueError):
+            select_files(self.ti, exclude=["*"])
+
+    def test_priority_names(self):
+        """Test libtorrent values map to the nearest lower name"""
+        self.assertEqual([priority_name(v) for v in (0, 1, 3, 4, 6, 7)],
+                         ['skip', 'low', 'low', 'normal', 'normal', 'high'])
+
+    def test_selection_saved_in_resume_data(self):
+        """Test skipped files aren't downloaded and the selection survives resume data"""
+        ses = make_session(app_settings=True)
+        params = lt.add_torrent_params()
+        params.ti = lt.torrent_info(self.ti)
+        params.save_path = os.path.join(self.test_dir, "download")
+        params.file_priorities = select_files(self.ti, include=["Season 2/*"])
+        handle = ses.add_torrent(params)
+
+        handle.save_resume_data()
+        deadline = time.monotonic() + 10
+        alert = None
+        while alert is None and time.monotonic() < deadline:
+            alert = next((a for a in ses.pop_alerts() if isinstance(a, lt.save_resume_data_alert)),
+                         None)
+            time.sleep(0.05)
+        self.assertIsNotNone(alert)
+
+        restored = lt.read_resume_data(lt.write_resume_data_buf(alert.params))
+        self.assertEqual(self.wanted(list(restored.file_priorities)), ["show/Season 2/Episode 1.MKV"])
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "download", "show", "Season 1")))
+
+
+if __name__ == '__main__':
+    unittest.main()
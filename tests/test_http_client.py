@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared HTTP client
+"""
+
+import unittest
+import sys
+import os
+import gzip
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Keep-alive handler recording which client connection served each request"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        server.hits[self.path] = server.hits.get(self.path, 0) + 1
+
+        if self.path == '/busy' and server.hits[self.path] == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '3600')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.path == '/flaky' and server.hits[self.path] == 1:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = b'{"ip": "1.2.3.4"}' * 50
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    """Test connection reuse, retries and compression against a local server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.connections = set()
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        http_client.close()
+
+    def tearDown(self):
+        http_client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        """Test sequential requests share one keep-alive connection"""
+        for _ in range(5):
+            response = http_client.get(f"{self.base}/ip", timeout=5)
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_gzip_decoded(self):
+        """Test responses are requested gzipped and handed back decoded"""
+        response = http_client.get(f"{self.base}/ip", timeout=5)
+
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertTrue(response.text.startswith('{"ip": "1.2.3.4"}'))
+
+    def test_retry_on_server_error(self):
+        """Test a 503 is retried and the next response returned"""
+        response = http_client.get(f"{self.base}/flaky", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits['/flaky'], 2)
+
+    def test_retry_after_capped(self):
+        """Test a long Retry-After is cut to MAX_RETRY_AFTER instead of blocking"""
+        start = time.monotonic()
+        response = http_client.get(f"{self.base}/busy", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits['/busy'], 2)
+        self.assertLess(time.monotonic() - start, http_client.MAX_RETRY_AFTER + 3)
+
+    def test_shared_session(self):
+        """Test every caller gets the same session until it is closed"""
+        session = http_client.get_session()
+        self.assertIs(http_client.get_session(), session)
+
+        http_client.close()
+        self.assertIsNot(http_client.get_session(), session)
+
+    def test_threads_share_pool(self):
+        """Test concurrent requests from many threads succeed"""
+        statuses = []
+
+        def fetch():
+            statuses.append(http_client.get(f"{self.base}/ip", timeout=5).status_code)
+
+        threads = [threading.Thread(target=fetch) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [200] * 8)
+        self.assertLessEqual(len(self.server.connections), http_client.POOL_MAXSIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tests for the framed single-instance IPC protocol
+"""
+
+import unittest
+import sys
+import os
+import socket
+import struct
+import tempfile
+import shutil
+import threading
+import time
+import unittest.mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ipc_protocol import (IpcServer, IpcClient, ProtocolError, send_message, recv_message,
+                          make_add_item, validate_add_item)
+
+
+def magnet(i):
+    return f"magnet:?xt=urn:btih:{i:040x}&dn=item{i}"
+
+
+class TestFraming(unittest.TestCase):
+    """Test message framing over a socket pair"""
+
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def test_round_trip(self):
+        """Test several messages on one connection arrive intact and in order"""
+        send_message(self.a, {'id': 1, 'type': 'ping'})
+        send_message(self.a, {'id': 2, 'type': 'add', 'items': []})
+
+        self.assertEqual(recv_message(self.b), {'id': 1, 'type': 'ping'})
+        self.assertEqual(recv_message(self.b)['id'], 2)
+
+    def test_large_message(self):
+        """Test a message far beyond one recv() arrives whole"""
+        items = [{'magnet': magnet(i) + '&tr=' + 'x' * 5000} for i in range(200)]
+        sender = threading.Thread(target=send_message, args=(self.a, {'items': items}))
+        sender.start()
+
+        received = recv_message(self.b)
+        sender.join()
+        self.assertEqual(received['items'], items)
+
+    def test_closed_between_messages(self):
+        """Test a clean close returns None"""
+        self.a.close()
+        self.assertIsNone(recv_message(self.b))
+
+    def test_bad_frames(self):
+        """Test oversized, truncated and non-object frames raise ProtocolError"""
+        self.a.sendall(struct.pack('>I', 1 << 31))
+        with self.assertRaises(ProtocolError):
+            recv_message(self.b)
+
+        self.a.sendall(struct.pack('>I', 2) + b'[]')
+        with self.assertRaises(ProtocolError):
+            recv_message(self.b)
+
+        self.a.sendall(struct.pack('>I', 100) + b'{"id"')
+        self.a.close()
+        with self.assertRaises(ProtocolError):
+            recv_message(self.b)
+
+
+class TestAddItems(unittest.TestCase):
+    """Test building and validating add items"""
+
+    def test_make_add_item(self):
+        """Test magnets pass through and paths become absolute"""
+        self.assertEqual(make_add_item(magnet(1)), {'magnet': magnet(1)})
+        self.assertEqual(make_add_item("a.torrent"), {'torrent': os.path.abspath("a.torrent")})
+
+    def test_validate_add_item(self):
+        """Test invalid items are rejected with a reason"""
+        self.assertIsNone(validate_add_item({'magnet': magnet(1)}))
+        self.assertIsNotNone(validate_add_item({'magnet': "magnet:?dn=x"}))
+        self.assertIsNotNone(validate_add_item({'torrent': "relative.torrent"}))
+        self.assertIsNotNone(validate_add_item({'torrent': "/no/such/file.torrent"}))
+        self.assertIsNotNone(validate_add_item({'other': 1}))
+        self.assertIsNotNone(validate_add_item("magnet"))
+
+
+class TestIpcServer(unittest.TestCase):
+    """Test the server and client over a real Unix socket"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.test_dir, "test.sock")
+        self.batches = []
+        self.server = IpcServer(self.socket_path, {'add': self.on_add,
+                                                   'fail': self.on_fail})
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.test_dir)
+
+    def on_add(self, request):
+        self.batches.append(request['items'])
+        return {'results': [{'status': 'queued' if validate_add_item(item) is None else 'rejected'}
+                            for item in request['items']]}
+
+    def on_fail(self, request):
+        raise RuntimeError("boom")
+
+    def test_batch_in_one_round_trip(self):
+        """Test hundreds of items are delivered in a single request"""
+        items = [{'magnet': magnet(i)} for i in range(500)] + [{'magnet': 'bad'}]
+
+        with IpcClient(self.socket_path) as client:
+            results = client.add(items)
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(len(self.batches[0]), 501)
+        self.assertEqual([r['status'] for r in results], ['queued'] * 500 + ['rejected'])
+
+    def test_ping_and_ids(self):
+        """Test several requests on one connection get matching ids"""
+        with IpcClient(self.socket_path) as client:
+            self.assertEqual(client.request('ping')['type'], 'pong')
+            response = client.request('add', items=[])
+            self.assertEqual(response['id'], 2)
+            self.assertEqual(response['type'], 'result')
+
+    def test_errors(self):
+        """Test unknown types and failing handlers give typed errors"""
+        with IpcClient(self.socket_path) as client:
+            with self.assertRaises(ProtocolError):
+                client.request('nope')
+            with self.assertRaises(ProtocolError):
+                client.request('fail')
+            self.assertEqual(client.request('ping')['type'], 'pong')  # Connection still usable
+
+    def test_concurrent_clients(self):
+        """Test clients are served in parallel, not one after another"""
+        def send(i):
+            with IpcClient(self.socket_path) as client:
+                client.add([{'magnet': magnet(i)}])
+
+        # An idle connection must not hold up the others
+        idle = IpcClient(self.socket_path)
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(20)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        idle.close()
+
+        self.assertEqual(len(self.batches), 20)
+        self.assertLess(time.monotonic() - start, 2.0)
+
+    def test_socket_private_and_removed(self):
+        """Test the socket is owner-only and removed on stop"""
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+        self.server.stop()
+        self.assertFalse(os.path.exists(self.socket_path))
+        with self.assertRaises(OSError):
+            IpcClient(self.socket_path)
+
+    def test_socket_private_from_bind(self):
+        """Test the socket is owner-only as soon as it exists, and the umask is restored"""
+        self.server.stop()
+        modes = []
+        bind = socket.socket.bind
+
+        def checked_bind(sock, address):
+            bind(sock, address)
+            modes.append(os.stat(address).st_mode & 0o777)
+
+        umask = os.umask(0o022)
+        try:
+            with unittest.mock.patch.object(socket.socket, 'bind', checked_bind):
+                self.server.start()
+            self.assertEqual(os.umask(0o022), 0o022)
+        finally:
+            os.umask(umask)
+        self.assertEqual(modes, [0o600])
+
+
+if __name__ == '__main__':
+    unittest.main()
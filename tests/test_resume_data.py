@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Tests for resume data writing and flushing
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from resume_data import (ResumeDataWriter, ResumeFlusher, ResumeCheckpointer,
+                         write_file_atomic, verify_resume_files, encode_resume_data)
+from status_engine import StatusEngine
+from tests.helpers import make_session, make_torrent
+
+
+class TestWriteFileAtomic(unittest.TestCase):
+    """Test atomic file replacement"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_write_bytes_and_text(self):
+        """Test bytes and str are both written"""
+        path = os.path.join(self.test_dir, "data")
+        write_file_atomic(path, b"binary")
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b"binary")
+
+        write_file_atomic(path, "text")
+        with open(path, 'r') as f:
+            self.assertEqual(f.read(), "text")
+
+    def test_no_temp_file_left(self):
+        """Test the temporary file is renamed into place"""
+        path = os.path.join(self.test_dir, "data")
+        write_file_atomic(path, b"x")
+        self.assertEqual(os.listdir(self.test_dir), ["data"])
+
+
+class TestResumeFlusher(unittest.TestCase):
+    """Test flushing resume data for a session"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+        self.resume_dir = os.path.join(self.test_dir, "resume")
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        os.makedirs(self.resume_dir)
+        os.makedirs(self.download_dir)
+
+        self.ses = make_session()
+        self.writer = ResumeDataWriter(self.resume_dir)
+        self.flusher = ResumeFlusher(self.ses, self.writer)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.writer.shutdown()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_flush_magnet(self):
+        """Test resume data for a magnet is written and readable"""
+        info_hash = "dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{info_hash}")
+        params.save_path = self.download_dir
+        handle = self.ses.add_torrent(params)
+
+        result = self.flusher.flush([handle], timeout=5)
+
+        self.assertEqual(result['saved'], 1)
+        self.assertEqual(result['timed_out'], 0)
+
+        resume_file = os.path.join(self.resume_dir, f"{info_hash}.fastresume")
+        with open(resume_file, 'rb') as f:
+            loaded = lt.read_resume_data(f.read())
+        self.assertEqual(str(loaded.info_hash), info_hash)
+
+    def test_flush_many_with_metadata(self):
+        """Test every torrent is answered and metadata is saved"""
+        handles = []
+        for i in range(5):
+            ti = make_torrent(self.download_dir, name=f"file{i}.bin")
+            handles.append(self.ses.add_torrent({'ti': ti, 'save_path': self.download_dir}))
+
+        result = self.flusher.flush(handles, timeout=10)
+
+        self.assertEqual(result['saved'], 5)
+        for handle in handles:
+            info_hash = str(handle.info_hash())
+            self.assertTrue(os.path.exists(os.path.join(self.resume_dir, f"{info_hash}.fastresume")))
+            self.assertTrue(os.path.exists(os.path.join(self.resume_dir, f"{info_hash}.torrent")))
+            self.assertTrue(os.path.exists(os.path.join(self.resume_dir, f"{info_hash}.magnet")))
+
+    def test_flush_nothing(self):
+        """Test flushing no torrents returns immediately"""
+        result = self.flusher.flush([], timeout=5)
+        self.assertEqual(result, {'saved': 0, 'failed': 0, 'timed_out': 0})
+
+    def test_invalid_handle_skipped(self):
+        """Test removed torrents are not waited for"""
+        params = lt.parse_magnet_uri("magnet:?xt=urn:btih:dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c")
+        params.save_path = self.download_dir
+        handle = self.ses.add_torrent(params)
+        self.ses.remove_torrent(handle)
+
+        result = self.flusher.flush([handle], timeout=2)
+        self.assertEqual(result['timed_out'], 0)
+
+
+class TestVerifyResumeFiles(unittest.TestCase):
+    """Test the size/mtime check that replaces a startup hash check"""
+
+    def setUp(self):
+        """Save resume data for a torrent whose file is on disk"""
+        self.test_dir = tempfile.mkdtemp()
+        self.resume_dir = os.path.join(self.test_dir, "resume")
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        os.makedirs(self.resume_dir)
+        os.makedirs(self.download_dir)
+
+        self.ses = make_session()
+        self.writer = ResumeDataWriter(self.resume_dir)
+        self.ti = make_torrent(self.download_dir)
+        handle = self.ses.add_torrent({'ti': self.ti, 'save_path': self.download_dir})
+        ResumeFlusher(self.ses, self.writer).flush([handle], timeout=5)
+
+        resume_file = os.path.join(self.resume_dir, f"{handle.info_hash()}.fastresume")
+        with open(resume_file, 'rb') as f:
+            self.resume_data = f.read()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.writer.shutdown()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_unchanged_files_match(self):
+        """Test untouched files are trusted and the data still loads"""
+        self.assertTrue(verify_resume_files(self.resume_data, self.ti, self.download_dir))
+        lt.read_resume_data(self.resume_data)
+
+    def test_resized_file_detected(self):
+        """Test a file with a different size fails the check"""
+        with open(os.path.join(self.download_dir, "test.txt"), 'ab') as f:
+            f.write(b"extra")
+        self.assertFalse(verify_resume_files(self.resume_data, self.ti, self.download_dir))
+
+    def test_modified_time_detected(self):
+        """Test a file touched since the save fails the check"""
+        path = os.path.join(self.download_dir, "test.txt")
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+        self.assertFalse(verify_resume_files(self.resume_data, self.ti, self.download_dir))
+
+    def test_missing_file_detected(self):
+        """Test a deleted file fails the check"""
+        os.remove(os.path.join(self.download_dir, "test.txt"))
+        self.assertFalse(verify_resume_files(self.resume_data, self.ti, self.download_dir))
+
+    def test_no_stats_recorded(self):
+        """Test resume data without file stats, or none at all, is not trusted"""
+        plain = encode_resume_data(lt.read_resume_data(self.resume_data))
+        self.assertFalse(verify_resume_files(plain, self.ti, self.download_dir))
+        self.assertFalse(verify_resume_files(None, self.ti, self.download_dir))
+        self.assertFalse(verify_resume_files(b"garbage", self.ti, self.download_dir))
+
+
+class TestResumeCheckpointer(unittest.TestCase):
+    """Test periodic checkpointing of changed torrents"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+        self.resume_dir = os.path.join(self.test_dir, "resume")
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        os.makedirs(self.resume_dir)
+        os.makedirs(self.download_dir)
+
+        self.ses = make_session()
+        self.engine = StatusEngine(self.ses)
+        self.writer = ResumeDataWriter(self.resume_dir)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.writer.shutdown()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def make_checkpointer(self, **kwargs):
+        checkpointer = ResumeCheckpointer(self.writer, **kwargs)
+        self.engine.subscribe(lt.save_resume_data_alert, checkpointer.on_resume_data)
+        self.engine.subscribe(lt.save_resume_data_failed_alert, checkpointer.on_resume_failed)
+        return checkpointer
+
+    def add_torrents(self, count):
+        handles = []
+        for i in range(count):
+            ti = make_torrent(self.download_dir, name=f"file{i}.bin")
+            handle = self.ses.add_torrent({'ti': ti, 'save_path': self.download_dir})
+            self.engine.track(handle)
+            handles.append(handle)
+        return handles
+
+    def test_changed_torrent_checkpointed(self):
+        """Test a torrent needing a save gets its resume data written"""
+        checkpointer = self.make_checkpointer(interval=0)
+        handle = self.add_torrents(1)[0]
+
+        for status in self.engine.poll(interval=0.2):
+            checkpointer.note_status(status)
+        checkpointer.tick()
+        self.engine.poll(interval=1.0)
+        self.writer.shutdown()
+
+        info_hash = str(handle.info_hash())
+        self.assertTrue(os.path.exists(os.path.join(self.resume_dir, f"{info_hash}.fastresume")))
+        self.assertEqual(checkpointer.in_flight, set())
+
+    def test_requests_spread_across_ticks(self):
+        """Test a large checkpoint is issued a few requests per tick"""
+        checkpointer = self.make_checkpointer(interval=0, max_requests_per_tick=2)
+        self.add_torrents(5)
+
+        for status in self.engine.poll(interval=0.2):
+            checkpointer.note_status(status)
+        self.assertEqual(len(checkpointer.dirty), 5)
+
+        checkpointer.tick()
+        self.assertEqual(len(checkpointer.queue), 3)
+        checkpointer.tick()
+        self.assertEqual(len(checkpointer.queue), 1)
+
+    def test_forget_drops_requests_and_answers(self):
+        """Test a torrent forgotten mid-checkpoint is never written back"""
+        checkpointer = self.make_checkpointer(interval=0, max_requests_per_tick=1)
+        handles = self.add_torrents(3)
+        hashes = [str(h.info_hash()) for h in handles]
+
+        for status in self.engine.poll(interval=0.2):
+            checkpointer.note_status(status)
+        checkpointer.tick()   # One request in flight, two queued
+        in_flight = next(h for h in hashes if h in checkpointer.in_flight
+                         and h not in [q for q, _ in checkpointer.queue])
+        queued = checkpointer.queue[0][0]
+
+        for info_hash in (in_flight, queued):
+            checkpointer.forget(info_hash, handles[hashes.index(info_hash)])
+        for _ in range(3):
+            checkpointer.tick()
+            self.engine.poll(interval=0.5)
+        self.writer.shutdown()
+
+        kept = next(h for h in hashes if h not in (in_flight, queued))
+        self.assertEqual({name.split('.')[0] for name in os.listdir(self.resume_dir)}, {kept})
+        self.assertEqual(checkpointer.in_flight, set())
+
+        # Still in the session (e.g. cleared from the list): not marked dirty again,
+        # unless it was added again and has a new handle
+        handle = handles[hashes.index(queued)]
+        checkpointer.note_status(SimpleNamespace(need_save_resume=True, info_hash=queued,
+                                                 handle=handle))
+        self.assertNotIn(queued, checkpointer.dirty)
+        checkpointer.note_status(SimpleNamespace(need_save_resume=True, info_hash=queued,
+                                                 handle=handles[hashes.index(kept)]))
+        self.assertIn(queued, checkpointer.dirty)
+
+    def test_nothing_before_interval(self):
+        """Test no requests are made until the checkpoint is due"""
+        checkpointer = self.make_checkpointer(interval=3600)
+        self.add_torrents(1)
+
+        for status in self.engine.poll(interval=0.2):
+            checkpointer.note_status(status)
+        checkpointer.tick()
+
+        self.assertEqual(len(checkpointer.queue), 0)
+        self.assertEqual(checkpointer.in_flight, set())
+        self.assertEqual(os.listdir(self.resume_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
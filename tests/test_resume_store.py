@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Tests for the resume data stores
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from resume_store import (FileResumeStore, SQLiteResumeStore, migrate_file_store,
+                          open_resume_store, find_resume_store)
+from resume_data import ResumeDataWriter, ResumeFlusher
+from tests.helpers import make_session, make_torrent
+
+
+HASH_A = "dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"
+HASH_B = "a2b1c3d4e5f60718293a4b5c6d7e8f9012345678"
+
+
+class StoreTests:
+    """Behaviour shared by every store; mixed into a TestCase per backend"""
+
+    def test_put_and_get(self):
+        """Test a stored record reads back unchanged"""
+        self.store.put(HASH_A, resume=b"resume", torrent=b"torrent", magnet="magnet:?x")
+        self.assertEqual(self.store.get(HASH_A),
+                         {'resume': b"resume", 'torrent': b"torrent", 'magnet': "magnet:?x"})
+        self.assertIsNone(self.store.get(HASH_B))
+
+    def test_partial_update_keeps_fields(self):
+        """Test fields left as None keep their stored value"""
+        self.store.put(HASH_A, resume=b"old", torrent=b"torrent")
+        self.store.put(HASH_A, resume=b"new")
+
+        record = self.store.get(HASH_A)
+        self.assertEqual(record['resume'], b"new")
+        self.assertEqual(record['torrent'], b"torrent")
+        self.assertTrue(self.store.has_metadata(HASH_A))
+
+    def test_load_all(self):
+        """Test every record is returned by one load"""
+        self.store.put_many([
+            (HASH_A, {'resume': b"a"}),
+            (HASH_B, {'magnet': "magnet:?b"}),
+        ])
+
+        records = self.store.load_all()
+        self.assertEqual(set(records), {HASH_A, HASH_B})
+        self.assertEqual(records[HASH_A]['resume'], b"a")
+        self.assertIsNone(records[HASH_A]['torrent'])
+        self.assertEqual(records[HASH_B]['magnet'], "magnet:?b")
+
+    def test_delete(self):
+        """Test deleting single fields and whole records"""
+        self.store.put(HASH_A, resume=b"a", torrent=b"t")
+        self.store.delete(HASH_A, fields=('resume',))
+        self.assertEqual(self.store.get(HASH_A)['resume'], None)
+        self.assertEqual(self.store.get(HASH_A)['torrent'], b"t")
+
+        self.store.delete(HASH_A)
+        self.assertIsNone(self.store.get(HASH_A))
+        self.assertEqual(self.store.load_all(), {})
+
+
+class TestFileResumeStore(StoreTests, unittest.TestCase):
+    """Test the per-hash file layout"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = FileResumeStore(os.path.join(self.test_dir, "resume"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_original_layout(self):
+        """Test records are written as the original three files"""
+        self.store.put(HASH_A, resume=b"a", torrent=b"t", magnet="m")
+        self.assertEqual(sorted(os.listdir(self.store.resume_dir)),
+                         [f"{HASH_A}.fastresume", f"{HASH_A}.magnet", f"{HASH_A}.torrent"])
+
+
+class TestSQLiteResumeStore(StoreTests, unittest.TestCase):
+    """Test the single-database store"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_wal_mode(self):
+        """Test the database uses write-ahead logging"""
+        mode = self.store.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_batch_is_one_transaction(self):
+        """Test a failing batch leaves no partial writes behind"""
+        with self.assertRaises(Exception):
+            self.store.put_many([
+                (HASH_A, {'resume': b"a"}),
+                (HASH_B, {'resume': object()}),  # Can't be stored
+            ])
+        self.assertEqual(self.store.load_all(), {})
+
+
+class TestMigration(unittest.TestCase):
+    """Test moving the file layout into SQLite"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.resume_dir = os.path.join(self.test_dir, "resume")
+        files = FileResumeStore(self.resume_dir)
+        files.put(HASH_A, resume=b"resume-a", torrent=b"torrent-a", magnet="magnet:?a")
+        files.put(HASH_B, magnet="magnet:?b")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_open_migrates_files(self):
+        """Test opening the SQLite store imports and sets aside the old files"""
+        store = open_resume_store(self.resume_dir, 'sqlite')
+        try:
+            records = store.load_all()
+            self.assertEqual(records[HASH_A]['torrent'], b"torrent-a")
+            self.assertEqual(records[HASH_B]['magnet'], "magnet:?b")
+        finally:
+            store.close()
+
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "resume.db")))
+        self.assertEqual(os.listdir(self.resume_dir), ["migrated"])
+        self.assertEqual(len(os.listdir(os.path.join(self.resume_dir, "migrated"))), 4)
+
+    def test_migrate_is_idempotent(self):
+        """Test a second migration finds nothing left to move"""
+        store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+        try:
+            self.assertEqual(migrate_file_store(self.resume_dir, store), 2)
+            self.assertEqual(migrate_file_store(self.resume_dir, store), 0)
+        finally:
+            store.close()
+
+    def test_find_prefers_database(self):
+        """Test the diagnostic lookup picks the database once it exists"""
+        self.assertIsInstance(find_resume_store(self.resume_dir), FileResumeStore)
+        open_resume_store(self.resume_dir, 'sqlite').close()
+
+        store = find_resume_store(self.resume_dir)
+        self.assertIsInstance(store, SQLiteResumeStore)
+        store.close()
+
+
+class TestWriterWithSQLite(unittest.TestCase):
+    """Test resume data flushed from a session into the database"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        os.makedirs(self.download_dir)
+        self.store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+        self.ses = make_session()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_flush_into_database(self):
+        """Test every torrent's resume data and metadata end up in the database"""
+        handles = []
+        for i in range(5):
+            ti = make_torrent(self.download_dir, name=f"file{i}.bin")
+            handles.append(self.ses.add_torrent({'ti': ti, 'save_path': self.download_dir}))
+
+        writer = ResumeDataWriter(self.store)
+        result = ResumeFlusher(self.ses, writer).flush(handles, timeout=10)
+        writer.shutdown()
+
+        self.assertEqual(result['saved'], 5)
+        records = self.store.load_all()
+        for handle in handles:
+            record = records[str(handle.info_hash())]
+            self.assertEqual(str(lt.read_resume_data(record['resume']).info_hash),
+                             str(handle.info_hash()))
+            self.assertEqual(lt.torrent_info(record['torrent']).info_hash(), handle.info_hash())
+            self.assertTrue(record['magnet'].startswith("magnet:?"))
+
+
+if __name__ == '__main__':
+    unittest.main()
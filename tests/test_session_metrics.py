@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for sampling and exporting libtorrent session counters
+"""
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+import shutil
+import urllib.error
+import urllib.request
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from session_metrics import (SUMMARY, MetricsServer, SessionMetrics, format_prometheus,
+                             metric_types, prometheus_name)
+from status_engine import StatusEngine
+from tests.helpers import make_session
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPrometheusFormat(unittest.TestCase):
+    """Test metric names and the exposition format"""
+
+    def test_names(self):
+        """Test dots become underscores and counters get _total"""
+        self.assertEqual(prometheus_name('disk.num_read_ops', 'counter'),
+                         'libtorrent_disk_num_read_ops_total')
+        self.assertEqual(prometheus_name('disk.queued_disk_jobs', 'gauge'),
+                         'libtorrent_disk_queued_disk_jobs')
+
+    def test_format(self):
+        """Test each metric gets HELP, TYPE and a sample line"""
+        text = format_prometheus({'peer.error_peers': 3, 'disk.queued_disk_jobs': 0},
+                                 {'peer.error_peers': 'counter', 'disk.queued_disk_jobs': 'gauge'})
+        self.assertEqual(text.splitlines(), [
+            "# HELP libtorrent_disk_queued_disk_jobs libtorrent session gauge disk.queued_disk_jobs",
+            "# TYPE libtorrent_disk_queued_disk_jobs gauge",
+            "libtorrent_disk_queued_disk_jobs 0",
+            "# HELP libtorrent_peer_error_peers_total libtorrent session counter peer.error_peers",
+            "# TYPE libtorrent_peer_error_peers_total counter",
+            "libtorrent_peer_error_peers_total 3",
+        ])
+
+    def test_summary_names_exist(self):
+        """Test every summary metric is one libtorrent reports"""
+        types = metric_types()
+        self.assertEqual([name for name in SUMMARY if name not in types], [])
+        self.assertEqual(types['disk.queued_disk_jobs'], 'gauge')
+        self.assertEqual(types['peer.error_peers'], 'counter')
+
+
+class TestSessionMetrics(unittest.TestCase):
+    """Test sampling a real session"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.test_dir, "metrics.jsonl")
+        self.ses = make_session(app_settings=True)
+        self.engine = StatusEngine(self.ses)
+        self.clock = FakeClock()
+        self.metrics = SessionMetrics(self.ses, interval=5, log_path=self.log_path,
+                                      clock=self.clock)
+        self.engine.subscribe(lt.session_stats_alert, self.metrics.on_session_stats)
+
+    def tearDown(self):
+        self.metrics.close()
+        shutil.rmtree(self.test_dir)
+
+    def sample(self):
+        """Tick and poll until a sample arrives"""
+        before = self.metrics.latest()[0]
+        self.metrics.tick()
+        for _ in range(20):
+            self.engine.poll(interval=0.1)
+            if self.metrics.latest()[0] != before:
+                return True
+        return False
+
+    def test_samples_at_interval(self):
+        """Test a sample is requested once per interval"""
+        self.assertEqual(self.metrics.latest(), (None, {}))
+        self.assertTrue(self.sample())
+        timestamp, values = self.metrics.latest()
+        self.assertIn('disk.queued_disk_jobs', values)
+        self.assertEqual(set(self.metrics.summary()), set(SUMMARY))
+
+        # Not due yet: nothing is requested
+        self.assertFalse(self.sample())
+        self.clock.now = 5
+        self.assertTrue(self.sample())
+
+    def test_jsonl_log(self):
+        """Test every sample is appended as one JSON line without zero values"""
+        self.sample()
+        self.clock.now = 5
+        self.sample()
+        self.metrics.close()
+
+        with open(self.log_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 2)
+        self.assertLessEqual(records[0]['timestamp'], records[1]['timestamp'])
+        self.assertNotIn(0, records[1]['values'].values())
+
+    def test_prometheus_endpoint(self):
+        """Test /metrics serves the latest sample and other paths 404"""
+        self.sample()
+        server = MetricsServer(self.metrics, port=0)
+        server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(url + "/metrics", timeout=10) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith("text/plain"))
+                text = response.read().decode()
+            self.assertIn("# TYPE libtorrent_peer_error_peers_total counter", text)
+            self.assertIn("\nlibtorrent_disk_queued_disk_jobs 0\n", text)
+            self.assertIn("libtorrent_stats_timestamp_seconds ", text)
+
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen(url + "/", timeout=10)
+            self.assertEqual(cm.exception.code, 404)
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
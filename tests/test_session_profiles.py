@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for session performance profiles
+"""
+
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from session_profiles import (PROFILES, PROFILE_DESCRIPTIONS, DEFAULT_PROFILE, BALANCED,
+                              profile_settings, validate_settings)
+from torrent_engine import build_session_settings
+from tests.helpers import make_session
+
+
+class TestProfiles(unittest.TestCase):
+    """Test the profile tables"""
+
+    def test_profiles_are_complete(self):
+        """Test every profile sets the same keys, all known to libtorrent"""
+        for name in PROFILES:
+            settings = profile_settings(name)
+            self.assertEqual(set(settings), set(BALANCED), name)
+            self.assertEqual(validate_settings(settings)[1], [], name)
+            self.assertIn(name, PROFILE_DESCRIPTIONS)
+
+        self.assertEqual(set(PROFILES[DEFAULT_PROFILE]), set())
+
+    def test_balanced_keeps_defaults(self):
+        """Test balanced only differs from libtorrent where the app always did"""
+        defaults = lt.default_settings()
+        changed = {key for key, value in BALANCED.items() if defaults[key] != value}
+        self.assertEqual(changed, {'max_peerlist_size', 'active_limit',
+                                   'seed_choking_algorithm', 'choking_algorithm'})
+
+    def test_unknown_profile(self):
+        """Test an unknown profile name is refused"""
+        with self.assertRaises(ValueError):
+            profile_settings('turbo')
+        with self.assertRaises(ValueError):
+            build_session_settings(profile='turbo')
+
+    def test_overrides(self):
+        """Test overrides apply on top and bad ones are skipped"""
+        settings = profile_settings('low_memory', {
+            'aio_threads': 1,
+            'no_such_setting': 5,
+            'connections_limit': "many",
+        })
+
+        self.assertEqual(settings['aio_threads'], 1)
+        self.assertEqual(settings['connections_limit'], PROFILES['low_memory']['connections_limit'])
+        self.assertNotIn('no_such_setting', settings)
+
+    def test_validate_settings(self):
+        """Test unknown names and wrong types are rejected, bools allowed as ints"""
+        valid, rejected = validate_settings({
+            'enable_dht': True,
+            'active_limit': 4,
+            'active_seeds': True,
+            'cache_sizes': 1,
+            'listen_interfaces': 6881,
+        })
+
+        self.assertEqual(valid, {'enable_dht': True, 'active_limit': 4, 'active_seeds': True})
+        self.assertEqual(len(rejected), 2)
+
+    def test_build_session_settings_layers(self):
+        """Test session options and limits are layered over the profile"""
+        settings = build_session_settings(download_rate=1000, dht=False, profile='seedbox',
+                                          profile_overrides={'active_limit': 7})
+
+        self.assertEqual(settings['active_limit'], 7)
+        self.assertEqual(settings['aio_threads'], PROFILES['seedbox']['aio_threads'])
+        self.assertEqual(settings['download_rate_limit'], 1000)
+        self.assertFalse(settings['enable_dht'])
+
+
+class TestProfilesWithSession(unittest.TestCase):
+    """Test profiles against a live session"""
+
+    def test_switch_at_runtime(self):
+        """Test switching profiles with apply_settings replaces every value"""
+        ses = make_session(profile_settings('seedbox'))
+
+        for name in ('low_memory', 'metered', 'balanced'):
+            ses.apply_settings(profile_settings(name))
+            current = ses.get_settings()
+            for key, value in profile_settings(name).items():
+                self.assertEqual(current[key], value, f"{name}: {key}")
+
+
+if __name__ == '__main__':
+    unittest.main()
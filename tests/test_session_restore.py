@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Tests for background session restore
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from resume_data import ResumeDataWriter, ResumeFlusher, verify_resume_files
+from resume_store import SQLiteResumeStore
+from session_restore import SessionRestorer, apply_save_path, build_restore_params
+from status_engine import StatusEngine
+from tests.helpers import make_session, make_torrent
+
+
+MAGNET_HASH = "dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"
+
+
+class TestSessionRestorer(unittest.TestCase):
+    """Test restoring a saved session into a fresh one"""
+
+    def setUp(self):
+        """Save three torrents with metadata and one bare magnet"""
+        self.test_dir = tempfile.mkdtemp()
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        os.makedirs(self.download_dir)
+        self.store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+
+        ses = make_session()
+        handles = []
+        for i in range(3):
+            ti = make_torrent(self.download_dir, name=f"file{i}.bin")
+            handles.append(ses.add_torrent({'ti': ti, 'save_path': self.download_dir}))
+        writer = ResumeDataWriter(self.store)
+        ResumeFlusher(ses, writer).flush(handles, timeout=10)
+        writer.shutdown()
+        self.saved_hashes = {str(h.info_hash()) for h in handles}
+
+        self.store.put(MAGNET_HASH, magnet=f"magnet:?xt=urn:btih:{MAGNET_HASH}&dn=magnet-only")
+
+        self.ses = make_session()
+        self.engine = StatusEngine(self.ses)
+        self.added = []
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.store.close()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def restore(self, **kwargs):
+        restorer = SessionRestorer(self.ses, self.store, self.download_dir,
+                                   on_added=lambda handle, entry: self.added.append(entry),
+                                   **kwargs)
+        self.engine.subscribe(lt.add_torrent_alert, restorer.on_add_torrent)
+        restorer.start()
+
+        deadline = time.monotonic() + 10
+        while not restorer.is_finished() and time.monotonic() < deadline:
+            self.engine.poll(interval=0.1)
+        restorer.shutdown()
+        return restorer
+
+    def test_all_torrents_restored(self):
+        """Test every stored record is added to the session"""
+        restorer = self.restore()
+
+        self.assertEqual(restorer.restored, 4)
+        self.assertEqual(restorer.failed, 0)
+        self.assertEqual({entry['info_hash'] for entry in self.added},
+                         self.saved_hashes | {MAGNET_HASH})
+        self.assertEqual(len(self.ses.get_torrents()), 4)
+
+    def test_entries_describe_torrents(self):
+        """Test entries carry the name and size for the new rows"""
+        self.restore()
+
+        entries = {entry['info_hash']: entry for entry in self.added}
+        magnet = entries.pop(MAGNET_HASH)
+        self.assertEqual(magnet['name'], 'magnet-only')
+        self.assertFalse(magnet['has_metadata'])
+        for entry in entries.values():
+            self.assertTrue(entry['has_metadata'])
+            self.assertEqual(entry['size'], 64 * 1024)
+            self.assertIsNone(entry['torrent_settings'])
+
+    def test_recheck_decision(self):
+        """Test only torrents with metadata are offered for a recheck"""
+        asked = []
+
+        def needs_recheck(resume_data, ti, save_path):
+            asked.append(str(ti.info_hash()))
+            return True
+
+        self.restore(needs_recheck=needs_recheck)
+
+        self.assertEqual(set(asked), self.saved_hashes)
+        rechecked = {e['info_hash'] for e in self.added if e['recheck']}
+        self.assertEqual(rechecked, self.saved_hashes)
+
+    def test_bad_record_counted_as_failed(self):
+        """Test an unreadable record doesn't stall the restore"""
+        self.store.put("ab" * 20, torrent=b"not a torrent")
+        restorer = self.restore()
+
+        self.assertTrue(restorer.is_finished())
+        self.assertEqual(restorer.restored, 4)
+        self.assertEqual(restorer.failed, 1)
+
+    def test_unanswered_hashes(self):
+        """Test records count as unanswered until their add is answered"""
+        restorer = SessionRestorer(self.ses, self.store, self.download_dir,
+                                   on_added=lambda handle, entry: self.added.append(entry))
+        self.engine.subscribe(lt.add_torrent_alert, restorer.on_add_torrent)
+        restorer.start()
+
+        # Nothing dispatched yet: every record is still waiting
+        self.assertEqual(restorer.unanswered_hashes(timeout=10),
+                         self.saved_hashes | {MAGNET_HASH})
+
+        deadline = time.monotonic() + 10
+        while not restorer.is_finished() and time.monotonic() < deadline:
+            self.engine.poll(interval=0.1)
+        restorer.shutdown()
+        self.assertEqual(restorer.unanswered_hashes(), set())
+
+    def test_other_adds_ignored(self):
+        """Test torrents added outside the restore don't reach the callback"""
+        restorer = SessionRestorer(self.ses, self.store, self.download_dir,
+                                   on_added=lambda handle, entry: self.added.append(entry))
+        self.engine.subscribe(lt.add_torrent_alert, restorer.on_add_torrent)
+
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{'cd' * 20}")
+        params.save_path = self.download_dir
+        self.ses.add_torrent(params)
+        self.engine.poll(interval=0.3)
+
+        self.assertEqual(self.added, [])
+        restorer.shutdown()
+
+
+class TestRestoreAfterMove(unittest.TestCase):
+    """Test a torrent moved with move_storage() is restored from its new place"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        self.moved_dir = os.path.join(self.test_dir, "moved")
+        os.makedirs(self.download_dir)
+        os.makedirs(self.moved_dir)
+        self.store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_move_save_restore(self):
+        """Test the moved directory wins over the download path and is the one checked"""
+        ses = make_session()
+        ti = make_torrent(self.download_dir, name="moved.bin")
+        handle = ses.add_torrent({'ti': ti, 'save_path': self.download_dir})
+        info_hash = str(handle.info_hash())
+
+        # Wait for the check to find the file complete, then move it
+        deadline = time.monotonic() + 10
+        while not handle.status().is_seeding and time.monotonic() < deadline:
+            time.sleep(0.05)
+        handle.move_storage(self.moved_dir)
+        while handle.status().save_path != self.moved_dir and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(os.path.exists(os.path.join(self.moved_dir, "moved.bin")))
+
+        writer = ResumeDataWriter(self.store)
+        ResumeFlusher(ses, writer).flush([handle], timeout=10)
+        writer.shutdown()
+        self.store.put(info_hash, torrent=lt.bencode(lt.create_torrent(ti).generate()))
+        del ses
+
+        # Restore into a fresh session with the old download directory
+        checked = []
+
+        def needs_recheck(resume_data, ti, save_path):
+            checked.append(save_path)
+            return not verify_resume_files(resume_data, ti, save_path)
+
+        new_ses = make_session()
+        engine = StatusEngine(new_ses)
+        added = []
+        restorer = SessionRestorer(new_ses, self.store, self.download_dir,
+                                   on_added=lambda handle, entry: added.append((handle, entry)),
+                                   needs_recheck=needs_recheck)
+        engine.subscribe(lt.add_torrent_alert, restorer.on_add_torrent)
+        restorer.start()
+        deadline = time.monotonic() + 10
+        while not restorer.is_finished() and time.monotonic() < deadline:
+            engine.poll(interval=0.1)
+        restorer.shutdown()
+
+        self.assertEqual(checked, [self.moved_dir])
+        restored, entry = added[0]
+        self.assertFalse(entry['recheck'])
+        self.assertEqual(restored.status().save_path, self.moved_dir)
+
+
+class TestBuildRestoreParams(unittest.TestCase):
+    """Test turning store records into add_torrent_params"""
+
+    def test_hash_only_record(self):
+        """Test a record without metadata still names the torrent"""
+        record = {'resume': None, 'torrent': None, 'magnet': None}
+        params, resume_data = build_restore_params(MAGNET_HASH, record, "/tmp")
+
+        self.assertEqual(str(params.info_hash), MAGNET_HASH)
+        self.assertIsNone(resume_data)
+
+    def test_truncated_resume_ignored(self):
+        """Test resume data too short to be valid is dropped"""
+        record = {'resume': b"d1:ai1ee", 'torrent': None,
+                  'magnet': f"magnet:?xt=urn:btih:{MAGNET_HASH}"}
+        params, resume_data = build_restore_params(MAGNET_HASH, record, "/tmp")
+
+        self.assertIsNone(resume_data)
+        self.assertEqual(params.save_path, "/tmp")
+
+    def test_resume_save_path_kept(self):
+        """Test the directory recorded in resume data is not replaced"""
+        params = lt.add_torrent_params()
+        self.assertEqual(apply_save_path(params, "/downloads"), "/downloads")
+
+        params.save_path = "/moved"
+        self.assertEqual(apply_save_path(params, "/downloads"), "/moved")
+        self.assertEqual(params.save_path, "/moved")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the alert-driven status engine
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from status_engine import StatusEngine, alert_waiter
+from tests.helpers import make_session
+
+
+class TestStatusEngine(unittest.TestCase):
+    """Test status caching and alert dispatch"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+        self.ses = make_session()
+        self.engine = StatusEngine(self.ses)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def add_magnet(self, info_hash="dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"):
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{info_hash}")
+        params.save_path = self.test_dir
+        return self.ses.add_torrent(params)
+
+    def test_tracked_torrent_reported(self):
+        """Test a tracked torrent is reported on the next poll"""
+        handle = self.add_magnet()
+        self.engine.track(handle)
+
+        changed = self.engine.poll(interval=0.2)
+
+        hashes = [str(s.info_hash) for s in changed]
+        self.assertIn("dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c", hashes)
+        self.assertIsNotNone(self.engine.get("dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"))
+
+    def test_alerts_dispatched(self):
+        """Test non-status alerts reach subscribers"""
+        received = []
+        self.engine.subscribe(lt.add_torrent_alert, received.append)
+
+        self.add_magnet()
+        self.engine.poll(interval=0.5)
+
+        self.assertEqual(len(received), 1)
+
+    def test_failing_handler_does_not_stop_poll(self):
+        """Test an exception in a subscriber is contained"""
+        def broken(alert):
+            raise ValueError("broken handler")
+
+        self.engine.subscribe(lt.add_torrent_alert, broken)
+        self.add_magnet()
+
+        # Should not raise
+        self.engine.poll(interval=0.2)
+
+    def test_forget_removes_status(self):
+        """Test forgotten torrents are dropped from the cache"""
+        info_hash = "dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"
+        handle = self.add_magnet(info_hash)
+        self.engine.track(handle)
+        self.engine.poll(interval=0.2)
+
+        self.ses.remove_torrent(handle)
+        self.engine.forget(info_hash)
+        changed = self.engine.poll(interval=0.2)
+
+        self.assertIsNone(self.engine.get(info_hash))
+        self.assertNotIn(info_hash, [str(s.info_hash) for s in changed])
+        self.assertEqual(self.engine.download_rate, 0)
+        self.assertEqual(self.engine.upload_rate, 0)
+        self.assertEqual(self.engine.num_peers, 0)
+
+    def test_alerts_during_bulk_add(self):
+        """Test polling while thousands of adds flood the alert queue"""
+        added = []
+        self.engine.subscribe(lt.add_torrent_alert, lambda alert: added.append(alert.handle))
+        for i in range(1, 3001):
+            params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{i:040x}")
+            params.save_path = self.test_dir
+            self.ses.async_add_torrent(params)
+            if i % 500 == 0:
+                self.engine.poll(interval=0.01)
+
+        for _ in range(50):
+            if len(added) == 3000:
+                break
+            self.engine.poll(interval=0.1)
+
+        self.assertEqual(len(added), 3000)
+
+    def test_alert_waiter_shared(self):
+        """Test one waiter per session, woken by new alerts"""
+        waiter = alert_waiter(self.ses)
+        self.assertIs(waiter, self.engine.waiter)
+
+        self.engine.poll(interval=0.2)
+        self.add_magnet()
+        self.assertTrue(waiter.wait(2.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
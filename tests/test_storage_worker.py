@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for background deletion and moving of downloaded files
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from status_engine import StatusEngine
+from storage_worker import StorageWorker, StorageJob
+from tests.helpers import make_folder_torrent, make_session
+
+
+class TestStorageWorker(unittest.TestCase):
+    """Test deletes and moves against a live session"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.ses = make_session(app_settings=True)
+        self.engine = StatusEngine(self.ses)
+        self.progress = []
+        self.worker = StorageWorker(self.ses, on_progress=lambda job: self.progress.append(job.done))
+        self.engine.subscribe(lt.torrent_deleted_alert, self.worker.on_deleted)
+        self.engine.subscribe(lt.torrent_delete_failed_alert, self.worker.on_delete_failed)
+        self.engine.subscribe(lt.storage_moved_alert, self.worker.on_moved)
+        self.engine.subscribe(lt.storage_moved_failed_alert, self.worker.on_move_failed)
+
+        # Pump alerts the way the GUI's update loop does
+        self.running = True
+        self.pump = threading.Thread(target=self.pump_alerts, daemon=True)
+        self.pump.start()
+
+    def tearDown(self):
+        self.running = False
+        self.pump.join()
+        shutil.rmtree(self.test_dir)
+
+    def pump_alerts(self):
+        while self.running:
+            self.engine.poll(interval=0.05)
+
+    def add_seed(self, name):
+        """Add a torrent whose files are complete on disk; returns (handle, info_hash)"""
+        params = lt.add_torrent_params()
+        params.ti = make_folder_torrent(self.test_dir, name,
+                                        {f"part{i}.bin": 32 * 1024 for i in range(2)})
+        params.save_path = self.test_dir
+        handle = self.ses.add_torrent(params)
+
+        deadline = time.monotonic() + 10
+        while not handle.status().is_seeding and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return handle, str(handle.info_hash())
+
+    def test_delete_in_background(self):
+        """Test files are deleted, unrelated files kept, and progress reported"""
+        torrents = [self.add_seed(f"t{i}") for i in range(3)]
+        with open(os.path.join(self.test_dir, "t0", "notes.txt"), 'w') as f:
+            f.write("not part of the torrent")
+
+        job = self.worker.delete([(h, ih, f"t{i}") for i, (h, ih) in enumerate(torrents)])
+
+        self.assertTrue(job.wait(10))
+        self.assertEqual(job.done, 3)
+        self.assertEqual(job.errors, [])
+        self.assertEqual(sorted(self.progress), [1, 2, 3])
+        self.assertEqual(self.ses.get_torrents(), [])
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, "t0")), ["notes.txt"])
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "t1")))
+
+    def test_delete_magnet_without_files(self):
+        """Test a torrent with no metadata yet completes without an error"""
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{1:040x}")
+        params.save_path = self.test_dir
+        handle = self.ses.add_torrent(params)
+
+        job = self.worker.delete([(handle, f"{1:040x}", "magnet")])
+
+        self.assertTrue(job.wait(10))
+        self.assertEqual(job.errors, [])
+
+    def test_move(self):
+        """Test files move to the destination and the torrent keeps seeding"""
+        handle, info_hash = self.add_seed("moved")
+        destination = os.path.join(self.test_dir, "elsewhere")
+        os.makedirs(destination)
+
+        job = self.worker.move([(handle, info_hash, "moved")], destination)
+
+        self.assertTrue(job.wait(10))
+        self.assertEqual(job.errors, [])
+        self.assertEqual(sorted(os.listdir(os.path.join(destination, "moved"))),
+                         ["part0.bin", "part1.bin"])
+        self.assertEqual(handle.status().save_path, destination)
+
+    def test_move_failure_reported(self):
+        """Test a move that libtorrent can't do ends up in the job errors"""
+        handle, info_hash = self.add_seed("stuck")
+        blocker = os.path.join(self.test_dir, "file")
+        open(blocker, 'w').close()
+
+        job = self.worker.move([(handle, info_hash, "stuck")], os.path.join(blocker, "sub"))
+
+        self.assertTrue(job.wait(10))
+        self.assertEqual(len(job.errors), 1)
+        self.assertEqual(job.errors[0][0], "stuck")
+        self.assertIn("stuck", job.summary())
+
+    def test_empty_job(self):
+        """Test an empty batch is finished right away"""
+        self.assertTrue(self.worker.delete([]).finished.is_set())
+
+
+class TestStorageJob(unittest.TestCase):
+    """Test the summary text"""
+
+    def test_summary(self):
+        """Test counts and a capped list of failures are shown"""
+        job = StorageJob('delete', 20)
+        job.done = 20
+        job.errors = [(f"t{i}", "Permission denied") for i in range(12)]
+
+        summary = job.summary(max_errors=2)
+
+        self.assertIn("Deleted files of 8 of 20", summary)
+        self.assertIn("t0: Permission denied", summary)
+        self.assertIn("and 10 more", summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming mode and the local HTTP range server
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import urllib.error
+import urllib.request
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from stream_server import StreamServer, parse_range, pick_file
+from tests.helpers import make_folder_torrent, make_session
+
+
+def fetch(url, headers=None, method='GET'):
+    """Return (status, headers, body) of a request"""
+    request = urllib.request.Request(url, headers=headers or {}, method=method)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status, response.headers, response.read()
+
+
+class TestParseRange(unittest.TestCase):
+    """Test Range header parsing"""
+
+    def test_ranges(self):
+        """Test closed, open-ended and suffix ranges"""
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=500-", 1000), (500, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+        self.assertEqual(parse_range("bytes=900-5000", 1000), (900, 999))
+
+    def test_whole_file(self):
+        """Test a missing, malformed or multi-range header means the whole file"""
+        for header in (None, "", "bytes=abc", "items=0-1", "bytes=0-1,5-9", "bytes=9-1", "bytes=-"):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        """Test ranges past the end raise ValueError"""
+        for header in ("bytes=1000-", "bytes=2000-3000", "bytes=-0"):
+            with self.assertRaises(ValueError):
+                parse_range(header, 1000)
+
+
+class TestStreamServer(unittest.TestCase):
+    """Test streaming a file while it downloads from a loopback seeder"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        seed_dir = os.path.join(self.test_dir, "seed")
+        leech_dir = os.path.join(self.test_dir, "leech")
+        os.makedirs(seed_dir)
+        os.makedirs(leech_dir)
+
+        self.data = os.urandom(4 * 1024 * 1024 + 1234)
+        self.ti = make_folder_torrent(seed_dir, "movie", {"film.mp4": self.data, "notes.txt": b"notes"},
+                                      piece_size=64 * 1024)
+
+        self.seeder = make_session(app_settings=True)
+        params = lt.add_torrent_params()
+        params.ti = self.ti
+        params.save_path = seed_dir
+        params.flags |= lt.torrent_flags.seed_mode
+        self.seeder.add_torrent(params)
+
+        self.leecher = make_session(app_settings=True)
+        params = lt.add_torrent_params()
+        params.ti = lt.torrent_info(self.ti)
+        params.save_path = leech_dir
+        self.handle = self.leecher.add_torrent(params)
+        # Slow enough that the whole file can't arrive before the request
+        self.handle.set_download_limit(512 * 1024)
+
+        self.server = StreamServer()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.test_dir)
+
+    def connect(self):
+        self.handle.connect_peer(('127.0.0.1', self.seeder.listen_port()))
+
+    def test_pick_largest_file(self):
+        """Test the largest file is streamed by default"""
+        index = pick_file(self.ti)
+        self.assertEqual(self.ti.files().file_path(index), os.path.join("movie", "film.mp4"))
+        self.assertTrue(self.server.add(self.handle).endswith("/film.mp4"))
+
+    def test_range_from_middle_before_complete(self):
+        """Test a seek far ahead is served long before the download gets there"""
+        url = self.server.add(self.handle)
+        self.assertTrue(self.handle.flags() & lt.torrent_flags.sequential_download)
+        self.connect()
+
+        status, headers, body = fetch(url, {'Range': "bytes=3000000-3100000"})
+
+        self.assertEqual(status, 206)
+        self.assertEqual(headers['Content-Range'], f"bytes 3000000-3100000/{len(self.data)}")
+        self.assertEqual(headers['Content-Type'], "video/mp4")
+        self.assertEqual(body, self.data[3000000:3100001])
+        self.assertLess(self.handle.status().progress, 1.0)
+
+    def test_whole_file_and_head(self):
+        """Test a request without Range streams everything and HEAD sends no body"""
+        url = self.server.add(self.handle)
+        self.handle.set_download_limit(0)
+        self.connect()
+
+        status, headers, body = fetch(url, method='HEAD')
+        self.assertEqual((status, headers['Content-Length'], body),
+                         (200, str(len(self.data)), b""))
+        self.assertEqual(headers['Accept-Ranges'], "bytes")
+
+        status, headers, body = fetch(url)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.data)
+
+    def test_errors(self):
+        """Test unknown streams give 404 and ranges past the end 416"""
+        url = self.server.add(self.handle)
+
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            fetch(url, {'Range': f"bytes={len(self.data)}-"})
+        self.assertEqual(cm.exception.code, 416)
+        self.assertEqual(cm.exception.headers['Content-Range'], f"bytes */{len(self.data)}")
+
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            fetch(f"http://127.0.0.1:{self.server.port}/not-a-stream/film.mp4")
+        self.assertEqual(cm.exception.code, 404)
+
+        with self.assertRaises(ValueError):
+            self.server.add(self.handle, file_index=5)
+
+    def test_remove_stops_streaming(self):
+        """Test the same file keeps its URL and removing turns sequential mode off"""
+        url = self.server.add(self.handle)
+        self.assertEqual(self.server.add(self.handle), url)
+
+        self.assertEqual(self.server.remove(str(self.handle.info_hash())), 1)
+
+        self.assertFalse(self.handle.flags() & lt.torrent_flags.sequential_download)
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            fetch(url)
+        self.assertEqual(cm.exception.code, 404)
+
+    def test_without_metadata(self):
+        """Test a magnet without metadata can't be streamed yet"""
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{1:040x}")
+        params.save_path = self.test_dir
+        handle = self.leecher.add_torrent(params)
+
+        with self.assertRaises(ValueError):
+            self.server.add(handle)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the loopback swarm benchmark
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_benchmark import (append_record, compare, find_baseline, load_records, make_torrent,
+                             run_isolated, run_trial, summarize)
+
+
+def make_result(profile, complete_seconds, timed_out=False):
+    """A run_trial() result with made-up numbers"""
+    return {'profile': profile, 'timed_out': timed_out, 'complete_seconds': complete_seconds,
+            'cpu_per_mib': 0.02, 'peak_rss': 50 * 1024 * 1024, 'restart_seconds': 0.1}
+
+
+class TestSwarmBenchmark(unittest.TestCase):
+    """Test trials on a small payload"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_torrent_is_reproducible(self):
+        """Test the same seed gives the same info hash and another seed a different one"""
+        hashes = []
+        for name, seed in (('a', 1), ('b', 1), ('c', 2)):
+            directory = os.path.join(self.test_dir, name)
+            os.makedirs(directory)
+            hashes.append(str(make_torrent(directory, 1, seed).info_hash()))
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertNotEqual(hashes[0], hashes[2])
+
+    def test_trial(self):
+        """Test every leecher completes and restarts from resume data"""
+        result = run_trial('balanced', size_mb=2, leechers=2, timeout=60)
+
+        self.assertFalse(result['timed_out'])
+        self.assertGreater(result['complete_seconds'], 0)
+        self.assertLessEqual(result['mean_complete_seconds'], result['complete_seconds'])
+        self.assertGreater(result['rate'], 0)
+        self.assertGreaterEqual(result['rss_growth'], 0)
+        self.assertGreater(result['peak_rss'], result['rss_growth'])
+        self.assertIsNotNone(result['resume_save_seconds'])
+        self.assertIsNotNone(result['restart_seconds'])
+
+    def test_isolated_trial(self):
+        """Test a trial can run in its own process"""
+        result = run_isolated('low_memory', size_mb=1, leechers=1, timeout=60)
+        self.assertEqual(result['profile'], 'low_memory')
+        self.assertFalse(result['timed_out'])
+
+    def test_unknown_profile(self):
+        """Test an unknown profile raises ValueError"""
+        with self.assertRaises(ValueError):
+            run_trial('turbo', size_mb=1, leechers=1)
+
+
+class TestResults(unittest.TestCase):
+    """Test medians, the results file and comparisons"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "results.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_summarize(self):
+        """Test the median is taken over trials that finished"""
+        summary = summarize([make_result('balanced', 3.0), make_result('balanced', 1.0),
+                             make_result('balanced', 2.0), make_result('balanced', None, True)])
+        self.assertEqual(summary['complete_seconds'], 2.0)
+        self.assertEqual(summary['trials'], 4)
+        self.assertTrue(summary['timed_out'])
+
+    def test_baseline_and_compare(self):
+        """Test only runs with the same parameters and machine are compared"""
+        params = {'size_mb': 8, 'leechers': 2, 'seed': 1, 'repeat': 1}
+        self.assertEqual(load_records(self.path), [])
+        for commit, size, machine, seconds in (('aaa111', 8, 'box', 2.0), ('bbb222', 8, 'box', 4.0),
+                                               ('ccc333', 16, 'box', 9.0),
+                                               ('ddd444', 8, 'other', 9.0)):
+            append_record(self.path, {'commit': commit, 'machine': machine,
+                                      'params': dict(params, size_mb=size),
+                                      'results': {'balanced': make_result('balanced', seconds)}})
+        records = load_records(self.path)
+
+        self.assertEqual(find_baseline(records, params, 'box')['commit'], 'bbb222')
+        self.assertEqual(find_baseline(records, params, 'box', commit='aaa')['commit'], 'aaa111')
+        self.assertIsNone(find_baseline(records, dict(params, leechers=5), 'box'))
+
+        rows = compare(find_baseline(records, params, 'box'),
+                       {'balanced': make_result('balanced', 5.0), 'seedbox': make_result('seedbox', 1.0)})
+        self.assertEqual(rows[0], ('balanced', 'complete_seconds', 4.0, 5.0, 25.0))
+        self.assertEqual({row[0] for row in rows}, {'balanced'})
+
+
+if __name__ == '__main__':
+    unittest.main()
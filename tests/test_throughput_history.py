@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tests for the throughput ring buffers and recorder
+"""
+
+import unittest
+import sys
+import os
+import io
+import csv
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from throughput_history import RingBuffer, Series, ThroughputHistory, ThroughputRecorder
+
+
+class FakeStatus:
+    """The torrent_status fields the recorder reads"""
+
+    def __init__(self, info_hash, download_rate, upload_rate, num_peers):
+        self.info_hash = info_hash
+        self.download_rate = download_rate
+        self.upload_rate = upload_rate
+        self.num_peers = num_peers
+
+
+class TestRingBuffer(unittest.TestCase):
+    """Test the fixed-size buffer"""
+
+    def test_wraps_around(self):
+        """Test the oldest values are dropped once full and order is kept"""
+        buffer = RingBuffer(3)
+        self.assertEqual(buffer.values(), [])
+        for value in range(1, 6):
+            buffer.append(value)
+
+        self.assertEqual(buffer.values(), [3, 4, 5])
+        self.assertEqual(len(buffer), 3)
+        buffer.replace_last(9)
+        self.assertEqual(buffer.values(), [3, 4, 9])
+
+    def test_memory_is_constant(self):
+        """Test the storage never grows"""
+        buffer = RingBuffer(10)
+        size = buffer.data.buffer_info()[1]
+        for value in range(10000):
+            buffer.append(value)
+        self.assertEqual(buffer.data.buffer_info()[1], size)
+        self.assertEqual(buffer.values(), list(range(9990, 10000)))
+
+
+class TestSeries(unittest.TestCase):
+    """Test interval handling of one resolution"""
+
+    def test_same_interval_replaces(self):
+        """Test a second sample in the same interval replaces the first"""
+        series = Series(60, 10)
+        series.put(100, (1, 2, 3))
+        series.put(100, (4, 5, 6))
+        self.assertEqual(series.samples(), [(6000, 4, 5, 6)])
+
+    def test_gaps_filled_with_zeros(self):
+        """Test long runs of skipped intervals become zero samples so spacing stays even"""
+        series = Series(1, 10)
+        series.put(1000, (10, 1, 2))
+        series.put(1004, (20, 2, 3))
+        self.assertEqual(series.samples(), [
+            (1000, 10, 1, 2), (1001, 0, 0, 0), (1002, 0, 0, 0), (1003, 0, 0, 0),
+            (1004, 20, 2, 3)])
+
+        # A gap longer than the buffer just clears it
+        series.put(5000, (7, 7, 7))
+        self.assertEqual(series.samples()[-1], (5000, 7, 7, 7))
+        self.assertEqual(series.samples()[0], (4991, 0, 0, 0))
+
+    def test_short_gaps_carry_previous_sample(self):
+        """Test one or two skipped intervals repeat the previous sample"""
+        series = Series(1, 10)
+        series.put(1000, (10, 1, 2))
+        series.put(1003, (20, 2, 3))
+        self.assertEqual(series.samples(), [
+            (1000, 10, 1, 2), (1001, 10, 1, 2), (1002, 10, 1, 2), (1003, 20, 2, 3)])
+
+    def test_tick_jitter_adds_no_zeros(self):
+        """Test ticks slightly longer than a second never record a false zero"""
+        history = ThroughputHistory({'1s': (1, 300)})
+        for tick in range(200):
+            history.add(1700000000 + tick * 1.02, 5000, 500, 3)
+
+        samples = history.samples('1s')
+        self.assertEqual(len(samples), int(199 * 1.02) + 1)   # One per second covered
+        self.assertEqual({sample[1:] for sample in samples}, {(5000, 500, 3)})
+
+
+class TestThroughputHistory(unittest.TestCase):
+    """Test the coarse resolutions average the second samples"""
+
+    def test_running_averages(self):
+        """Test minute samples are the average of their seconds, including the current minute"""
+        history = ThroughputHistory({'1s': (1, 5), '1m': (60, 5)})
+        for second, rate in enumerate([100, 200, 300]):
+            history.add(600 + second, rate, rate // 10, 4)
+
+        self.assertEqual(history.samples('1m'), [(600, 200, 20, 4)])
+
+        # Once the minute is over, its unsampled seconds count as zero
+        history.add(660, 1000, 0, 1)
+        self.assertEqual(history.samples('1m'), [(600, 10, 1, 0), (660, 1000, 0, 1)])
+        self.assertEqual([s[0] for s in history.samples('1s')], [656, 657, 658, 659, 660])
+
+    def test_sparse_samples_average_over_the_minute(self):
+        """Test a torrent sampled only when it changes averages over every second"""
+        history = ThroughputHistory({'1s': (1, 300), '1m': (60, 10), '1h': (3600, 10)})
+        history.add(6000, 1000000, 0, 2)     # One busy second...
+        history.add(6001, 0, 0, 0)           # ...then idle, and no more samples
+
+        # The minute so far: two seconds, one of them busy
+        self.assertEqual(history.samples('1m')[-1][1], 500000)
+        # Read at the end of the minute, the idle seconds count
+        self.assertEqual(history.samples('1m', now=6059)[-1][1], 1000000 // 60)
+        # The hour began before the history did: only its last 1200 seconds count
+        self.assertEqual(history.samples('1h', now=7199)[-1][1], 1000000 // 1200)
+
+        # The next sample closes the minute the same way
+        history.add(6130, 0, 0, 0)
+        self.assertEqual([s[1] for s in history.samples('1m')], [1000000 // 60, 0, 0])
+
+    def test_same_second_replaces(self):
+        """Test a second sample within one second replaces the first in the averages"""
+        history = ThroughputHistory({'1m': (60, 5)})
+        history.add(600.1, 100, 0, 1)
+        history.add(600.6, 300, 0, 1)
+        history.add(601, 300, 0, 1)
+        self.assertEqual(history.samples('1m'), [(600, 300, 0, 1)])
+
+
+class TestThroughputRecorder(unittest.TestCase):
+    """Test session and torrent series, forgetting and CSV export"""
+
+    def setUp(self):
+        self.recorder = ThroughputRecorder({'1s': (1, 60), '1m': (60, 60)})
+        for second in range(3):
+            self.recorder.record([FakeStatus('a', 1000, 100, 2), FakeStatus('b', 500, 0, 1)],
+                                 timestamp=1700000000 + second)
+
+    def test_session_and_torrents(self):
+        """Test the session series sums the torrents"""
+        self.assertEqual(self.recorder.samples()[-1][1:], (1500, 100, 3))
+        self.assertEqual(self.recorder.samples('b')[-1][1:], (500, 0, 1))
+        self.assertEqual(len(self.recorder.samples('a', '1s')), 3)
+        self.assertEqual(self.recorder.samples('missing'), [])
+        with self.assertRaises(KeyError):
+            self.recorder.samples(resolution='1d')
+
+    def test_session_totals_given(self):
+        """Test session totals can cover torrents that get no sample"""
+        self.recorder.record([FakeStatus('a', 1000, 100, 2)], totals=(4000, 300, 9),
+                             timestamp=1700000003)
+
+        self.assertEqual(self.recorder.samples()[-1], (1700000003, 4000, 300, 9))
+        self.assertEqual(self.recorder.samples('a')[-1], (1700000003, 1000, 100, 2))
+        self.assertEqual(self.recorder.samples('b')[-1][0], 1700000002)
+        self.assertTrue(self.recorder.has_history('b'))
+        self.assertFalse(self.recorder.has_history('c'))
+
+    def test_forget(self):
+        """Test a removed torrent's history is dropped"""
+        self.recorder.forget('a')
+        self.assertEqual(self.recorder.samples('a'), [])
+        self.assertEqual(list(self.recorder.torrents), ['b'])
+
+    def test_export_csv(self):
+        """Test CSV has a header and one row per sample"""
+        out = io.StringIO(newline='')
+        self.assertEqual(self.recorder.export_csv(out, 'a'), 3)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['timestamp', 'time', 'download_bytes_per_sec',
+                                   'upload_bytes_per_sec', 'peers'])
+        self.assertEqual(rows[1][0], '1700000000')
+        self.assertEqual(rows[1][2:], ['1000', '100', '2'])
+        self.assertEqual(len(rows), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Tests for per-torrent limits, priorities and queue order
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from resume_data import (ResumeDataWriter, ResumeFlusher, attach_torrent_settings,
+                         read_torrent_settings)
+from resume_store import SQLiteResumeStore
+from session_restore import SessionRestorer
+from status_engine import StatusEngine
+from torrent_bandwidth import (BandwidthAllocator, weighted_shares, move_in_queue,
+                               restore_queue_order)
+from tests.helpers import make_session
+
+
+def add_magnets(ses, count, save_path):
+    """Add bare magnets, which stay in the download queue"""
+    handles = []
+    for i in range(1, count + 1):
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{i:040x}")
+        params.save_path = save_path
+        handles.append(ses.add_torrent(params))
+    return handles
+
+
+class FakeHandle:
+    """Record the limits set on a torrent"""
+
+    def __init__(self):
+        self.download_limit = None
+        self.upload_limit = None
+        self.calls = 0
+
+    def is_valid(self):
+        return True
+
+    def set_download_limit(self, limit):
+        self.download_limit = limit
+        self.calls += 1
+
+    def set_upload_limit(self, limit):
+        self.upload_limit = limit
+
+
+class FakeStatus:
+    """The torrent_status fields the allocator reads"""
+
+    def __init__(self, i, state=lt.torrent_status.downloading, num_peers=5, paused=False):
+        self.info_hash = f"{i:040x}"
+        self.state = state
+        self.num_peers = num_peers
+        self.paused = paused
+        self.handle = FakeHandle()
+
+
+class TestWeightedShares(unittest.TestCase):
+    """Test splitting a cap by weight"""
+
+    def test_split_by_weight(self):
+        """Test shares follow the weights"""
+        shares = weighted_shares(7000, {'a': (4, 0), 'b': (2, 0), 'c': (1, 0)})
+        self.assertEqual(shares, {'a': 4000, 'b': 2000, 'c': 1000})
+
+    def test_ceiling_redistributed(self):
+        """Test what a limited claimant can't use goes to the others"""
+        shares = weighted_shares(9000, {'a': (4, 500), 'b': (1, 0), 'c': (1, 0)})
+        self.assertEqual(shares, {'a': 500, 'b': 4250, 'c': 4250})
+
+    def test_every_claimant_capped(self):
+        """Test ceilings below the cap are kept as they are"""
+        shares = weighted_shares(9000, {'a': (1, 100), 'b': (1, 200)})
+        self.assertEqual(shares, {'a': 100, 'b': 200})
+
+
+class TestBandwidthAllocator(unittest.TestCase):
+    """Test turning priorities and limits into per-torrent limits"""
+
+    def setUp(self):
+        self.allocator = BandwidthAllocator()
+        self.high, self.low, self.seed = FakeStatus(1), FakeStatus(2), \
+            FakeStatus(3, state=lt.torrent_status.seeding)
+        self.allocator.set_priority(self.high.info_hash, 'high')
+        self.allocator.set_priority(self.low.info_hash, 'low')
+
+    def test_session_cap_split_by_priority(self):
+        """Test a high-priority download gets four times a low one"""
+        statuses = [self.high, self.low, self.seed]
+        self.allocator.rebalance(statuses, download_cap=5000, upload_cap=8000)
+
+        self.assertEqual(self.high.handle.download_limit, 4000)
+        self.assertEqual(self.low.handle.download_limit, 1000)
+        # Seeds don't take part in the download split, but do upload
+        self.assertEqual(self.seed.handle.download_limit, 0)
+        self.assertEqual([s.handle.upload_limit for s in statuses], [4571, 1142, 2285])
+
+    def test_no_cap_uses_own_limits(self):
+        """Test without a session cap each torrent just gets its own limit"""
+        self.allocator.set_limits(self.low.info_hash, download=3000)
+        self.allocator.rebalance([self.high, self.low])
+
+        self.assertEqual(self.high.handle.download_limit, 0)
+        self.assertEqual(self.low.handle.download_limit, 3000)
+
+    def test_idle_torrents_keep_own_limits(self):
+        """Test paused torrents and torrents without peers get no share"""
+        idle = FakeStatus(4, num_peers=0)
+        paused = FakeStatus(5, paused=True)
+        self.allocator.rebalance([self.high, idle, paused], download_cap=6000)
+
+        self.assertEqual(self.high.handle.download_limit, 6000)
+        self.assertEqual(idle.handle.download_limit, 0)
+        self.assertEqual(paused.handle.download_limit, 0)
+
+    def test_unchanged_limits_not_reapplied(self):
+        """Test handles are only touched when their limits change"""
+        statuses = [self.high, self.low]
+        self.assertEqual(self.allocator.rebalance(statuses, download_cap=5000), 2)
+        self.assertEqual(self.allocator.rebalance(statuses, download_cap=5000), 0)
+
+        self.allocator.set_limits(self.low.info_hash, upload=100)
+        self.assertEqual(self.allocator.rebalance(statuses, download_cap=5000), 1)
+
+    def test_forget_during_rebalance(self):
+        """Test a torrent forgotten from another thread mid-rebalance stays forgotten"""
+        handle = self.low.handle
+        set_download_limit = handle.set_download_limit
+        threads = []
+
+        def forget_torrent(limit):
+            set_download_limit(limit)
+            thread = threading.Thread(target=self.allocator.forget, args=(self.low.info_hash,))
+            thread.start()
+            thread.join(0.2)
+            threads.append(thread)
+
+        handle.set_download_limit = forget_torrent
+        self.allocator.rebalance([self.low])
+        threads[0].join()
+
+        self.assertNotIn(self.low.info_hash, self.allocator.applied)
+        self.assertTrue(self.allocator.get(self.low.info_hash).is_default())
+
+    def test_invalid_values(self):
+        """Test unknown priorities and negative limits are refused"""
+        with self.assertRaises(ValueError):
+            self.allocator.set_priority(self.high.info_hash, 'urgent')
+        with self.assertRaises(ValueError):
+            self.allocator.set_limits(self.high.info_hash, download=-1)
+
+    def test_load_and_forget(self):
+        """Test saved settings are restored and removed torrents dropped"""
+        self.allocator.load("ab" * 20, {'priority': 'high', 'download_limit': 500,
+                                         'upload_limit': 0, 'queue_position': 3})
+        self.assertEqual(self.allocator.get("ab" * 20).download_limit, 500)
+        self.assertEqual(self.allocator.get("ab" * 20).priority, 'high')
+
+        self.allocator.forget("ab" * 20)
+        self.assertTrue(self.allocator.get("ab" * 20).is_default())
+
+
+class TestQueue(unittest.TestCase):
+    """Test queue moves and restoring the queue order against a live session"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.ses = make_session()
+        self.handles = add_magnets(self.ses, 5, self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def positions(self):
+        deadline = time.monotonic() + 2
+        positions = [h.queue_position() for h in self.handles]
+        while sorted(positions) != list(range(5)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+            positions = [h.queue_position() for h in self.handles]
+        return positions
+
+    def test_move_selection_keeps_order(self):
+        """Test moving several torrents keeps them in their relative order"""
+        move_in_queue([self.handles[3], self.handles[4]], 'top')
+        self.assertEqual(self.positions(), [2, 3, 4, 0, 1])
+
+        move_in_queue([self.handles[3], self.handles[4]], 'down')
+        self.assertEqual(self.positions(), [0, 3, 4, 1, 2])
+
+        move_in_queue([self.handles[0], self.handles[1]], 'bottom')
+        self.assertEqual(self.positions(), [3, 4, 2, 0, 1])
+
+        with self.assertRaises(ValueError):
+            move_in_queue(self.handles, 'sideways')
+
+    def test_restore_queue_order(self):
+        """Test saved positions put the queue back in order"""
+        saved = [(4, self.handles[0]), (3, self.handles[1]), (2, self.handles[2]),
+                 (1, self.handles[3]), (0, self.handles[4])]
+        restore_queue_order(saved)
+        self.assertEqual(self.positions(), [4, 3, 2, 1, 0])
+
+
+class TestPersistence(unittest.TestCase):
+    """Test settings survive a save and restore"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_attach_and_read(self):
+        """Test the settings key round-trips through bencoding"""
+        resume_data = lt.bencode({b'file-format': b'libtorrent resume file'})
+        stored = attach_torrent_settings(resume_data, {'priority': 'low', 'download_limit': 7})
+
+        self.assertEqual(read_torrent_settings(stored), {'priority': 'low', 'download_limit': 7})
+        self.assertIsNone(read_torrent_settings(resume_data))
+        self.assertIsNone(read_torrent_settings(None))
+
+    def test_save_and_restore(self):
+        """Test the user's limits, not the applied share, come back on restore"""
+        allocator = BandwidthAllocator()
+        ses = make_session()
+        handles = add_magnets(ses, 2, self.test_dir)
+        info_hash = str(handles[1].info_hash())
+        allocator.set_priority(info_hash, 'high')
+        allocator.set_limits(info_hash, download=8000, upload=2000)
+        handles[1].set_download_limit(1234)   # A share of the session cap
+        handles[1].queue_position_top()
+
+        writer = ResumeDataWriter(self.store, torrent_settings=allocator.saved)
+        ResumeFlusher(ses, writer).flush(handles, timeout=10)
+        writer.shutdown()
+
+        restored = make_session()
+        engine = StatusEngine(restored)
+        added = {}
+        restorer = SessionRestorer(restored, self.store, self.test_dir,
+                                   on_added=lambda h, entry: added.update({entry['info_hash']: (h, entry)}))
+        engine.subscribe(lt.add_torrent_alert, restorer.on_add_torrent)
+        restorer.start()
+        deadline = time.monotonic() + 10
+        while not restorer.is_finished() and time.monotonic() < deadline:
+            engine.poll(interval=0.1)
+        restorer.shutdown()
+
+        handle, entry = added[info_hash]
+        self.assertEqual(entry['torrent_settings'], {'priority': 'high', 'download_limit': 8000,
+                                                     'upload_limit': 2000, 'queue_position': 0})
+        self.assertEqual(handle.download_limit(), 8000)
+        self.assertEqual(handle.upload_limit(), 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the indexed built-in torrent catalog
+"""
+
+import unittest
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_catalog import Catalog, CATALOG, RESULT_FIELDS
+from torrent_search import TorrentSearcher
+
+
+def make_entry(name, category='movies', keywords=''):
+    """Build a catalog entry"""
+    return {'category': category, 'keywords': keywords, 'name': name,
+            'size': '1 GB', 'seeders': '10+', 'magnet': f"magnet:?dn={name}",
+            'link': '', 'source': category}
+
+
+class TestCatalog(unittest.TestCase):
+    """Test matching and ranking against a small catalog"""
+
+    def setUp(self):
+        self.catalog = Catalog([
+            make_entry("Night of the Living Dead (1968)", keywords="night of the living dead"),
+            make_entry("His Girl Friday (1940)", keywords="his girl friday"),
+            make_entry("Dead Souls", category='books'),
+            make_entry("Big Buck Bunny", category='samples', keywords="big buck bunny"),
+        ])
+
+    def names(self, query, **kwargs):
+        return [r['name'] for r in self.catalog.search(query, **kwargs)]
+
+    def test_whole_word_match(self):
+        """Test a word from the name finds the entry"""
+        self.assertEqual(self.names("friday"), ["His Girl Friday (1940)"])
+
+    def test_case_and_punctuation_ignored(self):
+        """Test matching is case-insensitive and ignores punctuation"""
+        self.assertEqual(self.names("BIG-BUCK"), ["Big Buck Bunny"])
+
+    def test_prefix_match(self):
+        """Test a partial word matches longer words"""
+        self.assertEqual(self.names("bunn"), ["Big Buck Bunny"])
+        self.assertEqual(self.names("bu"), [])   # Too short to be a prefix
+
+    def test_more_terms_rank_first(self):
+        """Test entries matching more query words come first"""
+        self.assertEqual(self.names("dead souls"), ["Dead Souls", "Night of the Living Dead (1968)"])
+        self.assertEqual(self.names("living dead"), ["Night of the Living Dead (1968)", "Dead Souls"])
+
+    def test_category_filter(self):
+        """Test a category limits results to its entries"""
+        self.assertEqual(self.names("dead", category='books'), ["Dead Souls"])
+
+    def test_stopwords(self):
+        """Test stopwords are skipped unless nothing else is searched"""
+        self.assertEqual(self.names("the friday"), ["His Girl Friday (1940)"])
+        self.assertEqual(self.names("the"), ["Night of the Living Dead (1968)"])
+
+    def test_limit_and_fields(self):
+        """Test results are capped and carry only the result fields"""
+        results = self.catalog.search("dead", limit=1)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(set(results[0]), set(RESULT_FIELDS))
+
+    def test_no_match(self):
+        """Test unknown words and empty queries return nothing"""
+        self.assertEqual(self.names("zzzz"), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_large_catalog(self):
+        """Test lookups stay fast with thousands of entries"""
+        catalog = Catalog([make_entry(f"Title {i} word{i % 500}") for i in range(20000)])
+
+        start = time.monotonic()
+        for _ in range(100):
+            results = catalog.search("word42", limit=20)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0]['name'], "Title 42 word42")
+        self.assertLess(elapsed, 1.0)
+
+
+class TestBuiltinCatalog(unittest.TestCase):
+    """Test the shipped catalog behind the static search sources"""
+
+    def test_loaded(self):
+        """Test every category has entries"""
+        categories = {entry['category'] for entry in CATALOG.entries}
+        self.assertEqual(categories, {'samples', 'movies', 'books', 'music', 'linux'})
+
+    def test_sources_search_catalog(self):
+        """Test the static sources answer from their own category"""
+        searcher = TorrentSearcher()
+
+        self.assertEqual([r['source'] for r in searcher.search_sample_content("sintel")],
+                         ['Creative Commons'])
+        self.assertEqual([r['name'] for r in searcher.search_linux_tracker("ubuntu")],
+                         ['Ubuntu 24.04 LTS Desktop'])
+        self.assertEqual(searcher.search_public_domain_books("sintel"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
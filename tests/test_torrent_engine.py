@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Tests for the headless torrent engine
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import threading
+import time
+import unittest.mock
+import urllib.error
+import urllib.request
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from resume_store import SQLiteResumeStore
+from torrent_engine import TorrentEngine
+from bandwidth_scheduler import BandwidthSchedule
+from tests.helpers import make_settings, make_torrent_data
+
+
+MAGNET_HASH = "dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c"
+MAGNET = f"magnet:?xt=urn:btih:{MAGNET_HASH}&dn=magnet-only"
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+class TestTorrentEngine(unittest.TestCase):
+    """Test adding, controlling and persisting torrents without a UI"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.download_dir = os.path.join(self.test_dir, "downloads")
+        os.makedirs(self.download_dir)
+        self.store = SQLiteResumeStore(os.path.join(self.test_dir, "resume.db"))
+        self.engine = self.start_engine()
+
+    def tearDown(self):
+        self.engine.shutdown()
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def start_engine(self, schedule=None):
+        engine = TorrentEngine(self.store, self.download_dir, settings=make_settings(),
+                               tick_interval=0.1, schedule=schedule)
+        engine.start()
+        return engine
+
+    def test_add_magnet(self):
+        """Test a magnet is added and listed"""
+        info_hash = self.engine.add_magnet(MAGNET)
+
+        self.assertEqual(info_hash, MAGNET_HASH)
+        torrents = self.engine.list_torrents()
+        self.assertEqual([(t['info_hash'], t['name']) for t in torrents],
+                         [(MAGNET_HASH, 'magnet-only')])
+
+    def test_add_invalid(self):
+        """Test bad magnets and torrent data raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.engine.add_magnet("magnet:?dn=no-hash")
+        with self.assertRaises(ValueError):
+            self.engine.add_torrent_data(b"not a torrent")
+
+    def test_add_twice(self):
+        """Test adding the same torrent again keeps one copy"""
+        self.engine.add_magnet(MAGNET)
+        self.engine.add_magnet(MAGNET)
+        self.assertEqual(len(self.engine.list_torrents()), 1)
+
+    def test_add_concurrently(self):
+        """Test adds of the same torrent from several threads keep one copy"""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.engine.add_magnet(MAGNET)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [MAGNET_HASH] * 8)
+        self.assertEqual(len(self.engine.list_torrents()), 1)
+        self.assertIsNotNone(self.engine.handles[MAGNET_HASH])
+
+    def test_add_while_restoring(self):
+        """Test a torrent the restore has yet to add is left to the restore"""
+        with self.engine.restorer.lock:
+            self.engine.restorer.unanswered.add(MAGNET_HASH)
+
+        self.assertEqual(self.engine.add_magnet(MAGNET), MAGNET_HASH)
+        self.assertNotIn(MAGNET_HASH, self.engine.handles)
+
+    def test_failed_add_releases_hash(self):
+        """Test a failed add does not leave the torrent reserved"""
+        with unittest.mock.patch.object(self.engine, 'ses', unittest.mock.Mock()) as ses:
+            ses.add_torrent.side_effect = RuntimeError("add failed")
+            with self.assertRaises(RuntimeError):
+                self.engine.add_magnet(MAGNET)
+        self.assertNotIn(MAGNET_HASH, self.engine.handles)
+
+        self.assertEqual(self.engine.add_magnet(MAGNET), MAGNET_HASH)
+        self.assertEqual(len(self.engine.list_torrents()), 1)
+
+    def test_seeds_existing_files(self):
+        """Test a torrent whose files are already complete ends up seeding"""
+        data = make_torrent_data(self.download_dir)
+        info_hash = self.engine.add_torrent_data(data)
+
+        self.assertTrue(wait_for(lambda: self.engine.torrent_status(info_hash)['is_seeding']))
+        self.assertEqual(self.store.get(info_hash)['torrent'], data)
+
+    def test_pause_and_resume(self):
+        """Test pause and resume reach the torrent"""
+        info_hash = self.engine.add_magnet(MAGNET)
+        self.engine.resume(info_hash)
+        self.assertTrue(wait_for(lambda: not self.engine.torrent_status(info_hash)['paused']))
+
+        self.engine.pause(info_hash)
+        self.assertTrue(wait_for(lambda: self.engine.torrent_status(info_hash)['paused']))
+
+    def test_remove(self):
+        """Test removing drops the torrent and its stored record"""
+        info_hash = self.engine.add_torrent_data(make_torrent_data(self.download_dir))
+        self.engine.remove(info_hash)
+
+        self.assertEqual(self.engine.list_torrents(), [])
+        self.assertIsNone(self.store.get(info_hash))
+        with self.assertRaises(KeyError):
+            self.engine.pause(info_hash)
+
+    def test_stream(self):
+        """Test streaming serves the file and removing the torrent ends the stream"""
+        data = make_torrent_data(self.download_dir, name="clip.mp4")
+        info_hash = self.engine.add_torrent_data(data)
+        self.assertTrue(wait_for(lambda: self.engine.torrent_status(info_hash)['is_seeding']))
+
+        url = self.engine.stream(info_hash)
+        self.assertTrue(url.endswith("/clip.mp4"))
+        with urllib.request.urlopen(url, timeout=10) as response:
+            body = response.read()
+        with open(os.path.join(self.download_dir, "clip.mp4"), 'rb') as f:
+            self.assertEqual(body, f.read())
+
+        self.engine.remove(info_hash)
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(url, timeout=10)
+        self.assertEqual(cm.exception.code, 404)
+
+        with self.assertRaises(KeyError):
+            self.engine.stream(info_hash)
+
+    def test_select_files(self):
+        """Test files are listed and glob filters skip the others"""
+        source = os.path.join(self.test_dir, "source")
+        os.makedirs(os.path.join(source, "pack"))
+        for name in ("a.txt", "b.bin"):
+            with open(os.path.join(source, "pack", name), 'wb') as f:
+                f.write(os.urandom(16 * 1024))
+        fs = lt.file_storage()
+        lt.add_files(fs, os.path.join(source, "pack"))
+        t = lt.create_torrent(fs)
+        lt.set_piece_hashes(t, source)
+        info_hash = self.engine.add_torrent_data(lt.bencode(t.generate()))
+
+        self.engine.select_files(info_hash, include=["*.txt"])
+
+        files = {f['path']: f['priority'] for f in self.engine.files(info_hash)}
+        self.assertEqual(files, {"pack/a.txt": 'normal', "pack/b.bin": 'skip'})
+        with self.assertRaises(ValueError):
+            self.engine.select_files(info_hash, exclude=["*"])
+
+    def test_limits(self):
+        """Test limits are applied and validated"""
+        self.engine.set_limits(download=50000)
+        self.assertEqual(self.engine.get_limits(), {'download': 50000, 'upload': 0})
+
+        with self.assertRaises(ValueError):
+            self.engine.set_limits(upload=-1)
+
+    def test_schedule_overrides_limits(self):
+        """Test a slot in effect wins over limits set by hand"""
+        self.engine.shutdown()
+        self.engine = self.start_engine(BandwidthSchedule.parse("daily 00:00-24:00 up=50"))
+
+        self.assertEqual(self.engine.get_limits(), {'download': 0, 'upload': 50000})
+        self.assertEqual(self.engine.session_status()['schedule'], "daily 00:00-24:00 up=50")
+
+        self.engine.set_limits(download=7000, upload=9000)
+        self.assertEqual(self.engine.get_limits(), {'download': 7000, 'upload': 50000})
+
+    def test_switch_profile(self):
+        """Test switching profiles changes the running session and keeps the limits"""
+        self.engine.set_limits(download=50000)
+        self.engine.set_profile('seedbox')
+
+        self.assertEqual(self.engine.get_profile(), 'seedbox')
+        self.assertEqual(self.engine.session_status()['profile'], 'seedbox')
+        self.assertEqual(self.engine.ses.get_settings()['active_limit'], 100)
+        self.assertEqual(self.engine.get_limits(), {'download': 50000, 'upload': 0})
+
+        with self.assertRaises(ValueError):
+            self.engine.set_profile('turbo')
+        self.assertEqual(self.engine.get_profile(), 'seedbox')
+
+    def test_session_stats(self):
+        """Test counters are sampled by the update loop and served to Prometheus"""
+        self.engine.shutdown()
+        log_path = os.path.join(self.test_dir, "metrics.jsonl")
+        self.engine = TorrentEngine(self.store, self.download_dir, settings=make_settings(),
+                                    tick_interval=0.1, metrics_interval=0.1,
+                                    metrics_log=log_path, metrics_port=0)
+        self.engine.start()
+
+        self.assertTrue(wait_for(lambda: self.engine.session_stats()['timestamp'] is not None))
+        self.assertIn('disk.queued_disk_jobs', self.engine.session_stats()['values'])
+        self.assertGreater(len(self.engine.session_stats(all_metrics=True)['values']), 100)
+
+        port = self.engine.session_status()['metrics_port']
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=10) as response:
+            self.assertIn(b"libtorrent_ses_num_downloading_torrents ", response.read())
+
+        self.engine.shutdown()
+        self.assertTrue(os.path.getsize(log_path))
+
+    def test_restart_restores_torrents(self):
+        """Test torrents come back after a shutdown and restart"""
+        info_hash = self.engine.add_torrent_data(make_torrent_data(self.download_dir))
+        self.engine.add_magnet(MAGNET)
+        self.engine.shutdown()
+
+        self.engine = self.start_engine()
+        self.assertTrue(wait_for(lambda: len(self.engine.list_torrents()) == 2))
+        self.assertEqual({t['info_hash'] for t in self.engine.list_torrents()},
+                         {info_hash, MAGNET_HASH})
+
+
+if __name__ == '__main__':
+    unittest.main()
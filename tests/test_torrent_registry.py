@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the torrent registry
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libtorrent as lt
+from torrent_registry import TorrentRegistry, TorrentRecord
+from tests.helpers import make_session
+
+
+class FakeHandle:
+    """Stand-in for a torrent_handle; hashable like the real one"""
+
+    def __init__(self, i):
+        self.i = i
+
+    def info_hash(self):
+        return f"{self.i:040x}"
+
+
+class TestTorrentRegistry(unittest.TestCase):
+    """Test the indexes and bulk operations"""
+
+    def setUp(self):
+        self.registry = TorrentRegistry()
+        self.handles = [FakeHandle(i) for i in range(10)]
+        self.records = [self.registry.add(h, None, f"I{h.i:03d}") for h in self.handles]
+
+    def test_lookups(self):
+        """Test every index finds the same record"""
+        record = self.records[3]
+
+        self.assertIs(self.registry.get(f"{3:040x}"), record)
+        self.assertIs(self.registry.get_by_item("I003"), record)
+        self.assertIs(self.registry.get_by_handle(self.handles[3]), record)
+        self.assertIn(f"{3:040x}", self.registry)
+        self.assertEqual(len(self.registry), 10)
+        self.assertIsNone(self.registry.get("missing"))
+        self.assertIsNone(self.registry.get_by_item("I999"))
+
+    def test_records_use_slots(self):
+        """Test records carry no per-instance dict"""
+        self.assertFalse(hasattr(self.records[0], '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.records[0].extra = 1
+
+    def test_remove_items(self):
+        """Test removing a selection drops it from every index"""
+        removed = self.registry.remove_items(["I002", "I999", "I005"])
+
+        self.assertEqual([r.item_id for r in removed], ["I002", "I005"])
+        self.assertEqual(len(self.registry), 8)
+        self.assertIsNone(self.registry.get(f"{2:040x}"))
+        self.assertIsNone(self.registry.get_by_handle(self.handles[5]))
+        self.assertEqual(self.registry.remove_items(["I002"]), [])
+
+    def test_for_items_and_remove(self):
+        """Test selection lookup skips unknown rows and remove() is idempotent"""
+        self.assertEqual(self.registry.for_items(["I001", "gone", "I004"]),
+                         [self.records[1], self.records[4]])
+
+        self.registry.remove(self.records[1])
+        self.registry.remove(self.records[1])
+        self.assertEqual(len(self.registry), 9)
+        self.assertNotIn(self.records[1], self.registry.snapshot())
+
+    def test_re_add_replaces(self):
+        """Test adding an info hash again replaces the old row everywhere"""
+        record = self.registry.add(self.handles[0], None, "NEW", info_hash=f"{0:040x}")
+
+        self.assertIs(self.registry.get(f"{0:040x}"), record)
+        self.assertIsNone(self.registry.get_by_item("I000"))
+        self.assertEqual(len(self.registry), 10)
+
+    def test_bulk_remove_is_linear(self):
+        """Test removing half of 20000 torrents takes well under a second"""
+        registry = TorrentRegistry()
+        for i in range(20000):
+            registry.add(FakeHandle(i), None, f"row{i}")
+        selection = [f"row{i}" for i in range(0, 20000, 2)]
+
+        start = time.monotonic()
+        removed = registry.remove_items(selection)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(removed), 10000)
+        self.assertEqual(len(registry), 10000)
+        self.assertLess(elapsed, 0.5)
+
+    def test_snapshot_during_writes(self):
+        """Test iterating a snapshot while another thread adds and removes"""
+        stop = threading.Event()
+        errors = []
+
+        def writer():
+            i = 1000
+            while not stop.is_set():
+                record = self.registry.add(FakeHandle(i), None, f"W{i}")
+                self.registry.remove(record)
+                i += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(200):
+                try:
+                    for record in self.registry.snapshot():
+                        self.assertIsInstance(record, TorrentRecord)
+                except RuntimeError as e:
+                    errors.append(e)
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+
+class TestRegistryWithSession(unittest.TestCase):
+    """Test real torrent_handles as index keys"""
+
+    def test_handle_lookup(self):
+        """Test a handle returned later by the session finds its record"""
+        ses = make_session()
+        params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{1:040x}")
+        params.save_path = '.'
+        params.flags |= lt.torrent_flags.paused
+        handle = ses.add_torrent(params)
+
+        registry = TorrentRegistry()
+        record = registry.add(handle, None, "I001")
+
+        self.assertEqual(record.info_hash, f"{1:040x}")
+        self.assertIs(registry.get_by_handle(ses.get_torrents()[0]), record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Tests for concurrent searching across torrent sources
+"""
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+import shutil
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_search import TorrentSearcher, SearchCache
+
+
+def fake_source(name, delay=0.0, count=2, error=None):
+    """Build a search function that sleeps, then returns count results"""
+    def search(query, limit=20):
+        time.sleep(delay)
+        if error:
+            raise error
+        return [{'name': f"{name} {i}", 'size': '1 MB', 'seeders': i,
+                 'magnet': f"magnet:?{name}{i}", 'link': '', 'source': name}
+                for i in range(count)][:limit]
+    return search
+
+
+class TestConcurrentSearch(unittest.TestCase):
+    """Test search_stream and search_all without touching the network"""
+
+    def setUp(self):
+        self.searcher = TorrentSearcher()
+
+    def use_sources(self, *sources):
+        self.searcher.search_sources = [(name, fake_source(name, **kwargs))
+                                        for name, kwargs in sources]
+
+    def test_sources_run_in_parallel(self):
+        """Test total time is that of the slowest source, not the sum"""
+        self.use_sources(('a', {'delay': 0.3}), ('b', {'delay': 0.3}), ('c', {'delay': 0.3}))
+
+        start = time.monotonic()
+        results = self.searcher.search_all("x", limit=10)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(results), 6)
+        self.assertLess(elapsed, 0.8)
+
+    def test_stream_yields_fastest_first(self):
+        """Test results arrive as each source finishes"""
+        self.use_sources(('slow', {'delay': 0.4}), ('fast', {'delay': 0.0}))
+
+        order = [name for name, _ in self.searcher.search_stream("x")]
+        self.assertEqual(order, ['fast', 'slow'])
+
+    def test_search_all_keeps_source_order(self):
+        """Test merged results follow source priority, not finish order"""
+        self.use_sources(('first', {'delay': 0.3}), ('second', {'delay': 0.0}))
+
+        results = self.searcher.search_all("x", limit=3)
+        self.assertEqual([r['source'] for r in results], ['first', 'first', 'second'])
+
+    def test_deadline_skips_slow_source(self):
+        """Test a source past the deadline doesn't hold up the search"""
+        self.use_sources(('fast', {}), ('stuck', {'delay': 2.0}))
+
+        start = time.monotonic()
+        results = self.searcher.search_all("x", timeout=0.3)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual({r['source'] for r in results}, {'fast'})
+        self.assertLess(elapsed, 1.0)
+
+    def test_failing_source_contained(self):
+        """Test one source raising doesn't lose the others"""
+        self.use_sources(('ok', {}), ('broken', {'error': ValueError("bad")}))
+
+        results = self.searcher.search_all("x")
+        self.assertEqual({r['source'] for r in results}, {'ok'})
+
+    def test_per_source_limit(self):
+        """Test each source is capped at the limit"""
+        self.use_sources(('many', {'count': 10}))
+
+        batches = list(self.searcher.search_stream("x", limit=4))
+        self.assertEqual(len(batches[0][1]), 4)
+
+
+RESULTS = [{'name': f"r{i}", 'size': '1 MB', 'seeders': i, 'magnet': '', 'link': '',
+            'source': 'src'} for i in range(5)]
+
+
+class TestSearchCache(unittest.TestCase):
+    """Test TTL, LRU and persistence of cached search results"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_hit_with_normalized_query(self):
+        """Test case and whitespace differences share an entry"""
+        cache = SearchCache()
+        cache.put('src', "Ubuntu  Server", 20, RESULTS)
+
+        self.assertEqual(cache.get('src', " ubuntu server ", 20), RESULTS)
+        self.assertIsNone(cache.get('other', "ubuntu server", 20))
+
+    def test_larger_limit(self):
+        """Test a smaller stored limit only answers when the source was exhausted"""
+        cache = SearchCache()
+        cache.put('full', "q", 5, RESULTS)          # Filled its limit, may have more
+        cache.put('short', "q", 10, RESULTS)        # Had only 5 of 10
+
+        self.assertEqual(len(cache.get('full', "q", 3)), 3)
+        self.assertIsNone(cache.get('full', "q", 10))
+        self.assertEqual(cache.get('short', "q", 20), RESULTS)
+
+    def test_expiry(self):
+        """Test entries expire after their source's TTL"""
+        cache = SearchCache(default_ttl=0.05, ttls={'slow': 60})
+        cache.put('src', "q", 20, RESULTS)
+        cache.put('slow', "q", 20, RESULTS)
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get('src', "q", 20))
+        self.assertIsNotNone(cache.get('slow', "q", 20))
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        cache = SearchCache(max_entries=2)
+        cache.put('src', "a", 20, RESULTS)
+        cache.put('src', "b", 20, RESULTS)
+        cache.get('src', "a", 20)
+        cache.put('src', "c", 20, RESULTS)
+
+        self.assertIsNotNone(cache.get('src', "a", 20))
+        self.assertIsNone(cache.get('src', "b", 20))
+
+    def test_empty_results_not_cached(self):
+        """Test an empty answer (possibly an error) is not remembered"""
+        cache = SearchCache()
+        cache.put('src', "q", 20, [])
+        self.assertIsNone(cache.get('src', "q", 20))
+
+    def test_persistence(self):
+        """Test entries survive a save and load"""
+        path = os.path.join(self.test_dir, "cache.json")
+        cache = SearchCache(path=path)
+        cache.put('src', "q", 20, RESULTS)
+        cache.save()
+
+        self.assertEqual(SearchCache(path=path).get('src', "q", 20), RESULTS)
+
+    def test_searcher_uses_cache(self):
+        """Test a repeated search doesn't query the source again"""
+        calls = []
+
+        def source(query, limit=20):
+            calls.append(query)
+            return RESULTS[:limit]
+
+        searcher = TorrentSearcher()
+        searcher.search_sources = [('src', source)]
+        searcher.cached_sources = {'src'}
+
+        first = searcher.search_all("Query", limit=5)
+        second = searcher.search_all("query", limit=5)
+
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["Query"])
+
+    def test_catalog_sources_not_cached(self):
+        """Test only network sources go through the cache"""
+        calls = []
+
+        def source(query, limit=20):
+            calls.append(query)
+            return RESULTS[:limit]
+
+        searcher = TorrentSearcher()
+        searcher.search_sources = [('catalog', source)]
+        searcher.cached_sources = set()
+
+        searcher.search_all("query", limit=5)
+        searcher.search_all("query", limit=5)
+
+        self.assertEqual(calls, ["query", "query"])
+        self.assertIsNone(searcher.cache.get('catalog', "query", 5))
+
+    def test_builtin_catalog_sources_uncached(self):
+        """Test the built-in catalog sources aren't marked for caching"""
+        searcher = TorrentSearcher()
+        for name in ('Sample Content', 'Public Domain', 'Public Domain Books',
+                     'CC Music', 'Linux Tracker'):
+            self.assertNotIn(name, searcher.cached_sources)
+
+
+if __name__ == '__main__':
+    unittest.main()
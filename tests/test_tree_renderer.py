@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched, diff-based Treeview renderer
+"""
+
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tree_renderer import TreeRenderer
+
+
+COLUMNS = ('Name', 'Progress', 'Status')
+ROW_HEIGHT = 20
+HEADING_HEIGHT = 24
+
+
+class FakeTree:
+    """Minimal stand-in for ttk.Treeview that records Tk calls"""
+
+    def __init__(self, visible_rows=5):
+        self.order = []
+        self.rows = {}
+        self.tags = {}
+        self.offset = 0   # index of the first visible row
+        self.height = HEADING_HEIGHT + visible_rows * ROW_HEIGHT
+        self.set_calls = []
+        self.tag_calls = []
+        self.reorders = 0
+
+    def insert(self, parent, index, values=(), tags=()):
+        item_id = f"I{len(self.order) + 1:03d}"
+        self.order.append(item_id)
+        self.rows[item_id] = dict(zip(COLUMNS, values))
+        self.tags[item_id] = tuple(tags)
+        return item_id
+
+    def delete(self, item_id):
+        self.order.remove(item_id)
+        del self.rows[item_id]
+
+    def set_children(self, parent, *items):
+        self.reorders += 1
+        self.order = list(items)
+
+    def set(self, item_id, column, value):
+        self.set_calls.append((item_id, column, value))
+        self.rows[item_id][column] = value
+
+    def item(self, item_id, tags=()):
+        self.tag_calls.append((item_id, tags))
+        self.tags[item_id] = tuple(tags)
+
+    def winfo_height(self):
+        return self.height
+
+    def identify_row(self, y):
+        if y < HEADING_HEIGHT:
+            return ''
+        index = self.offset + (y - HEADING_HEIGHT) // ROW_HEIGHT
+        return self.order[index] if index < len(self.order) else ''
+
+    def bbox(self, item_id):
+        return (0, HEADING_HEIGHT, 100, ROW_HEIGHT)
+
+    def next(self, item_id):
+        index = self.order.index(item_id) + 1
+        return self.order[index] if index < len(self.order) else ''
+
+
+class FakeRoot:
+    """Collects root.after callbacks so tests control when frames run"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def run_frame(self):
+        callbacks, self.scheduled = self.scheduled, []
+        for callback in callbacks:
+            callback()
+
+
+class TestTreeRenderer(unittest.TestCase):
+    """Test diffing, batching and visibility handling"""
+
+    def setUp(self):
+        """Set up a renderer with ten rows, five of them visible"""
+        self.root = FakeRoot()
+        self.tree = FakeTree(visible_rows=5)
+        self.renderer = TreeRenderer(self.root, self.tree, COLUMNS)
+        self.items = [self.renderer.insert((f"t{i}", '0%', 'Queued')) for i in range(10)]
+
+    def test_unchanged_row_not_sent(self):
+        """Test re-sending identical values costs no Tk calls"""
+        self.renderer.update(self.items[0], ('t0', '0%', 'Queued'))
+        self.renderer.flush_later()
+        self.root.run_frame()
+
+        self.assertEqual(self.tree.set_calls, [])
+        self.assertEqual(self.root.scheduled, [])
+
+    def test_only_changed_cells_sent(self):
+        """Test only the cells that differ are written"""
+        self.renderer.update(self.items[0], ('t0', '5.0%', 'Queued'))
+        self.renderer.flush_later()
+        self.root.run_frame()
+
+        self.assertEqual(self.tree.set_calls, [(self.items[0], 'Progress', '5.0%')])
+        self.assertEqual(self.tree.tag_calls, [])
+
+    def test_tags_updated(self):
+        """Test tag changes are sent without rewriting values"""
+        self.renderer.update(self.items[1], ('t1', '0%', 'Queued'), tags=('paused',))
+        self.renderer.flush_later()
+        self.root.run_frame()
+
+        self.assertEqual(self.tree.set_calls, [])
+        self.assertEqual(self.tree.tag_calls, [(self.items[1], ('paused',))])
+
+    def test_one_flush_per_frame(self):
+        """Test many updates schedule a single main-thread batch"""
+        for i, item_id in enumerate(self.items[:5]):
+            self.renderer.update(item_id, (f"t{i}", '50.0%', 'Downloading'))
+            self.renderer.flush_later()
+
+        self.assertEqual(len(self.root.scheduled), 1)
+        self.root.run_frame()
+        self.assertEqual(len(self.tree.set_calls), 10)
+
+    def test_offscreen_rows_deferred(self):
+        """Test rows out of view are rendered once they scroll into view"""
+        hidden = self.items[8]
+        self.renderer.update(hidden, ('t8', '80.0%', 'Queued'))
+        self.renderer.flush_later()
+        self.root.run_frame()
+
+        self.assertEqual(self.tree.set_calls, [])
+        self.assertEqual(self.renderer.values(hidden), ('t8', '80.0%', 'Queued'))
+
+        # Scroll down so the row becomes visible
+        self.tree.offset = 5
+        self.renderer.flush_later()
+        self.root.run_frame()
+
+        self.assertEqual(self.tree.set_calls, [(hidden, 'Progress', '80.0%')])
+
+    def test_deleted_row_ignored(self):
+        """Test updates to deleted rows are dropped"""
+        item_id = self.items[0]
+        self.renderer.delete(item_id)
+        self.renderer.update(item_id, ('t0', '10.0%', 'Queued'))
+        self.renderer.flush_later()
+        self.root.run_frame()
+
+        self.assertEqual(self.tree.set_calls, [])
+        self.assertNotIn(item_id, self.tree.rows)
+
+    def update_progress(self, index, progress):
+        """Update a row's progress with its raw value as the sort key"""
+        self.renderer.update(self.items[index], (f"t{index}", f"{progress:.1f}%", 'Queued'),
+                             sort_keys=(f"t{index}", progress, 'Queued'))
+
+    def test_sort_by_raw_keys(self):
+        """Test rows sort by the raw keys, not the formatted text"""
+        for i, progress in enumerate([5, 100, 40, 9, 70, 1, 0, 80, 30, 60]):
+            self.update_progress(i, progress)
+
+        self.renderer.sort(1)
+        self.assertEqual([self.tree.rows[i]['Progress'] for i in self.tree.order[:4]],
+                         ['0.0%', '1.0%', '5.0%', '9.0%'])
+
+        self.renderer.sort(1, reverse=True)
+        self.assertEqual(self.tree.rows[self.tree.order[0]]['Progress'], '100.0%')
+        self.assertEqual(self.tree.reorders, 2)
+
+    def test_order_kept_across_updates(self):
+        """Test the sort is reapplied when keys change, in one call per frame"""
+        for i in range(10):
+            self.update_progress(i, i)
+        self.renderer.sort(1, reverse=True)
+        self.assertEqual(self.tree.order[0], self.items[9])
+
+        # Changes that don't affect the sort column don't reorder
+        self.renderer.update(self.items[0], ('t0', '0.0%', 'Paused'),
+                             sort_keys=('t0', 0, 'Paused'))
+        self.renderer.flush_later()
+        self.root.run_frame()
+        self.assertEqual(self.tree.reorders, 1)
+
+        self.update_progress(0, 50)
+        self.update_progress(5, 60)
+        self.renderer.flush_later()
+        self.root.run_frame()
+        self.assertEqual(self.tree.order[:2], [self.items[5], self.items[0]])
+        self.assertEqual(self.tree.reorders, 2)
+
+    def test_volatile_keys_keep_order(self):
+        """Test keys that change every frame only reorder when the order changes"""
+        for i in range(10):
+            self.update_progress(i, i)
+        self.renderer.sort(1, reverse=True)
+        self.renderer.delete(self.items.pop(3))
+
+        for frame in range(1, 6):
+            for i in range(9):
+                self.update_progress(i, i * 10 + frame)
+            self.renderer.flush_later()
+            self.root.run_frame()
+        self.assertEqual(self.tree.reorders, 1)
+
+        self.update_progress(8, 0)
+        self.renderer.flush_later()
+        self.root.run_frame()
+        self.assertEqual(self.tree.order, self.items[7::-1] + self.items[8:])
+        self.assertEqual(self.tree.reorders, 2)
+
+    def test_sort_ties_and_unkeyed_rows(self):
+        """Test ties keep insertion order and rows without keys go last"""
+        for i in range(1, 10):
+            self.update_progress(i, 50)
+
+        self.renderer.sort(1, reverse=True)
+
+        self.assertEqual(self.tree.order, self.items[1:] + self.items[:1])
+
+    def test_sort_thousands_of_rows(self):
+        """Test sorting many rows is a single reorder"""
+        items = [self.renderer.insert((f"n{i}", '', '')) for i in range(5000)]
+        for i, item_id in enumerate(items):
+            self.renderer.update(item_id, (f"n{i}", '', ''), sort_keys=(f"n{i}", (i * 7919) % 5000, ''))
+
+        self.renderer.sort(1)
+
+        self.assertEqual(self.tree.reorders, 1)
+        self.assertEqual(self.tree.order[0], items[0])
+        self.assertEqual(self.tree.order[-1], self.items[-1])  # Unkeyed rows last
+
+
+if __name__ == '__main__':
+    unittest.main()
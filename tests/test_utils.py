@@ -11,7 +11,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from torrent_utils import (
-    format_size, format_speed, format_time,
+    format_size, format_speed, format_time, parse_size, parse_count,
     sanitize_filename, is_magnet_link, validate_magnet_link
 )
 
@@ -92,6 +92,25 @@ class TestFormatTime(unittest.TestCase):
         self.assertEqual(format_time(float('inf')), "Unknown")
 
 
+class TestParseSize(unittest.TestCase):
+    """Test parse_size and parse_count functions"""
+
+    def test_parse_size(self):
+        """Test search source and format_size strings convert to bytes"""
+        self.assertEqual(parse_size("264 MB"), 264 * 1024 ** 2)
+        self.assertEqual(parse_size("1.5 GB"), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_size(format_size(1536)), 1536)
+        self.assertEqual(parse_size("Unknown"), 0)
+        self.assertEqual(parse_size("12 parsecs"), 0)
+
+    def test_parse_count(self):
+        """Test counts with separators and plus signs"""
+        self.assertEqual(parse_count(42), 42)
+        self.assertEqual(parse_count("1,234"), 1234)
+        self.assertEqual(parse_count("500+"), 500)
+        self.assertEqual(parse_count("many"), 0)
+
+
 class TestSanitizeFilename(unittest.TestCase):
     """Test sanitize_filename function"""
 
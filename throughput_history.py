@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Bounded time series of download/upload rates and peer counts
+
+Every torrent and the session as a whole get a ThroughputHistory: one
+fixed-size ring buffer per metric and resolution (1 second, 1 minute,
+1 hour), kept in array.array storage. A sample overwrites the oldest one
+once a buffer is full, so memory depends only on the number of torrents,
+not on how long the session runs.
+
+The recorder is fed once per update loop tick with the session totals
+and the torrent_status of the torrents worth keeping a history for.
+Minute and hour samples are the average over every second of their
+interval; seconds without a sample count as zero (or as the previous
+sample across a short gap, like the second series), so a torrent that
+is only sampled while it changes still averages right. The newest coarse
+sample is a running average, current instead of appearing only when its
+interval ends.
+"""
+
+import csv
+import time
+import threading
+from array import array
+from datetime import datetime
+
+
+# name -> (seconds per sample, number of samples kept)
+RESOLUTIONS = {
+    '1s': (1, 300),       # 5 minutes
+    '1m': (60, 240),      # 4 hours
+    '1h': (3600, 168),    # 1 week
+}
+
+DEFAULT_RESOLUTION = '1s'
+
+# Gaps of up to this many seconds repeat the previous sample: ticks
+# drift (a 1.02 s tick skips a second now and then), and a zero there
+# would be a false dip. Longer gaps mean nothing was recorded and are zero.
+MAX_CARRIED_GAP = 2
+
+METRICS = ('download', 'upload', 'peers')
+
+# Unsigned 32-bit cells: rates up to 4 GB/s, 4 bytes per sample
+TYPECODE = 'L' if array('L').itemsize == 4 else 'I'
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of unsigned integers that drops the oldest value when full"""
+
+    __slots__ = ('data', 'capacity', 'head', 'count')
+
+    def __init__(self, capacity):
+        self.data = array(TYPECODE, bytes(array(TYPECODE).itemsize * capacity))
+        self.capacity = capacity
+        self.head = 0       # Index the next value is written to
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def last(self):
+        """Return the newest value (0 if empty)"""
+        if not self.count:
+            return 0
+        return self.data[(self.head - 1) % self.capacity]
+
+    def replace_last(self, value):
+        """Overwrite the newest value (append if empty)"""
+        if not self.count:
+            self.append(value)
+        else:
+            self.data[(self.head - 1) % self.capacity] = value
+
+    def values(self):
+        """Return the values oldest first"""
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            return self.data[start:start + self.count].tolist()
+        return self.data[start:].tolist() + self.data[:self.head].tolist()
+
+
+class Series:
+    """Download, upload and peer samples at one resolution"""
+
+    __slots__ = ('step', 'buffers', 'last_bucket')
+
+    def __init__(self, step, capacity):
+        """
+        Args:
+            step: Seconds per sample
+            capacity: Samples kept
+        """
+        self.step = step
+        self.buffers = tuple(RingBuffer(capacity) for _ in METRICS)
+        self.last_bucket = None   # Interval number (time // step) of the newest sample
+
+    def put(self, bucket, values):
+        """
+        Store the sample of an interval
+
+        A sample for the newest interval replaces it. Intervals skipped
+        since then are filled so samples stay evenly spaced: with the
+        previous sample if they span at most MAX_CARRIED_GAP seconds (tick
+        jitter), with zeros if more (the machine slept, say).
+
+        Args:
+            bucket: Interval number, int(timestamp // step)
+            values: One value per METRICS entry
+        """
+        if self.last_bucket is not None and bucket <= self.last_bucket:
+            # Same interval, or the clock went back: keep the newest slot current
+            for buffer, value in zip(self.buffers, values):
+                buffer.replace_last(value)
+            return
+
+        if self.last_bucket is not None:
+            gap = min(bucket - self.last_bucket - 1, self.buffers[0].capacity)
+            for buffer in self.buffers:
+                fill = buffer.last() if gap * self.step <= MAX_CARRIED_GAP else 0
+                for _ in range(gap):
+                    buffer.append(fill)
+        for buffer, value in zip(self.buffers, values):
+            buffer.append(value)
+        self.last_bucket = bucket
+
+    def samples(self):
+        """
+        Return the samples oldest first
+
+        Returns:
+            list: (timestamp, download, upload, peers) tuples; the timestamp
+                is the start of the sample's interval
+        """
+        columns = [buffer.values() for buffer in self.buffers]
+        count = len(columns[0])
+        if not count:
+            return []
+        first = (self.last_bucket - count + 1) * self.step
+        return [(first + i * self.step,) + tuple(column[i] for column in columns)
+                for i in range(count)]
+
+
+def average(sums, end):
+    """Return the per-second averages of coarse sums from their first second up to end"""
+    seconds = max(1, end - sums[1])
+    return [max(0, total) // seconds for total in sums[2:]]
+
+
+class ThroughputHistory:
+    """The series of one torrent or of the whole session, at every resolution"""
+
+    __slots__ = ('series', 'sums', 'last_second', 'last_values')
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.series = {name: Series(step, capacity)
+                       for name, (step, capacity) in resolutions.items()}
+        # name -> [bucket, first second, download sum, upload sum, peers sum]
+        # over the seconds of the newest interval of the coarse resolutions;
+        # the first second is later than the interval start only for the
+        # interval the history began in
+        self.sums = {name: [None, 0, 0, 0, 0] for name, (step, _) in resolutions.items()
+                     if step > 1}
+        self.last_second = None
+        self.last_values = (0, 0, 0)
+
+    def add(self, timestamp, download, upload, peers):
+        """
+        Record one second's rates and peer count
+
+        Args:
+            timestamp: Unix time of the sample
+            download: Download rate in bytes/sec
+            upload: Upload rate in bytes/sec
+            peers: Connected peers
+        """
+        values = (max(0, int(download)), max(0, int(upload)), max(0, int(peers)))
+        second = int(timestamp)
+        last_second, last_values = self.last_second, self.last_values
+
+        for name, series in self.series.items():
+            sums = self.sums.get(name)
+            if sums is None:
+                series.put(int(timestamp // series.step), values)
+            elif last_second is not None and second <= last_second:
+                # Same second again (or the clock went back): replace its sample
+                self._add_second(series, sums, last_second,
+                                 [new - old for new, old in zip(values, last_values)])
+            else:
+                if last_second is not None and second - last_second - 1 <= MAX_CARRIED_GAP:
+                    for skipped in range(last_second + 1, second):
+                        self._add_second(series, sums, skipped, last_values)
+                self._add_second(series, sums, second, values)
+
+        if last_second is None or second >= last_second:
+            self.last_second = second
+        self.last_values = values
+
+    @staticmethod
+    def _add_second(series, sums, second, values):
+        """Add one second's values to a coarse series and update its newest sample"""
+        step = series.step
+        bucket = second // step
+        if sums[0] != bucket:
+            if sums[0] is not None and bucket > sums[0]:
+                # The interval is over: every one of its seconds counts
+                series.put(sums[0], average(sums, (sums[0] + 1) * step))
+            # Seconds before the history's first sample don't count
+            start = bucket * step if sums[0] is not None else second
+            sums[:] = [bucket, start, 0, 0, 0]
+        for i, value in enumerate(values):
+            sums[2 + i] += value
+        series.put(bucket, average(sums, second + 1))
+
+    def samples(self, resolution=DEFAULT_RESOLUTION, now=None):
+        """
+        Return the samples of one resolution, oldest first
+
+        Args:
+            resolution: Key of the resolutions
+            now: Current Unix time; the newest coarse sample then also
+                counts the seconds since the last sample as zero
+
+        Raises:
+            KeyError: If the resolution doesn't exist
+        """
+        series = self.series[resolution]
+        samples = series.samples()
+        sums = self.sums.get(resolution)
+        if now is None or sums is None or not samples or sums[0] != series.last_bucket:
+            return samples
+
+        end = min((sums[0] + 1) * series.step, int(now) + 1)
+        samples[-1] = (samples[-1][0],) + tuple(average(sums, end))
+        return samples
+
+
+class ThroughputRecorder:
+    """Keep session-wide and per-torrent histories; safe to read from any thread"""
+
+    def __init__(self, resolutions=RESOLUTIONS, clock=time.time):
+        """
+        Args:
+            resolutions: name -> (seconds per sample, samples kept)
+            clock: Returns the current Unix time
+        """
+        self.resolutions = resolutions
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.session = ThroughputHistory(resolutions)
+        self.torrents = {}     # info_hash -> ThroughputHistory
+
+    def record(self, statuses, totals=None, timestamp=None):
+        """
+        Add a sample for the session and for the given torrents
+
+        Only the torrents passed in get a sample (and a history, the first
+        time), so callers can leave out the idle ones.
+
+        Args:
+            statuses: torrent_status of the torrents to sample
+            totals: (download, upload, peers) of the whole session
+                (default: the sums over statuses)
+            timestamp: Unix time of the sample (default: now)
+        """
+        timestamp = self.clock() if timestamp is None else timestamp
+        download = upload = peers = 0
+        with self.lock:
+            for s in statuses:
+                info_hash = str(s.info_hash)
+                history = self.torrents.get(info_hash)
+                if history is None:
+                    history = self.torrents[info_hash] = ThroughputHistory(self.resolutions)
+                history.add(timestamp, s.download_rate, s.upload_rate, s.num_peers)
+                download += s.download_rate
+                upload += s.upload_rate
+                peers += s.num_peers
+            if totals is not None:
+                download, upload, peers = totals
+            self.session.add(timestamp, download, upload, peers)
+
+    def has_history(self, info_hash):
+        """Return True if a torrent has been sampled since it was added"""
+        return info_hash in self.torrents
+
+    def forget(self, info_hash):
+        """Drop the history of a removed torrent"""
+        with self.lock:
+            self.torrents.pop(info_hash, None)
+
+    def samples(self, info_hash=None, resolution=DEFAULT_RESOLUTION):
+        """
+        Return samples oldest first
+
+        Args:
+            info_hash: Torrent, or None for the whole session
+            resolution: Key of RESOLUTIONS
+
+        Returns:
+            list: (timestamp, download, upload, peers) tuples; empty for an
+                unknown torrent
+
+        Raises:
+            KeyError: If the resolution doesn't exist
+        """
+        with self.lock:
+            history = self.session if info_hash is None else self.torrents.get(info_hash)
+            if history is None:
+                if resolution not in self.resolutions:
+                    raise KeyError(resolution)
+                return []
+            return history.samples(resolution, now=self.clock())
+
+    def export_csv(self, f, info_hash=None, resolution=DEFAULT_RESOLUTION):
+        """
+        Write samples as CSV
+
+        Args:
+            f: Text file opened with newline=''
+            info_hash: Torrent, or None for the whole session
+            resolution: Key of RESOLUTIONS
+
+        Returns:
+            int: Number of rows written
+        """
+        samples = self.samples(info_hash, resolution)
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'time', 'download_bytes_per_sec',
+                         'upload_bytes_per_sec', 'peers'])
+        for timestamp, download, upload, peers in samples:
+            writer.writerow([timestamp, datetime.fromtimestamp(timestamp).isoformat(sep=' '),
+                             download, upload, peers])
+        return len(samples)
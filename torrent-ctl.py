@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Command-line client for the torrent daemon
+
+Usage:
+  python3 torrent-ctl.py status
+  python3 torrent-ctl.py stats [--all] [--grep TEXT]
+  python3 torrent-ctl.py list
+  python3 torrent-ctl.py add <torrent_file_or_magnet> [...]
+  python3 torrent-ctl.py remove [--delete-files] <info_hash> [...]
+  python3 torrent-ctl.py pause|resume <info_hash> [...]
+  python3 torrent-ctl.py stream [--file N] <info_hash>
+  python3 torrent-ctl.py files [--include GLOB ...] [--exclude GLOB ...] <info_hash>
+  python3 torrent-ctl.py limits [--download KB/s] [--upload KB/s]
+  python3 torrent-ctl.py profile [name]
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+from control_api import ControlError, connect
+from session_profiles import PROFILES, PROFILE_DESCRIPTIONS
+from torrent_utils import format_size, format_speed, is_magnet_link
+
+
+CONTROL_PATH = os.path.expanduser("~/.config/torrent-downloader/daemon.json")
+
+
+def print_torrents(torrents):
+    """Print one line per torrent"""
+    if not torrents:
+        print("No torrents")
+        return
+    for t in sorted(torrents, key=lambda t: t['name'].lower()):
+        state = 'paused' if t['paused'] else t['state']
+        print(f"{t['info_hash']}  {t['progress'] * 100:5.1f}%  "
+              f"↓{format_speed(t['download_rate']):>12} ↑{format_speed(t['upload_rate']):>12}  "
+              f"{state:<20} {t['name']}")
+
+
+def print_files(files):
+    """Print one line per file with its priority and progress"""
+    wanted = [f for f in files if f['priority'] != 'skip']
+    for f in files:
+        percent = f['done'] * 100 / f['size'] if f['size'] else 100.0
+        print(f"{f['index']:4}  {f['priority']:<6}  {format_size(f['size']):>10}  "
+              f"{percent:5.1f}%  {f['path']}")
+    print(f"{len(wanted)} of {len(files)} files selected, "
+          f"{format_size(sum(f['size'] for f in wanted))} of "
+          f"{format_size(sum(f['size'] for f in files))}")
+
+
+def print_stats(stats, pattern=None):
+    """Print libtorrent session counters, one per line"""
+    if stats['timestamp'] is None:
+        print("No sample yet, try again in a few seconds")
+        return
+    print(f"Sampled at {datetime.fromtimestamp(stats['timestamp']):%H:%M:%S}")
+    for name, value in stats['values'].items():
+        if pattern is None or pattern.lower() in name.lower():
+            print(f"  {name:40} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Control a running torrent daemon')
+    parser.add_argument('--control-file', default=CONTROL_PATH,
+                        help=f'Control file written by the daemon (default: {CONTROL_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('status', help='Show session rates and totals')
+    commands.add_parser('list', help='List torrents')
+
+    stats = commands.add_parser('stats', help='Show libtorrent session counters')
+    stats.add_argument('--all', action='store_true',
+                       help='Every counter instead of the disk/peer/picker summary')
+    stats.add_argument('--grep', metavar='TEXT', help='Only counters whose name contains TEXT')
+
+    add = commands.add_parser('add', help='Add .torrent files or magnet links')
+    add.add_argument('torrents', nargs='+')
+
+    remove = commands.add_parser('remove', help='Remove torrents')
+    remove.add_argument('--delete-files', action='store_true',
+                        help='Also delete the downloaded files')
+    remove.add_argument('hashes', nargs='+')
+
+    for name in ('pause', 'resume'):
+        command = commands.add_parser(name, help=f'{name.capitalize()} torrents')
+        command.add_argument('hashes', nargs='+')
+
+    stream = commands.add_parser('stream', help='Stream a file and print its local URL')
+    stream.add_argument('--file', type=int, help='Index of the file to stream (default: the largest)')
+    stream.add_argument('hash')
+
+    files = commands.add_parser('files', help='List files, or choose which to download')
+    files.add_argument('--include', action='append', default=[], metavar='GLOB',
+                       help='Download only files matching this glob (repeatable)')
+    files.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                       help='Skip files matching this glob (repeatable)')
+    files.add_argument('hash')
+
+    limits = commands.add_parser('limits', help='Show or set rate limits (0 = unlimited)')
+    limits.add_argument('--download', type=int, help='Download limit in KB/s')
+    limits.add_argument('--upload', type=int, help='Upload limit in KB/s')
+
+    profile = commands.add_parser('profile', help='Show or switch the performance profile')
+    profile.add_argument('name', nargs='?', choices=list(PROFILES))
+
+    args = parser.parse_args()
+
+    client = connect(args.control_file)
+    if client is None:
+        print("Torrent daemon is not running (start it with torrent-daemon.py)")
+        sys.exit(1)
+
+    failed = 0
+    try:
+        if args.command == 'status':
+            s = client.session_status()
+            print(f"Torrents: {s['torrents']}{' (restoring...)' if s['restoring'] else ''}")
+            print(f"Speed:    ↓ {format_speed(s['download_rate'])}  ↑ {format_speed(s['upload_rate'])}")
+            print(f"Session:  ↓ {format_size(s['total_download'])}  ↑ {format_size(s['total_upload'])}")
+            if s.get('schedule'):
+                print(f"Schedule: {s['schedule']}")
+            if s.get('metrics_port'):
+                print(f"Metrics:  http://127.0.0.1:{s['metrics_port']}/metrics")
+
+        elif args.command == 'stats':
+            # Filtering the full set finds counters outside the summary too
+            print_stats(client.session_stats(all_metrics=args.all or bool(args.grep)), args.grep)
+
+        elif args.command == 'list':
+            print_torrents(client.list_torrents())
+
+        elif args.command == 'add':
+            for item in args.torrents:
+                try:
+                    if is_magnet_link(item):
+                        info_hash = client.add_magnet(item)
+                    else:
+                        info_hash = client.add_torrent_file(item)
+                    print(f"Added {info_hash}")
+                except (ControlError, OSError) as e:
+                    print(f"Failed to add {item}: {e}")
+                    failed += 1
+
+        elif args.command in ('remove', 'pause', 'resume'):
+            for info_hash in args.hashes:
+                try:
+                    if args.command == 'remove':
+                        client.remove(info_hash, delete_files=args.delete_files)
+                    else:
+                        getattr(client, args.command)(info_hash)
+                except ControlError as e:
+                    print(f"{info_hash}: {e}")
+                    failed += 1
+
+        elif args.command == 'stream':
+            print(client.stream(args.hash, args.file))
+
+        elif args.command == 'files':
+            if args.include or args.exclude:
+                entries = client.select_files(args.hash, args.include, args.exclude)
+            else:
+                entries = client.files(args.hash)
+            print_files(entries)
+
+        elif args.command == 'limits':
+            if args.download is not None or args.upload is not None:
+                client.set_limits(
+                    download=args.download * 1000 if args.download is not None else None,
+                    upload=args.upload * 1000 if args.upload is not None else None
+                )
+            current = client.get_limits()
+            for key in ('download', 'upload'):
+                value = current[key]
+                print(f"{key.capitalize()}: {value // 1000} KB/s" if value else
+                      f"{key.capitalize()}: unlimited")
+
+        elif args.command == 'profile':
+            current = client.set_profile(args.name) if args.name else client.get_profile()
+            for name in PROFILES:
+                marker = '*' if name == current else ' '
+                print(f"{marker} {name:12} {PROFILE_DESCRIPTIONS[name]}")
+
+    except ControlError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Headless Torrent Daemon
+Runs the torrent session without a display and serves a local control API
+
+Usage:
+  python3 torrent-daemon.py [--config-dir DIR] [--port PORT]
+                            [--metrics-port PORT] [--metrics-log FILE]
+
+Control it with torrent-ctl.py. Settings (download path, rate limits,
+bandwidth schedule, encryption, DHT, startup check, resume backend,
+performance profile, metrics) are read from the same settings.json as
+the GUI; don't run both against one config directory.
+
+With a metrics port, libtorrent's session counters are served to
+Prometheus at http://127.0.0.1:PORT/metrics; with a metrics log, every
+sample is also appended to a JSONL file.
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+
+from control_api import ControlServer, DEFAULT_PORT, write_control_file
+from resume_store import open_resume_store
+from bandwidth_scheduler import BandwidthSchedule
+from session_profiles import DEFAULT_PROFILE, PROFILES
+from session_metrics import DEFAULT_INTERVAL, DEFAULT_METRICS_PORT
+from torrent_engine import TorrentEngine, build_session_settings
+
+
+CONFIG_DIR = os.path.expanduser("~/.config/torrent-downloader")
+CONTROL_FILE = "daemon.json"
+
+
+def load_settings(config_dir):
+    """Load settings.json from the config directory, with the GUI's defaults"""
+    settings = {
+        'download_path': os.path.expanduser("~/Downloads/torrents"),
+        'max_download_rate': 0,
+        'max_upload_rate': 0,
+        'encryption_enabled': True,
+        'dht_enabled': True,
+        'startup_check': 'trust',
+        'resume_backend': 'sqlite',
+        'performance_profile': DEFAULT_PROFILE,
+        'profile_overrides': {},
+        'bandwidth_schedule': {'enabled': False, 'slots': []},
+        'metrics_port': 0,      # 0 = no Prometheus endpoint
+        'metrics_log': '',      # '' = no JSONL log
+        'metrics_interval': DEFAULT_INTERVAL,
+    }
+    try:
+        with open(os.path.join(config_dir, "settings.json"), 'r') as f:
+            settings.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Failed to load settings: {e}")
+
+    if settings['performance_profile'] not in PROFILES:
+        print(f"Unknown performance profile {settings['performance_profile']!r}, "
+              f"using {DEFAULT_PROFILE!r}")
+        settings['performance_profile'] = DEFAULT_PROFILE
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless torrent daemon')
+    parser.add_argument('--config-dir', default=CONFIG_DIR,
+                        help=f'Settings and resume data directory (default: {CONFIG_DIR})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Loopback port for the control API (default: {DEFAULT_PORT})')
+    parser.add_argument('--listen', default='0.0.0.0:6881',
+                        help='Interfaces and port for peer connections (default: 0.0.0.0:6881)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve session counters to Prometheus on this loopback port '
+                             f'(e.g. {DEFAULT_METRICS_PORT}; default: settings.json, off)')
+    parser.add_argument('--metrics-log', metavar='FILE',
+                        help='Append every session counter sample to this JSONL file')
+    parser.add_argument('--metrics-interval', type=float,
+                        help=f'Seconds between samples (default: {DEFAULT_INTERVAL:g})')
+    args = parser.parse_args()
+
+    os.makedirs(args.config_dir, exist_ok=True)
+    settings = load_settings(args.config_dir)
+    control_path = os.path.join(args.config_dir, CONTROL_FILE)
+
+    try:
+        schedule = BandwidthSchedule.from_settings(settings['bandwidth_schedule'])
+    except ValueError as e:
+        print(f"Ignoring invalid bandwidth schedule: {e}")
+        schedule = None
+
+    metrics_port = args.metrics_port if args.metrics_port is not None else settings['metrics_port']
+    metrics_log = args.metrics_log if args.metrics_log is not None else settings['metrics_log']
+    metrics_interval = (args.metrics_interval if args.metrics_interval is not None
+                        else settings['metrics_interval'])
+
+    store = open_resume_store(os.path.join(args.config_dir, "resume"), settings['resume_backend'])
+    engine = TorrentEngine(
+        store,
+        settings['download_path'],
+        settings=build_session_settings(
+            download_rate=settings['max_download_rate'],
+            upload_rate=settings['max_upload_rate'],
+            encryption=settings['encryption_enabled'],
+            dht=settings['dht_enabled'],
+            listen_interfaces=args.listen,
+            profile=settings['performance_profile'],
+            profile_overrides=settings['profile_overrides']
+        ),
+        startup_check=settings['startup_check'],
+        profile=settings['performance_profile'],
+        schedule=schedule,
+        metrics_interval=metrics_interval,
+        metrics_log=os.path.expanduser(metrics_log) if metrics_log else None,
+        metrics_port=metrics_port or None
+    )
+
+    try:
+        server = ControlServer(engine, token='', port=args.port)
+    except OSError as e:
+        print(f"Cannot listen on 127.0.0.1:{args.port}: {e}")
+        store.close()
+        sys.exit(1)
+    server.token = write_control_file(control_path, server.server_address[1])
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    try:
+        engine.start()
+    except OSError as e:
+        print(f"Cannot start the engine (metrics port {metrics_port} or log {metrics_log!r}): {e}")
+        server.server_close()
+        os.remove(control_path)
+        store.close()
+        sys.exit(1)
+    server.start()
+    print(f"Torrent daemon running (control API on 127.0.0.1:{server.server_address[1]}, "
+          f"downloads in {settings['download_path']})")
+    if engine.metrics_server:
+        print(f"Metrics on http://127.0.0.1:{engine.metrics_server.port}/metrics")
+
+    while not stop.wait(1.0):
+        pass
+
+    print("Shutting down, saving resume data...")
+    server.stop()
+    try:
+        os.remove(control_path)
+    except OSError:
+        pass
+    engine.shutdown()
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,11 @@ import sys
 import time
 import os
 import argparse
+from resume_data import ResumeDataWriter, ResumeFlusher, verify_resume_files
+from resume_store import open_resume_store
+from stream_server import StreamServer
+from file_selection import list_files, priority_name, select_files, selection_summary
+import control_api
 
 
 def format_size(bytes):
@@ -65,11 +70,13 @@ def get_torrent_info(handle, timeout=30):
 class TorrentDownloader:
     """Manages torrent downloads with resume capability"""
 
-    def __init__(self, download_path=".", resume_data_path=".torrent_resume"):
+    def __init__(self, download_path=".", resume_data_path=".torrent_resume", recheck=False,
+                 resume_backend='files', stream=False, include=(), exclude=()):
         self.download_path = os.path.abspath(download_path)
         self.resume_data_path = os.path.abspath(resume_data_path)
         os.makedirs(self.download_path, exist_ok=True)
         os.makedirs(self.resume_data_path, exist_ok=True)
+        self.resume_store = open_resume_store(self.resume_data_path, resume_backend)
 
         # Create session with resume support
         self.ses = lt.session()
@@ -85,47 +92,66 @@ class TorrentDownloader:
         # DHT routers are automatically bootstrapped by libtorrent
 
         self.handles = []
+        self.recheck = recheck  # Hash-check every torrent even if its resume data matches
         self.metadata_saved = {}  # Track which magnets have saved metadata
 
+        # Glob filters choosing which files to download; the selection is
+        # kept in the resume data, so without filters a resumed torrent
+        # keeps the one it had
+        self.include = list(include)
+        self.exclude = list(exclude)
+
+        # Streaming mode: serve each torrent's largest file on localhost
+        # while it downloads
+        self.stream_server = None
+        self.stream_urls = {}     # info_hash -> URL
+        if stream:
+            self.stream_server = StreamServer()
+            self.stream_server.start()
+
+    def load_resume_params(self, info_hash):
+        """
+        Read saved resume data for a torrent
+
+        Returns:
+            tuple: (add_torrent_params, resume_data bytes), or
+                   (None, None) if there is no usable resume data
+        """
+        record = self.resume_store.get(info_hash)
+        if not record or not record['resume']:
+            return None, None
+        try:
+            resume_data = record['resume']
+            return lt.read_resume_data(resume_data), resume_data
+        except Exception as e:
+            print(f"  Resume data invalid, ignoring it: {e}")
+            return None, None
+
     def add_torrent(self, torrent_input):
         """Add a torrent file or magnet link to download queue with resume support"""
         try:
-            params = {
-                'save_path': self.download_path,
-                'storage_mode': lt.storage_mode_t.storage_mode_sparse,
-            }
-
             info = None
             info_hash = None
+            resume_data = None
 
             if is_magnet_link(torrent_input):
                 print(f"Adding magnet link...")
-                magnet_params = lt.parse_magnet_uri(torrent_input)
-                params.update(magnet_params)
-                info_hash = str(magnet_params.info_hash)
+                params = lt.parse_magnet_uri(torrent_input)
+                info_hash = str(params.info_hash)
 
                 # Check for existing resume data and metadata
-                resume_file = os.path.join(self.resume_data_path, f"{info_hash}.fastresume")
-                torrent_file = os.path.join(self.resume_data_path, f"{info_hash}.torrent")
-
-                has_resume = os.path.exists(resume_file)
-                has_metadata = os.path.exists(torrent_file)
+                record = self.resume_store.get(info_hash) or {}
+                torrent_data = record.get('torrent')
+                has_metadata = bool(torrent_data)
+                resume_params, resume_data = self.load_resume_params(info_hash)
 
-                if has_resume and has_metadata:
+                if resume_params is not None and has_metadata:
                     print(f"  ⚡ Resume data found - loading saved torrent")
-                    # Load the full torrent info
-                    info = lt.torrent_info(torrent_file)
-                    params['ti'] = info
-
-                    # Load resume data
-                    with open(resume_file, 'rb') as f:
-                        params['resume_data'] = f.read()
-
-                    handle = self.ses.add_torrent(params)
-
-                    # Force recheck to detect existing files
-                    print(f"  🔍 Checking for existing files...")
-                    handle.force_recheck()
+                    # Keep trackers from both the magnet and the resume data
+                    resume_params.trackers = list(set(resume_params.trackers) | set(params.trackers))
+                    params = resume_params
+                    info = lt.torrent_info(torrent_data)
+                    params.ti = info
 
                     # Mark metadata as already saved
                     self.metadata_saved[info_hash] = True
@@ -133,24 +159,12 @@ class TorrentDownloader:
                 elif has_metadata:
                     # Have metadata but no resume data - still useful
                     print(f"  📦 Saved torrent found - loading")
-                    info = lt.torrent_info(torrent_file)
-                    params['ti'] = info
-
-                    handle = self.ses.add_torrent(params)
-
-                    # Force recheck to detect existing files
-                    print(f"  🔍 Checking for existing files...")
-                    handle.force_recheck()
+                    info = lt.torrent_info(torrent_data)
+                    params.ti = info
 
                     # Mark metadata as already saved
                     self.metadata_saved[info_hash] = True
 
-                else:
-                    # No saved data - need to fetch metadata
-                    print(f"  📥 Fetching metadata from peers...")
-                    handle = self.ses.add_torrent(params)
-                    info = get_torrent_info(handle)
-
             else:
                 # Validate torrent file exists
                 if not os.path.exists(torrent_input):
@@ -158,24 +172,43 @@ class TorrentDownloader:
 
                 print(f"Adding torrent file: {torrent_input}")
                 info = lt.torrent_info(torrent_input)
-                params['ti'] = info
                 info_hash = str(info.info_hash())
 
                 # Check for existing resume data
-                resume_file = os.path.join(self.resume_data_path, f"{info_hash}.fastresume")
-                if os.path.exists(resume_file):
-                    print(f"  ⚡ Resume data found - checking existing files")
-                    with open(resume_file, 'rb') as f:
-                        params['resume_data'] = f.read()
+                params, resume_data = self.load_resume_params(info_hash)
+                if params is not None:
+                    print(f"  ⚡ Resume data found")
                 else:
-                    # No resume data, but force checking of existing files
-                    print(f"  🔍 Checking for existing files in download directory")
-
-                handle = self.ses.add_torrent(params)
-
-            # Force recheck to detect existing files
-            print(f"  ⏳ Scanning existing files (this may take a moment)...")
-            handle.force_recheck()
+                    params = lt.add_torrent_params()
+                params.ti = info
+
+            params.save_path = self.download_path
+            params.storage_mode = lt.storage_mode_t.storage_mode_sparse
+
+            # Setting the selection before adding means skipped files are
+            # never allocated
+            if info is not None and (self.include or self.exclude):
+                params.file_priorities = select_files(info, self.include, self.exclude,
+                                                      list(params.file_priorities) or None)
+                self.print_selection(info, params.file_priorities)
+
+            handle = self.ses.add_torrent(params)
+
+            if info is None:
+                # No saved data - need to fetch metadata
+                print(f"  📥 Fetching metadata from peers...")
+                info = get_torrent_info(handle)
+                if self.include or self.exclude:
+                    priorities = select_files(info, self.include, self.exclude)
+                    handle.prioritize_files(priorities)
+                    self.print_selection(info, priorities)
+
+            # Only hash-check the files if they don't match the resume data
+            elif self.recheck or not verify_resume_files(resume_data, info, self.download_path):
+                print(f"  ⏳ Scanning existing files (this may take a moment)...")
+                handle.force_recheck()
+            else:
+                print(f"  ✅ Files match resume data - skipping hash check")
 
             self.handles.append(handle)
 
@@ -206,6 +239,48 @@ class TorrentDownloader:
             traceback.print_exc()
             return False
 
+    def print_selection(self, info, priorities):
+        """Print how much of a torrent the file filters selected"""
+        selected, total, selected_bytes, total_bytes = selection_summary(info, priorities)
+        print(f"  Selected: {selected} of {total} files "
+              f"({format_size(selected_bytes)} of {format_size(total_bytes)})")
+
+    def fetch_info(self, torrent_input):
+        """
+        Return the torrent_info of a .torrent file or magnet link without downloading it
+
+        Magnets without saved metadata are added in upload mode, so only
+        the metadata is fetched, and removed again.
+        """
+        if not is_magnet_link(torrent_input):
+            return lt.torrent_info(torrent_input)
+
+        params = lt.parse_magnet_uri(torrent_input)
+        record = self.resume_store.get(str(params.info_hash)) or {}
+        if record.get('torrent'):
+            return lt.torrent_info(record['torrent'])
+
+        params.save_path = self.download_path
+        params.flags |= lt.torrent_flags.upload_mode
+        handle = self.ses.add_torrent(params)
+        try:
+            return get_torrent_info(handle)
+        finally:
+            self.ses.remove_torrent(handle)
+
+    def show_files(self, torrent_input):
+        """Print the files of a torrent with their size and whether the filters select them"""
+        info = self.fetch_info(torrent_input)
+        try:
+            priorities = select_files(info, self.include, self.exclude)
+        except ValueError:
+            priorities = [0] * info.num_files()
+
+        print(f"{info.name()}")
+        for index, path, size in list_files(info):
+            print(f"  {index:4}  {priority_name(priorities[index]):<6}  {format_size(size):>10}  {path}")
+        self.print_selection(info, priorities)
+
     def save_metadata_if_ready(self, handle):
         """Save torrent metadata to file if it has arrived (for magnet links)"""
         info_hash = str(handle.status().info_hash)
@@ -217,15 +292,12 @@ class TorrentDownloader:
         # Check if we have metadata
         if handle.status().has_metadata and handle.torrent_file():
             try:
-                torrent_file = os.path.join(self.resume_data_path, f"{info_hash}.torrent")
-
-                # Save the .torrent file
+                # Save the .torrent metadata
                 ti = handle.torrent_file()
                 try:
                     ct = lt.create_torrent(ti)
                     torrent_data = lt.bencode(ct.generate())
-                    with open(torrent_file, 'wb') as f:
-                        f.write(torrent_data)
+                    self.resume_store.put(info_hash, torrent=torrent_data)
                     print(f"\n✅ Saved metadata for {handle.status().name}")
                 except Exception as e:
                     print(f"\n⚠️  Could not save .torrent file: {e}")
@@ -233,6 +305,21 @@ class TorrentDownloader:
             except Exception as e:
                 print(f"\n⚠️  Failed to save metadata: {e}")
 
+    def stream_if_ready(self, handle):
+        """Start streaming a torrent once its metadata is available; returns its URL or None"""
+        if self.stream_server is None:
+            return None
+        info_hash = str(handle.info_hash())
+        if info_hash not in self.stream_urls and handle.torrent_file() is not None:
+            self.stream_urls[info_hash] = self.stream_server.add(handle)
+        return self.stream_urls.get(info_hash)
+
+    def stop_streaming(self):
+        """Stop the stream server, turning sequential download off again"""
+        if self.stream_server is not None:
+            self.stream_server.stop()
+            self.stream_server = None
+
     def download_all(self, seed_after=True):
         """Download all torrents in queue"""
         if not self.handles:
@@ -255,8 +342,10 @@ class TorrentDownloader:
 
                     # Save metadata if it arrived (for magnet links)
                     self.save_metadata_if_ready(h)
+                    stream_url = self.stream_if_ready(h)
 
-                    if not s.is_seeding:
+                    # A torrent with skipped files finishes without seeding
+                    if not s.is_finished:
                         all_complete = False
 
                     # Calculate stats
@@ -281,6 +370,8 @@ class TorrentDownloader:
                     # Status indicator
                     if s.is_seeding:
                         status = "✓ Seeding"
+                    elif s.is_finished:
+                        status = "✓ Finished"
                     elif s.paused:
                         status = "⏸ Paused"
                     elif s.state == lt.torrent_status.downloading:
@@ -295,6 +386,8 @@ class TorrentDownloader:
                     print(f"    [{bar}] {progress:.1f}%")
                     print(f"    {status} | ↓ {download_rate:.1f} KB/s | ↑ {upload_rate:.1f} KB/s | "
                           f"Peers: {num_peers} | ETA: {format_time(eta)}")
+                    if stream_url:
+                        print(f"    ▶ Stream: {stream_url}")
                     print()
 
                 time.sleep(1)
@@ -306,6 +399,17 @@ class TorrentDownloader:
             # Save resume data
             self.save_resume_data()
 
+            if not seed_after and self.stream_server is not None:
+                # Keep serving the finished files without uploading to anyone
+                for h in self.handles:
+                    h.pause()
+                print("\nStill serving streams:")
+                for url in self.stream_urls.values():
+                    print(f"  ▶ {url}")
+                print("Press Ctrl+C to stop and exit.")
+                while True:
+                    time.sleep(1)
+
             if seed_after:
                 print("\nSeeding all torrents... Press Ctrl+C to stop and exit.")
                 while True:
@@ -316,58 +420,58 @@ class TorrentDownloader:
                         upload_rate = s.upload_rate / 1000
                         print(f"[{idx+1}] {s.name[:50]}")
                         print(f"    Seeding: ↑ {upload_rate:.1f} KB/s | Peers: {s.num_peers}")
+                        stream_url = self.stream_urls.get(str(h.info_hash()))
+                        if stream_url:
+                            print(f"    ▶ Stream: {stream_url}")
                         print()
 
                     time.sleep(1)
 
         except KeyboardInterrupt:
             print("\n\nStopping downloads...")
+            self.stop_streaming()
             self.save_resume_data()
 
     def save_resume_data(self):
         """Save resume data for all torrents"""
         print("Saving resume data...")
 
-        # Request resume data for all torrents
-        for h in self.handles:
-            if h.is_valid():
-                h.save_resume_data()
+        # Wait for every torrent to answer instead of a fixed sleep
+        writer = ResumeDataWriter(self.resume_store)
+        result = ResumeFlusher(self.ses, writer).flush(self.handles)
+        writer.shutdown()
 
-        # Wait for resume data alerts
-        time.sleep(1)
+        print(f"Resume data saved for {result['saved']} torrent(s).")
 
-        # Process alerts and save resume data
-        alerts = self.ses.pop_alerts()
-        saved_count = 0
 
-        for alert in alerts:
-            if isinstance(alert, lt.save_resume_data_alert):
-                try:
-                    torrent_status = alert.handle.status()
-                    info_hash = str(torrent_status.info_hash)
-
-                    # Save resume data to file
-                    resume_file = os.path.join(self.resume_data_path, f"{info_hash}.fastresume")
-                    with open(resume_file, 'wb') as f:
-                        f.write(lt.bencode(alert.params))
-
-                    # Also save the torrent file if available
-                    if alert.handle.torrent_file():
-                        torrent_file = os.path.join(self.resume_data_path, f"{info_hash}.torrent")
-                        ti = alert.handle.torrent_file()
-                        try:
-                            ct = lt.create_torrent(ti)
-                            torrent_data = lt.bencode(ct.generate())
-                            with open(torrent_file, 'wb') as f:
-                                f.write(torrent_data)
-                        except Exception as e:
-                            print(f"Could not save .torrent file: {e}")
-
-                    saved_count += 1
-                except Exception as e:
-                    print(f"Error saving resume data: {e}")
+def send_to_daemon(torrents):
+    """
+    Add torrents to the running daemon through its control API
+
+    Returns:
+        int: Exit status (0 if every torrent was added)
+    """
+    client = control_api.connect(os.path.expanduser("~/.config/torrent-downloader/daemon.json"))
+    if client is None:
+        print("Torrent daemon is not running (start it with torrent-daemon.py)")
+        return 1
 
-        print(f"Resume data saved for {saved_count} torrent(s).")
+    items = [{'magnet': torrent} if is_magnet_link(torrent) else {'torrent': torrent}
+             for torrent in torrents]
+    try:
+        results = client.add_many(items)
+    except control_api.ControlError as e:
+        print(f"✗ Failed to send torrents to daemon: {e}")
+        return 1
+
+    failed = 0
+    for torrent, result in zip(torrents, results):
+        if 'error' in result:
+            print(f"✗ Failed to add {torrent}: {result['error']}")
+            failed += 1
+        else:
+            print(f"✓ Sent to daemon: {result['info_hash']}")
+    return 1 if failed else 0
 
 
 def main():
@@ -391,6 +495,19 @@ Examples:
 
   # Download and don't seed after
   %(prog)s --no-seed ubuntu.torrent
+
+  # Re-verify files already on disk
+  %(prog)s --recheck ubuntu.torrent
+
+  # Show the files of a torrent, then download only some of them
+  %(prog)s --list-files season.torrent
+  %(prog)s --include '*.mkv' --exclude '*sample*' season.torrent
+
+  # Watch a video while it downloads: open the printed URL in a media player
+  %(prog)s --stream movie.torrent
+
+  # Hand the torrents to a running torrent-daemon.py and exit
+  %(prog)s --daemon ubuntu.torrent
         """
     )
 
@@ -402,14 +519,41 @@ Examples:
                         help='Exit after download without seeding')
     parser.add_argument('--resume-dir', default='.torrent_resume',
                         help='Directory for resume data (default: .torrent_resume)')
+    parser.add_argument('--resume-backend', choices=['files', 'sqlite'], default='files',
+                        help='Store resume data as files or in one SQLite database '
+                             '(default: files; sqlite migrates existing files)')
+    parser.add_argument('--recheck', action='store_true',
+                        help='Hash-check existing files even when they match the resume data')
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                        help='Download only files matching this glob, by path or name '
+                             '(repeatable)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='Skip files matching this glob (repeatable)')
+    parser.add_argument('--list-files', action='store_true',
+                        help='List the files of each torrent, marking what the filters '
+                             'select, and exit without downloading')
+    parser.add_argument('--stream', action='store_true',
+                        help='Download sequentially and serve the largest file of each torrent '
+                             'on a localhost URL a media player can open while it downloads')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Add the torrents to the running torrent daemon instead of '
+                             'downloading in this process')
 
     args = parser.parse_args()
 
+    if args.daemon:
+        sys.exit(send_to_daemon(args.torrents))
+
     try:
         # Initialize downloader
         downloader = TorrentDownloader(
             download_path=args.directory,
-            resume_data_path=args.resume_dir
+            resume_data_path=args.resume_dir,
+            recheck=args.recheck,
+            resume_backend=args.resume_backend,
+            stream=args.stream,
+            include=args.include,
+            exclude=args.exclude
         )
 
         print("=" * 70)
@@ -419,6 +563,12 @@ Examples:
         print("=" * 70)
         print()
 
+        if args.list_files:
+            for torrent in args.torrents:
+                downloader.show_files(torrent)
+                print()
+            sys.exit(0)
+
         # Add all torrents to queue
         success_count = 0
         for torrent in args.torrents:
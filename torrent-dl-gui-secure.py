@@ -4,18 +4,51 @@ Secure Torrent Downloader with Privacy & Security Features
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import libtorrent as lt
 import threading
 import time
 import os
 import sys
 import json
-import socket
 import tempfile
-from torrent_search import TorrentSearcher
+from collections import deque
+import http_client
+from torrent_search import TorrentSearcher, SearchCache
 from privacy_security import PrivacySecurityChecker
-from torrent_utils import format_size, send_notification, sanitize_filename
+from torrent_utils import format_size, send_notification, sanitize_filename, parse_size, parse_count
+from status_engine import StatusEngine
+from tree_renderer import TreeRenderer
+from resume_data import (ResumeDataWriter, ResumeFlusher, ResumeCheckpointer, verify_resume_files,
+                         read_torrent_settings)
+from resume_store import open_resume_store
+from session_restore import SessionRestorer, apply_save_path
+from torrent_engine import build_session_settings
+from session_profiles import DEFAULT_PROFILE, PROFILES, PROFILE_DESCRIPTIONS, profile_settings
+import control_api
+from bulk_import import BulkImporter, ImportRouter, collect_items
+from ipc_protocol import IpcServer, IpcClient, ProtocolError, make_add_item, validate_add_item
+from torrent_registry import TorrentRegistry
+from storage_worker import StorageWorker
+from torrent_bandwidth import BandwidthAllocator, move_in_queue, restore_queue_order
+from bandwidth_scheduler import BandwidthSchedule, BandwidthScheduler
+from stream_server import StreamServer
+from file_selection import (PRIORITIES as FILE_PRIORITIES, DEFAULT_PRIORITY as DEFAULT_FILE_PRIORITY,
+                            list_files, priority_name, select_files, selection_summary)
+from throughput_history import RESOLUTIONS, ThroughputRecorder
+from session_metrics import DEFAULT_INTERVAL as METRICS_INTERVAL, MetricsServer, SessionMetrics
+
+
+DOWNLOAD_COLUMNS = ('Name', 'Size', 'Progress', 'Speed', 'ETA', 'Peers', 'Status',
+                    'Queue', 'Priority', 'Limits')
+
+# Seconds between updates of the per-torrent limits that carry priorities
+REBALANCE_INTERVAL = 5.0
+
+# Speed graph: what each resolution covers, and how often it is redrawn (ms)
+GRAPH_RANGES = {'1s': "Last 5 minutes", '1m': "Last 4 hours", '1h': "Last week"}
+GRAPH_AXIS_START = {'1s': "5 min ago", '1m': "4 h ago", '1h': "7 days ago"}
+GRAPH_REFRESH_MS = 1000
 
 
 class SecureTorrentGUI:
@@ -26,15 +59,30 @@ class SecureTorrentGUI:
 
         # Session and torrents
         self.ses = None
-        self.torrents = []
-        self.torrents_lock = threading.Lock()  # Protect torrents list from race conditions
+        self.registry = TorrentRegistry()  # Torrents by info hash, tree item and handle
+        self.bandwidth = BandwidthAllocator()  # Per-torrent priorities and limits
+        self.throughput = ThroughputRecorder()  # Rate and peer history for the speed graph
+        self.graphed_torrent = None  # Info hash the open speed graph shows, if any
+        self.rebalance_due = 0.0  # Monotonic time of the next per-torrent limit update
+        self.status_engine = None
+        self.import_router = None
         self.running = False
+        self.closing = False
         self.metadata_saved = set()  # Track which magnets have saved metadata
 
+        # Torrents restored in the background, waiting for their rows
+        self.session_restorer = None
+        self.restored_rows = deque()
+        self.restore_lock = threading.Lock()
+        self.restore_scheduled = False
+        self.restore_reported = False  # Rows from bulk imports share the queue afterwards
+        self.restored_queue = []  # (saved queue position, handle) until the restore finishes
+
         # Search and security
-        self.searcher = TorrentSearcher()
         self.security_checker = PrivacySecurityChecker()
         self.search_results = []
+        self.search_rows = []  # (item_id, sort keys) per search result row
+        self.search_generation = 0  # Bumped per search so late results of an old one are dropped
         self.sort_column = None
         self.sort_reverse = False
 
@@ -46,9 +94,13 @@ class SecureTorrentGUI:
         os.makedirs(self.config_dir, exist_ok=True)
         os.makedirs(self.resume_dir, exist_ok=True)
 
+        # Search results are cached across restarts to spare the public APIs
+        self.searcher = TorrentSearcher(
+            cache=SearchCache(path=os.path.join(self.config_dir, "search_cache.json")))
+
         # Single instance socket
         self.socket_path = os.path.join(tempfile.gettempdir(), "torrent-downloader-gui.sock")
-        self.ipc_socket = None
+        self.ipc_server = None
         self.start_ipc_server()
 
         # Dark mode
@@ -65,9 +117,38 @@ class SecureTorrentGUI:
         self.encryption_enabled = True
         self.dht_enabled = True  # Can be disabled for more privacy
 
+        # 'trust' rechecks only torrents whose files don't match their resume data,
+        # 'full' hash-checks every torrent on load
+        self.startup_check = 'trust'
+
+        # 'sqlite' keeps all resume data in resume.db, 'files' uses one file per hash and type
+        self.resume_backend = 'sqlite'
+
+        # Named connection, queue and disk settings (see session_profiles.py),
+        # plus individual libtorrent settings layered on top
+        self.performance_profile = DEFAULT_PROFILE
+        self.profile_overrides = {}
+
+        # Weekly slots overriding the limits above (see bandwidth_scheduler.py)
+        self.bandwidth_schedule = {'enabled': False, 'slots': []}
+        self.scheduler = None
+
+        # Local HTTP server for streaming mode, started on first use
+        self.stream_server = None
+
+        # libtorrent session counters (see session_metrics.py): a Prometheus
+        # endpoint when metrics_port is set, a JSONL log when metrics_log is
+        self.metrics_port = 0
+        self.metrics_log = ''
+        self.metrics_interval = METRICS_INTERVAL
+        self.metrics = None
+        self.metrics_server = None
+
         # Load saved settings
         self.load_settings()
 
+        self.resume_store = open_resume_store(self.resume_dir, self.resume_backend)
+
         self.setup_ui()
         self.init_session()
         self.load_session_state()
@@ -97,6 +178,18 @@ class SecureTorrentGUI:
                 self.dark_mode = settings.get('dark_mode', False)
                 self.encryption_enabled = settings.get('encryption_enabled', True)
                 self.dht_enabled = settings.get('dht_enabled', True)
+                self.startup_check = settings.get('startup_check', 'trust')
+                self.resume_backend = settings.get('resume_backend', 'sqlite')
+                self.performance_profile = settings.get('performance_profile', DEFAULT_PROFILE)
+                self.profile_overrides = settings.get('profile_overrides', {})
+                self.bandwidth_schedule = settings.get('bandwidth_schedule', self.bandwidth_schedule)
+                self.metrics_port = settings.get('metrics_port', 0)
+                self.metrics_log = settings.get('metrics_log', '')
+                self.metrics_interval = settings.get('metrics_interval', METRICS_INTERVAL)
+                if self.performance_profile not in PROFILES:
+                    print(f"Unknown performance profile {self.performance_profile!r}, "
+                          f"using {DEFAULT_PROFILE!r}")
+                    self.performance_profile = DEFAULT_PROFILE
         except Exception as e:
             print(f"Failed to load settings: {e}")
 
@@ -109,7 +202,15 @@ class SecureTorrentGUI:
                 'max_upload_rate': self.max_upload_rate,
                 'dark_mode': self.dark_mode,
                 'encryption_enabled': self.encryption_enabled,
-                'dht_enabled': self.dht_enabled
+                'dht_enabled': self.dht_enabled,
+                'startup_check': self.startup_check,
+                'resume_backend': self.resume_backend,
+                'performance_profile': self.performance_profile,
+                'profile_overrides': self.profile_overrides,
+                'bandwidth_schedule': self.bandwidth_schedule,
+                'metrics_port': self.metrics_port,
+                'metrics_log': self.metrics_log,
+                'metrics_interval': self.metrics_interval
             }
 
             with open(self.config_file, 'w') as f:
@@ -118,167 +219,76 @@ class SecureTorrentGUI:
             print(f"Failed to save settings: {e}")
 
     def load_session_state(self):
-        """Load saved torrents and resume them"""
-        try:
-            # Load all .torrent and .fastresume files from resume directory
-            if not os.path.exists(self.resume_dir):
+        """Restore saved torrents in the background; rows appear as each one is added"""
+        self.session_restorer = SessionRestorer(
+            self.ses, self.resume_store, self.download_path,
+            on_added=self.on_torrent_restored,
+            needs_recheck=self.needs_recheck
+        )
+        self.status_engine.subscribe(lt.add_torrent_alert, self.session_restorer.on_add_torrent)
+        self.session_restorer.start()
+
+    def on_torrent_restored(self, handle, entry):
+        """Queue a restored torrent for display (alert thread)"""
+        with self.restore_lock:
+            self.restored_rows.append((handle, entry))
+            if self.restore_scheduled:
                 return
+            self.restore_scheduled = True
+        self.root.after(0, self.show_restored_torrents)
+
+    def show_restored_torrents(self):
+        """Insert rows for every torrent restored since the last call (main thread)"""
+        with self.restore_lock:
+            batch = list(self.restored_rows)
+            self.restored_rows.clear()
+            self.restore_scheduled = False
+
+        for handle, entry in batch:
+            item_id = self.downloads_renderer.insert((
+                entry['name'],
+                format_size(entry['size']) if entry['size'] is not None else '?',
+                '0%',
+                '0 KB/s',
+                '-',
+                '0',
+                'Checking files' if entry['recheck'] else 'Queued',
+                '-', 'Normal', '-'
+            ))
 
-            # Find all unique info hashes from any file type
-            all_files = os.listdir(self.resume_dir)
-            info_hashes = set()
-
-            for filename in all_files:
-                if filename.endswith(('.fastresume', '.torrent', '.magnet')):
-                    info_hash = filename.rsplit('.', 1)[0]
-                    info_hashes.add(info_hash)
-
-            for info_hash in info_hashes:
-                resume_file = os.path.join(self.resume_dir, f"{info_hash}.fastresume")
+            self.register_torrent(handle, handle.torrent_file(), item_id, entry['info_hash'])
 
-                try:
-                    # Load resume data if available and valid
-                    if os.path.exists(resume_file) and os.path.getsize(resume_file) > 10:
-                        try:
-                            with open(resume_file, 'rb') as f:
-                                resume_data = f.read()
-                            # Use read_resume_data() for proper loading
-                            params = lt.read_resume_data(resume_data)
-                            params.save_path = self.download_path
-                            print(f"  Loaded resume data for {info_hash}")
-                        except Exception as e:
-                            print(f"  Resume data invalid, starting fresh: {e}")
-                            # Invalid resume data, create fresh params
-                            params = lt.add_torrent_params()
-                            params.save_path = self.download_path
-                    else:
-                        # No resume data or file too small (corrupted), create fresh params
-                        if os.path.exists(resume_file):
-                            print(f"  Resume file too small ({os.path.getsize(resume_file)} bytes), starting fresh")
-                        params = lt.add_torrent_params()
-                        params.save_path = self.download_path
-
-                    # Check for .torrent file first (preferred)
-                    torrent_file = os.path.join(self.resume_dir, f"{info_hash}.torrent")
-                    if os.path.exists(torrent_file):
-                        # Load full torrent info
-                        ti = lt.torrent_info(torrent_file)
-                        params.ti = ti
-                        print(f"Loading torrent: {ti.name()}")
-                    else:
-                        # Fall back to .magnet file
-                        magnet_file = os.path.join(self.resume_dir, f"{info_hash}.magnet")
-                        if os.path.exists(magnet_file):
-                            with open(magnet_file, 'r') as f:
-                                magnet = f.read().strip()
-                            # Parse magnet and update params
-                            magnet_params = lt.parse_magnet_uri(magnet)
-                            params.info_hash = magnet_params.info_hash
-                            if magnet_params.name:
-                                params.name = magnet_params.name
-                            params.trackers = magnet_params.trackers
-                            print(f"Loading magnet: {magnet_params.name or info_hash}")
-                        else:
-                            # No metadata available, just use info hash
-                            print(f"Loading torrent by info hash: {info_hash}")
-
-                    # Add the torrent
-                    handle = self.ses.add_torrent(params)
-
-                    # Check existing files
-                    handle.force_recheck()
-
-                    # Add to UI
-                    item_id = self.tree.insert('', 'end', values=(
-                        'Loading...',
-                        '?',
-                        '0%',
-                        '0 KB/s',
-                        '-',
-                        '0',
-                        'Checking files'
-                    ))
-
-                    with self.torrents_lock:
-                        self.torrents.append({
-                            'handle': handle,
-                            'info': handle.torrent_file() if handle.torrent_file() else None,
-                            'item_id': item_id,
-                            'completed': False
-                        })
-
-                    # Mark metadata as saved if we have torrent file
-                    if os.path.exists(torrent_file):
-                        self.metadata_saved.add(info_hash)
+            saved = entry.get('torrent_settings')
+            if saved:
+                self.bandwidth.load(entry['info_hash'], saved)
+                self.restored_queue.append((saved.get('queue_position', -1), handle))
 
-                except Exception as e:
-                    print(f"Failed to resume {filename}: {e}")
-                    import traceback
-                    traceback.print_exc()
+            # Mark metadata as saved if it was restored from the store
+            if entry['has_metadata'] and not entry.get('imported'):
+                self.metadata_saved.add(entry['info_hash'])
 
-        except Exception as e:
-            print(f"Failed to load session state: {e}")
-            import traceback
-            traceback.print_exc()
+        restorer = self.session_restorer
+        if self.restore_reported:
+            return
+        if restorer.is_finished():
+            self.status_var.set(f"Restored {restorer.restored} torrent(s)")
+            self.restore_reported = True
+            restore_queue_order(self.restored_queue)
+            self.restored_queue = []
+        else:
+            self.status_var.set(f"Restoring torrents... {restorer.restored}/{restorer.total}")
 
     def save_session_state(self):
-        """Save all torrents for resume"""
+        """Save all torrents for resume, waiting until every request is answered"""
         try:
             if not self.ses:
                 return
 
-            # Request resume data for all torrents
-            for torrent in self.torrents:
-                try:
-                    handle = torrent['handle']
-                    if handle.is_valid():
-                        handle.save_resume_data()
-                except:
-                    pass
-
-            # Wait a bit for resume data alerts
-            time.sleep(0.5)
-
-            # Process alerts and save resume data
-            alerts = self.ses.pop_alerts()
-            for alert in alerts:
-                if isinstance(alert, lt.save_resume_data_alert):
-                    try:
-                        handle = alert.handle
-                        status = handle.status()
-                        info_hash = str(status.info_hash)
-
-                        # Save resume data
-                        resume_file = os.path.join(self.resume_dir, f"{info_hash}.fastresume")
-                        with open(resume_file, 'wb') as f:
-                            f.write(lt.bencode(alert.params))
-
-                        # Save torrent metadata if available
-                        if handle.torrent_file():
-                            ti = handle.torrent_file()
-
-                            # Save .torrent file (preferred for resume)
-                            torrent_file = os.path.join(self.resume_dir, f"{info_hash}.torrent")
-                            try:
-                                # Create torrent from torrent_info and generate bencode
-                                ct = lt.create_torrent(ti)
-                                torrent_data = lt.bencode(ct.generate())
-                                with open(torrent_file, 'wb') as f:
-                                    f.write(torrent_data)
-                            except Exception as e:
-                                print(f"Could not save .torrent file: {e}")
-
-                            # Also save magnet link as backup
-                            try:
-                                magnet = lt.make_magnet_uri(ti)
-                                magnet_file = os.path.join(self.resume_dir, f"{info_hash}.magnet")
-                                with open(magnet_file, 'w') as f:
-                                    f.write(magnet)
-                            except Exception as e:
-                                print(f"Could not save .magnet file: {e}")
+            handles = [torrent.handle for torrent in self.registry.snapshot()]
 
-                    except Exception as e:
-                        print(f"Failed to save torrent resume data: {e}")
+            result = self.resume_flusher.flush(handles, timeout=30.0)
+            print(f"Resume data saved for {result['saved']} torrent(s) "
+                  f"({result['failed']} failed, {result['timed_out']} timed out)")
 
         except Exception as e:
             print(f"Failed to save session state: {e}")
@@ -414,6 +424,10 @@ class SecureTorrentGUI:
         self.notebook.add(self.settings_tab, text="⚙️ Settings")
         self.setup_settings_tab()
 
+        self.speed_tab = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.speed_tab, text="📈 Speed")
+        self.setup_speed_tab()
+
         # Status bar (status_var already initialized above)
         status_bar = ttk.Label(main_frame, textvariable=self.status_var,
                               relief=tk.SUNKEN, padding=5)
@@ -435,10 +449,16 @@ class SecureTorrentGUI:
         self.setup_keyboard_shortcuts()
 
     def setup_menu_bar(self):
-        """Setup menu bar with Help menu"""
+        """Setup menu bar with File and Help menus"""
         menubar = tk.Menu(self.root)
         self.root.config(menu=menubar)
 
+        # File menu
+        file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="📂 Import Torrent Folder...", command=self.import_torrent_folder)
+        file_menu.add_command(label="🧲 Import Magnet List...", command=self.import_magnet_list)
+
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
@@ -537,16 +557,15 @@ https://github.com/IsThatLegal/torrent
         if not selection:
             return
 
-        with self.torrents_lock:
-            torrent = self.get_torrent_by_item_id(selection[0])
-            if torrent:
-                handle = torrent['handle']
-                if handle.status().paused:
-                    handle.resume()
-                    self.status_var.set("Resumed")
-                else:
-                    handle.pause()
-                    self.status_var.set("Paused")
+        torrent = self.registry.get_by_item(selection[0])
+        if torrent:
+            handle = torrent.handle
+            if handle.flags() & lt.torrent_flags.paused:
+                handle.resume()
+                self.status_var.set("Resumed")
+            else:
+                handle.pause()
+                self.status_var.set("Paused")
 
     def select_all_torrents(self):
         """Select all torrents in downloads list"""
@@ -800,7 +819,7 @@ https://github.com/IsThatLegal/torrent
         downloads_frame.columnconfigure(0, weight=1)
         downloads_frame.rowconfigure(0, weight=1)
 
-        columns = ('Name', 'Size', 'Progress', 'Speed', 'ETA', 'Peers', 'Status')
+        columns = DOWNLOAD_COLUMNS
         self.tree = ttk.Treeview(downloads_frame, columns=columns, show='headings', height=12)
 
         # Make columns sortable
@@ -818,9 +837,16 @@ https://github.com/IsThatLegal/torrent
         self.tree.column('ETA', width=80)
         self.tree.column('Peers', width=60)
         self.tree.column('Status', width=120)
+        self.tree.column('Queue', width=50)
+        self.tree.column('Priority', width=70)
+        self.tree.column('Limits', width=110)
 
         scrollbar = ttk.Scrollbar(downloads_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        # Background updates go through the renderer, which only sends
+        # changed cells of visible rows to Tk, once per frame
+        self.downloads_renderer = TreeRenderer(self.root, self.tree, columns)
+        self.downloads_renderer.attach_scrollbar(scrollbar)
 
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
@@ -849,6 +875,138 @@ https://github.com/IsThatLegal/torrent
         ttk.Button(control_frame, text="Clear Completed",
                   command=self.clear_completed).pack(side=tk.LEFT, padx=5)
 
+    def setup_speed_tab(self):
+        """Setup the speed graph tab"""
+        self.speed_tab.columnconfigure(0, weight=1)
+        self.speed_tab.rowconfigure(1, weight=1)
+
+        controls = ttk.Frame(self.speed_tab)
+        controls.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+
+        ttk.Label(controls, text="Show:").pack(side=tk.LEFT)
+        self.graph_scope_var = tk.StringVar(value="Session")
+        ttk.Combobox(controls, textvariable=self.graph_scope_var, state='readonly', width=16,
+                     values=["Session", "Selected torrent"]).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(controls, text="Range:").pack(side=tk.LEFT, padx=(10, 0))
+        self.graph_range_var = tk.StringVar(value=GRAPH_RANGES['1s'])
+        ttk.Combobox(controls, textvariable=self.graph_range_var, state='readonly', width=16,
+                     values=list(GRAPH_RANGES.values())).pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(controls, text="Export CSV...",
+                   command=self.export_speed_history).pack(side=tk.RIGHT)
+
+        self.speed_canvas = tk.Canvas(self.speed_tab, height=300, highlightthickness=0)
+        self.speed_canvas.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.graph_legend_var = tk.StringVar()
+        ttk.Label(self.speed_tab, textvariable=self.graph_legend_var).grid(
+            row=2, column=0, sticky=tk.W, pady=(5, 0))
+
+        self.root.after(GRAPH_REFRESH_MS, self.refresh_speed_graph)
+
+    def graph_selection(self):
+        """
+        Return what the speed graph shows
+
+        Returns:
+            tuple: (info_hash or None for the session, resolution, title)
+        """
+        resolution = next((name for name, label in GRAPH_RANGES.items()
+                           if label == self.graph_range_var.get()), '1s')
+        if self.graph_scope_var.get() == "Selected torrent":
+            selection = self.tree.selection()
+            torrent = self.registry.get_by_item(selection[0]) if selection else None
+            if torrent:
+                return torrent.info_hash, resolution, self.torrent_name(torrent)
+            return None, resolution, "Session (no torrent selected)"
+        return None, resolution, "Session"
+
+    def refresh_speed_graph(self):
+        """Redraw the speed graph while its tab is showing"""
+        try:
+            if self.notebook.select() == str(self.speed_tab):
+                # Tells the update loop to keep sampling this torrent
+                self.graphed_torrent = self.graph_selection()[0]
+                self.draw_speed_graph()
+            else:
+                self.graphed_torrent = None
+        except Exception as e:
+            print(f"Speed graph error: {e}")
+        if not self.closing:
+            self.root.after(GRAPH_REFRESH_MS, self.refresh_speed_graph)
+
+    def draw_speed_graph(self):
+        """Draw download and upload rates of the current selection"""
+        info_hash, resolution, title = self.graph_selection()
+        samples = self.throughput.samples(info_hash, resolution)
+        step, capacity = RESOLUTIONS[resolution]
+
+        canvas = self.speed_canvas
+        theme = self.themes['dark'] if self.dark_mode else self.themes['light']
+        canvas.configure(bg=theme['entry_bg'])
+        canvas.delete('all')
+        width = max(canvas.winfo_width(), 200)
+        height = max(canvas.winfo_height(), 100)
+        left, right, top, bottom = 70, 10, 10, 20
+
+        # Round the scale up to 1, 2 or 5 times a power of ten
+        peak = max([max(d, u) for _, d, u, _ in samples] + [1000])
+        scale = 1
+        while scale * 10 <= peak:
+            scale *= 10
+        scale = next(m * scale for m in (1, 2, 5, 10) if m * scale >= peak)
+
+        for i in range(5):
+            y = top + (height - top - bottom) * i / 4
+            canvas.create_line(left, y, width - right, y, fill=theme['button_bg'])
+            canvas.create_text(left - 5, y, anchor=tk.E, fill=theme['fg'],
+                               text=f"{scale * (4 - i) / 4 / 1000:.0f} KB/s")
+        canvas.create_text(left, height - 2, anchor=tk.SW, fill=theme['fg'],
+                           text=GRAPH_AXIS_START[resolution])
+        canvas.create_text(width - right, height - 2, anchor=tk.SE, fill=theme['fg'], text="now")
+
+        if samples:
+            # The newest sample is at the right edge; the full buffer spans the width
+            x_step = (width - left - right) / max(capacity - 1, 1)
+            x0 = width - right - (len(samples) - 1) * x_step
+            for column, color in ((1, '#2196F3'), (2, '#4CAF50')):
+                points = []
+                for i, sample in enumerate(samples):
+                    points.append(x0 + i * x_step)
+                    points.append(height - bottom - (height - top - bottom) * sample[column] / scale)
+                if len(points) >= 4:
+                    canvas.create_line(*points, fill=color, width=2)
+
+            _, download, upload, peers = samples[-1]
+            average_down = sum(s[1] for s in samples) / len(samples)
+            average_up = sum(s[2] for s in samples) / len(samples)
+            self.graph_legend_var.set(
+                f"{title}  —  ↓ {download / 1000:.0f} KB/s (avg {average_down / 1000:.0f})  "
+                f"↑ {upload / 1000:.0f} KB/s (avg {average_up / 1000:.0f})  Peers: {peers}  "
+                f"[blue = download, green = upload]")
+        else:
+            self.graph_legend_var.set(f"{title}  —  no data yet")
+
+    def export_speed_history(self):
+        """Save the samples the speed graph shows as CSV"""
+        info_hash, resolution, title = self.graph_selection()
+        path = filedialog.asksaveasfilename(
+            title="Export Speed History",
+            defaultextension=".csv",
+            initialfile=f"speed-{resolution}.csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            with open(path, 'w', newline='') as f:
+                rows = self.throughput.export_csv(f, info_hash, resolution)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export speed history:\n{e}")
+            return
+        self.status_var.set(f"Exported {rows} samples of {title} to {os.path.basename(path)}")
+
     def setup_settings_tab(self):
         """Setup settings tab with privacy options"""
         # Download path
@@ -900,58 +1058,202 @@ https://github.com/IsThatLegal/torrent
         ttk.Button(bandwidth_frame, text="Apply Limits",
                   command=self.apply_limits).grid(row=0, column=2, rowspan=2, padx=20)
 
+        # Bandwidth schedule
+        schedule_frame = ttk.LabelFrame(self.settings_tab, text="Bandwidth Schedule", padding="10")
+        schedule_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        schedule_frame.columnconfigure(0, weight=1)
+
+        self.schedule_enabled_var = tk.BooleanVar(value=self.bandwidth_schedule.get('enabled', False))
+        ttk.Checkbutton(schedule_frame, text="Follow the schedule (limits above apply outside it)",
+                       variable=self.schedule_enabled_var).grid(row=0, column=0, sticky=tk.W)
+        ttk.Label(schedule_frame,
+                  text="One slot per line, the first match wins:  mon-fri 09:00-17:00 down=500 up=100\n"
+                       "Rates in KB/s (0 = unlimited); also downloads=, seeds=, active=; "
+                       "22:00-06:00 runs past midnight"
+                  ).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.schedule_text = tk.Text(schedule_frame, height=4, width=70)
+        self.schedule_text.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
+        try:
+            schedule_lines = BandwidthSchedule.from_settings(
+                dict(self.bandwidth_schedule, enabled=True)).format()
+        except ValueError as e:
+            print(f"Invalid bandwidth schedule: {e}")
+            schedule_lines = ""
+        self.schedule_text.insert('1.0', schedule_lines)
+        ttk.Button(schedule_frame, text="Apply Schedule",
+                  command=self.apply_schedule).grid(row=2, column=1, padx=20)
+
+        # Startup file check
+        startup_frame = ttk.LabelFrame(self.settings_tab, text="Startup File Check", padding="10")
+        startup_frame.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+
+        self.startup_check_var = tk.StringVar(value=self.startup_check)
+        ttk.Radiobutton(startup_frame, text="Trust resume data (check file sizes and dates only)",
+                       variable=self.startup_check_var, value='trust',
+                       command=self.apply_startup_check).grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Radiobutton(startup_frame, text="Full hash check of every torrent (slow)",
+                       variable=self.startup_check_var, value='full',
+                       command=self.apply_startup_check).grid(row=1, column=0, sticky=tk.W, pady=2)
+
+        # Performance profile
+        profile_frame = ttk.LabelFrame(self.settings_tab, text="Performance Profile", padding="10")
+        profile_frame.grid(row=5, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+
+        self.profile_var = tk.StringVar(value=self.performance_profile)
+        profile_box = ttk.Combobox(profile_frame, textvariable=self.profile_var,
+                                   values=list(PROFILES), state='readonly', width=14)
+        profile_box.grid(row=0, column=0, sticky=tk.W, padx=5)
+        profile_box.bind('<<ComboboxSelected>>', self.show_profile_description)
+        ttk.Button(profile_frame, text="Apply Profile",
+                  command=self.apply_profile).grid(row=0, column=1, padx=20)
+        self.profile_description = ttk.Label(profile_frame,
+                                             text=PROFILE_DESCRIPTIONS[self.performance_profile])
+        self.profile_description.grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
         # Appearance settings
         appearance_frame = ttk.LabelFrame(self.settings_tab, text="Appearance", padding="10")
-        appearance_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        appearance_frame.grid(row=6, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
 
         self.dark_mode_button = ttk.Button(appearance_frame,
                                           text='🌙 Dark Mode',
                                           command=self.toggle_dark_mode)
         self.dark_mode_button.pack(pady=10)
 
-    def init_session(self):
-        """Initialize libtorrent session with privacy settings"""
-        self.ses = lt.session()
-        settings = self.ses.get_settings()
-        settings['listen_interfaces'] = '0.0.0.0:6881'
-        settings['enable_dht'] = self.dht_enabled
-        settings['enable_lsd'] = True
-        settings['enable_upnp'] = True
-        settings['enable_natpmp'] = True
-
-        # Bandwidth limits (apply saved or default settings)
+    def apply_startup_check(self):
+        """Save the startup file check mode"""
+        self.startup_check = self.startup_check_var.get()
+        self.save_settings()
+
+    def show_profile_description(self, event=None):
+        """Describe the profile picked in the dropdown"""
+        self.profile_description.config(text=PROFILE_DESCRIPTIONS[self.profile_var.get()])
+
+    def apply_profile(self):
+        """Switch the running session to the selected performance profile"""
+        name = self.profile_var.get()
+        try:
+            self.ses.apply_settings(profile_settings(name, self.profile_overrides))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to apply profile: {e}")
+            return
+
+        self.performance_profile = name
+        self.save_settings()
+        self.status_var.set(f"Performance profile: {name}")
+
+        # Slots in effect keep their caps over the profile's
+        self.scheduler.set_base(self.scheduler_base())
+
+    def scheduler_base(self):
+        """Settings in effect outside every schedule slot"""
+        settings = profile_settings(self.performance_profile, self.profile_overrides)
         settings['download_rate_limit'] = self.max_download_rate
         settings['upload_rate_limit'] = self.max_upload_rate
+        return settings
 
-        # Connection limits to prevent bandwidth hogging
-        settings['connections_limit'] = 200        # Max total connections
-        settings['active_downloads'] = 3           # Max active downloads at once
-        settings['active_seeds'] = 5               # Max active seeds at once
-        settings['active_limit'] = 8               # Max active torrents total
-
-        # Per-torrent connection limits
-        settings['unchoke_slots_limit'] = 8        # Max upload slots per torrent
-        settings['max_peerlist_size'] = 1000       # Limit peer list size
-
-        # Rate-based unchoking for smoother bandwidth usage
-        settings['seed_choking_algorithm'] = lt.seed_choking_algorithm_t.fastest_upload
-        settings['choking_algorithm'] = lt.choking_algorithm_t.rate_based_choker
-
-        # Privacy: Enable encryption
-        if self.encryption_enabled:
-            settings['out_enc_policy'] = lt.enc_policy.enabled
-            settings['in_enc_policy'] = lt.enc_policy.enabled
-            settings['allowed_enc_level'] = lt.enc_level.both
+    def load_schedule(self):
+        """Return the saved schedule, or None if it is off or invalid"""
+        try:
+            return BandwidthSchedule.from_settings(self.bandwidth_schedule)
+        except ValueError as e:
+            print(f"Ignoring invalid bandwidth schedule: {e}")
+            return None
+
+    def apply_schedule(self):
+        """Parse the schedule text and start following it"""
+        try:
+            schedule = BandwidthSchedule.parse(self.schedule_text.get('1.0', tk.END))
+        except ValueError as e:
+            messagebox.showerror("Invalid Schedule", str(e))
+            return
+
+        enabled = self.schedule_enabled_var.get()
+        self.bandwidth_schedule = {'enabled': enabled, 'slots': schedule.to_list()}
+        self.save_settings()
+        self.status_var.set("Bandwidth schedule saved" if enabled else "Bandwidth schedule off")
+        self.scheduler.set_schedule(schedule if enabled else None)
+
+    def on_schedule_change(self, settings, slot):
+        """Report new scheduled limits (scheduler thread)"""
+        self.rebalance_due = 0.0
+        if slot is None:
+            text = "Bandwidth schedule: regular limits"
         else:
-            settings['out_enc_policy'] = lt.enc_policy.disabled
-            settings['in_enc_policy'] = lt.enc_policy.disabled
+            text = f"Bandwidth schedule: {slot.format()}"
+        self.root.after(0, lambda: self.status_var.set(text))
 
-        self.ses.apply_settings(settings)
+    def session_caps(self):
+        """Return the session (download, upload) limits currently in effect"""
+        current = self.scheduler.current if self.scheduler else {}
+        return (current.get('download_rate_limit', self.max_download_rate),
+                current.get('upload_rate_limit', self.max_upload_rate))
+
+    def init_session(self):
+        """Initialize libtorrent session with privacy settings"""
+        self.ses = lt.session(build_session_settings(
+            download_rate=self.max_download_rate,
+            upload_rate=self.max_upload_rate,
+            encryption=self.encryption_enabled,
+            dht=self.dht_enabled,
+            profile=self.performance_profile,
+            profile_overrides=self.profile_overrides
+        ))
+
+        self.status_engine = StatusEngine(self.ses)
+        self.resume_writer = ResumeDataWriter(self.resume_store,
+                                              torrent_settings=self.bandwidth.saved)
+        self.resume_flusher = ResumeFlusher(self.ses, self.resume_writer)
+
+        # Checkpoint changed torrents while running, so a crash doesn't lose
+        # all progress since startup
+        self.resume_checkpointer = ResumeCheckpointer(self.resume_writer)
+        self.status_engine.subscribe(lt.save_resume_data_alert,
+                                     self.resume_checkpointer.on_resume_data)
+        self.status_engine.subscribe(lt.save_resume_data_failed_alert,
+                                     self.resume_checkpointer.on_resume_failed)
+
+        # Deleting and moving files happens on libtorrent's disk threads
+        self.storage_worker = StorageWorker(self.ses, on_progress=self.on_storage_progress)
+
+        # Time-of-day limits, re-evaluated every minute in the background
+        self.scheduler = BandwidthScheduler(self.ses, self.scheduler_base(), self.load_schedule(),
+                                            on_change=self.on_schedule_change)
+        self.scheduler.start()
+        self.status_engine.subscribe(lt.torrent_deleted_alert, self.storage_worker.on_deleted)
+        self.status_engine.subscribe(lt.torrent_delete_failed_alert,
+                                     self.storage_worker.on_delete_failed)
+        self.status_engine.subscribe(lt.storage_moved_alert, self.storage_worker.on_moved)
+        self.status_engine.subscribe(lt.storage_moved_failed_alert,
+                                     self.storage_worker.on_move_failed)
+
+        # Bulk imports come and go; the router stays subscribed
+        self.import_router = ImportRouter()
+        self.status_engine.subscribe(lt.add_torrent_alert, self.import_router.on_add_torrent)
+        self.init_metrics()
 
         self.running = True
         self.update_thread = threading.Thread(target=self.update_loop, daemon=True)
         self.update_thread.start()
 
+    def init_metrics(self):
+        """Sample session counters, and export them if settings.json asks to"""
+        log_path = os.path.expanduser(self.metrics_log) if self.metrics_log else None
+        try:
+            self.metrics = SessionMetrics(self.ses, self.metrics_interval, log_path)
+        except OSError as e:
+            print(f"Cannot open metrics log {log_path}: {e}")
+            self.metrics = SessionMetrics(self.ses, self.metrics_interval)
+        self.status_engine.subscribe(lt.session_stats_alert, self.metrics.on_session_stats)
+
+        if self.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, self.metrics_port)
+                self.metrics_server.start()
+                print(f"Metrics on http://127.0.0.1:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                print(f"Cannot serve metrics on 127.0.0.1:{self.metrics_port}: {e}")
+                self.metrics_server = None
+
     def apply_privacy_settings(self):
         """Apply privacy settings"""
         try:
@@ -992,31 +1294,67 @@ https://github.com/IsThatLegal/torrent
 
         self.status_var.set(f"Searching for '{query}'...")
         self.search_results = []
+        self.search_rows = []
+        self.search_generation += 1
+        generation = self.search_generation
 
         def do_search():
             try:
-                results = self.searcher.search_all(query, limit=50)
-                self.search_results = results
-                self.root.after(0, lambda: self.display_search_results(results))
+                # Show each source's results as soon as it answers
+                for source, results in self.searcher.search_stream(query, limit=50):
+                    if results:
+                        self.root.after(0, lambda r=results, s=source:
+                                        self.append_search_results(generation, s, r))
+                self.root.after(0, lambda: self.finish_search(generation))
             except Exception as e:
                 self.root.after(0, lambda: messagebox.showerror("Search Error", str(e)))
 
         threading.Thread(target=do_search, daemon=True).start()
 
-    def display_search_results(self, results):
-        """Display search results"""
-        for item in self.search_tree.get_children():
-            self.search_tree.delete(item)
+    def append_search_results(self, generation, source, results):
+        """Add one source's results to the search list (main thread)"""
+        if generation != self.search_generation:
+            return  # A newer search has started
 
-        for result in results:
-            self.search_tree.insert('', 'end', values=(
+        room = 50 - len(self.search_results)
+        for result in results[:room]:
+            self.search_results.append(result)
+            item_id = self.search_tree.insert('', 'end', values=(
                 result['name'],
                 result['size'],
                 result['seeders'],
                 result['source']
             ))
-
-        self.status_var.set(f"Found {len(results)} results")
+            self.search_rows.append((item_id, self.search_sort_keys(result)))
+
+        # Keep a chosen sort as results from slower sources arrive
+        if self.sort_column:
+            self.apply_search_order()
+
+        self.status_var.set(f"Found {len(self.search_results)} results so far ({source})...")
+
+    def finish_search(self, generation):
+        """Report the final result count once every source has answered (main thread)"""
+        if generation == self.search_generation:
+            self.status_var.set(f"Found {len(self.search_results)} results")
+
+    @staticmethod
+    def search_sort_keys(result):
+        """
+        Compute the sort keys of a search result once, when it arrives
+
+        Sources that only give a size string have it parsed here rather
+        than on every click.
+        """
+        size_bytes = result.get('size_bytes')
+        if size_bytes is None:
+            size_bytes = parse_size(result.get('size', ''))
+        return {
+            'name': str(result.get('name', '')).lower(),
+            'size': size_bytes,
+            'seeders': parse_count(result.get('seeders', 0)),
+            'source': str(result.get('source', '')).lower(),
+        }
 
     def sort_search_results(self, column):
         """Sort search results by column"""
@@ -1030,40 +1368,6 @@ https://github.com/IsThatLegal/torrent
             self.sort_column = column
             self.sort_reverse = False
 
-        # Define sort key functions
-        def get_sort_key(result):
-            if column == 'name':
-                return result.get('name', '').lower()
-            elif column == 'size':
-                # Convert size string to bytes for proper sorting
-                size_str = result.get('size', '0 B')
-                try:
-                    parts = size_str.split()
-                    if len(parts) == 2:
-                        value = float(parts[0])
-                        unit = parts[1].upper()
-                        multipliers = {'B': 1, 'KB': 1024, 'MB': 1024**2,
-                                     'GB': 1024**3, 'TB': 1024**4}
-                        return value * multipliers.get(unit, 0)
-                except:
-                    pass
-                return 0
-            elif column == 'seeders':
-                # Handle "500+" format
-                seeders = result.get('seeders', '0')
-                try:
-                    if isinstance(seeders, str):
-                        seeders = seeders.replace('+', '').replace(',', '')
-                    return int(seeders)
-                except:
-                    return 0
-            elif column == 'source':
-                return result.get('source', '').lower()
-            return ''
-
-        # Sort the results
-        sorted_results = sorted(self.search_results, key=get_sort_key, reverse=self.sort_reverse)
-
         # Update column headers to show sort direction
         arrow = ' ▲' if self.sort_reverse else ' ▼'
         self.search_tree.heading('Name', text='Name' + (arrow if column == 'name' else ' ▼'))
@@ -1071,8 +1375,13 @@ https://github.com/IsThatLegal/torrent
         self.search_tree.heading('Seeders', text='Seeders' + (arrow if column == 'seeders' else ' ▼'))
         self.search_tree.heading('Source', text='Source' + (arrow if column == 'source' else ' ▼'))
 
-        # Display sorted results
-        self.display_search_results(sorted_results)
+        self.apply_search_order()
+
+    def apply_search_order(self):
+        """Reorder the search rows by the current sort column in one Tk call"""
+        column = self.sort_column
+        rows = sorted(self.search_rows, key=lambda row: row[1][column], reverse=self.sort_reverse)
+        self.search_tree.set_children('', *[item_id for item_id, _ in rows])
 
     def download_from_search(self, event=None):
         """Download from search results"""
@@ -1101,8 +1410,7 @@ https://github.com/IsThatLegal/torrent
 
         def download_and_add():
             try:
-                import requests
-                response = requests.get(url, timeout=30)
+                response = http_client.get(url, timeout=30)
                 if response.status_code == 200:
                     # Sanitize filename to prevent path traversal
                     safe_name = sanitize_filename(name)
@@ -1110,7 +1418,7 @@ https://github.com/IsThatLegal/torrent
 
                     with open(temp_path, 'wb') as f:
                         f.write(response.content)
-                    self.root.after(0, lambda: self.add_torrent_file(temp_path))
+                    self.root.after(0, lambda: self.add_torrent_file(temp_path, choose_files=True))
                 else:
                     self.root.after(0, lambda: messagebox.showerror("Error",
                                     "Failed to download torrent file"))
@@ -1126,10 +1434,17 @@ https://github.com/IsThatLegal/torrent
             filetypes=[("Torrent files", "*.torrent"), ("All files", "*.*")]
         )
         if filename:
-            self.add_torrent_file(filename)
+            self.add_torrent_file(filename, choose_files=True)
+
+    def add_torrent_file(self, filepath, choose_files=False):
+        """
+        Add torrent file with validation
 
-    def add_torrent_file(self, filepath):
-        """Add torrent file with validation"""
+        Args:
+            filepath: Path of the .torrent file
+            choose_files: Ask which files to download if the torrent has
+                several and no saved selection
+        """
         # Validate file path
         if not filepath or not isinstance(filepath, str):
             messagebox.showerror("Invalid Input", "File path cannot be empty")
@@ -1182,45 +1497,54 @@ https://github.com/IsThatLegal/torrent
                     "Torrent file is missing required name field")
                 return
 
-            params = {
-                'ti': info,
-                'save_path': self.download_path,
-                'storage_mode': lt.storage_mode_t.storage_mode_sparse,
-            }
+            params = lt.add_torrent_params()
 
             # Check for resume data
             info_hash = str(info.info_hash())
-            resume_file = os.path.join(self.resume_dir, f"{info_hash}.fastresume")
-            if os.path.exists(resume_file):
+            record = self.resume_store.get(info_hash)
+            resume_data = record['resume'] if record else None
+            if resume_data:
                 try:
-                    with open(resume_file, 'rb') as f:
-                        params['resume_data'] = f.read()
+                    params = lt.read_resume_data(resume_data)
                     self.status_var.set("Loading resume data...")
                 except Exception as e:
                     print(f"Failed to load resume data: {e}")
+                    resume_data = None
+                    params = lt.add_torrent_params()
+
+            # Resume data already holds the earlier selection
+            if choose_files and not resume_data and len(list_files(info)) > 1:
+                priorities = self.choose_files(info)
+                if priorities is None:
+                    self.status_var.set(f"Cancelled: {info.name()}")
+                    return
+                # Set before adding, so skipped files are never allocated
+                params.file_priorities = priorities
+
+            params.ti = info
+            apply_save_path(params, self.download_path)
+            params.storage_mode = lt.storage_mode_t.storage_mode_sparse
 
             handle = self.ses.add_torrent(params)
 
-            # Force recheck to detect existing files
-            handle.force_recheck()
+            # Hash-check existing files only if they don't match the resume data
+            recheck = self.needs_recheck(resume_data, info, params.save_path)
+            if recheck:
+                handle.force_recheck()
 
-            item_id = self.tree.insert('', 'end', values=(
+            item_id = self.downloads_renderer.insert((
                 info.name(),
                 format_size(info.total_size()),
                 '0%',
                 '0 KB/s',
                 '-',
                 '0',
-                'Checking...'
+                'Checking...' if recheck else 'Queued',
+                '-', 'Normal', '-'
             ))
 
-            with self.torrents_lock:
-                self.torrents.append({
-                    'handle': handle,
-                    'info': info,
-                    'item_id': item_id,
-                    'completed': False
-                })
+            self.register_torrent(handle, info, item_id)
+            self.bandwidth.load(info_hash, read_torrent_settings(resume_data))
 
             self.status_var.set(f"Added: {info.name()}")
 
@@ -1289,33 +1613,37 @@ https://github.com/IsThatLegal/torrent
 
             # Check for saved metadata and resume data
             info_hash = str(params.info_hash)
-            resume_file = os.path.join(self.resume_dir, f"{info_hash}.fastresume")
-            torrent_file = os.path.join(self.resume_dir, f"{info_hash}.torrent")
+            record = self.resume_store.get(info_hash) or {}
 
-            has_resume = os.path.exists(resume_file)
-            has_metadata = os.path.exists(torrent_file)
+            has_resume = bool(record.get('resume'))
+            has_metadata = bool(record.get('torrent'))
+            resume_data = None
 
             if has_resume and has_metadata:
                 # Best case: have both metadata and resume data
                 try:
                     # Load the full torrent info
-                    ti = lt.torrent_info(torrent_file)
-                    params.ti = ti
+                    ti = lt.torrent_info(record['torrent'])
 
-                    # Load resume data
-                    with open(resume_file, 'rb') as f:
-                        resume_data = f.read()
-                        # Note: resume_data parameter works differently for add_torrent_params
+                    # Load resume data, keeping the magnet's trackers
+                    resume_data = record['resume']
+                    resume_params = lt.read_resume_data(resume_data)
+                    resume_params.trackers = list(set(resume_params.trackers) | set(params.trackers))
+                    params = resume_params
+                    params.ti = ti
+                    apply_save_path(params, self.download_path)
+                    params.storage_mode = lt.storage_mode_t.storage_mode_sparse
 
                     self.status_var.set("⚡ Resuming download...")
                     self.metadata_saved.add(info_hash)
                 except Exception as e:
                     print(f"Failed to load saved data: {e}")
+                    resume_data = None
 
             elif has_metadata:
                 # Have metadata but no resume - still better than nothing
                 try:
-                    ti = lt.torrent_info(torrent_file)
+                    ti = lt.torrent_info(record['torrent'])
                     params.ti = ti
                     self.status_var.set("📦 Loading saved torrent...")
                     self.metadata_saved.add(info_hash)
@@ -1324,35 +1652,33 @@ https://github.com/IsThatLegal/torrent
 
             handle = self.ses.add_torrent(params)
 
-            # Force recheck to detect existing files
-            if has_metadata:
+            # Hash-check existing files only if they don't match the resume data
+            recheck = params.ti is not None and self.needs_recheck(
+                resume_data, params.ti, params.save_path)
+            if recheck:
                 handle.force_recheck()
 
             # Set initial status based on what we have
-            if has_resume and has_metadata:
+            if recheck:
                 initial_status = 'Checking...'
             elif has_metadata:
-                initial_status = 'Checking...'
+                initial_status = 'Queued'
             else:
                 initial_status = 'Getting metadata...'
 
-            item_id = self.tree.insert('', 'end', values=(
+            item_id = self.downloads_renderer.insert((
                 'Fetching metadata...' if not has_metadata else 'Checking files...',
                 '?',
                 '0%',
                 '0 KB/s',
                 '-',
                 '0',
-                initial_status
+                initial_status,
+                '-', 'Normal', '-'
             ))
 
-            with self.torrents_lock:
-                self.torrents.append({
-                    'handle': handle,
-                    'info': None,
-                    'item_id': item_id,
-                    'completed': False
-                })
+            self.register_torrent(handle, None, item_id)
+            self.bandwidth.load(info_hash, read_torrent_settings(resume_data))
 
             self.status_var.set("Added magnet link")
 
@@ -1366,22 +1692,92 @@ https://github.com/IsThatLegal/torrent
             messagebox.showerror("Unexpected Error",
                 f"An unexpected error occurred:\n{str(e)}")
 
-    def handle_external_magnet(self, magnet_link):
-        """Handle magnet link from external source (browser, command line)"""
+    def handle_external_items(self, items):
+        """Add magnets and .torrent files sent by another instance or the command line"""
         try:
             # Switch to Downloads tab
             self.notebook.select(self.downloads_tab)
 
-            # Add the magnet link
-            self.add_magnet_direct(magnet_link)
+            if len(items) > 1:
+                self.import_torrents(items)
+                return
+
+            for item in items:
+                if 'magnet' in item:
+                    self.add_magnet_direct(item['magnet'])
+                else:
+                    self.add_torrent_file(item['torrent'])
 
-            # Show notification
+            # Show one notification for the whole batch
             messagebox.showinfo(
-                "Magnet Link Added",
-                "The torrent has been added to your downloads!"
+                "Torrents Added",
+                "The torrent has been added to your downloads!" if len(items) == 1 else
+                f"{len(items)} torrents have been added to your downloads!"
             )
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to handle magnet link: {e}")
+            messagebox.showerror("Error", f"Failed to handle external torrents: {e}")
+
+    def import_torrent_folder(self):
+        """Import every .torrent file in a folder"""
+        directory = filedialog.askdirectory(title="Select Folder of .torrent Files")
+        if directory:
+            self.import_sources([directory])
+
+    def import_magnet_list(self):
+        """Import a text file with one magnet link per line"""
+        filepath = filedialog.askopenfilename(
+            title="Select Magnet List",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if filepath:
+            self.import_sources([filepath])
+
+    def import_sources(self, sources):
+        """Expand import sources in the background, then import the items"""
+        def expand():
+            items, errors = collect_items(sources)
+            self.root.after(0, lambda: self.import_torrents(items, errors))
+
+        self.status_var.set("Reading import sources...")
+        threading.Thread(target=expand, daemon=True).start()
+
+    def import_torrents(self, items, errors=()):
+        """
+        Add many torrents without blocking the UI, then show one summary
+
+        Items are parsed on a worker pool, torrents already in the list are
+        skipped, and rows appear as libtorrent confirms each add.
+
+        Args:
+            items: List of {'magnet': uri} or {'torrent': path} dicts
+            errors: (source, reason) pairs found while reading the sources
+        """
+        os.makedirs(self.download_path, exist_ok=True)
+        existing = self.registry.hashes()
+
+        importer = BulkImporter(self.ses, self.download_path, existing=existing,
+                                on_added=self.on_torrent_restored,
+                                restorer=self.session_restorer)
+        importer.report.invalid.extend(errors)
+        self.status_var.set(f"Importing {len(items)} torrent(s)...")
+
+        def run():
+            self.import_router.add(importer)
+            try:
+                report = importer.run(items)
+            finally:
+                self.import_router.remove(importer)
+            self.root.after(0, lambda: self.show_import_report(report))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def show_import_report(self, report):
+        """Show the outcome of a bulk import"""
+        self.status_var.set(f"Imported {report.added} of {report.total} torrent(s)")
+        if report.invalid or report.failed:
+            messagebox.showwarning("Import Finished", report.summary())
+        else:
+            messagebox.showinfo("Import Finished", report.summary())
 
     def browse_download_path(self):
         """Browse for download path"""
@@ -1446,13 +1842,20 @@ https://github.com/IsThatLegal/torrent
             settings['upload_rate_limit'] = upload_limit
             self.ses.apply_settings(settings)
 
+            # Priorities split the new caps on the next update; a schedule
+            # slot in effect keeps its own limits until it ends
+            self.rebalance_due = 0.0
+            self.scheduler.set_base(self.scheduler_base())
+
             self.save_settings()
 
             # Show success message with actual values
             dl_text = f"{download_limit // 1000} KB/s" if download_limit > 0 else "unlimited"
             ul_text = f"{upload_limit // 1000} KB/s" if upload_limit > 0 else "unlimited"
-            messagebox.showinfo("Success",
-                f"Bandwidth limits applied!\nDownload: {dl_text}\nUpload: {ul_text}")
+            message = f"Bandwidth limits applied!\nDownload: {dl_text}\nUpload: {ul_text}"
+            if self.scheduler.slot is not None:
+                message += f"\n\nThe schedule slot \"{self.scheduler.slot.format()}\" applies until it ends."
+            messagebox.showinfo("Success", message)
 
         except AttributeError as e:
             messagebox.showerror("Error", "Session not initialized")
@@ -1480,84 +1883,153 @@ https://github.com/IsThatLegal/torrent
 
         delete_files = (response == False)  # No = delete files
 
-        with self.torrents_lock:
-            for item_id in selection:
-                for i, torrent in enumerate(self.torrents):
-                    if torrent['item_id'] == item_id:
-                        # Get info hash and info before removing
-                        handle = torrent['handle']
-                        info_hash = str(handle.status().info_hash)
-
-                        # If deleting files, get file paths first
-                        if delete_files:
-                            try:
-                                status = handle.status()
-                                save_path = status.save_path
-                                if torrent['info']:
-                                    torrent_name = torrent['info'].name()
-                                else:
-                                    torrent_name = status.name
-
-                                # Full path to downloaded files
-                                full_path = os.path.join(save_path, torrent_name)
-                            except:
-                                full_path = None
-
-                        # Remove from session
-                        self.ses.remove_torrent(handle)
-                        self.torrents.pop(i)
-
-                        # Delete resume files so it doesn't reload on restart
-                        self.delete_resume_files(info_hash)
-
-                        # Delete downloaded files if requested
-                        if delete_files and full_path and os.path.exists(full_path):
-                            try:
-                                import shutil
-                                if os.path.isdir(full_path):
-                                    shutil.rmtree(full_path)
-                                else:
-                                    os.remove(full_path)
-                                print(f"Deleted downloaded files: {full_path}")
-                            except Exception as e:
-                                print(f"Warning: Could not delete files: {e}")
-
-                        break
-                self.tree.delete(item_id)
+        # One pass over the selection; each row is a dict lookup
+        removed = self.registry.remove_items(selection)
+        for item_id in selection:
+            self.downloads_renderer.delete(item_id)
+
+        if delete_files:
+            # libtorrent deletes the files in the background; progress
+            # arrives through on_storage_progress()
+            job = self.storage_worker.delete([
+                (torrent.handle, torrent.info_hash, self.torrent_name(torrent))
+                for torrent in removed
+            ])
+            if not job.finished.is_set():
+                self.status_var.set(f"Deleting files of {job.total} torrent(s)...")
+        else:
+            for torrent in removed:
+                self.ses.remove_torrent(torrent.handle)
+
+        for torrent in removed:
+            self.status_engine.forget(torrent.info_hash)
+            self.resume_checkpointer.forget(torrent.info_hash, torrent.handle)
+            self.bandwidth.forget(torrent.info_hash)
+            self.throughput.forget(torrent.info_hash)
+            if self.stream_server:
+                self.stream_server.remove(torrent.info_hash)
+
+            # Delete resume files so it doesn't reload on restart
+            self.delete_resume_files(torrent.info_hash)
+
+    def move_selected(self):
+        """Move the files of the selected torrents to another directory"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a torrent")
+            return
+
+        destination = filedialog.askdirectory(title="Move Files To")
+        if not destination:
+            return
+
+        torrents = self.registry.for_items(selection)
+        job = self.storage_worker.move([
+            (torrent.handle, torrent.info_hash, self.torrent_name(torrent))
+            for torrent in torrents
+        ], destination)
+        if not job.finished.is_set():
+            self.status_var.set(f"Moving {job.total} torrent(s) to {destination}...")
+
+    def set_selected_priority(self, priority):
+        """Give the selected torrents a bigger or smaller share of the session caps"""
+        torrents = self.registry.for_items(self.tree.selection())
+        for torrent in torrents:
+            self.bandwidth.set_priority(torrent.info_hash, priority)
+        self.rebalance_due = 0.0
+        self.refresh_rows(torrents)
+        self.status_var.set(f"Priority of {len(torrents)} torrent(s): {priority}")
+
+    def move_selected_in_queue(self, direction):
+        """Move the selected torrents in the download queue"""
+        torrents = self.registry.for_items(self.tree.selection())
+        move_in_queue([torrent.handle for torrent in torrents], direction)
+
+    def set_selected_limits(self):
+        """Ask for per-torrent rate limits and apply them to the selected torrents"""
+        torrents = self.registry.for_items(self.tree.selection())
+        if not torrents:
+            messagebox.showwarning("Warning", "Please select a torrent")
+            return
+
+        current = self.bandwidth.get(torrents[0].info_hash)
+        download = simpledialog.askinteger(
+            "Torrent Limits", "Download limit (KB/s, 0 = unlimited):", parent=self.root,
+            initialvalue=current.download_limit // 1000, minvalue=0, maxvalue=1000000)
+        if download is None:
+            return
+        upload = simpledialog.askinteger(
+            "Torrent Limits", "Upload limit (KB/s, 0 = unlimited):", parent=self.root,
+            initialvalue=current.upload_limit // 1000, minvalue=0, maxvalue=1000000)
+        if upload is None:
+            return
+
+        for torrent in torrents:
+            self.bandwidth.set_limits(torrent.info_hash, download=download * 1000,
+                                      upload=upload * 1000)
+        self.rebalance_due = 0.0
+        self.refresh_rows(torrents)
+        self.status_var.set(f"Limits set for {len(torrents)} torrent(s)")
+
+    def refresh_rows(self, torrents):
+        """Redraw rows whose settings changed without their status changing"""
+        for torrent in torrents:
+            status = self.status_engine.get(torrent.info_hash)
+            if status is not None:
+                self.update_torrent_row(torrent, status)
+        self.downloads_renderer.flush_later()
+
+    def torrent_name(self, torrent):
+        """Name of a registered torrent for messages, without asking the session"""
+        if torrent.info:
+            return torrent.info.name()
+        status = self.status_engine.get(torrent.info_hash)
+        return status.name if status is not None and status.name else torrent.info_hash
+
+    def on_storage_progress(self, job):
+        """Report progress of a delete or move (alert thread)"""
+        self.root.after(0, lambda: self.show_storage_progress(job))
+
+    def show_storage_progress(self, job):
+        """Show how far a delete or move has got, and its outcome when done"""
+        if not job.finished.is_set():
+            verb = "Deleting files of" if job.kind == 'delete' else "Moving"
+            self.status_var.set(f"{verb} torrents... {job.done}/{job.total}")
+            return
+
+        self.status_var.set(job.summary().splitlines()[0])
+        if job.errors:
+            title = "Delete Failed" if job.kind == 'delete' else "Move Failed"
+            messagebox.showwarning(title, job.summary())
 
     def clear_completed(self):
         """Clear completed torrents"""
-        to_remove = []
+        to_remove = [torrent for torrent in self.registry.snapshot() if torrent.completed]
 
-        with self.torrents_lock:
-            for torrent in self.torrents:
-                if torrent['completed']:
-                    to_remove.append(torrent)
+        for torrent in to_remove:
+            # Get info hash before removing
+            info_hash = torrent.info_hash
 
-            for torrent in to_remove:
-                # Get info hash before removing
-                info_hash = str(torrent['handle'].status().info_hash)
+            # Remove from session and UI
+            self.downloads_renderer.delete(torrent.item_id)
+            self.registry.remove(torrent)
+            self.status_engine.forget(info_hash)
+            self.resume_checkpointer.forget(info_hash, torrent.handle)
+            self.bandwidth.forget(info_hash)
+            self.throughput.forget(info_hash)
+            if self.stream_server:
+                self.stream_server.remove(info_hash)
 
-                # Remove from session and UI
-                self.tree.delete(torrent['item_id'])
-                self.torrents.remove(torrent)
-
-                # Delete resume files so it doesn't reload on restart
-                self.delete_resume_files(info_hash)
+            # Delete resume files so it doesn't reload on restart
+            self.delete_resume_files(info_hash)
 
         self.status_var.set(f"Cleared {len(to_remove)} completed torrent(s)")
 
     def delete_resume_files(self, info_hash):
-        """Delete all resume files for a torrent"""
+        """Delete all resume data for a torrent"""
         try:
-            # List of file extensions to delete
-            extensions = ['.fastresume', '.torrent', '.magnet']
-
-            for ext in extensions:
-                filename = os.path.join(self.resume_dir, f"{info_hash}{ext}")
-                if os.path.exists(filename):
-                    os.remove(filename)
-                    print(f"Deleted resume file: {info_hash}{ext}")
+            self.resume_store.delete(info_hash)
+            print(f"Deleted resume data: {info_hash}")
 
             # Remove from metadata_saved set
             if info_hash in self.metadata_saved:
@@ -1566,12 +2038,11 @@ https://github.com/IsThatLegal/torrent
         except Exception as e:
             print(f"Warning: Could not delete resume files for {info_hash}: {e}")
 
-    def get_torrent_by_item_id(self, item_id):
-        """Get torrent dict by tree item ID (must be called with lock held)"""
-        for torrent in self.torrents:
-            if torrent['item_id'] == item_id:
-                return torrent
-        return None
+    def register_torrent(self, handle, info, item_id, info_hash=None):
+        """Track a newly added torrent in the registry and the status engine"""
+        torrent = self.registry.add(handle, info, item_id, info_hash)
+        self.status_engine.track(handle)
+        return torrent
 
     def pause_selected(self):
         """Pause selected torrent"""
@@ -1581,14 +2052,12 @@ https://github.com/IsThatLegal/torrent
             return
 
         paused_count = 0
-        with self.torrents_lock:
-            for item_id in selection:
-                torrent = self.get_torrent_by_item_id(item_id)
-                if torrent:
-                    handle = torrent['handle']
-                    if not handle.status().paused:
-                        handle.pause()
-                        paused_count += 1
+        for torrent in self.registry.for_items(selection):
+            # The flags are read without building a full torrent_status
+            handle = torrent.handle
+            if not handle.flags() & lt.torrent_flags.paused:
+                handle.pause()
+                paused_count += 1
 
         if paused_count > 0:
             self.status_var.set(f"Paused {paused_count} torrent(s)")
@@ -1603,20 +2072,48 @@ https://github.com/IsThatLegal/torrent
             return
 
         resumed_count = 0
-        with self.torrents_lock:
-            for item_id in selection:
-                torrent = self.get_torrent_by_item_id(item_id)
-                if torrent:
-                    handle = torrent['handle']
-                    if handle.status().paused:
-                        handle.resume()
-                        resumed_count += 1
+        for torrent in self.registry.for_items(selection):
+            handle = torrent.handle
+            if handle.flags() & lt.torrent_flags.paused:
+                handle.resume()
+                resumed_count += 1
 
         if resumed_count > 0:
             self.status_var.set(f"Resumed {resumed_count} torrent(s)")
         else:
             self.status_var.set("Selected torrent(s) already active")
 
+    def needs_recheck(self, resume_data, ti, save_path):
+        """
+        Decide whether a torrent being added needs a full hash check
+
+        Args:
+            resume_data: Bencoded resume data, or None if there is none
+            ti: torrent_info of the torrent
+            save_path: Directory the torrent is saved to
+
+        Returns:
+            bool: True unless the files on disk match the resume data
+        """
+        if self.startup_check == 'full':
+            return True
+        return not verify_resume_files(resume_data, ti, save_path)
+
+    def force_recheck_selected(self):
+        """Hash-check the files of the selected torrents"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a torrent to recheck")
+            return
+
+        rechecked = 0
+        for torrent in self.registry.for_items(selection):
+            if torrent.handle.is_valid():
+                torrent.handle.force_recheck()
+                rechecked += 1
+
+        self.status_var.set(f"Rechecking {rechecked} torrent(s)")
+
     def open_folder(self):
         """Open download folder for selected torrent"""
         selection = self.tree.selection()
@@ -1624,34 +2121,33 @@ https://github.com/IsThatLegal/torrent
             messagebox.showwarning("Warning", "Please select a torrent")
             return
 
-        with self.torrents_lock:
-            torrent = self.get_torrent_by_item_id(selection[0])
-            if torrent:
-                handle = torrent['handle']
-                status = handle.status()
+        torrent = self.registry.get_by_item(selection[0])
+        if torrent:
+            handle = torrent.handle
+            status = handle.status()
 
-                # Get the folder path
-                folder_path = status.save_path
+            # Get the folder path
+            folder_path = status.save_path
 
-                # If torrent has metadata, check if it's a folder or file
-                if torrent['info']:
-                    name = status.name
-                    full_path = os.path.join(folder_path, name)
+            # If torrent has metadata, check if it's a folder or file
+            if torrent.info:
+                name = status.name
+                full_path = os.path.join(folder_path, name)
 
-                    # If it's a directory, open it directly
-                    if os.path.isdir(full_path):
-                        folder_path = full_path
-                    # If it's a file, open its parent directory
-                    elif os.path.isfile(full_path):
-                        folder_path = os.path.dirname(full_path)
+                # If it's a directory, open it directly
+                if os.path.isdir(full_path):
+                    folder_path = full_path
+                # If it's a file, open its parent directory
+                elif os.path.isfile(full_path):
+                    folder_path = os.path.dirname(full_path)
 
-                # Open the folder
-                try:
-                    import subprocess
-                    subprocess.Popen(['xdg-open', folder_path])
-                    self.status_var.set(f"Opened folder: {folder_path}")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to open folder:\n{e}")
+            # Open the folder
+            try:
+                import subprocess
+                subprocess.Popen(['xdg-open', folder_path])
+                self.status_var.set(f"Opened folder: {folder_path}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to open folder:\n{e}")
 
     def sort_downloads(self, column):
         """Sort downloads by column"""
@@ -1662,38 +2158,10 @@ https://github.com/IsThatLegal/torrent
             self.downloads_sort_column = column
             self.downloads_sort_reverse = False
 
-        # Get all items with their values
-        items = []
-        for item_id in self.tree.get_children(''):
-            values = self.tree.item(item_id)['values']
-            items.append((item_id, values))
-
-        # Determine column index
-        columns = ('Name', 'Size', 'Progress', 'Speed', 'ETA', 'Peers', 'Status')
-        col_index = columns.index(column)
-
-        # Sort items
-        try:
-            # For progress column, sort numerically
-            if column == 'Progress':
-                items.sort(key=lambda x: float(x[1][col_index].rstrip('%')),
-                          reverse=self.downloads_sort_reverse)
-            # For peers column, sort numerically
-            elif column == 'Peers':
-                items.sort(key=lambda x: int(x[1][col_index]),
-                          reverse=self.downloads_sort_reverse)
-            # For other columns, sort alphabetically
-            else:
-                items.sort(key=lambda x: str(x[1][col_index]),
-                          reverse=self.downloads_sort_reverse)
-        except:
-            # Fallback to string sort if parsing fails
-            items.sort(key=lambda x: str(x[1][col_index]),
-                      reverse=self.downloads_sort_reverse)
-
-        # Rearrange items in tree
-        for index, (item_id, values) in enumerate(items):
-            self.tree.move(item_id, '', index)
+        # One sort over the raw keys the update loop recorded; the renderer
+        # keeps this order as the rows change
+        columns = DOWNLOAD_COLUMNS
+        self.downloads_renderer.sort(columns.index(column), self.downloads_sort_reverse)
 
         # Update column header to show sort direction
         for col in columns:
@@ -1710,37 +2178,216 @@ https://github.com/IsThatLegal/torrent
             messagebox.showwarning("Warning", "Please select a torrent")
             return
 
-        with self.torrents_lock:
-            torrent = self.get_torrent_by_item_id(selection[0])
-            if torrent:
-                handle = torrent['handle']
-                status = handle.status()
+        torrent = self.registry.get_by_item(selection[0])
+        if torrent:
+            handle = torrent.handle
+            status = handle.status()
 
-                # Check if download is complete
-                if not status.is_seeding and status.progress < 1.0:
-                    messagebox.showinfo("Not Complete",
-                                      "Download not yet complete. Please wait until it's finished.")
-                    return
+            # Check if download is complete
+            if not status.is_seeding and status.progress < 1.0:
+                messagebox.showinfo("Not Complete",
+                                  "Download not yet complete. Please wait until it's finished.")
+                return
+
+            # Get the file path
+            save_path = status.save_path
+            if torrent.info:
+                name = status.name
+                full_path = os.path.join(save_path, name)
 
-                # Get the file path
-                save_path = status.save_path
-                if torrent['info']:
-                    name = status.name
-                    full_path = os.path.join(save_path, name)
-
-                    if os.path.exists(full_path):
-                        try:
-                            import subprocess
-                            subprocess.Popen(['xdg-open', full_path])
-                            self.status_var.set(f"Opened: {name}")
-                        except Exception as e:
-                            messagebox.showerror("Error", f"Failed to open file:\n{e}")
-                    else:
-                        messagebox.showerror("File Not Found",
-                                           f"File not found:\n{full_path}")
+                if os.path.exists(full_path):
+                    try:
+                        import subprocess
+                        subprocess.Popen(['xdg-open', full_path])
+                        self.status_var.set(f"Opened: {name}")
+                    except Exception as e:
+                        messagebox.showerror("Error", f"Failed to open file:\n{e}")
                 else:
-                    messagebox.showinfo("No Metadata",
-                                      "Torrent metadata not yet available.")
+                    messagebox.showerror("File Not Found",
+                                       f"File not found:\n{full_path}")
+            else:
+                messagebox.showinfo("No Metadata",
+                                  "Torrent metadata not yet available.")
+
+    def choose_files(self, info, priorities=None):
+        """
+        Let the user pick which files of a torrent to download, and their priority
+
+        Args:
+            info: torrent_info
+            priorities: Current file priorities (default: every file normal)
+
+        Returns:
+            list: New file priorities, or None if cancelled
+        """
+        priorities = list(priorities) if priorities else [DEFAULT_FILE_PRIORITY] * info.num_files()
+        files = list_files(info)
+        result = {}
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Select Files - {info.name()}")
+        dialog.transient(self.root)
+        dialog.geometry("760x480")
+
+        filter_frame = ttk.Frame(dialog, padding=5)
+        filter_frame.pack(fill=tk.X)
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        pattern_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=pattern_var, width=30).pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text="(globs like *.mkv, separated by spaces)").pack(side=tk.LEFT)
+
+        tree_frame = ttk.Frame(dialog, padding=(5, 0))
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=('Priority', 'Size', 'File'), show='headings')
+        tree.heading('Priority', text='Priority')
+        tree.heading('Size', text='Size')
+        tree.heading('File', text='File')
+        tree.column('Priority', width=80, anchor=tk.CENTER)
+        tree.column('Size', width=100, anchor=tk.E)
+        tree.column('File', width=540)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        shown = {}
+        for index, path, size in files:
+            shown[index] = priority_name(priorities[index]).capitalize()
+            tree.insert('', tk.END, iid=str(index), values=(shown[index], format_size(size), path))
+
+        summary_var = tk.StringVar()
+
+        def refresh():
+            # Only rows whose priority changed are touched
+            for index, _, _ in files:
+                name = priority_name(priorities[index]).capitalize()
+                if shown[index] != name:
+                    shown[index] = name
+                    tree.set(str(index), 'Priority', name)
+            selected, total, selected_bytes, total_bytes = selection_summary(info, priorities)
+            summary_var.set(f"{selected} of {total} files selected, "
+                            f"{format_size(selected_bytes)} of {format_size(total_bytes)}")
+
+        def set_priority(name):
+            for item_id in tree.selection():
+                priorities[int(item_id)] = FILE_PRIORITIES[name]
+            refresh()
+
+        def toggle(event):
+            item_id = tree.identify_row(event.y)
+            if item_id:
+                index = int(item_id)
+                priorities[index] = 0 if priorities[index] else DEFAULT_FILE_PRIORITY
+                refresh()
+
+        def apply_filter(only_matching):
+            patterns = pattern_var.get().split()
+            if not patterns:
+                return
+            try:
+                if only_matching:
+                    new = select_files(info, include=patterns, priorities=priorities)
+                else:
+                    new = select_files(info, exclude=patterns, priorities=priorities)
+            except ValueError as e:
+                messagebox.showwarning("Select Files", str(e), parent=dialog)
+                return
+            priorities[:] = new
+            refresh()
+
+        def select_all():
+            for index, _, _ in files:
+                if not priorities[index]:
+                    priorities[index] = DEFAULT_FILE_PRIORITY
+            refresh()
+
+        def ok():
+            if not any(priorities[index] for index, _, _ in files):
+                messagebox.showwarning("Select Files", "Select at least one file", parent=dialog)
+                return
+            result['priorities'] = list(priorities)
+            dialog.destroy()
+
+        ttk.Button(filter_frame, text="Only Matching",
+                   command=lambda: apply_filter(True)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(filter_frame, text="Skip Matching",
+                   command=lambda: apply_filter(False)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(filter_frame, text="All", command=select_all).pack(side=tk.LEFT, padx=2)
+        tree.bind('<Double-1>', toggle)
+
+        button_frame = ttk.Frame(dialog, padding=5)
+        button_frame.pack(fill=tk.X)
+        ttk.Label(button_frame, text="Selected rows:").pack(side=tk.LEFT)
+        for name in ('high', 'normal', 'low', 'skip'):
+            ttk.Button(button_frame, text=name.capitalize(),
+                       command=lambda n=name: set_priority(n)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(button_frame, text="OK", command=ok).pack(side=tk.RIGHT, padx=2)
+        ttk.Label(dialog, textvariable=summary_var, padding=(5, 0, 5, 5)).pack(fill=tk.X)
+
+        refresh()
+        dialog.grab_set()
+        dialog.wait_window()
+        return result.get('priorities')
+
+    def select_files_selected(self):
+        """Change which files of the selected torrent are downloaded"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a torrent")
+            return
+
+        torrent = self.registry.get_by_item(selection[0])
+        if not torrent:
+            return
+        info = torrent.handle.torrent_file()
+        if info is None:
+            messagebox.showinfo("No Metadata",
+                                "Torrent metadata not yet available. Please wait for it to download.")
+            return
+
+        priorities = self.choose_files(info, torrent.handle.get_file_priorities())
+        if priorities is None:
+            return
+        # libtorrent keeps the selection in the resume data
+        torrent.handle.prioritize_files(priorities)
+        selected, total, selected_bytes, _ = selection_summary(info, priorities)
+        self.status_var.set(f"Downloading {selected} of {total} files "
+                            f"({format_size(selected_bytes)}) of {self.torrent_name(torrent)}")
+
+    def stream_selected(self):
+        """Stream the largest file of the selected torrent and copy its URL"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a torrent")
+            return
+
+        torrent = self.registry.get_by_item(selection[0])
+        if not torrent:
+            return
+        try:
+            if self.stream_server is None:
+                self.stream_server = StreamServer()
+                self.stream_server.start()
+            url = self.stream_server.add(torrent.handle)
+        except ValueError as e:
+            messagebox.showinfo("Stream", str(e))
+            return
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to start the stream server:\n{e}")
+            return
+
+        self.root.clipboard_clear()
+        self.root.clipboard_append(url)
+        self.status_var.set(f"Streaming {self.torrent_name(torrent)}; URL copied to clipboard")
+        if messagebox.askyesno("Stream",
+                               f"Downloading sequentially. Open this URL in a media player:\n\n"
+                               f"{url}\n\n(copied to clipboard)\n\nOpen it now?"):
+            try:
+                import subprocess
+                subprocess.Popen(['xdg-open', url])
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to open stream:\n{e}")
 
     def setup_context_menu(self):
         """Setup right-click context menu for downloads"""
@@ -1750,7 +2397,26 @@ https://github.com/IsThatLegal/torrent
         self.context_menu.add_separator()
         self.context_menu.add_command(label="📂 Open File", command=self.open_file)
         self.context_menu.add_command(label="📁 Open Folder", command=self.open_folder)
+        self.context_menu.add_command(label="📺 Stream", command=self.stream_selected)
+        self.context_menu.add_command(label="🗂️ Select Files...", command=self.select_files_selected)
         self.context_menu.add_command(label="📋 Copy Magnet Link", command=self.copy_magnet)
+        self.context_menu.add_command(label="🔍 Force Recheck", command=self.force_recheck_selected)
+        self.context_menu.add_command(label="📦 Move Files...", command=self.move_selected)
+        self.context_menu.add_separator()
+
+        priority_menu = tk.Menu(self.context_menu, tearoff=0)
+        for priority in ('high', 'normal', 'low'):
+            priority_menu.add_command(label=priority.capitalize(),
+                                      command=lambda p=priority: self.set_selected_priority(p))
+        self.context_menu.add_cascade(label="⚖️ Priority", menu=priority_menu)
+
+        queue_menu = tk.Menu(self.context_menu, tearoff=0)
+        for direction, label in (('top', "Move to Top"), ('up', "Move Up"),
+                                 ('down', "Move Down"), ('bottom', "Move to Bottom")):
+            queue_menu.add_command(label=label,
+                                   command=lambda d=direction: self.move_selected_in_queue(d))
+        self.context_menu.add_cascade(label="🔢 Queue", menu=queue_menu)
+        self.context_menu.add_command(label="🚦 Set Limits...", command=self.set_selected_limits)
         self.context_menu.add_separator()
         self.context_menu.add_command(label="🗑️ Remove", command=self.remove_selected)
 
@@ -1781,282 +2447,396 @@ https://github.com/IsThatLegal/torrent
             messagebox.showwarning("Warning", "Please select a torrent")
             return
 
-        with self.torrents_lock:
-            torrent = self.get_torrent_by_item_id(selection[0])
-            if torrent:
-                handle = torrent['handle']
-                if handle.torrent_file():
-                    try:
-                        magnet = lt.make_magnet_uri(handle.torrent_file())
-                        self.root.clipboard_clear()
-                        self.root.clipboard_append(magnet)
-                        self.status_var.set("Magnet link copied to clipboard")
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to copy magnet link:\n{e}")
-                else:
-                    messagebox.showinfo("No Metadata",
-                                      "Torrent metadata not yet available. Please wait for it to download.")
+        torrent = self.registry.get_by_item(selection[0])
+        if torrent:
+            handle = torrent.handle
+            if handle.torrent_file():
+                try:
+                    magnet = lt.make_magnet_uri(handle.torrent_file())
+                    self.root.clipboard_clear()
+                    self.root.clipboard_append(magnet)
+                    self.status_var.set("Magnet link copied to clipboard")
+                except Exception as e:
+                    messagebox.showerror("Error", f"Failed to copy magnet link:\n{e}")
+            else:
+                messagebox.showinfo("No Metadata",
+                                  "Torrent metadata not yet available. Please wait for it to download.")
 
-    def save_metadata_if_ready(self, torrent):
+    def save_metadata_if_ready(self, torrent, status):
         """Save torrent metadata to file if it has arrived (for magnet links)"""
-        handle = torrent['handle']
-        info_hash = str(handle.status().info_hash)
+        handle = torrent.handle
+        info_hash = torrent.info_hash
 
         # Skip if already saved
         if info_hash in self.metadata_saved:
             return
 
         # Check if we have metadata
-        if handle.status().has_metadata and handle.torrent_file():
+        if status.has_metadata and handle.torrent_file():
             try:
-                torrent_file = os.path.join(self.resume_dir, f"{info_hash}.torrent")
-
-                # Save the .torrent file
+                # Save the .torrent metadata
                 ti = handle.torrent_file()
                 try:
                     # Create torrent from torrent_info and generate bencode
                     ct = lt.create_torrent(ti)
                     torrent_data = lt.bencode(ct.generate())
-                    with open(torrent_file, 'wb') as f:
-                        f.write(torrent_data)
-                    print(f"✅ Saved metadata for {handle.status().name}")
+                    self.resume_store.put(info_hash, torrent=torrent_data)
+                    print(f"✅ Saved metadata for {status.name}")
                     self.metadata_saved.add(info_hash)
                 except Exception as create_error:
                     # If create_torrent fails, try saving magnet as fallback
                     print(f"⚠️ Could not save .torrent file, saving magnet instead: {create_error}")
                     magnet = lt.make_magnet_uri(ti)
-                    magnet_file = os.path.join(self.resume_dir, f"{info_hash}.magnet")
-                    with open(magnet_file, 'w') as f:
-                        f.write(magnet)
+                    self.resume_store.put(info_hash, magnet=magnet)
                     self.metadata_saved.add(info_hash)
 
             except Exception as e:
                 print(f"⚠️ Failed to save metadata: {e}")
 
     def update_loop(self):
-        """Update torrents"""
+        """Update torrents whose status changed since the last tick"""
         while self.running:
             try:
-                # Create a copy of torrents list to avoid race conditions
-                with self.torrents_lock:
-                    torrents_copy = self.torrents.copy()
-
-                for torrent in torrents_copy:
-                    handle = torrent['handle']
-                    s = handle.status()
-
-                    # Save metadata if it arrived (for magnet links)
-                    self.save_metadata_if_ready(torrent)
-
-                    if torrent['info'] is None and s.has_metadata:
-                        torrent['info'] = handle.torrent_file()
-
-                    if torrent['info']:
-                        name = s.name[:40]
-                        size = format_size(torrent['info'].total_size())
-                    else:
-                        name = "Fetching metadata..."
-                        size = "?"
-
-                    progress = f"{s.progress * 100:.1f}%"
-                    download_rate = s.download_rate / 1000
-                    upload_rate = s.upload_rate / 1000
-                    speed = f"↓{download_rate:.0f} ↑{upload_rate:.0f} KB/s"
-                    peers = str(s.num_peers)
-
-                    # Calculate ETA
-                    if s.state == lt.torrent_status.downloading and download_rate > 0:
-                        if torrent['info']:
-                            total_size = torrent['info'].total_size()
-                            downloaded = s.total_done
-                            remaining = total_size - downloaded
-                            eta_seconds = remaining / (download_rate * 1000)  # convert KB/s to B/s
-
-                            # Format ETA
-                            if eta_seconds < 60:
-                                eta = f"{int(eta_seconds)}s"
-                            elif eta_seconds < 3600:
-                                eta = f"{int(eta_seconds / 60)}m"
-                            elif eta_seconds < 86400:
-                                hours = int(eta_seconds / 3600)
-                                minutes = int((eta_seconds % 3600) / 60)
-                                eta = f"{hours}h {minutes}m"
-                            else:
-                                days = int(eta_seconds / 86400)
-                                hours = int((eta_seconds % 86400) / 3600)
-                                eta = f"{days}d {hours}h"
-                        else:
-                            eta = "Unknown"
-                    else:
-                        eta = "-"
-
-                    # Determine status with icons and color tags
-                    if s.paused:
-                        status = "⏸️ Paused"
-                        status_tag = "paused"
-                    elif s.is_seeding:
-                        status = "🌱 Seeding"
-                        status_tag = "seeding"
-                        if not torrent['completed']:
-                            torrent['completed'] = True
-                            send_notification("Download Complete", f"{name}")
-                    elif s.state == lt.torrent_status.downloading:
-                        status = "⬇️ Downloading"
-                        status_tag = "downloading"
-                    elif s.state == lt.torrent_status.checking_files:
-                        status = "🔍 Checking"
-                        status_tag = "checking"
-                    elif s.state == lt.torrent_status.queued:
-                        status = "⏳ Queued"
-                        status_tag = "queued"
-                    else:
-                        status = "❓ Unknown"
-                        status_tag = ""
-
-                    self.tree.item(torrent['item_id'], values=(
-                        name, size, progress, speed, eta, peers, status
-                    ), tags=(status_tag,))
-
-                # Update total session bandwidth and statistics
-                try:
-                    status = self.ses.status()
-                    total_download = status.download_rate / 1000  # Convert to KB/s
-                    total_upload = status.upload_rate / 1000      # Convert to KB/s
-
-                    # Show limits if they exist
-                    dl_limit_text = ""
-                    ul_limit_text = ""
-                    if self.max_download_rate > 0:
-                        dl_limit = self.max_download_rate / 1000
-                        dl_limit_text = f" / {dl_limit:.0f}"
-                    if self.max_upload_rate > 0:
-                        ul_limit = self.max_upload_rate / 1000
-                        ul_limit_text = f" / {ul_limit:.0f}"
-
-                    # Session statistics
-                    total_down = format_size(status.total_download)
-                    total_up = format_size(status.total_upload)
-
-                    # Calculate ratio
-                    if status.total_download > 0:
-                        ratio = status.total_upload / status.total_download
-                    else:
-                        ratio = 0.0
-
-                    bandwidth_text = f"Speed: ↓ {total_download:.0f}{dl_limit_text} KB/s  ↑ {total_upload:.0f}{ul_limit_text} KB/s  |  Session: ↓ {total_down}  ↑ {total_up}  Ratio: {ratio:.2f}"
-                    self.bandwidth_var.set(bandwidth_text)
-                except Exception as bw_error:
-                    pass  # Silently ignore bandwidth update errors
+                # Only torrents whose status changed are returned, so rows
+                # that didn't change cost nothing this tick
+                changed = self.status_engine.poll(interval=1.0)
+
+                for s in changed:
+                    self.resume_checkpointer.note_status(s)
+
+                    torrent = self.registry.get(str(s.info_hash))
+                    if torrent is None:
+                        continue  # Removed while the update was in flight
+                    self.update_torrent_row(torrent, s)
+
+                # One main-thread batch for everything that changed this tick
+                self.downloads_renderer.flush_later()
+                self.update_bandwidth_bar()
+                self.record_throughput(changed)
+                self.metrics.tick()
+
+                # Request resume data for a few of the changed torrents
+                self.resume_checkpointer.tick()
+
+                # Split the session caps by priority between active torrents
+                if time.monotonic() >= self.rebalance_due:
+                    self.rebalance_due = time.monotonic() + REBALANCE_INTERVAL
+                    self.bandwidth.rebalance(list(self.status_engine.statuses.values()),
+                                             *self.session_caps())
 
             except Exception as e:
                 print(f"Update error: {e}")
+                time.sleep(1)
+
+    def record_throughput(self, changed):
+        """
+        Sample the session totals, plus the torrents moving data or graphed
+
+        Idle torrents are left out, so a tick costs nothing for them and
+        they get no history. A torrent with a history is still sampled when
+        it changes, so its drop to zero is recorded; the gap after that
+        reads as zero.
+
+        Args:
+            changed: torrent_status objects that changed this tick
+        """
+        engine = self.status_engine
+        statuses = [s for s in changed if s.download_rate or s.upload_rate
+                    or self.throughput.has_history(str(s.info_hash))]
+        graphed = self.graphed_torrent
+        if graphed is not None and all(str(s.info_hash) != graphed for s in statuses):
+            status = engine.get(graphed)
+            if status is not None:
+                statuses.append(status)
+        self.throughput.record(statuses,
+                               totals=(engine.download_rate, engine.upload_rate, engine.num_peers))
+
+    def update_torrent_row(self, torrent, s):
+        """Refresh one downloads row from a torrent_status"""
+        handle = torrent.handle
+
+        # Save metadata if it arrived (for magnet links)
+        self.save_metadata_if_ready(torrent, s)
+
+        if torrent.info is None and s.has_metadata:
+            torrent.info = handle.torrent_file()
+
+        if torrent.info:
+            name = s.name[:40]
+            # With files skipped, only the selected ones count
+            total_size = s.total_wanted if s.total_wanted else torrent.info.total_size()
+            size = format_size(total_size)
+        else:
+            name = "Fetching metadata..."
+            total_size = -1
+            size = "?"
+
+        progress = f"{s.progress * 100:.1f}%"
+        download_rate = s.download_rate / 1000
+        upload_rate = s.upload_rate / 1000
+        speed = f"↓{download_rate:.0f} ↑{upload_rate:.0f} KB/s"
+        peers = str(s.num_peers)
+
+        # Calculate ETA; rows without one sort after every row with one
+        eta_seconds = float('inf')
+        if s.state == lt.torrent_status.downloading and download_rate > 0:
+            if torrent.info:
+                downloaded = s.total_wanted_done
+                remaining = total_size - downloaded
+                eta_seconds = remaining / (download_rate * 1000)  # convert KB/s to B/s
+
+                # Format ETA
+                if eta_seconds < 60:
+                    eta = f"{int(eta_seconds)}s"
+                elif eta_seconds < 3600:
+                    eta = f"{int(eta_seconds / 60)}m"
+                elif eta_seconds < 86400:
+                    hours = int(eta_seconds / 3600)
+                    minutes = int((eta_seconds % 3600) / 60)
+                    eta = f"{hours}h {minutes}m"
+                else:
+                    days = int(eta_seconds / 86400)
+                    hours = int((eta_seconds % 86400) / 3600)
+                    eta = f"{days}d {hours}h"
+            else:
+                eta = "Unknown"
+        else:
+            eta = "-"
+
+        # Determine status with icons and color tags
+        if s.paused:
+            status = "⏸️ Paused"
+            status_tag = "paused"
+        elif s.is_seeding:
+            status = "🌱 Seeding"
+            status_tag = "seeding"
+            if not torrent.completed:
+                torrent.completed = True
+                send_notification("Download Complete", f"{name}")
+        elif s.state == lt.torrent_status.finished:
+            # Every selected file is done; skipped files keep it from seeding
+            status = "✅ Finished"
+            status_tag = "seeding"
+            if not torrent.completed:
+                torrent.completed = True
+                send_notification("Download Complete", f"{name}")
+        elif s.state == lt.torrent_status.downloading:
+            status = "⬇️ Downloading"
+            status_tag = "downloading"
+        elif s.state == lt.torrent_status.checking_files:
+            status = "🔍 Checking"
+            status_tag = "checking"
+        elif s.state == lt.torrent_status.queued_for_checking:
+            status = "⏳ Queued"
+            status_tag = "queued"
+        else:
+            status = "❓ Unknown"
+            status_tag = ""
+
+        # Finished torrents leave the download queue (position -1)
+        queue_position = s.queue_position
+        queue = str(queue_position + 1) if queue_position >= 0 else "-"
+
+        bandwidth = self.bandwidth.get(torrent.info_hash)
+        priority = bandwidth.priority.capitalize()
+        if bandwidth.download_limit or bandwidth.upload_limit:
+            limits = (f"↓{bandwidth.download_limit // 1000 or '∞'} "
+                      f"↑{bandwidth.upload_limit // 1000 or '∞'} KB/s")
+        else:
+            limits = "-"
+
+        # Sort by the raw numbers rather than the formatted text
+        unlimited = float('inf')
+        sort_keys = (name.lower(), total_size, s.progress, (s.download_rate, s.upload_rate),
+                     eta_seconds, s.num_peers, status,
+                     queue_position if queue_position >= 0 else unlimited, bandwidth.weight,
+                     (bandwidth.download_limit or unlimited, bandwidth.upload_limit or unlimited))
+
+        self.downloads_renderer.update(torrent.item_id, (
+            name, size, progress, speed, eta, peers, status, queue, priority, limits
+        ), tags=(status_tag,), sort_keys=sort_keys)
 
-            time.sleep(1)
+    def update_bandwidth_bar(self):
+        """Update total session bandwidth and statistics from the status engine"""
+        try:
+            engine = self.status_engine
+            total_download = engine.download_rate / 1000  # Convert to KB/s
+            total_upload = engine.upload_rate / 1000      # Convert to KB/s
+
+            # Show limits if they exist (scheduled ones while a slot is in effect)
+            download_cap, upload_cap = self.session_caps()
+            dl_limit_text = ""
+            ul_limit_text = ""
+            if download_cap > 0:
+                dl_limit = download_cap / 1000
+                dl_limit_text = f" / {dl_limit:.0f}"
+            if upload_cap > 0:
+                ul_limit = upload_cap / 1000
+                ul_limit_text = f" / {ul_limit:.0f}"
+
+            # Session statistics
+            total_down = format_size(engine.total_download)
+            total_up = format_size(engine.total_upload)
+
+            # Calculate ratio
+            if engine.total_download > 0:
+                ratio = engine.total_upload / engine.total_download
+            else:
+                ratio = 0.0
+
+            bandwidth_text = f"Speed: ↓ {total_download:.0f}{dl_limit_text} KB/s  ↑ {total_upload:.0f}{ul_limit_text} KB/s  |  Session: ↓ {total_down}  ↑ {total_up}  Ratio: {ratio:.2f}"
+            self.bandwidth_var.set(bandwidth_text)
+        except Exception as bw_error:
+            pass  # Silently ignore bandwidth update errors
 
     def start_ipc_server(self):
         """Start IPC server to handle single instance communication"""
         try:
-            # Remove stale socket file if exists
-            if os.path.exists(self.socket_path):
-                os.remove(self.socket_path)
-
-            # Create Unix domain socket
-            self.ipc_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            self.ipc_socket.bind(self.socket_path)
-            self.ipc_socket.listen(5)
-            self.ipc_socket.setblocking(False)
-
-            # Start listener thread
-            ipc_thread = threading.Thread(target=self.ipc_listener, daemon=True)
-            ipc_thread.start()
+            self.ipc_server = IpcServer(self.socket_path, {'add': self.on_ipc_add})
+            self.ipc_server.start()
         except Exception as e:
             print(f"Failed to start IPC server: {e}")
-            self.ipc_socket = None
-
-    def ipc_listener(self):
-        """Listen for incoming magnet links from other instances"""
-        while self.running or not hasattr(self, 'running'):
-            try:
-                # Check if there's an incoming connection (non-blocking)
-                import select
-                ready, _, _ = select.select([self.ipc_socket], [], [], 0.5)
+            self.ipc_server = None
+
+    def on_ipc_add(self, request):
+        """Validate a batch of torrents from another instance and queue it (IPC thread)"""
+        items = request.get('items')
+        if not isinstance(items, list):
+            raise ValueError("'items' must be a list")
+
+        results = []
+        accepted = []
+        for item in items:
+            error = validate_add_item(item)
+            if error:
+                results.append({'status': 'rejected', 'error': error})
+            else:
+                results.append({'status': 'queued'})
+                accepted.append(item)
 
-                if ready:
-                    conn, _ = self.ipc_socket.accept()
-                    try:
-                        data = conn.recv(4096).decode('utf-8')
-                        if data:
-                            # Schedule magnet link to be added on main thread
-                            self.root.after(0, lambda: self.handle_external_magnet(data))
-                            conn.send(b"OK")
-                    finally:
-                        conn.close()
-            except Exception as e:
-                if self.running:
-                    time.sleep(0.5)
+        # One main-thread call for the whole batch
+        if accepted:
+            self.root.after(0, lambda: self.handle_external_items(accepted))
+        return {'results': results}
 
     def on_closing(self):
         """Handle closing"""
+        if self.closing:
+            return
+
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
-            # Save settings and session state
+            self.closing = True
+
+            # Save settings
             self.save_settings()
-            self.save_session_state()
 
-            # Stop the app
+            # Stop the update loop so the resume flush is the only alert consumer
             self.running = False
+            self.status_var.set("Saving resume data...")
+
+            def shutdown():
+                if hasattr(self, 'update_thread'):
+                    self.update_thread.join(timeout=5)
+                if self.session_restorer:
+                    self.session_restorer.shutdown()
+                if self.scheduler:
+                    self.scheduler.stop()
+                if self.stream_server:
+                    # Turns sequential download off before the resume data is saved
+                    self.stream_server.stop()
+                if self.metrics_server:
+                    self.metrics_server.stop()
+                self.save_session_state()
+                self.resume_writer.shutdown()
+                self.metrics.close()
+                self.resume_store.close()
+                http_client.close()
+                self.searcher.cache.save()
+                self.root.after(0, self.finish_closing)
+
+            # Keep the window responsive while resume data is written
+            threading.Thread(target=shutdown, daemon=True).start()
+
+    def finish_closing(self):
+        """Release the IPC socket and destroy the window once state is saved"""
+        # Cleanup IPC socket
+        if self.ipc_server:
+            self.ipc_server.stop()
+
+        self.root.destroy()
+
+
+def send_to_existing_instance(items):
+    """
+    Try to send torrents to an existing instance in one request
+
+    Returns:
+        bool: True if an instance answered
+    """
+    socket_path = os.path.join(tempfile.gettempdir(), "torrent-downloader-gui.sock")
 
-            # Cleanup IPC socket
-            if self.ipc_socket:
-                try:
-                    self.ipc_socket.close()
-                except:
-                    pass
-            if os.path.exists(self.socket_path):
-                try:
-                    os.remove(self.socket_path)
-                except:
-                    pass
+    try:
+        with IpcClient(socket_path) as client:
+            results = client.add(items)
+    except (OSError, ProtocolError):
+        # No existing instance
+        return False
 
-            self.root.destroy()
+    for item, result in zip(items, results):
+        if result['status'] != 'queued':
+            print(f"Rejected {item.get('magnet') or item.get('torrent')}: {result.get('error')}")
+    return True
 
 
-def send_to_existing_instance(magnet_link):
-    """Try to send magnet link to existing instance"""
-    socket_path = os.path.join(tempfile.gettempdir(), "torrent-downloader-gui.sock")
+def send_to_daemon(items):
+    """
+    Try to add torrents to a running headless daemon
 
-    try:
-        # Try to connect to existing instance
-        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        client.settimeout(2)
-        client.connect(socket_path)
-        client.send(magnet_link.encode('utf-8'))
-        response = client.recv(1024)
-        client.close()
-        return True
-    except (socket.error, FileNotFoundError, ConnectionRefusedError):
-        # No existing instance
+    Returns:
+        bool: True if a daemon answered
+    """
+    client = control_api.connect(
+        os.path.expanduser("~/.config/torrent-downloader/daemon.json"), timeout=5)
+    if client is None:
         return False
 
+    for item in items:
+        try:
+            if 'magnet' in item:
+                client.add_magnet(item['magnet'])
+            else:
+                client.add_torrent_file(item['torrent'])
+        except control_api.ControlError as e:
+            if e.status is None:
+                return False  # Not reachable (stale control file)
+            print(f"Torrent daemon did not accept {item.get('magnet') or item.get('torrent')}: {e}")
+        except OSError as e:
+            print(f"Could not read {item['torrent']}: {e}")
+    return True
+
 
 def main():
-    # Check if magnet link was passed
-    magnet_link = sys.argv[1] if len(sys.argv) > 1 else None
+    # Magnet links and .torrent files passed on the command line
+    items = [make_add_item(arg) for arg in sys.argv[1:]]
 
-    # If magnet link provided, try to send to existing instance
-    if magnet_link:
-        if send_to_existing_instance(magnet_link):
-            print(f"Sent magnet link to existing instance")
+    # If any were given, try to send them to an existing instance
+    if items:
+        if send_to_existing_instance(items):
+            print(f"Sent {len(items)} torrent(s) to existing instance")
+            sys.exit(0)
+        if send_to_daemon(items):
+            print(f"Sent {len(items)} torrent(s) to the torrent daemon")
             sys.exit(0)
 
-    # No existing instance (or no magnet link), start normally
+    # No existing instance (or nothing to add), start normally
     root = tk.Tk()
     app = SecureTorrentGUI(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
 
-    # Handle magnet links passed as command-line arguments
-    if magnet_link:
-        # Schedule magnet link to be added after GUI is ready
-        root.after(500, lambda: app.handle_external_magnet(magnet_link))
+    # Handle torrents passed as command-line arguments
+    if items:
+        # Schedule them to be added after GUI is ready
+        root.after(500, lambda: app.handle_external_items(items))
 
     root.mainloop()
 
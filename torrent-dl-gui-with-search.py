@@ -10,6 +10,7 @@ import libtorrent as lt
 import threading
 import time
 import os
+import http_client
 from torrent_search import TorrentSearcher
 from torrent_utils import format_size, format_speed, send_notification, sanitize_filename
 
@@ -350,8 +351,7 @@ class TorrentGUI:
 
         def download_and_add():
             try:
-                import requests
-                response = requests.get(url, timeout=30)
+                response = http_client.get(url, timeout=30)
                 if response.status_code == 200:
                     # Sanitize filename to prevent path traversal
                     safe_name = sanitize_filename(name)
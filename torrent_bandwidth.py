@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Per-torrent rate limits, priorities and queue order
+
+libtorrent 2.0 has per-torrent rate limits but no torrent priorities, so
+priorities are implemented on top of the limits: while a session-wide cap
+is set, BandwidthAllocator divides it between the torrents that are
+transferring, in proportion to their priority weight, and applies the
+shares as per-torrent limits. A share never exceeds the limit the user
+set on the torrent; what a limited torrent can't use goes to the others.
+Without a session cap, each torrent just gets its own limit.
+
+The user's limits and priority are saved with the resume data (see
+resume_data.attach_torrent_settings), together with the queue position,
+which libtorrent itself doesn't restore.
+"""
+
+import threading
+
+import libtorrent as lt
+
+
+PRIORITY_WEIGHTS = {
+    'low': 1,
+    'normal': 2,
+    'high': 4,
+}
+
+DEFAULT_PRIORITY = 'normal'
+
+
+def weighted_shares(capacity, claims):
+    """
+    Split a rate between claimants by weight, respecting their own ceilings
+
+    Claimants whose ceiling is below their weighted share get the ceiling,
+    and the rest is split again between the others.
+
+    Args:
+        capacity: Rate to split in bytes/sec (> 0)
+        claims: Dict of key -> (weight, ceiling); a ceiling of 0 means none
+
+    Returns:
+        dict: key -> share in bytes/sec (at least 1)
+    """
+    shares = {}
+    remaining = dict(claims)
+    while remaining:
+        total_weight = sum(weight for weight, _ in remaining.values())
+        capped = {key: ceiling for key, (weight, ceiling) in remaining.items()
+                  if ceiling and ceiling <= capacity * weight / total_weight}
+        if not capped:
+            for key, (weight, _) in remaining.items():
+                shares[key] = max(1, int(capacity * weight / total_weight))
+            break
+        for key, ceiling in capped.items():
+            shares[key] = ceiling
+            capacity -= ceiling
+            del remaining[key]
+    return shares
+
+
+class TorrentBandwidth:
+    """The user's bandwidth settings for one torrent"""
+
+    __slots__ = ('priority', 'download_limit', 'upload_limit')
+
+    def __init__(self, priority=DEFAULT_PRIORITY, download_limit=0, upload_limit=0):
+        """
+        Args:
+            priority: Key of PRIORITY_WEIGHTS
+            download_limit: Download limit in bytes/sec (0 = unlimited)
+            upload_limit: Upload limit in bytes/sec (0 = unlimited)
+        """
+        self.priority = priority
+        self.download_limit = download_limit
+        self.upload_limit = upload_limit
+
+    @property
+    def weight(self):
+        return PRIORITY_WEIGHTS[self.priority]
+
+    def is_default(self):
+        """Return True if nothing was changed from the defaults"""
+        return (self.priority == DEFAULT_PRIORITY
+                and not self.download_limit and not self.upload_limit)
+
+
+class BandwidthAllocator:
+    """Keep per-torrent settings and turn them into libtorrent rate limits"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.torrents = {}     # info_hash -> TorrentBandwidth
+        self.applied = {}      # info_hash -> (download, upload) last set on the handle
+
+    def get(self, info_hash):
+        """Return the settings of a torrent (defaults if never changed)"""
+        return self.torrents.get(info_hash) or TorrentBandwidth()
+
+    def set_priority(self, info_hash, priority):
+        """
+        Change a torrent's priority
+
+        Raises:
+            ValueError: If the priority isn't one of PRIORITY_WEIGHTS
+        """
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority {priority!r}")
+        with self.lock:
+            self.torrents.setdefault(info_hash, TorrentBandwidth()).priority = priority
+
+    def set_limits(self, info_hash, download=None, upload=None):
+        """
+        Change a torrent's own rate limits
+
+        Args:
+            info_hash: Torrent to change
+            download: Limit in bytes/sec, 0 for unlimited, None to keep
+            upload: Limit in bytes/sec, 0 for unlimited, None to keep
+
+        Raises:
+            ValueError: If a limit is negative or not an integer
+        """
+        for value in (download, upload):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int)
+                                      or value < 0):
+                raise ValueError(f"Rate limit must be a non-negative integer, got {value!r}")
+        with self.lock:
+            settings = self.torrents.setdefault(info_hash, TorrentBandwidth())
+            if download is not None:
+                settings.download_limit = download
+            if upload is not None:
+                settings.upload_limit = upload
+            # Applied again on the next rebalance
+            self.applied.pop(info_hash, None)
+
+    def forget(self, info_hash):
+        """Drop a removed torrent"""
+        with self.lock:
+            self.torrents.pop(info_hash, None)
+            self.applied.pop(info_hash, None)
+
+    def load(self, info_hash, saved):
+        """
+        Restore a torrent's settings saved with its resume data
+
+        Args:
+            info_hash: Torrent the settings belong to
+            saved: Dict from saved(), or None
+        """
+        if not saved:
+            return
+        priority = saved.get('priority', DEFAULT_PRIORITY)
+        if priority not in PRIORITY_WEIGHTS:
+            priority = DEFAULT_PRIORITY
+        settings = TorrentBandwidth(priority, saved.get('download_limit', 0),
+                                    saved.get('upload_limit', 0))
+        with self.lock:
+            self.torrents[info_hash] = settings
+
+    def saved(self, info_hash, handle):
+        """
+        Return what to store with a torrent's resume data
+
+        Called from the resume writer's worker threads.
+
+        Args:
+            info_hash: Torrent being saved
+            handle: Its torrent_handle
+
+        Returns:
+            dict: 'priority', 'download_limit', 'upload_limit' and 'queue_position'
+        """
+        settings = self.get(info_hash)
+        return {
+            'priority': settings.priority,
+            'download_limit': settings.download_limit,
+            'upload_limit': settings.upload_limit,
+            'queue_position': int(handle.queue_position()) if handle.is_valid() else -1,
+        }
+
+    def rebalance(self, statuses, download_cap=0, upload_cap=0):
+        """
+        Set the per-torrent limits for the current session caps
+
+        Only torrents with peers take part in the split; the others get
+        their own limits until they start transferring. Handles are only
+        touched when their limits change.
+
+        Args:
+            statuses: Latest torrent_status of every torrent
+            download_cap: Session download limit in bytes/sec (0 = unlimited)
+            upload_cap: Session upload limit in bytes/sec (0 = unlimited)
+
+        Returns:
+            int: Number of torrents whose limits were changed
+        """
+        # Held throughout, so a set_limits() or forget() from another thread
+        # lands either before the split or after its limits are recorded
+        with self.lock:
+            default = TorrentBandwidth()
+            download_claims = {}
+            upload_claims = {}
+            for s in statuses:
+                if s.paused or s.num_peers == 0:
+                    continue
+                info_hash = str(s.info_hash)
+                settings = self.torrents.get(info_hash, default)
+                if s.state == lt.torrent_status.downloading:
+                    download_claims[info_hash] = (settings.weight, settings.download_limit)
+                upload_claims[info_hash] = (settings.weight, settings.upload_limit)
+
+            download_shares = (weighted_shares(download_cap, download_claims)
+                               if download_cap else {})
+            upload_shares = weighted_shares(upload_cap, upload_claims) if upload_cap else {}
+
+            changed = 0
+            for s in statuses:
+                info_hash = str(s.info_hash)
+                settings = self.torrents.get(info_hash, default)
+                limits = (download_shares.get(info_hash, settings.download_limit),
+                          upload_shares.get(info_hash, settings.upload_limit))
+                if self.applied.get(info_hash) == limits:
+                    continue
+                handle = s.handle
+                if not handle.is_valid():
+                    continue
+                handle.set_download_limit(limits[0])
+                handle.set_upload_limit(limits[1])
+                self.applied[info_hash] = limits
+                changed += 1
+            return changed
+
+
+def move_in_queue(handles, direction):
+    """
+    Move torrents in the download queue, keeping their relative order
+
+    Args:
+        handles: torrent_handles to move
+        direction: 'top', 'up', 'down' or 'bottom'
+
+    Raises:
+        ValueError: If the direction is unknown
+    """
+    moves = {
+        'top': lt.torrent_handle.queue_position_top,
+        'up': lt.torrent_handle.queue_position_up,
+        'down': lt.torrent_handle.queue_position_down,
+        'bottom': lt.torrent_handle.queue_position_bottom,
+    }
+    if direction not in moves:
+        raise ValueError(f"Unknown queue direction {direction!r}")
+
+    # Move the torrent nearest the destination first, or the selection
+    # would swap with itself
+    queued = [(int(h.queue_position()), h) for h in handles]
+    queued = [item for item in queued if item[0] >= 0]
+    queued.sort(key=lambda item: item[0], reverse=direction in ('top', 'down'))
+    for _, handle in queued:
+        moves[direction](handle)
+
+
+def restore_queue_order(saved_positions):
+    """
+    Put restored torrents back in their saved queue order
+
+    Torrents are added in whatever order their records finish loading, so
+    libtorrent queues them arbitrarily. Moving each one to the bottom in
+    saved order rebuilds the order in one pass.
+
+    Args:
+        saved_positions: (saved queue position, torrent_handle) pairs;
+            negative positions (finished torrents) are skipped
+    """
+    for position, handle in sorted((item for item in saved_positions if item[0] >= 0),
+                                   key=lambda item: item[0]):
+        if handle.is_valid():
+            handle.queue_position_bottom()
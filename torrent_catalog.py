@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Built-in catalog of legal torrents with a token inverted index
+
+The entries live in torrent_catalog.json and are loaded once at import.
+Each entry's name and keywords are split into tokens; the index maps
+every token to the entries containing it, so a lookup touches only the
+matching entries instead of scanning the whole catalog.
+"""
+
+import os
+import re
+import json
+from bisect import bisect_left
+
+from torrent_utils import parse_size
+
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "torrent_catalog.json")
+
+# Fields copied into search results; size_bytes is derived from size at load
+RESULT_FIELDS = ('name', 'size', 'size_bytes', 'seeders', 'magnet', 'link', 'source')
+
+# Ignored in queries unless the query has nothing else
+STOPWORDS = frozenset(['a', 'an', 'and', 'from', 'in', 'of', 'the', 'to'])
+
+# Query tokens at least this long also match longer tokens they start
+MIN_PREFIX = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class Catalog:
+    """Searchable set of catalog entries"""
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: List of dicts with 'category', 'keywords' and the
+                RESULT_FIELDS except size_bytes; order is used to break
+                ranking ties
+        """
+        self.entries = [dict(entry, size_bytes=parse_size(entry['size'])) for entry in entries]
+        self.index = {}   # token -> set of entry positions
+
+        for position, entry in enumerate(self.entries):
+            text = f"{entry['name']} {entry.get('keywords', '')}"
+            for token in set(tokenize(text)):
+                self.index.setdefault(token, set()).add(position)
+
+        self.vocabulary = sorted(self.index)
+
+    @classmethod
+    def load(cls, path=CATALOG_FILE):
+        """Load a catalog from a JSON file with an 'entries' list"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['entries'])
+
+    def _matches(self, token):
+        """
+        Return {position: weight} for entries matching one query token
+
+        Whole-token matches weigh 2, prefix matches 1.
+        """
+        matches = {position: 2 for position in self.index.get(token, ())}
+
+        if len(token) >= MIN_PREFIX:
+            start = bisect_left(self.vocabulary, token)
+            for word in self.vocabulary[start:]:
+                if not word.startswith(token):
+                    break
+                if word != token:
+                    for position in self.index[word]:
+                        matches.setdefault(position, 1)
+
+        return matches
+
+    def search(self, query, category=None, limit=20):
+        """
+        Find entries matching a query, best matches first
+
+        Entries are ranked by how many query terms they match, then by
+        match quality, then by catalog order.
+
+        Args:
+            query: Search query
+            category: Only return entries of this category (default: all)
+            limit: Maximum number of results
+
+        Returns:
+            list: Result dicts with RESULT_FIELDS
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        terms = [t for t in tokens if t not in STOPWORDS] or tokens
+
+        scores = {}   # position -> [terms matched, weight]
+        for term in terms:
+            for position, weight in self._matches(term).items():
+                if category and self.entries[position]['category'] != category:
+                    continue
+                score = scores.setdefault(position, [0, 0])
+                score[0] += 1
+                score[1] += weight
+
+        ranked = sorted(scores, key=lambda p: (-scores[p][0], -scores[p][1], p))
+        return [{field: self.entries[p][field] for field in RESULT_FIELDS}
+                for p in ranked[:limit]]
+
+
+CATALOG = Catalog.load()
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Headless torrent engine
+
+Owns the libtorrent session, the resume store and the update loop, with
+no UI attached. The daemon drives one engine and serves it to clients
+over the control API; every method here is safe to call from any thread.
+"""
+
+import os
+import threading
+
+import libtorrent as lt
+
+from status_engine import StatusEngine
+from resume_data import ResumeDataWriter, ResumeFlusher, ResumeCheckpointer, verify_resume_files
+from resume_store import empty_record
+from session_restore import SessionRestorer, build_restore_params
+from session_profiles import DEFAULT_PROFILE, profile_settings
+from bandwidth_scheduler import BandwidthScheduler
+from stream_server import StreamServer
+from session_metrics import DEFAULT_INTERVAL, MetricsServer, SessionMetrics
+from file_selection import list_files, priority_name, select_files
+from torrent_utils import validate_magnet_link
+
+
+def build_session_settings(download_rate=0, upload_rate=0, encryption=True, dht=True,
+                           listen_interfaces='0.0.0.0:6881', profile=DEFAULT_PROFILE,
+                           profile_overrides=None):
+    """
+    Build the settings pack shared by the GUI and the daemon
+
+    Args:
+        download_rate: Session download limit in bytes/sec (0 = unlimited)
+        upload_rate: Session upload limit in bytes/sec (0 = unlimited)
+        encryption: Enable protocol encryption
+        dht: Enable the DHT
+        listen_interfaces: Interfaces and port to accept peers on
+        profile: Performance profile for connections, queueing and disk I/O
+        profile_overrides: Individual settings applied on top of the profile
+
+    Returns:
+        dict: Settings for lt.session() or apply_settings()
+
+    Raises:
+        ValueError: If the profile doesn't exist
+    """
+    settings = profile_settings(profile, profile_overrides)
+    settings.update({
+        'listen_interfaces': listen_interfaces,
+        'enable_dht': dht,
+        'enable_lsd': True,
+        'enable_upnp': True,
+        'enable_natpmp': True,
+
+        # Bandwidth limits
+        'download_rate_limit': download_rate,
+        'upload_rate_limit': upload_rate,
+
+        # Errors, plus the storage alerts that report deleted and moved files
+        'alert_mask': int(lt.alert.category_t.error_notification
+                          | lt.alert.category_t.storage_notification),
+    })
+
+    if encryption:
+        settings['out_enc_policy'] = int(lt.enc_policy.enabled)
+        settings['in_enc_policy'] = int(lt.enc_policy.enabled)
+        settings['allowed_enc_level'] = int(lt.enc_level.both)
+    else:
+        settings['out_enc_policy'] = int(lt.enc_policy.disabled)
+        settings['in_enc_policy'] = int(lt.enc_policy.disabled)
+
+    return settings
+
+
+def status_to_dict(status):
+    """
+    Convert a torrent_status into a JSON-serializable dict
+
+    Args:
+        status: libtorrent torrent_status
+
+    Returns:
+        dict: Summary of the torrent's state and transfer
+    """
+    return {
+        'info_hash': str(status.info_hash),
+        'name': status.name,
+        'state': str(status.state),
+        'progress': status.progress,
+        'paused': status.paused,
+        'is_seeding': status.is_seeding,
+        'has_metadata': status.has_metadata,
+        'download_rate': status.download_rate,
+        'upload_rate': status.upload_rate,
+        'num_peers': status.num_peers,
+        'num_seeds': status.num_seeds,
+        'total_done': status.total_done,
+        'total_wanted': status.total_wanted,
+        'save_path': status.save_path,
+    }
+
+
+class TorrentEngine:
+    """Run a libtorrent session with resume data and checkpoints, without a UI"""
+
+    def __init__(self, store, download_path, settings=None, startup_check='trust',
+                 tick_interval=1.0, profile=DEFAULT_PROFILE, schedule=None,
+                 metrics_interval=DEFAULT_INTERVAL, metrics_log=None, metrics_port=None):
+        """
+        Args:
+            store: Resume store holding the saved torrents
+            download_path: Directory new torrents are saved to
+            settings: Session settings (default: build_session_settings())
+            startup_check: 'trust' rechecks only torrents whose files don't
+                match their resume data, 'full' hash-checks every torrent
+            tick_interval: Seconds per update loop tick
+            profile: Name of the performance profile the settings were built with
+            schedule: BandwidthSchedule overriding the limits at times, or None
+            metrics_interval: Seconds between session counter samples
+            metrics_log: JSONL file every counter sample is appended to, or None
+            metrics_port: Loopback port for the Prometheus endpoint
+                (None = off, 0 = any free port)
+        """
+        self.store = store
+        self.download_path = download_path
+        self.settings = settings if settings is not None else build_session_settings()
+        self.startup_check = startup_check
+        self.tick_interval = tick_interval
+        self.profile = profile
+        self.schedule = schedule
+        self.scheduler = None
+        self.stream_server = None  # Started by the first stream()
+        self.metrics_interval = metrics_interval
+        self.metrics_log = metrics_log
+        self.metrics_port = metrics_port
+        self.metrics = None
+        self.metrics_server = None
+
+        self.ses = None
+        self.handles = {}          # info_hash -> torrent_handle (None while being added)
+        self.metadata_saved = set()
+        self.lock = threading.Lock()
+
+        self.running = False
+        self.thread = None
+        self.restorer = None
+
+    def start(self):
+        """Create the session, start restoring saved torrents and run the update loop"""
+        os.makedirs(self.download_path, exist_ok=True)
+
+        self.ses = lt.session(self.settings)
+        self.status_engine = StatusEngine(self.ses)
+
+        # Before any thread starts, so a taken port or unwritable log fails cleanly
+        self.metrics = SessionMetrics(self.ses, self.metrics_interval, self.metrics_log)
+        self.status_engine.subscribe(lt.session_stats_alert, self.metrics.on_session_stats)
+        if self.metrics_port is not None:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, self.metrics_port)
+            except OSError:
+                self.metrics.close()
+                raise
+            self.metrics_server.start()
+
+        self.writer = ResumeDataWriter(self.store)
+        self.flusher = ResumeFlusher(self.ses, self.writer)
+
+        self.checkpointer = ResumeCheckpointer(self.writer)
+        self.status_engine.subscribe(lt.save_resume_data_alert, self.checkpointer.on_resume_data)
+        self.status_engine.subscribe(lt.save_resume_data_failed_alert,
+                                     self.checkpointer.on_resume_failed)
+
+        self.restorer = SessionRestorer(self.ses, self.store, self.download_path,
+                                        on_added=self._on_restored,
+                                        needs_recheck=self.needs_recheck)
+        self.status_engine.subscribe(lt.add_torrent_alert, self.restorer.on_add_torrent)
+        self.restorer.start()
+
+        # The settings passed in apply outside the schedule's slots
+        self.scheduler = BandwidthScheduler(self.ses, self.settings, self.schedule)
+        self.scheduler.start()
+
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name='torrent-engine', daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        """Poll status changes, save new metadata and checkpoint resume data"""
+        while self.running:
+            try:
+                for status in self.status_engine.poll(interval=self.tick_interval):
+                    self.checkpointer.note_status(status)
+                    if status.has_metadata:
+                        self._save_metadata(str(status.info_hash), status.handle)
+                self.checkpointer.tick()
+                self.metrics.tick()
+            except Exception as e:
+                print(f"Engine update error: {e}")
+
+    def _on_restored(self, handle, entry):
+        """Register a torrent restored from the store (alert thread)"""
+        self._register(handle)
+        if entry['has_metadata']:
+            self.metadata_saved.add(entry['info_hash'])
+
+    def _register(self, handle):
+        info_hash = str(handle.info_hash())
+        with self.lock:
+            self.handles[info_hash] = handle
+        self.status_engine.track(handle)
+        return info_hash
+
+    def _save_metadata(self, info_hash, handle):
+        """Store the .torrent of a magnet once its metadata has arrived"""
+        if info_hash in self.metadata_saved:
+            return
+        try:
+            ti = handle.torrent_file()
+            if ti is None:
+                return
+            self.store.put(info_hash, torrent=lt.bencode(lt.create_torrent(ti).generate()),
+                           magnet=lt.make_magnet_uri(ti))
+            self.metadata_saved.add(info_hash)
+        except Exception as e:
+            print(f"Failed to save metadata for {info_hash}: {e}")
+
+    def needs_recheck(self, resume_data, ti, save_path):
+        """Return True unless the files on disk match the resume data"""
+        if self.startup_check == 'full':
+            return True
+        return not verify_resume_files(resume_data, ti, save_path)
+
+    def _add(self, info_hash, record, trackers=()):
+        """Add a torrent from a store record, reusing saved resume data"""
+        # Checked before the handles, so a restore finishing in between is
+        # found in one or the other
+        if self.restorer is not None and self.restorer.is_unanswered(info_hash):
+            return info_hash  # The restore is adding it, with its resume data
+
+        with self.lock:
+            if info_hash in self.handles:
+                return info_hash  # Already in the session, or being added
+            self.handles[info_hash] = None  # Reserved, so a concurrent add stops above
+
+        try:
+            params, resume_data = build_restore_params(info_hash, record, self.download_path)
+            params.trackers = list(set(params.trackers) | set(trackers))
+            params.storage_mode = lt.storage_mode_t.storage_mode_sparse
+
+            handle = self.ses.add_torrent(params)
+            if params.ti is not None and self.needs_recheck(resume_data, params.ti,
+                                                            params.save_path):
+                handle.force_recheck()
+        except Exception:
+            with self.lock:
+                if self.handles.get(info_hash) is None:
+                    self.handles.pop(info_hash, None)
+            raise
+
+        if record['torrent']:
+            self.metadata_saved.add(info_hash)
+        return self._register(handle)
+
+    def add_magnet(self, magnet):
+        """
+        Add a magnet link
+
+        Args:
+            magnet: Magnet URI
+
+        Returns:
+            str: Info hash of the torrent
+
+        Raises:
+            ValueError: If the magnet link is invalid
+        """
+        check = validate_magnet_link(magnet.strip() if isinstance(magnet, str) else None)
+        if not check['valid']:
+            raise ValueError(f"Invalid magnet link: {check['error']}")
+
+        try:
+            magnet_params = lt.parse_magnet_uri(magnet.strip())
+        except RuntimeError as e:
+            raise ValueError(f"Invalid magnet link: {e}")
+
+        info_hash = str(magnet_params.info_hash)
+        record = self.store.get(info_hash) or empty_record()
+        if not record['torrent']:
+            record['magnet'] = magnet.strip()
+        return self._add(info_hash, record, trackers=magnet_params.trackers)
+
+    def add_torrent_data(self, data):
+        """
+        Add a torrent from the contents of a .torrent file
+
+        Args:
+            data: Bencoded .torrent bytes
+
+        Returns:
+            str: Info hash of the torrent
+
+        Raises:
+            ValueError: If the data is not a valid torrent
+        """
+        try:
+            ti = lt.torrent_info(lt.bdecode(data))
+        except Exception as e:
+            raise ValueError(f"Invalid torrent file: {e}")
+
+        info_hash = str(ti.info_hash())
+        record = self.store.get(info_hash) or empty_record()
+        if not record['torrent']:
+            record['torrent'] = data
+            self.store.put(info_hash, torrent=data)
+        return self._add(info_hash, record)
+
+    def _handle(self, info_hash):
+        with self.lock:
+            handle = self.handles.get(info_hash)
+        if handle is None:
+            raise KeyError(info_hash)
+        return handle
+
+    def remove(self, info_hash, delete_files=False):
+        """
+        Remove a torrent and its resume data
+
+        Args:
+            info_hash: Torrent to remove
+            delete_files: Also delete the downloaded files
+
+        Raises:
+            KeyError: If the torrent is not in the session
+        """
+        handle = self._handle(info_hash)
+        with self.lock:
+            self.handles.pop(info_hash, None)
+            stream_server = self.stream_server
+
+        if stream_server is not None:
+            stream_server.remove(info_hash)
+        # Before removing, so a checkpoint answer on its way isn't written back
+        self.checkpointer.forget(info_hash, handle)
+        if delete_files:
+            self.ses.remove_torrent(handle, lt.session.delete_files)
+        else:
+            self.ses.remove_torrent(handle)
+        self.status_engine.forget(info_hash)
+        self.metadata_saved.discard(info_hash)
+        self.store.delete(info_hash)
+
+    def pause(self, info_hash):
+        """Pause a torrent (KeyError if unknown)"""
+        self._handle(info_hash).pause()
+
+    def resume(self, info_hash):
+        """Resume a paused torrent (KeyError if unknown)"""
+        self._handle(info_hash).resume()
+
+    def stream(self, info_hash, file_index=None):
+        """
+        Put a torrent in streaming mode and return a local URL for one of its files
+
+        Args:
+            info_hash: Torrent to stream
+            file_index: File to stream (default: the largest)
+
+        Returns:
+            str: http://127.0.0.1 URL supporting Range requests
+
+        Raises:
+            KeyError: If the torrent is not in the session
+            ValueError: If it has no metadata yet or the index is invalid
+        """
+        handle = self._handle(info_hash)
+        with self.lock:
+            if self.stream_server is None:
+                self.stream_server = StreamServer()
+                self.stream_server.start()
+            stream_server = self.stream_server
+        return stream_server.add(handle, file_index)
+
+    def files(self, info_hash):
+        """
+        Return the files of a torrent with their priority and progress
+
+        Returns:
+            list: Dicts with 'index', 'path', 'size', 'priority' (name) and 'done' (bytes)
+
+        Raises:
+            KeyError: If the torrent is not in the session
+            ValueError: If it has no metadata yet
+        """
+        handle = self._handle(info_hash)
+        ti = handle.torrent_file()
+        if ti is None:
+            raise ValueError("Torrent metadata not yet available")
+        priorities = handle.get_file_priorities()
+        progress = handle.file_progress(lt.torrent_handle.piece_granularity)
+        return [{'index': index, 'path': path, 'size': size,
+                 'priority': priority_name(priorities[index]), 'done': progress[index]}
+                for index, path, size in list_files(ti)]
+
+    def select_files(self, info_hash, include=(), exclude=()):
+        """
+        Download only the files of a torrent that pass glob filters
+
+        The selection is kept in the torrent's resume data.
+
+        Raises:
+            KeyError: If the torrent is not in the session
+            ValueError: If it has no metadata yet or nothing matches
+        """
+        handle = self._handle(info_hash)
+        ti = handle.torrent_file()
+        if ti is None:
+            raise ValueError("Torrent metadata not yet available")
+        handle.prioritize_files(select_files(ti, include, exclude, handle.get_file_priorities()))
+
+    def torrent_status(self, info_hash):
+        """Return the status dict of one torrent (KeyError if unknown)"""
+        return status_to_dict(self._handle(info_hash).status())
+
+    def list_torrents(self):
+        """Return status dicts for every torrent, from the status cache where possible"""
+        with self.lock:
+            handles = dict(self.handles)
+
+        torrents = []
+        for info_hash, handle in handles.items():
+            if handle is None:
+                continue  # Still being added
+            status = self.status_engine.get(info_hash)
+            if status is None:
+                status = handle.status()  # Added since the last tick
+            torrents.append(status_to_dict(status))
+        return torrents
+
+    def session_status(self):
+        """Return session-wide rates, totals, limits and restore progress"""
+        with self.lock:
+            count = sum(handle is not None for handle in self.handles.values())
+
+        restorer = self.restorer
+        return {
+            'torrents': count,
+            'download_rate': self.status_engine.download_rate,
+            'upload_rate': self.status_engine.upload_rate,
+            'total_download': self.status_engine.total_download,
+            'total_upload': self.status_engine.total_upload,
+            'limits': self.get_limits(),
+            'profile': self.profile,
+            'schedule': self.scheduler.slot.format() if self.scheduler.slot else None,
+            'restoring': restorer is not None and not restorer.is_finished(),
+            'metrics_port': self.metrics_server.port if self.metrics_server else None,
+        }
+
+    def session_stats(self, all_metrics=False):
+        """
+        Return the latest libtorrent session counters
+
+        Args:
+            all_metrics: Every counter and gauge instead of the summary set
+
+        Returns:
+            dict: 'timestamp' (Unix time of the sample, None before the
+                first one) and 'values' (metric name -> value)
+        """
+        timestamp, values = self.metrics.latest()
+        if not all_metrics:
+            values = self.metrics.summary()
+        return {'timestamp': timestamp, 'values': values}
+
+    def get_limits(self):
+        """Return the session rate limits in bytes/sec (0 = unlimited)"""
+        settings = self.ses.get_settings()
+        return {'download': settings['download_rate_limit'],
+                'upload': settings['upload_rate_limit']}
+
+    def set_limits(self, download=None, upload=None):
+        """
+        Change the session rate limits
+
+        Args:
+            download: Download limit in bytes/sec, 0 for unlimited, None to keep
+            upload: Upload limit in bytes/sec, 0 for unlimited, None to keep
+
+        Raises:
+            ValueError: If a limit is negative or not a number
+        """
+        settings = {}
+        for key, value in (('download_rate_limit', download), ('upload_rate_limit', upload)):
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"Rate limit must be a non-negative integer, got {value!r}")
+            settings[key] = value
+
+        if settings:
+            self.ses.apply_settings(settings)
+            self.settings.update(settings)
+            self.scheduler.set_base(self.settings)
+
+    def get_profile(self):
+        """Return the name of the active performance profile"""
+        return self.profile
+
+    def set_profile(self, name, overrides=None):
+        """
+        Switch the running session to another performance profile
+
+        Args:
+            name: Profile name
+            overrides: Individual settings applied on top of the profile
+
+        Raises:
+            ValueError: If the profile doesn't exist
+        """
+        settings = profile_settings(name, overrides)
+        self.ses.apply_settings(settings)
+        self.settings.update(settings)
+        self.profile = name
+        self.scheduler.set_base(self.settings)
+
+    def shutdown(self, timeout=30.0):
+        """Stop the update loop and write resume data for every torrent"""
+        if not self.running:
+            return
+        self.running = False
+        self.thread.join(timeout=5)
+        self.restorer.shutdown()
+        self.scheduler.stop()
+        if self.stream_server is not None:
+            # Turns sequential download off again before the resume data is saved
+            self.stream_server.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+
+        with self.lock:
+            handles = [handle for handle in self.handles.values() if handle is not None]
+        result = self.flusher.flush(handles, timeout=timeout)
+        print(f"Resume data saved for {result['saved']} torrent(s) "
+              f"({result['failed']} failed, {result['timed_out']} timed out)")
+
+        self.writer.shutdown()
+        self.metrics.close()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Registry of the torrents shown in the downloads list
+
+Every torrent is indexed by info hash, tree item id and handle, so lookups
+from alerts (info hash), from the selection (item id) and from libtorrent
+callbacks (handle) are O(1), and bulk actions on a selection are linear in
+the size of the selection rather than selection x torrents.
+
+Writers serialize on a lock. Single lookups don't take it: a dict get is
+atomic, so the update thread can resolve changed statuses without ever
+waiting for the UI thread. Iteration goes through snapshot().
+"""
+
+import threading
+
+
+class TorrentRecord:
+    """One torrent in the downloads list"""
+
+    __slots__ = ('handle', 'info', 'item_id', 'info_hash', 'completed')
+
+    def __init__(self, handle, info, item_id, info_hash):
+        """
+        Args:
+            handle: libtorrent torrent_handle
+            info: torrent_info, or None until a magnet's metadata arrives
+            item_id: Row id in the downloads tree
+            info_hash: Info hash as a hex string
+        """
+        self.handle = handle
+        self.info = info
+        self.item_id = item_id
+        self.info_hash = info_hash
+        self.completed = False
+
+
+class TorrentRegistry:
+    """Index torrent records by info hash, item id and handle"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Serializes writers only
+        self.by_hash = {}
+        self.by_item_id = {}
+        self.by_handle = {}
+
+    def add(self, handle, info, item_id, info_hash=None):
+        """
+        Register a torrent
+
+        Args:
+            handle: libtorrent torrent_handle
+            info: torrent_info or None
+            item_id: Row id in the downloads tree
+            info_hash: Info hash, if already known (saves asking the handle)
+
+        Returns:
+            TorrentRecord
+        """
+        record = TorrentRecord(handle, info, item_id, info_hash or str(handle.info_hash()))
+        with self.lock:
+            old = self.by_hash.get(record.info_hash)
+            if old is not None:
+                self._unindex(old)
+            self.by_hash[record.info_hash] = record
+            self.by_item_id[item_id] = record
+            self.by_handle[handle] = record
+        return record
+
+    def _unindex(self, record):
+        """Drop a record from every index (lock held)"""
+        if self.by_hash.get(record.info_hash) is record:
+            del self.by_hash[record.info_hash]
+        if self.by_item_id.get(record.item_id) is record:
+            del self.by_item_id[record.item_id]
+        if self.by_handle.get(record.handle) is record:
+            del self.by_handle[record.handle]
+
+    def remove(self, record):
+        """Forget a torrent; removing one that is already gone is a no-op"""
+        with self.lock:
+            self._unindex(record)
+
+    def remove_items(self, item_ids):
+        """
+        Forget the torrents shown in the given rows
+
+        Args:
+            item_ids: Tree item ids, e.g. the current selection
+
+        Returns:
+            list: The removed records, in selection order
+        """
+        removed = []
+        with self.lock:
+            for item_id in item_ids:
+                record = self.by_item_id.get(item_id)
+                if record is not None:
+                    self._unindex(record)
+                    removed.append(record)
+        return removed
+
+    def get(self, info_hash):
+        """Return the record for an info hash, or None (lock-free)"""
+        return self.by_hash.get(info_hash)
+
+    def get_by_item(self, item_id):
+        """Return the record shown in a tree row, or None (lock-free)"""
+        return self.by_item_id.get(item_id)
+
+    def get_by_handle(self, handle):
+        """Return the record for a torrent_handle, or None (lock-free)"""
+        return self.by_handle.get(handle)
+
+    def for_items(self, item_ids):
+        """Return the records shown in the given rows, skipping unknown ones"""
+        by_item_id = self.by_item_id
+        return [record for record in map(by_item_id.get, item_ids) if record is not None]
+
+    def snapshot(self):
+        """Return a list of all records, safe to iterate while others add and remove"""
+        with self.lock:
+            return list(self.by_hash.values())
+
+    def hashes(self):
+        """Return the set of registered info hashes"""
+        with self.lock:
+            return set(self.by_hash)
+
+    def __contains__(self, info_hash):
+        return info_hash in self.by_hash
+
+    def __len__(self):
+        return len(self.by_hash)
@@ -6,14 +6,145 @@ Searches legal torrent sources for content
 
 import requests
 import re
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from urllib.parse import quote
 import json
 
+import http_client
+from torrent_catalog import CATALOG
+from torrent_utils import parse_count
+
+
+class SearchCache:
+    """TTL + LRU cache of search results, keyed by source and normalized query"""
+
+    # Network sources change slowly and are rate limited; keep them longer
+    DEFAULT_TTLS = {
+        'Internet Archive': 30 * 60,
+        'Academic Torrents': 30 * 60,
+    }
+
+    def __init__(self, max_entries=256, default_ttl=10 * 60, ttls=None, path=None):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            default_ttl: Seconds a result stays valid for sources not in ttls
+            ttls: Dict of source name -> TTL in seconds
+            path: Optional JSON file the cache is loaded from and saved to
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        self.path = path
+        self.entries = OrderedDict()  # (source, query) -> [expires_at, limit, results]
+        self.lock = threading.Lock()
+
+        if path:
+            self.load()
+
+    @staticmethod
+    def normalize_query(query):
+        """Lowercase and collapse whitespace so trivially different queries share an entry"""
+        return ' '.join(query.lower().split())
+
+    def get(self, source, query, limit):
+        """
+        Look up cached results
+
+        An entry stored for a larger limit also answers smaller ones, and
+        so does one whose source had fewer results than it was asked for.
+
+        Returns:
+            list: Up to limit results, or None on a miss
+        """
+        key = (source, self.normalize_query(query))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, stored_limit, results = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            if stored_limit < limit and len(results) >= stored_limit:
+                return None  # There may be more results than were stored
+
+            self.entries.move_to_end(key)
+            return list(results[:limit])
+
+    def put(self, source, query, limit, results):
+        """Store results, evicting the least recently used entries beyond max_entries"""
+        if not results:
+            return  # Sources return [] on errors too, so don't remember empty answers
+
+        key = (source, self.normalize_query(query))
+        ttl = self.ttls.get(source, self.default_ttl)
+        with self.lock:
+            self.entries[key] = [time.time() + ttl, limit, list(results)]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry"""
+        with self.lock:
+            self.entries.clear()
+
+    def load(self):
+        """Load unexpired entries from the cache file"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Failed to load search cache: {e}")
+            return
+
+        now = time.time()
+        with self.lock:
+            for source, query, expires_at, limit, results in data.get('entries', []):
+                if expires_at > now:
+                    self.entries[(source, query)] = [expires_at, limit, results]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        """Write unexpired entries to the cache file, least recently used first"""
+        if not self.path:
+            return
+
+        now = time.time()
+        with self.lock:
+            entries = [[source, query, expires_at, limit, results]
+                       for (source, query), (expires_at, limit, results) in self.entries.items()
+                       if expires_at > now]
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'entries': entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save search cache: {e}")
+
 
 class TorrentSearcher:
     """Search legal torrent sources"""
 
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: SearchCache to use (default: an in-memory one)
+        """
+        self.cache = cache if cache is not None else SearchCache()
+
         self.sources = {
             'archive': 'Internet Archive',
             'linuxtracker': 'Linux Tracker',
@@ -24,6 +155,21 @@ class TorrentSearcher:
             'books': 'Public Domain Books'
         }
 
+        # Sources queried by search_all, in the order their results are listed
+        self.search_sources = [
+            ('Sample Content', self.search_sample_content),
+            ('Public Domain', self.search_public_domain_movies),
+            ('Public Domain Books', self.search_public_domain_books),
+            ('CC Music', self.search_creative_commons_music),
+            ('Linux Tracker', self.search_linux_tracker),
+            ('Academic Torrents', self.search_academic_torrents),
+            ('Internet Archive', self.search_archive_org),
+        ]
+
+        # Sources that make a network request; only their results are cached.
+        # Catalog lookups are cheaper than a cache hit and must not evict them.
+        self.cached_sources = {'Academic Torrents', 'Internet Archive'}
+
     def search_archive_org(self, query, limit=20):
         """Search Internet Archive for torrents"""
         results = []
@@ -39,7 +185,7 @@ class TorrentSearcher:
                 'save': 'yes'
             }
 
-            response = requests.get(search_url, params=params, timeout=10)
+            response = http_client.get(search_url, params=params, timeout=10)
             response.raise_for_status()  # Raise exception for bad status codes
 
             data = response.json()
@@ -52,6 +198,7 @@ class TorrentSearcher:
                 result = {
                     'name': title if isinstance(title, str) else title[0] if title else 'Unknown',
                     'size': self._format_size(item.get('item_size', 0)),
+                    'size_bytes': parse_count(item.get('item_size', 0)),
                     'seeders': item.get('downloads', 0),
                     'magnet': f"https://archive.org/download/{identifier}/{identifier}_archive.torrent",
                     'link': f"https://archive.org/details/{identifier}",
@@ -74,223 +221,19 @@ class TorrentSearcher:
 
     def search_linux_tracker(self, query, limit=20):
         """Search for Linux distributions"""
-        results = []
-
-        # Common Linux distros with torrent links
-        linux_distros = {
-            'ubuntu': {
-                'name': 'Ubuntu 24.04 LTS Desktop',
-                'magnet': 'https://releases.ubuntu.com/24.04/ubuntu-24.04-desktop-amd64.iso.torrent',
-                'size': '5.8 GB',
-                'seeders': '1000+'
-            },
-            'debian': {
-                'name': 'Debian 12 Live',
-                'magnet': 'https://cdimage.debian.org/debian-cd/current-live/amd64/bt-hybrid/',
-                'size': '3.2 GB',
-                'seeders': '500+'
-            },
-            'fedora': {
-                'name': 'Fedora Workstation',
-                'magnet': 'https://torrent.fedoraproject.org/',
-                'size': '2.1 GB',
-                'seeders': '800+'
-            },
-            'mint': {
-                'name': 'Linux Mint 21 Cinnamon',
-                'magnet': 'https://www.linuxmint.com/torrents/',
-                'size': '2.8 GB',
-                'seeders': '600+'
-            },
-            'arch': {
-                'name': 'Arch Linux',
-                'magnet': 'https://archlinux.org/download/',
-                'size': '850 MB',
-                'seeders': '400+'
-            }
-        }
-
-        query_lower = query.lower()
-        for distro_name, info in linux_distros.items():
-            if distro_name in query_lower or query_lower in info['name'].lower():
-                results.append({
-                    'name': info['name'],
-                    'size': info['size'],
-                    'seeders': info['seeders'],
-                    'magnet': info['magnet'],
-                    'link': info['magnet'],
-                    'source': 'Linux Tracker'
-                })
-
-        return results[:limit]
+        return CATALOG.search(query, category='linux', limit=limit)
 
     def search_sample_content(self, query, limit=20):
         """Search for Creative Commons and sample content"""
-        results = []
-
-        samples = {
-            'big buck bunny': {
-                'name': 'Big Buck Bunny (Creative Commons)',
-                'magnet': 'magnet:?xt=urn:btih:dd8255ecdc7ca55fb0bbf81323d87062db1f6d1c&dn=Big+Buck+Bunny',
-                'size': '264 MB',
-                'seeders': '500+',
-                'link': 'https://peach.blender.org/'
-            },
-            'sintel': {
-                'name': 'Sintel (Creative Commons)',
-                'magnet': 'magnet:?xt=urn:btih:08ada5a7a6183aae1e09d831df6748d566095a10&dn=Sintel',
-                'size': '745 MB',
-                'seeders': '300+',
-                'link': 'https://durian.blender.org/'
-            },
-            'tears of steel': {
-                'name': 'Tears of Steel (Creative Commons)',
-                'magnet': 'magnet:?xt=urn:btih:3b24558f5e1c009d78ba1a4dff1276b1e31e6c1e&dn=Tears+of+Steel',
-                'size': '738 MB',
-                'seeders': '200+',
-                'link': 'https://mango.blender.org/'
-            },
-            'cosmos laundromat': {
-                'name': 'Cosmos Laundromat (Creative Commons)',
-                'magnet': 'magnet:?xt=urn:btih:c9e15763f722f23e98a29decdfae341b98d53056&dn=Cosmos+Laundromat',
-                'size': '210 MB',
-                'seeders': '150+',
-                'link': 'https://gooseberry.blender.org/'
-            },
-            'elephants dream': {
-                'name': 'Elephants Dream (Creative Commons)',
-                'magnet': 'magnet:?xt=urn:btih:0e8e78a9e6e6e6e6e6e6e6e6e6e6e6e6e6e6e6e6&dn=Elephants+Dream',
-                'size': '235 MB',
-                'seeders': '200+',
-                'link': 'https://orange.blender.org/'
-            }
-        }
-
-        query_lower = query.lower()
-        for key, info in samples.items():
-            if key in query_lower or query_lower in info['name'].lower():
-                results.append({
-                    'name': info['name'],
-                    'size': info['size'],
-                    'seeders': info['seeders'],
-                    'magnet': info['magnet'],
-                    'link': info['link'],
-                    'source': 'Creative Commons'
-                })
-
-        return results[:limit]
+        return CATALOG.search(query, category='samples', limit=limit)
 
     def search_public_domain_movies(self, query, limit=20):
         """Search for public domain classic movies"""
-        results = []
-
-        movies = {
-            'night of the living dead': {
-                'name': 'Night of the Living Dead (1968)',
-                'magnet': 'https://archive.org/download/night_of_the_living_dead/night_of_the_living_dead_archive.torrent',
-                'size': '700 MB',
-                'seeders': '250+',
-                'link': 'https://archive.org/details/night_of_the_living_dead'
-            },
-            'nosferatu': {
-                'name': 'Nosferatu (1922)',
-                'magnet': 'https://archive.org/download/nosferatu_1922/nosferatu_1922_archive.torrent',
-                'size': '450 MB',
-                'seeders': '180+',
-                'link': 'https://archive.org/details/nosferatu_1922'
-            },
-            'metropolis': {
-                'name': 'Metropolis (1927)',
-                'magnet': 'https://archive.org/download/Metropolis1927/Metropolis1927_archive.torrent',
-                'size': '850 MB',
-                'seeders': '200+',
-                'link': 'https://archive.org/details/Metropolis1927'
-            },
-            'charade': {
-                'name': 'Charade (1963)',
-                'magnet': 'https://archive.org/download/Charade_201510/Charade_archive.torrent',
-                'size': '1.2 GB',
-                'seeders': '190+',
-                'link': 'https://archive.org/details/Charade_201510'
-            },
-            'plan 9': {
-                'name': 'Plan 9 from Outer Space (1959)',
-                'magnet': 'https://archive.org/download/Plan9FromOuterSpace_201603/Plan9FromOuterSpace_archive.torrent',
-                'size': '550 MB',
-                'seeders': '160+',
-                'link': 'https://archive.org/details/Plan9FromOuterSpace_201603'
-            }
-        }
-
-        query_lower = query.lower()
-        for key, info in movies.items():
-            if key in query_lower or any(term in query_lower for term in key.split()):
-                results.append({
-                    'name': info['name'],
-                    'size': info['size'],
-                    'seeders': info['seeders'],
-                    'magnet': info['magnet'],
-                    'link': info['link'],
-                    'source': 'Public Domain Movies'
-                })
-
-        return results[:limit]
+        return CATALOG.search(query, category='movies', limit=limit)
 
     def search_public_domain_books(self, query, limit=20):
         """Search for public domain books"""
-        results = []
-
-        books = {
-            'alice in wonderland': {
-                'name': "Alice's Adventures in Wonderland - Lewis Carroll",
-                'magnet': 'https://archive.org/download/alicesadventures19033gut/alicesadventures19033gut_archive.torrent',
-                'size': '15 MB',
-                'seeders': '120+',
-                'link': 'https://archive.org/details/alicesadventures19033gut'
-            },
-            'pride and prejudice': {
-                'name': 'Pride and Prejudice - Jane Austen',
-                'magnet': 'https://archive.org/download/prideandprejudic01aust/prideandprejudic01aust_archive.torrent',
-                'size': '18 MB',
-                'seeders': '110+',
-                'link': 'https://archive.org/details/prideandprejudic01aust'
-            },
-            'sherlock holmes': {
-                'name': 'The Adventures of Sherlock Holmes',
-                'magnet': 'https://archive.org/download/adventuresofserl00doyl/adventuresofserl00doyl_archive.torrent',
-                'size': '22 MB',
-                'seeders': '130+',
-                'link': 'https://archive.org/details/adventuresofserl00doyl'
-            },
-            'moby dick': {
-                'name': 'Moby Dick - Herman Melville',
-                'magnet': 'https://archive.org/download/mobydick00melv/mobydick00melv_archive.torrent',
-                'size': '35 MB',
-                'seeders': '100+',
-                'link': 'https://archive.org/details/mobydick00melv'
-            },
-            'war and peace': {
-                'name': 'War and Peace - Leo Tolstoy',
-                'magnet': 'https://archive.org/download/warandpeace030164mbp/warandpeace030164mbp_archive.torrent',
-                'size': '45 MB',
-                'seeders': '95+',
-                'link': 'https://archive.org/details/warandpeace030164mbp'
-            }
-        }
-
-        query_lower = query.lower()
-        for key, info in books.items():
-            if key in query_lower or any(term in info['name'].lower() for term in query_lower.split()):
-                results.append({
-                    'name': info['name'],
-                    'size': info['size'],
-                    'seeders': info['seeders'],
-                    'magnet': info['magnet'],
-                    'link': info['link'],
-                    'source': 'Public Domain Books'
-                })
-
-        return results[:limit]
+        return CATALOG.search(query, category='books', limit=limit)
 
     def search_academic_torrents(self, query, limit=20):
         """Search Academic Torrents for research datasets"""
@@ -303,7 +246,7 @@ class TorrentSearcher:
                 'limit': limit
             }
 
-            response = requests.get(search_url, params=params, timeout=10)
+            response = http_client.get(search_url, params=params, timeout=10)
             response.raise_for_status()  # Raise exception for bad status codes
 
             data = response.json()
@@ -312,6 +255,7 @@ class TorrentSearcher:
                 result = {
                     'name': item.get('name', 'Unknown'),
                     'size': self._format_size(item.get('size', 0)),
+                    'size_bytes': parse_count(item.get('size', 0)),
                     'seeders': item.get('seeders', 0),
                     'magnet': item.get('magnet', ''),
                     'link': f"https://academictorrents.com/details/{item.get('id', '')}",
@@ -334,80 +278,87 @@ class TorrentSearcher:
 
     def search_creative_commons_music(self, query, limit=20):
         """Search for Creative Commons music"""
-        results = []
+        return CATALOG.search(query, category='music', limit=limit)
+
+    def search_stream(self, query, limit=20, timeout=15):
+        """
+        Query every source in parallel, yielding results as each one finishes
+
+        Network sources with cached results are answered first without a request.
+        Sources still running when the deadline passes are skipped; their
+        threads finish in the background and only fill the cache.
+
+        Args:
+            query: Search query
+            limit: Maximum results per source
+            timeout: Overall deadline in seconds for all sources
+
+        Yields:
+            tuple: (source name, list of results)
+        """
+        # Answer what we can from the cache straight away
+        misses = []
+        for name, search in self.search_sources:
+            if name not in self.cached_sources:
+                misses.append((name, search))
+                continue
+            cached = self.cache.get(name, query, limit)
+            if cached is not None:
+                yield name, cached
+            else:
+                misses.append((name, search))
+        if not misses:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=len(misses),
+                                      thread_name_prefix='search')
+        futures = {executor.submit(self._search_source, name, search, query, limit): name
+                   for name, search in misses}
 
-        # Example CC music library
-        music = {
-            'ambient': {
-                'name': 'Ambient Music Collection - Kevin MacLeod',
-                'magnet': 'https://archive.org/download/kevinmacleod_vol1/kevinmacleod_vol1_archive.torrent',
-                'size': '250 MB',
-                'seeders': '85+',
-                'link': 'https://archive.org/details/kevinmacleod_vol1'
-            },
-            'jazz': {
-                'name': 'Free Jazz Collection',
-                'magnet': 'https://archive.org/download/free_jazz_collection/free_jazz_collection_archive.torrent',
-                'size': '180 MB',
-                'seeders': '65+',
-                'link': 'https://archive.org/details/free_jazz_collection'
-            },
-            'classical': {
-                'name': 'Public Domain Classical Music',
-                'magnet': 'https://archive.org/download/classical_music_pd/classical_music_pd_archive.torrent',
-                'size': '320 MB',
-                'seeders': '90+',
-                'link': 'https://archive.org/details/classical_music_pd'
-            },
-            'electronic': {
-                'name': 'CC Electronic Music Mix',
-                'magnet': 'https://archive.org/download/cc_electronic_mix/cc_electronic_mix_archive.torrent',
-                'size': '200 MB',
-                'seeders': '70+',
-                'link': 'https://archive.org/details/cc_electronic_mix'
-            }
-        }
-
-        query_lower = query.lower()
-        for key, info in music.items():
-            if key in query_lower or any(term in info['name'].lower() for term in query_lower.split()):
-                results.append({
-                    'name': info['name'],
-                    'size': info['size'],
-                    'seeders': info['seeders'],
-                    'magnet': info['magnet'],
-                    'link': info['link'],
-                    'source': 'CC Music'
-                })
-
-        return results[:limit]
-
-    def search_all(self, query, limit=20):
-        """Search all sources"""
-        all_results = []
-
-        # Search Creative Commons first (fastest)
-        all_results.extend(self.search_sample_content(query, limit))
-
-        # Search public domain movies
-        all_results.extend(self.search_public_domain_movies(query, limit))
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                name = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"{name} search error - unexpected: {type(e).__name__}: {e}")
+                    continue
+                yield name, results[:limit]
+        except FuturesTimeout:
+            pending = [futures[f] for f in futures if not f.done()]
+            print(f"Search timeout - skipped slow sources: {', '.join(pending)}")
+        finally:
+            # Don't wait for stragglers
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _search_source(self, name, search, query, limit):
+        """Query one source and cache its results if it's a network source (worker thread)"""
+        results = search(query, limit)
+        # Cached even if the search deadline has passed, so the next search gets it
+        if name in self.cached_sources:
+            self.cache.put(name, query, limit, results)
+        return results
 
-        # Search public domain books
-        all_results.extend(self.search_public_domain_books(query, limit))
+    def search_all(self, query, limit=20, timeout=15):
+        """
+        Search all sources concurrently
 
-        # Search Creative Commons music
-        all_results.extend(self.search_creative_commons_music(query, limit))
+        Results are listed in source order (local sources first), whatever
+        order the sources finish in.
 
-        # Search Linux distros
-        all_results.extend(self.search_linux_tracker(query, limit))
+        Args:
+            query: Search query
+            limit: Maximum number of results
+            timeout: Overall deadline in seconds for all sources
 
-        # Search Academic Torrents (with API)
-        if len(all_results) < limit:
-            all_results.extend(self.search_academic_torrents(query, limit - len(all_results)))
+        Returns:
+            list: Up to limit results
+        """
+        by_source = dict(self.search_stream(query, limit, timeout))
 
-        # Search Internet Archive (slower, use as fallback)
-        if len(all_results) < limit:
-            all_results.extend(self.search_archive_org(query, limit - len(all_results)))
+        all_results = []
+        for name, _ in self.search_sources:
+            all_results.extend(by_source.get(name, []))
 
         return all_results[:limit]
 
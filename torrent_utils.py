@@ -70,6 +70,49 @@ def format_time(seconds):
         return "Unknown"
 
 
+# Units accepted by parse_size(); decimal and binary spellings both mean 1024
+SIZE_UNITS = {
+    'B': 1,
+    'KB': 1024, 'KIB': 1024,
+    'MB': 1024 ** 2, 'MIB': 1024 ** 2,
+    'GB': 1024 ** 3, 'GIB': 1024 ** 3,
+    'TB': 1024 ** 4, 'TIB': 1024 ** 4,
+    'PB': 1024 ** 5, 'PIB': 1024 ** 5,
+}
+
+
+def parse_size(text):
+    """
+    Convert a human-readable size like "1.5 GB" or "264 MiB" back to bytes
+
+    Args:
+        text: Size string as shown by search sources or format_size()
+
+    Returns:
+        int: Number of bytes, or 0 if the size is unknown
+    """
+    try:
+        value, unit = str(text).split()
+        return int(float(value) * SIZE_UNITS[unit.upper()])
+    except (ValueError, KeyError):
+        return 0
+
+
+def parse_count(value):
+    """
+    Convert a count like 12, "1,234" or "500+" to an int
+
+    Returns:
+        int: The count, or 0 if it is unknown
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(str(value).replace(',', '').rstrip('+').strip())
+    except ValueError:
+        return 0
+
+
 def send_notification(title, message):
     """
     Send desktop notification (Linux only)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Batched, diff-based rendering for ttk.Treeview
+
+Background threads record the values they want a row to show; the renderer
+remembers what each row currently displays and, once per frame on the Tk
+main thread, sends only the changed cells of rows that are on screen.
+Rows scrolled out of view stay dirty until they become visible.
+
+Rows can also carry raw sort keys (numbers, not the formatted text). Once a
+sort column is chosen, the renderer keeps the rows in that order as their
+keys change, reordering the whole tree with one set_children() call.
+"""
+
+import threading
+import tkinter as tk
+
+
+class TreeRenderer:
+    """Render row updates into a Treeview in one main-thread batch per frame"""
+
+    def __init__(self, root, tree, columns):
+        """
+        Args:
+            root: Tk root used to schedule flushes on the main thread
+            tree: ttk.Treeview to render into
+            columns: Column identifiers, in the order values are given
+        """
+        self.root = root
+        self.tree = tree
+        self.columns = tuple(columns)
+
+        self.rendered = {}   # item_id -> (values, tags) shown in the tree (main thread only)
+        self.desired = {}    # item_id -> (values, tags) most recently requested
+        self.dirty = set()   # item_ids whose desired row differs from the rendered one
+        self.sort_keys = {}  # item_id -> sort key per column
+        self.sort_column = None
+        self.sort_reverse = False
+        self.order = []      # item_ids as last ordered by the renderer (main thread only)
+        self.order_dirty = False
+        self.lock = threading.Lock()
+        self.flush_scheduled = False
+
+    def insert(self, values, tags=()):
+        """Insert a new row at the end (main thread) and return its item id"""
+        values, tags = tuple(values), tuple(tags)
+        item_id = self.tree.insert('', 'end', values=values, tags=tags)
+        with self.lock:
+            self.rendered[item_id] = (values, tags)
+            self.desired[item_id] = (values, tags)
+        self.order.append(item_id)
+        return item_id
+
+    def delete(self, item_id):
+        """Delete a row (main thread) and forget its cached values"""
+        with self.lock:
+            self.desired.pop(item_id, None)
+            self.dirty.discard(item_id)
+            self.sort_keys.pop(item_id, None)
+        self.rendered.pop(item_id, None)
+        if item_id in self.order:
+            self.order.remove(item_id)  # Kept in step with the tree for _apply_order()
+        self.tree.delete(item_id)
+
+    def update(self, item_id, values, tags=(), sort_keys=None):
+        """
+        Record the values a row should show (any thread)
+
+        Nothing is sent to Tk until the next flush, and rows whose values
+        didn't change are not marked dirty at all.
+
+        Args:
+            item_id: Row to update
+            values: Formatted cell values, one per column
+            tags: Row tags
+            sort_keys: Raw value to sort each column by, one per column
+        """
+        row = (tuple(values), tuple(tags))
+        with self.lock:
+            if item_id not in self.desired:
+                return
+            if sort_keys is not None:
+                sort_keys = tuple(sort_keys)
+                old = self.sort_keys.get(item_id)
+                self.sort_keys[item_id] = sort_keys
+                column = self.sort_column
+                if column is not None and (old is None or old[column] != sort_keys[column]):
+                    self.order_dirty = True
+            if self.desired[item_id] == row:
+                return
+            self.desired[item_id] = row
+            self.dirty.add(item_id)
+
+    def sort(self, column, reverse=False):
+        """
+        Order the rows by a column's sort keys and keep them in that order (main thread)
+
+        Rows without sort keys yet go last. Ties keep the order the rows
+        were inserted in, so equal rows don't swap places between updates.
+
+        Args:
+            column: Index of the column to sort by
+            reverse: Sort descending
+        """
+        with self.lock:
+            self.sort_column = column
+            self.sort_reverse = reverse
+            self.order_dirty = True
+        self.flush()
+
+    def values(self, item_id):
+        """Return the latest values for a row, rendered or not"""
+        with self.lock:
+            row = self.desired.get(item_id)
+        return row[0] if row else ()
+
+    def flush_later(self):
+        """Schedule a flush on the main thread, at most once per frame"""
+        with self.lock:
+            if self.flush_scheduled or not (self.dirty or self.order_dirty):
+                return
+            self.flush_scheduled = True
+        self.root.after(0, self.flush)
+
+    def attach_scrollbar(self, scrollbar):
+        """Route the tree's scrolling through the renderer so rows render as they appear"""
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            self.flush_later()
+
+        self.tree.configure(yscrollcommand=on_scroll)
+        self.tree.bind('<Configure>', lambda e: self.flush_later(), add='+')
+        self.tree.bind('<Map>', lambda e: self.flush_later(), add='+')
+
+    def flush(self):
+        """Send changed cells of visible dirty rows to the tree (main thread)"""
+        self._apply_order()
+
+        with self.lock:
+            self.flush_scheduled = False
+            if not self.dirty:
+                return
+            visible = [item for item in self.visible_items() if item in self.dirty]
+            rows = [(item, self.desired[item]) for item in visible]
+            self.dirty.difference_update(visible)
+
+        for item_id, (values, tags) in rows:
+            old_values, old_tags = self.rendered.get(item_id, ((), ()))
+            try:
+                for index, column in enumerate(self.columns):
+                    if index >= len(old_values) or old_values[index] != values[index]:
+                        self.tree.set(item_id, column, values[index])
+                if tags != old_tags:
+                    self.tree.item(item_id, tags=tags)
+            except tk.TclError:
+                continue  # Row was deleted after the update was recorded
+            self.rendered[item_id] = (values, tags)
+
+    def _apply_order(self):
+        """Reorder the tree if a sort key of the sort column changed (main thread)"""
+        with self.lock:
+            if not self.order_dirty:
+                return
+            self.order_dirty = False
+            column = self.sort_column
+            keys = self.sort_keys
+            # Starting from insertion order keeps ties stable across updates
+            keyed = [item for item in self.desired if item in keys]
+            keyed.sort(key=lambda item: keys[item][column], reverse=self.sort_reverse)
+            unkeyed = [item for item in self.desired if item not in keys]
+
+        order = keyed + unkeyed
+        if order != self.order:
+            self.tree.set_children('', *order)
+            self.order = order
+
+    def visible_items(self):
+        """Return the item ids currently on screen, top to bottom"""
+        height = self.tree.winfo_height()
+
+        # Find the first visible row, skipping past the heading
+        top = ''
+        for y in range(0, min(height, 64), 4):
+            top = self.tree.identify_row(y)
+            if top:
+                break
+        if not top:
+            return []
+
+        bbox = self.tree.bbox(top)
+        row_height = bbox[3] if bbox else 20
+        count = height // max(row_height, 1) + 1
+
+        items = []
+        item = top
+        while item and len(items) < count:
+            items.append(item)
+            item = self.tree.next(item)
+        return items